@@ -1,17 +1,28 @@
+import dataclasses
+import logging
 import os
+import threading
+from dataclasses import dataclass, field
 from dotenv import load_dotenv
 from pathlib import Path
+from typing import Any, Callable, Iterable, Mapping, Optional
 import yaml
+from modules.backends import DEFAULT_CACHE_TTL
+from modules.batch import DEFAULT_MAX_WORKERS
+from modules.quote_snapshot import QUOTE_BATCH_LIMIT
+from modules.rate_limiter import DEFAULT_QUOTE_RATE
+
+logger = logging.getLogger(__name__)
 
 # 1. 加载 .env 文件
 load_dotenv(dotenv_path=Path.cwd() / ".env", override=True)
 
 
 # 2. 加载 config.yml
-def load_yaml_config(path: Path = Path.cwd() / "config.yml") -> dict[str, str]:
+def load_yaml_config(path: Path = Path.cwd() / "config.yml") -> dict[str, Any]:
     if os.path.exists(path):
         with open(path, "r") as f:
-            return yaml.safe_load(f)
+            return yaml.safe_load(f) or {}
     return {}
 
 
@@ -27,3 +38,208 @@ def get_config(key: str, default: str = "") -> str:
 LONGPORT_APP_KEY: str = get_config("LONGPORT_APP_KEY", "")
 LONGPORT_APP_SECRET: str = get_config("LONGPORT_APP_SECRET", "")
 LONGPORT_ACCESS_TOKEN: str = get_config("LONGPORT_ACCESS_TOKEN", "")
+
+
+# 5. 性能配置：config.yml 中的 performance 段
+@dataclass(frozen=True)
+class PerformanceConfig:
+    """
+    性能相关的配置，例如：
+
+    performance:
+      max_workers: 16
+      rate_limit: 10
+      cache_ttl:
+        quote: 0.5
+      conflation_window: 0.2
+    """
+
+    # *_batch 方法的最大并发数
+    max_workers: int = DEFAULT_MAX_WORKERS
+    # 每秒调用次数与令牌桶容量（默认等于 rate_limit）
+    rate_limit: float = DEFAULT_QUOTE_RATE
+    rate_burst: Optional[float] = None
+    # 方法名 -> 缓存时间（秒），与默认值合并
+    cache_ttl: Mapping[str, float] = field(
+        default_factory=lambda: dict(DEFAULT_CACHE_TTL)
+    )
+    cache_max_entries: int = 10000
+    # 单次批量请求的标的数量
+    batch_size: int = QUOTE_BATCH_LIMIT
+    # 行情变化的合并窗口（秒），0 表示不合并
+    conflation_window: float = 0.0
+
+
+def _number(key: str, value: Any, minimum: float, integer: bool = False) -> Any:
+    if isinstance(value, bool) or not isinstance(
+        value, int if integer else (int, float)
+    ):
+        kind = "整数" if integer else "数字"
+        raise ValueError(f"性能配置 {key} 必须是{kind}: {value!r}")
+    if value < minimum:
+        raise ValueError(f"性能配置 {key} 不能小于 {minimum}: {value!r}")
+    return value if integer else float(value)
+
+
+def parse_performance_config(raw: Optional[Mapping[str, Any]]) -> PerformanceConfig:
+    """
+    校验并解析性能配置
+
+    :param raw: config.yml 中 performance 段的内容，None 表示全部使用默认值
+    :return: 性能配置
+    """
+    if raw is None:
+        return PerformanceConfig()
+    if not isinstance(raw, Mapping):
+        raise ValueError(f"性能配置必须是字典: {raw!r}")
+    known = {f.name for f in dataclasses.fields(PerformanceConfig)}
+    unknown = sorted(set(raw) - known)
+    if unknown:
+        raise ValueError(f"未知的性能配置: {', '.join(map(str, unknown))}")
+
+    values: dict[str, Any] = {}
+    for key in ("max_workers", "cache_max_entries", "batch_size"):
+        if key in raw:
+            values[key] = _number(key, raw[key], 1, integer=True)
+    if "rate_limit" in raw:
+        values["rate_limit"] = _number("rate_limit", raw["rate_limit"], 0.001)
+    if raw.get("rate_burst") is not None:
+        values["rate_burst"] = _number("rate_burst", raw["rate_burst"], 1)
+    if "conflation_window" in raw:
+        values["conflation_window"] = _number(
+            "conflation_window", raw["conflation_window"], 0
+        )
+    if "cache_ttl" in raw:
+        ttl = raw["cache_ttl"] or {}
+        if not isinstance(ttl, Mapping):
+            raise ValueError(f"性能配置 cache_ttl 必须是字典: {ttl!r}")
+        values["cache_ttl"] = {
+            **DEFAULT_CACHE_TTL,
+            **{
+                str(method): _number(f"cache_ttl.{method}", seconds, 0)
+                for method, seconds in ttl.items()
+            },
+        }
+    return PerformanceConfig(**values)
+
+
+def load_performance_config(
+    path: Path = Path.cwd() / "config.yml",
+) -> PerformanceConfig:
+    """
+    从配置文件加载性能配置
+
+    :param path: 配置文件路径
+    :return: 性能配置，配置不合法时抛出 ValueError
+    """
+    return parse_performance_config(load_yaml_config(path).get("performance"))
+
+
+# 启动时校验一次，配置不合法时直接失败；ConfigWatcher 重新加载后整体替换
+_performance_config = parse_performance_config(yaml_config.get("performance"))
+
+
+def get_performance_config() -> PerformanceConfig:
+    """获取当前生效的性能配置"""
+    return _performance_config
+
+
+class ConfigWatcher:
+    """
+    配置文件热加载
+
+    定期检查配置文件的修改时间，变化后重新校验性能配置并通知回调，
+    例如 LongPortMarketAdapter、QuoteSnapshotPublisher、ScreeningEngine、
+    QuoteConflator 的 apply_performance_config，无需重建连接。
+    新配置不合法时记录日志并继续使用旧配置；凭证不会热加载。
+    """
+
+    def __init__(
+        self,
+        path: Optional[Path] = None,
+        callbacks: Iterable[Callable[[PerformanceConfig], None]] = (),
+        interval: float = 2.0,
+    ):
+        """
+        :param path: 配置文件路径，默认当前目录下的 config.yml
+        :param callbacks: 配置变化时的回调，参数为新配置
+        :param interval: 检查间隔（秒）
+        """
+        self.path = Path.cwd() / "config.yml" if path is None else Path(path)
+        self._callbacks = list(callbacks)
+        self._interval = interval
+        self._signature = self._stat()
+        self._lock = threading.Lock()
+        self._stop_event = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self.reloads = 0
+        self.errors = 0
+
+    def add_callback(self, callback: Callable[[PerformanceConfig], None]) -> None:
+        """
+        注册配置变化回调
+
+        :param callback: 参数为新配置
+        """
+        self._callbacks.append(callback)
+
+    def _stat(self) -> Optional[tuple[int, int]]:
+        try:
+            stat = self.path.stat()
+        except FileNotFoundError:
+            return None
+        return stat.st_mtime_ns, stat.st_size
+
+    def check(self) -> bool:
+        """
+        检查配置文件，有变化时重新加载
+
+        :return: 生效的性能配置是否发生了变化
+        """
+        global _performance_config
+        with self._lock:
+            signature = self._stat()
+            if signature == self._signature:
+                return False
+            self._signature = signature
+            if signature is None:
+                # 配置文件被删除时继续使用当前配置
+                return False
+            try:
+                config = load_performance_config(self.path)
+            except Exception:
+                self.errors += 1
+                logger.exception("配置文件 %s 重新加载失败，继续使用旧配置", self.path)
+                return False
+            if config == _performance_config:
+                return False
+            _performance_config = config
+            self.reloads += 1
+        logger.info("性能配置已重新加载: %s", config)
+        for callback in self._callbacks:
+            try:
+                callback(config)
+            except Exception:
+                logger.exception("性能配置回调执行失败")
+        return True
+
+    def start(self) -> None:
+        """启动后台检查线程"""
+        if self._thread is not None:
+            return
+        self._stop_event.clear()
+        self._thread = threading.Thread(
+            target=self._run, name="config-watcher", daemon=True
+        )
+        self._thread.start()
+
+    def stop(self) -> None:
+        """停止后台检查线程"""
+        self._stop_event.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    def _run(self) -> None:
+        while not self._stop_event.wait(self._interval):
+            self.check()
@@ -0,0 +1,306 @@
+import threading
+import time
+from dataclasses import dataclass, replace
+from datetime import date, datetime, timedelta
+from decimal import Decimal
+from typing import TYPE_CHECKING, Any, Callable, Optional, Sequence, Type
+import numpy as np
+from longport.openapi import AdjustType, Period, TradeSessions
+from modules.codec import (
+    DEFAULT_PRICE_SCALE,
+    CandleArrays,
+    CandlestickRecord,
+    candle_columns,
+    to_records,
+)
+from modules.markets import market_timezone, symbol_market_key
+from modules.timestamps import from_epoch_ns, to_epoch_ns
+
+if TYPE_CHECKING:
+    from modules.long_port_market_adapter import LongPortMarketAdapter
+
+DEFAULT_FACTOR_TTL = 24 * 3600
+# 默认回溯的自然日数；需要复权更早的K线时按需向前补齐
+DEFAULT_LOOKBACK_DAYS = 2 * 365
+# 复权只作用于价格列，成交额不受公司行动影响
+PRICE_COLUMNS: tuple[str, ...] = ("open", "high", "low", "close")
+
+
+@dataclass(frozen=True)
+class AdjustmentFactors:
+    """
+    单个标的的前复权因子
+
+    day_starts_ns 是各交易日在市场当地零点的纳秒时间戳（升序），
+    factors 是对应交易日的因子：前复权价 = 不复权价 * 因子。
+    """
+
+    symbol: str
+    day_starts_ns: np.ndarray
+    factors: np.ndarray
+
+    def __len__(self) -> int:
+        return len(self.factors)
+
+    def factor_at(self, timestamps_ns: np.ndarray) -> np.ndarray:
+        """
+        查找每个时间戳所在交易日的因子，早于第一天的使用第一天的因子，
+        晚于最后一天的使用最后一天的因子
+
+        :param timestamps_ns: 纳秒时间戳数组
+        :return: 因子数组
+        """
+        if not len(self.factors):
+            return np.ones(len(timestamps_ns))
+        index = np.searchsorted(self.day_starts_ns, timestamps_ns, side="right") - 1
+        return self.factors[np.clip(index, 0, len(self.factors) - 1)]
+
+
+def compute_factors(
+    symbol: str, raw_daily: Sequence[Any], adjusted_daily: Sequence[Any]
+) -> AdjustmentFactors:
+    """
+    由同一区间的不复权日K线和前复权日K线计算每日复权因子
+
+    :param symbol: 标的代码
+    :param raw_daily: 不复权日K线（longport Candlestick 或 CandlestickRecord）
+    :param adjusted_daily: 前复权日K线
+    :return: 复权因子
+    """
+    raw = candle_columns(raw_daily)
+    adjusted = candle_columns(adjusted_daily)
+    common, raw_index, adjusted_index = np.intersect1d(
+        raw["timestamp_ns"], adjusted["timestamp_ns"], return_indices=True
+    )
+    raw_close = raw["close"][raw_index]
+    valid = raw_close > 0
+    factors = adjusted["close"][adjusted_index][valid] / raw_close[valid]
+    tz = market_timezone(symbol_market_key(symbol))
+    day_starts = np.array(
+        [
+            to_epoch_ns(
+                datetime.combine(
+                    from_epoch_ns(int(ns), tz).date(), datetime.min.time(), tz
+                )
+            )
+            for ns in common[valid]
+        ],
+        dtype=np.int64,
+    )
+    return AdjustmentFactors(symbol, day_starts, factors)
+
+
+def merge_factors(
+    older: AdjustmentFactors, newer: AdjustmentFactors
+) -> AdjustmentFactors:
+    """
+    合并两段不重叠的复权因子（前复权因子以最新价格为基准，不同区间可以直接拼接）
+
+    :param older: 较早区间的因子
+    :param newer: 较晚区间的因子
+    :return: 合并后的因子
+    """
+    return AdjustmentFactors(
+        newer.symbol,
+        np.concatenate([older.day_starts_ns, newer.day_starts_ns]),
+        np.concatenate([older.factors, newer.factors]),
+    )
+
+
+def adjust_arrays(arrays: CandleArrays, factors: AdjustmentFactors) -> CandleArrays:
+    """
+    对整段列式K线做前复权（向量化，返回新数组）
+
+    :param arrays: 不复权的列式K线
+    :param factors: 复权因子
+    :return: 前复权的列式K线
+    """
+    scale = factors.factor_at(arrays.timestamp_ns)
+    adjusted = {
+        name: np.rint(getattr(arrays, name) * scale).astype(np.int64)
+        for name in PRICE_COLUMNS
+    }
+    return replace(arrays, **adjusted)
+
+
+def adjust_candles(
+    candles: Sequence[Any],
+    factors: AdjustmentFactors,
+    scale: int = DEFAULT_PRICE_SCALE,
+) -> list[CandlestickRecord]:
+    """
+    对K线列表做前复权
+
+    :param candles: 不复权K线（longport Candlestick 或 CandlestickRecord）
+    :param factors: 复权因子
+    :param scale: 复权后价格保留的小数位数
+    :return: 前复权K线记录
+    """
+    records = to_records(candles, CandlestickRecord)
+    columns = candle_columns(records, scale)
+    arrays = adjust_arrays(CandleArrays(scale, **columns), factors)
+    prices = {name: getattr(arrays, name).tolist() for name in PRICE_COLUMNS}
+    return [
+        replace(
+            record,
+            **{name: Decimal(prices[name][i]).scaleb(-scale) for name in PRICE_COLUMNS},
+        )
+        for i, record in enumerate(records)
+    ]
+
+
+class AdjustmentEngine:
+    """
+    本地复权引擎
+
+    每个标的只请求一次不复权和前复权的日K线来计算每日复权因子并缓存，
+    其它周期的前复权K线由不复权K线在本地推导，历史K线只需请求一次，
+    两种口径也总是基于同一份原始数据。因子按日计算，同一交易日内的K线使用相同因子。
+    日K线通过 HistoryStream 分窗口请求，默认只回溯 lookback_days，
+    复权更早的K线时只补请求缺少的区间。
+    """
+
+    def __init__(
+        self,
+        adapter: "LongPortMarketAdapter",
+        ttl: float = DEFAULT_FACTOR_TTL,
+        lookback_days: int = DEFAULT_LOOKBACK_DAYS,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        """
+        :param adapter: 行情适配器
+        :param ttl: 复权因子的缓存时间（秒），新的除权除息日会改变全部历史因子
+        :param lookback_days: 计算因子时默认回溯的自然日数
+        :param clock: 单调时钟
+        """
+        self._adapter = adapter
+        self._ttl = ttl
+        self._lookback = timedelta(days=lookback_days)
+        self._clock = clock
+        # 标的 -> (复权因子, 过期时间, 因子覆盖的开始日期)
+        # 写时复制的只读快照，读取无需加锁
+        self._factors: dict[str, tuple[AdjustmentFactors, float, date]] = {}
+        self._lock = threading.Lock()
+
+    def factors(
+        self, symbol: str, today: Optional[date] = None, since: Optional[date] = None
+    ) -> AdjustmentFactors:
+        """
+        获取标的的复权因子（带缓存）
+
+        :param symbol: 标的代码
+        :param today: 市场当地的今天，默认按市场时区计算
+        :param since: 因子至少需要覆盖的开始日期，默认回溯 lookback_days
+        :return: 复权因子
+        """
+        tz = market_timezone(symbol_market_key(symbol))
+        end = today or datetime.now(tz).date()
+        start = end - self._lookback
+        if since is not None and since < start:
+            start = since
+        cached = self._factors.get(symbol)
+        if cached is not None and cached[1] > self._clock():
+            factors, expires_at, covered_from = cached
+            if covered_from <= start:
+                return factors
+            # 缓存仍然有效，只补请求更早的区间
+            older = self._compute(symbol, start, covered_from - timedelta(days=1))
+            factors = merge_factors(older, factors)
+        else:
+            factors = self._compute(symbol, start, end)
+            expires_at = self._clock() + self._ttl
+        with self._lock:
+            self._factors = {**self._factors, symbol: (factors, expires_at, start)}
+        return factors
+
+    def _compute(self, symbol: str, start: date, end: date) -> AdjustmentFactors:
+        """分窗口请求区间内的不复权与前复权日K线并计算因子"""
+        raw, adjusted = (
+            [
+                candle
+                for window in self._adapter.stream_history_candlesticks_by_date(
+                    symbol, Period.Day, adjust_type, start, end
+                ).iter_windows()
+                for candle in window
+            ]
+            for adjust_type in (AdjustType.NoAdjust, AdjustType.ForwardAdjust)
+        )
+        return compute_factors(symbol, raw, adjusted)
+
+    def invalidate(self, symbol: Optional[str] = None) -> None:
+        """
+        清空缓存的复权因子
+
+        :param symbol: 标的代码，默认清空全部
+        """
+        with self._lock:
+            if symbol is None:
+                self._factors = {}
+            else:
+                self._factors = {k: v for k, v in self._factors.items() if k != symbol}
+
+    def adjust(self, symbol: str, candles: Sequence[Any]) -> list[CandlestickRecord]:
+        """
+        对标的的不复权K线做前复权
+
+        :param symbol: 标的代码
+        :param candles: 不复权K线
+        :return: 前复权K线记录
+        """
+        records = to_records(candles, CandlestickRecord)
+        if not records:
+            return []
+        tz = market_timezone(symbol_market_key(symbol))
+        first = min(record.timestamp_ns for record in records)
+        since = from_epoch_ns(first, tz).date()
+        return adjust_candles(records, self.factors(symbol, since=since))
+
+    def fetch_history_candlesticks_by_date_normalized(
+        self,
+        symbol: str,
+        period: Type[Period],
+        adjust_type: Type[AdjustType],
+        start: Optional[date] = None,
+        end: Optional[date] = None,
+        trade_sessions: Type[TradeSessions] = TradeSessions.Intraday,
+    ) -> list[CandlestickRecord]:
+        """
+        按日期获取历史K线，前复权K线由不复权K线在本地推导
+
+        :param symbol: 标的代码
+        :param period: K线周期
+        :param adjust_type: 复权类型
+        :param start: 开始日期
+        :param end: 结束日期
+        :param trade_sessions: 交易时段
+        :return: K线记录列表
+        """
+        candles = self._adapter.fetch_history_candlesticks_by_date_normalized(
+            symbol, period, AdjustType.NoAdjust, start, end, trade_sessions
+        )
+        if adjust_type == AdjustType.ForwardAdjust:
+            return self.adjust(symbol, candles)
+        return candles
+
+    def fetch_both(
+        self,
+        symbol: str,
+        period: Type[Period],
+        start: Optional[date] = None,
+        end: Optional[date] = None,
+        trade_sessions: Type[TradeSessions] = TradeSessions.Intraday,
+    ) -> tuple[list[CandlestickRecord], list[CandlestickRecord]]:
+        """
+        一次请求同时得到不复权和前复权两种K线
+
+        :param symbol: 标的代码
+        :param period: K线周期
+        :param start: 开始日期
+        :param end: 结束日期
+        :param trade_sessions: 交易时段
+        :return: (不复权K线, 前复权K线)
+        """
+        candles = self._adapter.fetch_history_candlesticks_by_date_normalized(
+            symbol, period, AdjustType.NoAdjust, start, end, trade_sessions
+        )
+        return candles, self.adjust(symbol, candles)
@@ -0,0 +1,658 @@
+import heapq
+import itertools
+import logging
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from concurrent.futures import TimeoutError as FutureTimeoutError
+from dataclasses import dataclass
+from datetime import date
+from typing import (
+    Any,
+    Callable,
+    Iterator,
+    Literal,
+    Mapping,
+    Optional,
+    Protocol,
+    Sequence,
+    Type,
+    runtime_checkable,
+)
+from longport.openapi import (
+    AdjustType,
+    CalcIndex,
+    Candlestick,
+    CapitalDistributionResponse,
+    CapitalFlowLine,
+    HistoryMarketTemperatureResponse,
+    IntradayLine,
+    Market,
+    MarketTemperature,
+    MarketTradingDays,
+    MarketTradingSession,
+    ParticipantInfo,
+    Period,
+    PushTrades,
+    SecurityBrokers,
+    SecurityCalcIndex,
+    SecurityDepth,
+    SecurityQuote,
+    SecurityStaticInfo,
+    SubType,
+    Trade,
+    TradeSessions,
+)
+from modules.free_threading import Counter
+from modules.markets import market_key, symbol_market_key
+from modules.rate_limiter import RateLimiter
+
+logger = logging.getLogger(__name__)
+
+
+@runtime_checkable
+class MarketDataBackend(Protocol):
+    """
+    行情数据源协议
+
+    方法名与签名与 longport 的 QuoteContext 一致，QuoteContext 本身即满足该协议；
+    其他数据源或本地模拟器实现这些方法后即可接入适配器。
+    """
+
+    # ==================== 行情 ====================
+    def static_info(self, symbols: list[str]) -> list[SecurityStaticInfo]: ...
+
+    def quote(self, symbols: list[str]) -> list[SecurityQuote]: ...
+
+    def depth(self, symbol: str) -> SecurityDepth: ...
+
+    def brokers(self, symbol: str) -> SecurityBrokers: ...
+
+    def participants(self) -> list[ParticipantInfo]: ...
+
+    def trades(self, symbol: str, count: int) -> list[Trade]: ...
+
+    def intraday(
+        self, symbol: str, trade_sessions: Type[TradeSessions] = ...
+    ) -> list[IntradayLine]: ...
+
+    def candlesticks(
+        self,
+        symbol: str,
+        period: Type[Period],
+        count: int,
+        adjust_type: Type[AdjustType],
+        trade_sessions: Type[TradeSessions],
+    ) -> list[Candlestick]: ...
+
+    def history_candlesticks_by_date(
+        self,
+        symbol: str,
+        period: Type[Period],
+        adjust_type: Type[AdjustType],
+        start: Optional[date],
+        end: Optional[date],
+        trade_sessions: Type[TradeSessions],
+    ) -> list[Candlestick]: ...
+
+    def trading_session(self) -> list[MarketTradingSession]: ...
+
+    def trading_days(
+        self, market: Type[Market], begin: date, end: date
+    ) -> MarketTradingDays: ...
+
+    def capital_flow(self, symbol: str) -> list[CapitalFlowLine]: ...
+
+    def capital_distribution(self, symbol: str) -> CapitalDistributionResponse: ...
+
+    def calc_indexes(
+        self, symbols: list[str], indexes: list[Type[CalcIndex]]
+    ) -> list[SecurityCalcIndex]: ...
+
+    def market_temperature(self, market: Type[Market]) -> MarketTemperature: ...
+
+    def history_market_temperature(
+        self, market: Type[Market], start: date, end: date
+    ) -> HistoryMarketTemperatureResponse: ...
+
+    # ==================== 推送 ====================
+    def set_on_trades(self, callback: Callable[[str, PushTrades], None]) -> None: ...
+
+    def subscribe(self, symbols: list[str], sub_types: list[Type[SubType]]) -> None: ...
+
+    def unsubscribe(
+        self, symbols: list[str], sub_types: list[Type[SubType]]
+    ) -> None: ...
+
+
+class BackendMiddleware:
+    """
+    数据源中间件基类
+
+    包装另一个数据源并满足同样的协议，所有请求（包括协议之外的 QuoteContext 方法）
+    都经过 _call，子类只需重写 _call 即可为任意数据源叠加缓存、限流、统计等能力。
+    推送回调与订阅不是请求，直接转发给被包装的数据源。
+    """
+
+    def __init__(self, backend: Any):
+        """
+        :param backend: 被包装的数据源
+        """
+        self.backend = backend
+
+    def _call(self, method: str, args: tuple[Any, ...], kwargs: dict[str, Any]) -> Any:
+        return getattr(self.backend, method)(*args, **kwargs)
+
+    def __getattr__(self, method: str) -> Callable[..., Any]:
+        # 只在常规属性查找失败时调用，用于转发协议之外的方法
+        backend = self.__dict__.get("backend")
+        if backend is None or method.startswith("_"):
+            raise AttributeError(method)
+        if not callable(getattr(backend, method)):
+            return getattr(backend, method)
+        return lambda *args, **kwargs: self._call(method, args, kwargs)
+
+    # ==================== 行情 ====================
+    def static_info(self, symbols: list[str]) -> list[SecurityStaticInfo]:
+        return self._call("static_info", (symbols,), {})
+
+    def quote(self, symbols: list[str]) -> list[SecurityQuote]:
+        return self._call("quote", (symbols,), {})
+
+    def depth(self, symbol: str) -> SecurityDepth:
+        return self._call("depth", (symbol,), {})
+
+    def brokers(self, symbol: str) -> SecurityBrokers:
+        return self._call("brokers", (symbol,), {})
+
+    def participants(self) -> list[ParticipantInfo]:
+        return self._call("participants", (), {})
+
+    def trades(self, symbol: str, count: int) -> list[Trade]:
+        return self._call("trades", (symbol, count), {})
+
+    def intraday(self, *args: Any, **kwargs: Any) -> list[IntradayLine]:
+        return self._call("intraday", args, kwargs)
+
+    def candlesticks(self, *args: Any, **kwargs: Any) -> list[Candlestick]:
+        return self._call("candlesticks", args, kwargs)
+
+    def history_candlesticks_by_date(
+        self, *args: Any, **kwargs: Any
+    ) -> list[Candlestick]:
+        return self._call("history_candlesticks_by_date", args, kwargs)
+
+    def trading_session(self) -> list[MarketTradingSession]:
+        return self._call("trading_session", (), {})
+
+    def trading_days(
+        self, market: Type[Market], begin: date, end: date
+    ) -> MarketTradingDays:
+        return self._call("trading_days", (market, begin, end), {})
+
+    def capital_flow(self, symbol: str) -> list[CapitalFlowLine]:
+        return self._call("capital_flow", (symbol,), {})
+
+    def capital_distribution(self, symbol: str) -> CapitalDistributionResponse:
+        return self._call("capital_distribution", (symbol,), {})
+
+    def calc_indexes(
+        self, symbols: list[str], indexes: list[Type[CalcIndex]]
+    ) -> list[SecurityCalcIndex]:
+        return self._call("calc_indexes", (symbols, indexes), {})
+
+    def market_temperature(self, market: Type[Market]) -> MarketTemperature:
+        return self._call("market_temperature", (market,), {})
+
+    def history_market_temperature(
+        self, market: Type[Market], start: date, end: date
+    ) -> HistoryMarketTemperatureResponse:
+        return self._call("history_market_temperature", (market, start, end), {})
+
+    # ==================== 推送 ====================
+    def set_on_trades(self, callback: Callable[[str, PushTrades], None]) -> None:
+        self.backend.set_on_trades(callback)
+
+    def subscribe(self, symbols: list[str], sub_types: list[Type[SubType]]) -> None:
+        self.backend.subscribe(symbols, sub_types)
+
+    def unsubscribe(self, symbols: list[str], sub_types: list[Type[SubType]]) -> None:
+        self.backend.unsubscribe(symbols, sub_types)
+
+
+# ==================== 限流 ====================
+class RateLimitedBackend(BackendMiddleware):
+    """每次调用前从限流器获取令牌"""
+
+    def __init__(self, backend: Any, rate_limiter: Optional[RateLimiter] = None):
+        """
+        :param backend: 被包装的数据源
+        :param rate_limiter: 限流器，默认按行情接口限制新建一个
+        """
+        super().__init__(backend)
+        self.rate_limiter = rate_limiter or RateLimiter()
+
+    def _call(self, method: str, args: tuple[Any, ...], kwargs: dict[str, Any]) -> Any:
+        self.rate_limiter.acquire()
+        return super()._call(method, args, kwargs)
+
+
+# ==================== 缓存与合并 ====================
+# 各方法的默认缓存时间（秒），不在表中的方法只合并并发请求，不缓存结果
+DEFAULT_CACHE_TTL: dict[str, float] = {
+    "quote": 1.0,
+    "depth": 0.5,
+    "candlesticks": 5.0,
+    "history_candlesticks_by_date": 300.0,
+    "trading_session": 6 * 3600.0,
+    "trading_days": 6 * 3600.0,
+    "participants": 6 * 3600.0,
+    "static_info": 3600.0,
+}
+
+
+class _FrozenList(tuple):  # type: ignore[type-arg]
+    """缓存中的列表结果"""
+
+    __slots__ = ()
+
+
+def _freeze(value: Any) -> Any:
+    """列表结果以元组缓存，避免被调用方修改"""
+    return _FrozenList(value) if isinstance(value, list) else value
+
+
+def _unfreeze(value: Any) -> Any:
+    """为每个调用方复制一份列表"""
+    return list(value) if isinstance(value, _FrozenList) else value
+
+
+@dataclass(slots=True)
+class _CacheEntry:
+    value: Any
+    expires_at: float
+    # 最近一次命中的序号，用于近似 LRU 淘汰
+    used: int
+
+
+class CachingBackend(BackendMiddleware):
+    """
+    结果缓存与请求合并
+
+    相同参数的调用在 TTL 内直接返回缓存；缓存未命中时，并发的相同调用共享同一次请求。
+    longport 的枚举不可哈希，缓存键使用参数的 repr。
+
+    写入、淘汰在锁内原地修改字典，命中路径只做一次字典查找，不加锁。
+    容量超限时先清理过期结果，再按 LRU 淘汰到容量的 90%，淘汰开销分摊到多次写入。
+    列表结果以元组缓存，每个调用方拿到各自的列表副本，修改返回值不会影响缓存。
+    命中计数按线程分片累加；LRU 序号不加锁更新，并发时为近似值。
+    """
+
+    def __init__(
+        self,
+        backend: Any,
+        ttl: Mapping[str, float] = DEFAULT_CACHE_TTL,
+        max_entries: int = 10000,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        """
+        :param backend: 被包装的数据源
+        :param ttl: 方法名 -> 缓存时间（秒）
+        :param max_entries: 最多缓存的结果数，超出时淘汰最久未使用的
+        :param clock: 单调时钟
+        """
+        super().__init__(backend)
+        self._ttl = dict(ttl)
+        self._max_entries = max_entries
+        self._clock = clock
+        # 只在锁内修改，读取不加锁
+        self._cache: dict[tuple[str, str], _CacheEntry] = {}
+        self._inflight: dict[tuple[str, str], Future[Any]] = {}
+        self._lock = threading.Lock()
+        self._ticks = itertools.count()
+        self._hits = Counter()
+        self.misses = 0
+        self.coalesced = 0
+
+    def _call(self, method: str, args: tuple[Any, ...], kwargs: dict[str, Any]) -> Any:
+        key = (method, repr((args, sorted(kwargs.items()))))
+        entry = self._cache.get(key)
+        if entry is not None and entry.expires_at > self._clock():
+            entry.used = next(self._ticks)
+            self._hits.add()
+            return _unfreeze(entry.value)
+        with self._lock:
+            # 加锁后再查一次，其它线程可能刚刚写入
+            entry = self._cache.get(key)
+            if entry is not None and entry.expires_at > self._clock():
+                entry.used = next(self._ticks)
+                self._hits.add()
+                return _unfreeze(entry.value)
+            future = self._inflight.get(key)
+            owner = future is None
+            if future is None:
+                future = self._inflight[key] = Future()
+                self.misses += 1
+            else:
+                self.coalesced += 1
+        if not owner:
+            return _unfreeze(future.result())
+        try:
+            result = super()._call(method, args, kwargs)
+        except BaseException as e:
+            with self._lock:
+                del self._inflight[key]
+            future.set_exception(e)
+            raise
+        frozen = _freeze(result)
+        ttl = self._ttl.get(method)
+        with self._lock:
+            if ttl:
+                now = self._clock()
+                self._cache[key] = _CacheEntry(frozen, now + ttl, next(self._ticks))
+                if len(self._cache) > self._max_entries:
+                    self._evict(now, self._max_entries - self._max_entries // 10)
+            del self._inflight[key]
+        future.set_result(frozen)
+        return result
+
+    def _evict(self, now: float, keep: int) -> None:
+        """清理过期结果，仍然超出时按 LRU 淘汰到 keep 条（需持有锁）"""
+        cache = self._cache
+        for key in [k for k, v in cache.items() if v.expires_at <= now]:
+            del cache[key]
+        if len(cache) > keep:
+            for key in heapq.nsmallest(
+                len(cache) - keep, cache, key=lambda k: cache[k].used
+            ):
+                del cache[key]
+
+    def configure(
+        self,
+        ttl: Optional[Mapping[str, float]] = None,
+        max_entries: Optional[int] = None,
+    ) -> None:
+        """
+        运行时调整缓存时间与容量，已缓存的结果按原过期时间失效
+
+        :param ttl: 方法名 -> 缓存时间（秒）
+        :param max_entries: 最多缓存的结果数
+        """
+        with self._lock:
+            if ttl is not None:
+                self._ttl = dict(ttl)
+            if max_entries is not None:
+                self._max_entries = max_entries
+                if len(self._cache) > max_entries:
+                    self._evict(self._clock(), max_entries)
+
+    @property
+    def hits(self) -> int:
+        """缓存命中次数"""
+        return self._hits.value
+
+    def clear(self) -> None:
+        """清空缓存"""
+        with self._lock:
+            self._cache.clear()
+
+
+# ==================== 统计 ====================
+@dataclass(slots=True)
+class MethodStats:
+    """某个方法的调用统计"""
+
+    calls: int = 0
+    errors: int = 0
+    total_seconds: float = 0.0
+    # 指数加权平均耗时
+    ewma_seconds: Optional[float] = None
+
+    @property
+    def mean_seconds(self) -> float:
+        return self.total_seconds / self.calls if self.calls else 0.0
+
+
+class MetricsBackend(BackendMiddleware):
+    """记录每个方法的调用次数、错误次数与耗时"""
+
+    def __init__(self, backend: Any, alpha: float = 0.2):
+        """
+        :param backend: 被包装的数据源
+        :param alpha: 指数加权平均耗时的平滑系数
+        """
+        super().__init__(backend)
+        self._alpha = alpha
+        self._stats: dict[str, MethodStats] = {}
+        self._lock = threading.Lock()
+
+    def _call(self, method: str, args: tuple[Any, ...], kwargs: dict[str, Any]) -> Any:
+        started = time.perf_counter()
+        failed = False
+        try:
+            return super()._call(method, args, kwargs)
+        except BaseException:
+            failed = True
+            raise
+        finally:
+            self.observe(method, time.perf_counter() - started, failed)
+
+    def observe(self, method: str, seconds: float, failed: bool = False) -> None:
+        """
+        记录一次调用
+
+        :param method: 方法名
+        :param seconds: 耗时（秒）
+        :param failed: 是否失败
+        """
+        with self._lock:
+            stats = self._stats.get(method)
+            if stats is None:
+                stats = self._stats[method] = MethodStats()
+            stats.calls += 1
+            stats.errors += failed
+            stats.total_seconds += seconds
+            if stats.ewma_seconds is None:
+                stats.ewma_seconds = seconds
+            else:
+                stats.ewma_seconds += self._alpha * (seconds - stats.ewma_seconds)
+
+    def stats(self) -> dict[str, MethodStats]:
+        """获取各方法统计的快照"""
+        with self._lock:
+            return {
+                method: MethodStats(s.calls, s.errors, s.total_seconds, s.ewma_seconds)
+                for method, s in self._stats.items()
+            }
+
+    def latency(self, method: Optional[str] = None) -> Optional[float]:
+        """
+        获取指数加权平均耗时
+
+        :param method: 方法名，默认取全部方法中调用最多的那个
+        :return: 耗时（秒），没有调用记录时返回None
+        """
+        with self._lock:
+            if method is not None:
+                stats = self._stats.get(method)
+            else:
+                stats = max(self._stats.values(), key=lambda s: s.calls, default=None)
+            return stats.ewma_seconds if stats is not None else None
+
+
+# ==================== 路由与故障转移 ====================
+class RoutingBackend(BackendMiddleware):
+    """
+    多数据源路由
+
+    按市场为每个标的选择候选数据源（默认按优先级，也可按观测到的最快者），
+    主数据源出错或超时后依次切换到下一个候选数据源。
+    """
+
+    def __init__(
+        self,
+        backends: Mapping[str, Any],
+        market_routes: Optional[Mapping[str, Sequence[str]]] = None,
+        prefer: Literal["priority", "fastest"] = "priority",
+        timeout: Optional[float] = None,
+        max_workers: int = 8,
+    ):
+        """
+        :param backends: 名称 -> 数据源，按优先级排列
+        :param market_routes: 市场代码 -> 候选数据源名称，未配置的市场使用全部数据源
+        :param prefer: "priority" 按配置顺序，"fastest" 按平均耗时从低到高
+        :param timeout: 单次调用的超时时间（秒），超时视为失败并切换数据源
+        :param max_workers: 带超时调用时使用的线程数
+        """
+        if not backends:
+            raise ValueError("至少需要一个数据源")
+        self.backends = dict(backends)
+        super().__init__(next(iter(self.backends.values())))
+        self._routes = {k: list(v) for k, v in (market_routes or {}).items()}
+        self._prefer = prefer
+        self._timeout = timeout
+        self._executor = (
+            ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="routing")
+            if timeout is not None
+            else None
+        )
+        self.metrics = {name: MetricsBackend(b) for name, b in self.backends.items()}
+        self._failovers = Counter()
+
+    @property
+    def failovers(self) -> int:
+        """切换数据源重试的次数"""
+        return self._failovers.value
+
+    def candidates(self, market: str = "") -> list[str]:
+        """
+        获取某个市场的候选数据源（按尝试顺序）
+
+        :param market: 市场代码
+        :return: 数据源名称列表
+        """
+        names = self._routes.get(market) or list(self.backends)
+        if self._prefer == "fastest":
+            latencies = {name: self.metrics[name].latency() for name in names}
+            # 没有耗时记录的数据源优先尝试，以便获得观测值
+            names = sorted(names, key=lambda n: latencies[n] or 0.0)
+        return names
+
+    def _call_one(
+        self, name: str, method: str, args: tuple[Any, ...], kwargs: dict[str, Any]
+    ) -> Any:
+        backend = self.metrics[name]
+        if self._executor is None:
+            return backend._call(method, args, kwargs)
+        future = self._executor.submit(backend._call, method, args, kwargs)
+        try:
+            return future.result(timeout=self._timeout)
+        except FutureTimeoutError:
+            raise TimeoutError(f"数据源 {name} 调用 {method} 超时") from None
+
+    def _with_failover(
+        self,
+        names: Sequence[str],
+        method: str,
+        args: tuple[Any, ...],
+        kwargs: dict[str, Any],
+    ) -> Any:
+        error: Optional[BaseException] = None
+        for attempt, name in enumerate(names):
+            if attempt:
+                self._failovers.add()
+                logger.warning("数据源切换到 %s 重试 %s: %s", name, method, error)
+            try:
+                return self._call_one(name, method, args, kwargs)
+            except Exception as e:
+                error = e
+        assert error is not None
+        raise error
+
+    def _call(self, method: str, args: tuple[Any, ...], kwargs: dict[str, Any]) -> Any:
+        market = ""
+        if args and isinstance(args[0], str):
+            market = symbol_market_key(args[0])
+        elif method in ("trading_days", "market_temperature") and args:
+            market = market_key(args[0])
+        return self._with_failover(self.candidates(market), method, args, kwargs)
+
+    def _routes_for(self, symbols: list[str]) -> dict[tuple[str, ...], list[str]]:
+        """按候选数据源分组标的"""
+        groups: dict[tuple[str, ...], list[str]] = {}
+        for symbol in symbols:
+            route = tuple(self.candidates(symbol_market_key(symbol)))
+            groups.setdefault(route, []).append(symbol)
+        return groups
+
+    def quote(self, symbols: list[str]) -> list[SecurityQuote]:
+        # 按首选数据源分组，每组独立故障转移
+        quotes: list[SecurityQuote] = []
+        for route, group in self._routes_for(symbols).items():
+            quotes.extend(self._with_failover(route, "quote", (group,), {}))
+        order = {symbol: i for i, symbol in enumerate(symbols)}
+        quotes.sort(key=lambda q: order.get(q.symbol, len(order)))
+        return quotes
+
+    def set_on_trades(self, callback: Callable[[str, PushTrades], None]) -> None:
+        # 订阅可能落在任意数据源上，回调设置到全部数据源
+        for backend in self.backends.values():
+            backend.set_on_trades(callback)
+
+    def subscribe(self, symbols: list[str], sub_types: list[Type[SubType]]) -> None:
+        for route, group in self._routes_for(symbols).items():
+            self._with_failover(route, "subscribe", (group, sub_types), {})
+
+    def unsubscribe(self, symbols: list[str], sub_types: list[Type[SubType]]) -> None:
+        for route, group in self._routes_for(symbols).items():
+            self._with_failover(route, "unsubscribe", (group, sub_types), {})
+
+    def close(self) -> None:
+        """关闭超时调用使用的线程池"""
+        if self._executor is not None:
+            self._executor.shutdown(wait=False)
+
+
+def iter_backends(backend: Any) -> Iterator[Any]:
+    """
+    遍历数据源以及它包装的全部下层数据源，包括 RoutingBackend 的各个路由目标
+
+    :param backend: 数据源
+    :return: 各层数据源（同一个对象只出现一次）
+    """
+    seen: set[int] = set()
+    stack = [backend]
+    while stack:
+        current = stack.pop()
+        if id(current) in seen:
+            continue
+        seen.add(id(current))
+        yield current
+        if isinstance(current, RoutingBackend):
+            stack.extend(reversed(list(current.backends.values())))
+        elif isinstance(current, BackendMiddleware):
+            stack.append(current.backend)
+
+
+def build_backend(
+    backend: Any,
+    cache: bool = True,
+    rate_limiter: Optional[RateLimiter] = None,
+    metrics: bool = True,
+) -> Any:
+    """
+    为数据源叠加通用的性能组件：统计 -> 缓存与合并 -> 限流 -> 数据源
+
+    :param backend: 数据源（QuoteContext、RoutingBackend 或其他实现）
+    :param cache: 是否启用缓存与请求合并
+    :param rate_limiter: 限流器，None 表示不限流
+    :param metrics: 是否启用调用统计
+    :return: 包装后的数据源
+    """
+    if rate_limiter is not None:
+        backend = RateLimitedBackend(backend, rate_limiter)
+    if cache:
+        backend = CachingBackend(backend)
+    if metrics:
+        backend = MetricsBackend(backend)
+    return backend
@@ -0,0 +1,274 @@
+import heapq
+import re
+import threading
+from collections import Counter
+from dataclasses import dataclass
+from datetime import datetime
+from decimal import Decimal
+from typing import TYPE_CHECKING, Callable, Hashable, Iterable, Optional, Sequence, Type
+from longport.openapi import SubType, TradeSession
+from modules.markets import market_timezone, symbol_market_key
+from modules.timestamps import NS_PER_SECOND, to_epoch_ns
+from modules.trading_calendar import SessionWindow, TradingCalendar
+
+if TYPE_CHECKING:
+    from longport.openapi import PushTrades, Trade
+    from modules.long_port_market_adapter import LongPortMarketAdapter
+
+_PERIOD_UNITS = {"s": 1, "m": 60, "h": 3600}
+
+
+def parse_period(period: str | int) -> int:
+    """
+    解析K线周期
+
+    :param period: 秒数，或者 "15s"、"3m"、"1h" 形式的字符串
+    :return: 周期秒数
+    """
+    if isinstance(period, int):
+        seconds = period
+    else:
+        match = re.fullmatch(r"\s*(\d+)\s*([smh])\s*", period.lower())
+        if match is None:
+            raise ValueError(f"无法识别的K线周期: {period}")
+        seconds = int(match.group(1)) * _PERIOD_UNITS[match.group(2)]
+    if seconds <= 0:
+        raise ValueError(f"K线周期必须为正数: {period}")
+    return seconds
+
+
+@dataclass(slots=True)
+class Bar:
+    """由逐笔成交聚合出的一根K线"""
+
+    symbol: str
+    period: int
+    begin_ns: int
+    end_ns: int
+    open: Decimal
+    high: Decimal
+    low: Decimal
+    close: Decimal
+    volume: int
+    turnover: Decimal
+    count: int
+    trade_session: Optional[Type[TradeSession]] = None
+
+    @property
+    def begin(self) -> datetime:
+        tz = market_timezone(symbol_market_key(self.symbol))
+        return datetime.fromtimestamp(self.begin_ns / NS_PER_SECOND, tz)
+
+    @property
+    def end(self) -> datetime:
+        tz = market_timezone(symbol_market_key(self.symbol))
+        return datetime.fromtimestamp(self.end_ns / NS_PER_SECOND, tz)
+
+
+def _trade_key(trade: "Trade") -> Hashable:
+    """轮询去重使用的成交标识：有成交编号时使用编号，否则使用成交内容"""
+    trade_id = getattr(trade, "trade_id", None)
+    if trade_id:
+        return trade_id
+    return str(trade.price), trade.volume, trade.trade_type
+
+
+class BarAggregator:
+    """
+    实时K线聚合器
+
+    由逐笔成交推送（或定期 fetch_trades 轮询）聚合出任意周期的 OHLCV K线。
+    有交易日历时，K线以交易时段开始时间对齐，并在时段结束处截断，
+    不会跨越午休或收盘；时段外的成交会被丢弃。需定期调用 flush 关闭到期的K线。
+    """
+
+    def __init__(
+        self,
+        period: str | int,
+        on_bar: Callable[[Bar], None],
+        calendar: Optional[TradingCalendar] = None,
+        trade_sessions: Sequence[Type[TradeSession]] = (TradeSession.Intraday,),
+    ):
+        """
+        :param period: K线周期，例如 "15s"、"3m" 或秒数
+        :param on_bar: K线完成时的回调
+        :param calendar: 交易日历，用于按交易时段对齐K线
+        :param trade_sessions: 参与聚合的交易时段
+        """
+        self.period = parse_period(period)
+        self._period_ns = self.period * NS_PER_SECOND
+        self._on_bar = on_bar
+        self._calendar = calendar
+        self._trade_sessions = tuple(trade_sessions)
+        self._bars: dict[str, Bar] = {}
+        # (结束时间, 标的) 的小顶堆，用于按时间关闭没有新成交的K线
+        self._deadlines: list[tuple[int, str]] = []
+        # 市场 -> 最近命中的交易时段 (开始, 结束, 时段)
+        self._windows: dict[str, tuple[int, int, SessionWindow]] = {}
+        # 轮询去重：标的 -> (最后成交时间, 该时间上已处理的成交及次数)
+        self._seen: dict[str, tuple[int, Counter[Hashable]]] = {}
+        # 标的 -> 最近一根已产出K线的结束时间，早于它的成交属于迟到成交
+        self._emitted: dict[str, int] = {}
+        self._lock = threading.Lock()
+        self.late_trades = 0
+        self.dropped_trades = 0
+
+    # ==================== 数据源 ====================
+    def attach(self, adapter: "LongPortMarketAdapter", symbols: list[str]) -> None:
+        """
+        订阅逐笔成交推送并把推送接入聚合器
+
+        :param adapter: 行情适配器
+        :param symbols: 标的代码列表
+        """
+        adapter.set_on_trades(self.on_push_trades)
+        adapter.subscribe(symbols, [SubType.Trade])
+
+    def on_push_trades(self, symbol: str, event: "PushTrades") -> None:
+        """QuoteContext.set_on_trades 的回调"""
+        self.add_trades(symbol, event.trades)
+
+    def poll(
+        self, adapter: "LongPortMarketAdapter", symbols: Iterable[str], count: int = 500
+    ) -> None:
+        """
+        推送不可用时，通过 fetch_trades 轮询最新成交，已处理过的成交会被跳过
+
+        :param adapter: 行情适配器
+        :param symbols: 标的代码列表
+        :param count: 每次拉取的成交数量，应覆盖一个轮询间隔内的成交笔数
+        """
+        for symbol in symbols:
+            trades = sorted(
+                adapter.fetch_trades(symbol, count), key=lambda t: t.timestamp
+            )
+            self.add_trades(symbol, self._unseen(symbol, trades))
+
+    def _unseen(self, symbol: str, trades: list["Trade"]) -> list["Trade"]:
+        last_ns, seen = self._seen.get(symbol, (0, Counter()))
+        # 本批次中落在最后成交时间上的成交，同一时间同价同量的不同成交按次数区分
+        batch: Counter[Hashable] = Counter()
+        fresh: list["Trade"] = []
+        for trade in trades:
+            ts = to_epoch_ns(trade.timestamp)
+            if ts < last_ns:
+                continue
+            if ts > last_ns:
+                last_ns, seen, batch = ts, Counter(), Counter()
+            key = _trade_key(trade)
+            batch[key] += 1
+            if batch[key] > seen[key]:
+                fresh.append(trade)
+        self._seen[symbol] = (last_ns, seen | batch)
+        return fresh
+
+    # ==================== 聚合 ====================
+    def add_trades(self, symbol: str, trades: Iterable["Trade"]) -> None:
+        """
+        聚合一批成交（按时间升序）
+
+        :param symbol: 标的代码
+        :param trades: 成交列表
+        """
+        market = symbol_market_key(symbol)
+        completed: list[Bar] = []
+        with self._lock:
+            for trade in trades:
+                bar = self._add_trade(symbol, market, trade)
+                if bar is not None:
+                    completed.append(bar)
+        for bar in completed:
+            self._on_bar(bar)
+
+    def _add_trade(self, symbol: str, market: str, trade: "Trade") -> Optional[Bar]:
+        ts = to_epoch_ns(trade.timestamp)
+        bar = self._bars.get(symbol)
+        if ts < (bar.begin_ns if bar is not None else self._emitted.get(symbol, 0)):
+            self.late_trades += 1
+            return None
+        if bar is not None and ts < bar.end_ns:
+            price = trade.price
+            if price > bar.high:
+                bar.high = price
+            elif price < bar.low:
+                bar.low = price
+            bar.close = price
+            bar.volume += trade.volume
+            bar.turnover += price * trade.volume
+            bar.count += 1
+            return None
+
+        bucket = self._bucket(market, ts)
+        if bucket is None:
+            self.dropped_trades += 1
+            return None
+        finished = self._bars.pop(symbol, None)
+        if finished is not None:
+            self._emitted[symbol] = finished.end_ns
+        begin_ns, end_ns, trade_session = bucket
+        self._bars[symbol] = Bar(
+            symbol=symbol,
+            period=self.period,
+            begin_ns=begin_ns,
+            end_ns=end_ns,
+            open=trade.price,
+            high=trade.price,
+            low=trade.price,
+            close=trade.price,
+            volume=trade.volume,
+            turnover=trade.price * trade.volume,
+            count=1,
+            trade_session=trade_session,
+        )
+        heapq.heappush(self._deadlines, (end_ns, symbol))
+        return finished
+
+    def _bucket(
+        self, market: str, ts: int
+    ) -> Optional[tuple[int, int, Optional[Type[TradeSession]]]]:
+        """计算成交所属K线的 [开始, 结束) 区间"""
+        if self._calendar is None:
+            begin = ts - ts % self._period_ns
+            return begin, begin + self._period_ns, None
+
+        cached = self._windows.get(market)
+        if cached is None or not cached[0] <= ts < cached[1]:
+            at = datetime.fromtimestamp(ts / NS_PER_SECOND, market_timezone(market))
+            window = self._calendar.session_at(market, at, self._trade_sessions)
+            if window is None:
+                return None
+            cached = (to_epoch_ns(window.begin), to_epoch_ns(window.end), window)
+            self._windows[market] = cached
+        window_begin, window_end, window = cached
+        begin = window_begin + (ts - window_begin) // self._period_ns * self._period_ns
+        return begin, min(begin + self._period_ns, window_end), window.trade_session
+
+    def flush(self, now: Optional[datetime] = None) -> list[Bar]:
+        """
+        关闭结束时间已到的K线（没有新成交的标的也能按时产出K线）
+
+        :param now: 当前时间，默认系统时间
+        :return: 本次关闭的K线
+        """
+        now_ns = to_epoch_ns(now or datetime.now().astimezone())
+        completed: list[Bar] = []
+        with self._lock:
+            while self._deadlines and self._deadlines[0][0] <= now_ns:
+                end_ns, symbol = heapq.heappop(self._deadlines)
+                bar = self._bars.get(symbol)
+                # 跳过已经被新成交关闭的K线留下的过期条目
+                if bar is not None and bar.end_ns == end_ns:
+                    completed.append(self._bars.pop(symbol))
+                    self._emitted[symbol] = end_ns
+        for bar in completed:
+            self._on_bar(bar)
+        return completed
+
+    def current(self, symbol: str) -> Optional[Bar]:
+        """
+        获取某个标的正在形成中的K线
+
+        :param symbol: 标的代码
+        :return: 未完成的K线或None
+        """
+        return self._bars.get(symbol)
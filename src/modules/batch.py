@@ -0,0 +1,84 @@
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from typing import Callable, Generic, ItemsView, Iterable, Optional, TypeVar
+from modules.rate_limiter import RateLimiter
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+DEFAULT_MAX_WORKERS = 8
+
+
+@dataclass
+class BatchResult(Generic[T]):
+    """
+    多标的批量请求的结果
+
+    成功的标的在 results 中，失败的标的在 errors 中，两者的顺序都与请求顺序一致。
+    """
+
+    results: dict[str, T] = field(default_factory=dict)
+    errors: dict[str, Exception] = field(default_factory=dict)
+
+    def __getitem__(self, symbol: str) -> T:
+        """获取某个标的的结果，该标的失败时抛出其异常"""
+        error = self.errors.get(symbol)
+        if error is not None:
+            raise error
+        return self.results[symbol]
+
+    def __contains__(self, symbol: object) -> bool:
+        return symbol in self.results
+
+    def __len__(self) -> int:
+        return len(self.results)
+
+    def get(self, symbol: str, default: Optional[T] = None) -> Optional[T]:
+        """获取某个标的的结果，失败或不存在时返回默认值"""
+        return self.results.get(symbol, default)
+
+    def items(self) -> ItemsView[str, T]:
+        return self.results.items()
+
+    @property
+    def ok(self) -> bool:
+        """是否全部成功"""
+        return not self.errors
+
+
+def fan_out(
+    func: Callable[[str], T],
+    symbols: Iterable[str],
+    max_workers: int = DEFAULT_MAX_WORKERS,
+    rate_limiter: Optional[RateLimiter] = None,
+) -> BatchResult[T]:
+    """
+    对多个标的并发调用单标的接口
+
+    :param func: 单标的接口
+    :param symbols: 标的代码列表（重复的标的只请求一次）
+    :param max_workers: 最大并发数
+    :param rate_limiter: 限流器，每次调用前获取一个令牌
+    :return: 批量结果
+    """
+    unique = list(dict.fromkeys(symbols))
+    result: BatchResult[T] = BatchResult()
+    if not unique:
+        return result
+
+    def call(symbol: str) -> T:
+        if rate_limiter is not None:
+            rate_limiter.acquire()
+        return func(symbol)
+
+    with ThreadPoolExecutor(max_workers=min(max_workers, len(unique))) as executor:
+        futures = [(symbol, executor.submit(call, symbol)) for symbol in unique]
+        for symbol, future in futures:
+            try:
+                result.results[symbol] = future.result()
+            except Exception as e:
+                logger.warning("批量请求 %s 失败: %s", symbol, e)
+                result.errors[symbol] = e
+    return result
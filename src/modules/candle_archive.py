@@ -0,0 +1,394 @@
+import bisect
+import mmap
+import os
+import re
+import threading
+from dataclasses import dataclass
+from datetime import date
+from pathlib import Path
+from typing import TYPE_CHECKING, Any, Iterator, Optional, Sequence, Type
+import numpy as np
+from longport.openapi import AdjustType, Period, TradeSessions
+from modules.codec import (
+    CANDLE_COLUMNS,
+    DEFAULT_PRICE_SCALE,
+    CandleArrays,
+    candle_columns,
+)
+
+if TYPE_CHECKING:
+    from modules.long_port_market_adapter import LongPortMarketAdapter
+
+MAGIC = b"MKTCARCH"
+VERSION = 1
+HEADER_SIZE = 64
+DEFAULT_SEGMENT_ROWS = 1 << 16
+SEGMENT_SUFFIX = ".seg"
+
+# 文件头：魔数、版本、价格缩放位数、容量、行数、首尾时间戳，补齐到 HEADER_SIZE
+_HEADER_DTYPE = np.dtype(
+    [
+        ("magic", "S8"),
+        ("version", "<u4"),
+        ("scale", "<u4"),
+        ("capacity", "<i8"),
+        ("count", "<i8"),
+        ("first_ns", "<i8"),
+        ("last_ns", "<i8"),
+    ]
+)
+assert _HEADER_DTYPE.itemsize <= HEADER_SIZE
+
+
+def period_key(period: Type[Period] | str) -> str:
+    """K线周期的目录名，例如 Period.Min_1 -> "Min_1" """
+    return period if isinstance(period, str) else str(period).rsplit(".", 1)[-1]
+
+
+def _safe_name(symbol: str) -> str:
+    if not re.fullmatch(r"[A-Za-z0-9._-]+", symbol) or symbol in (".", ".."):
+        raise ValueError(f"非法的标的代码: {symbol}")
+    return symbol
+
+
+@dataclass(frozen=True, slots=True)
+class SegmentInfo:
+    """段文件的时间索引"""
+
+    path: Path
+    count: int
+    first_ns: int
+    last_ns: int
+
+
+class Segment:
+    """
+    一个定长列式段文件
+
+    文件头之后是 CANDLE_COLUMNS 各列的 int64 数组，每列预留 capacity 行；
+    追加时先写数据再更新文件头中的行数，读取方只会看到完整的行。
+    """
+
+    def __init__(self, path: Path, writable: bool = False):
+        self.path = path
+        self.writable = writable
+        with open(path, "r+b" if writable else "rb") as f:
+            access = mmap.ACCESS_WRITE if writable else mmap.ACCESS_READ
+            self._mm = mmap.mmap(f.fileno(), 0, access=access)
+        self._header = np.ndarray((), _HEADER_DTYPE, buffer=self._mm)
+        if self._header["magic"] != MAGIC or self._header["version"] != VERSION:
+            self.close()
+            raise ValueError(f"{path} 不是有效的K线段文件")
+        self.capacity = int(self._header["capacity"])
+        self.scale = int(self._header["scale"])
+        self._columns = {
+            name: np.ndarray(
+                self.capacity,
+                dtype="<i8",
+                buffer=self._mm,
+                offset=HEADER_SIZE + i * self.capacity * 8,
+            )
+            for i, name in enumerate(CANDLE_COLUMNS)
+        }
+
+    @classmethod
+    def create(cls, path: Path, capacity: int, scale: int) -> "Segment":
+        size = HEADER_SIZE + len(CANDLE_COLUMNS) * capacity * 8
+        tmp = path.with_suffix(".tmp")
+        with open(tmp, "wb") as f:
+            f.truncate(size)
+            header = np.zeros((), _HEADER_DTYPE)
+            header["magic"], header["version"] = MAGIC, VERSION
+            header["scale"], header["capacity"] = scale, capacity
+            f.write(header.tobytes())
+        # 原子替换，读取方不会看到未初始化的段文件
+        os.replace(tmp, path)
+        return cls(path, writable=True)
+
+    @property
+    def count(self) -> int:
+        return int(self._header["count"])
+
+    @property
+    def info(self) -> SegmentInfo:
+        return SegmentInfo(
+            self.path,
+            self.count,
+            int(self._header["first_ns"]),
+            int(self._header["last_ns"]),
+        )
+
+    def arrays(self, begin: int = 0, end: Optional[int] = None) -> CandleArrays:
+        """行区间 [begin, end) 的列视图（不复制）"""
+        end = self.count if end is None else end
+        return CandleArrays(
+            self.scale, **{name: col[begin:end] for name, col in self._columns.items()}
+        )
+
+    def slice_by_time(
+        self, start_ns: Optional[int], end_ns: Optional[int]
+    ) -> CandleArrays:
+        """时间区间 [start_ns, end_ns] 内的列视图"""
+        timestamps = self._columns["timestamp_ns"][: self.count]
+        begin = 0 if start_ns is None else int(np.searchsorted(timestamps, start_ns))
+        end = (
+            len(timestamps)
+            if end_ns is None
+            else int(np.searchsorted(timestamps, end_ns, side="right"))
+        )
+        return self.arrays(begin, max(begin, end))
+
+    def write(self, rows: dict[str, np.ndarray], replace_last: bool) -> int:
+        """
+        追加行（调用方保证时间戳递增且不超过容量）
+
+        :param rows: 列名 -> 数组
+        :param replace_last: 第一行是否覆盖当前最后一行
+        :return: 写入后的行数
+        """
+        count = self.count
+        begin = count - 1 if replace_last else count
+        size = len(rows["timestamp_ns"])
+        for name, column in self._columns.items():
+            column[begin : begin + size] = rows[name]
+        new_count = begin + size
+        if count == 0:
+            self._header["first_ns"] = rows["timestamp_ns"][0]
+        self._header["last_ns"] = rows["timestamp_ns"][-1]
+        self._header["count"] = new_count
+        return new_count
+
+    def flush(self) -> None:
+        if self.writable:
+            self._mm.flush()
+
+    def close(self) -> None:
+        self._header = None  # type: ignore[assignment]
+        self._columns = {}
+        try:
+            self._mm.close()
+        except BufferError:
+            # 调用方仍持有列视图，映射在视图释放后由垃圾回收关闭
+            pass
+
+
+class CandleArchive:
+    """
+    磁盘K线归档
+
+    每个 (标的, 周期) 一个目录，目录下是按时间顺序的定长列式段文件，
+    读取时以只读方式内存映射，多个回测进程共享操作系统页缓存。
+    每个 (标的, 周期) 同一时间只能有一个写入方（一个进程内的写入由锁保护）。
+    """
+
+    def __init__(
+        self,
+        root: Path | str,
+        segment_rows: int = DEFAULT_SEGMENT_ROWS,
+        scale: int = DEFAULT_PRICE_SCALE,
+    ):
+        """
+        :param root: 归档根目录
+        :param segment_rows: 每个段文件的行数
+        :param scale: 价格缩放位数（保留的小数位数）
+        """
+        self.root = Path(root)
+        self.segment_rows = segment_rows
+        self.scale = scale
+        self._writers: dict[Path, Segment] = {}
+        self._lock = threading.Lock()
+
+    def _dir(self, symbol: str, period: Type[Period] | str) -> Path:
+        return self.root / period_key(period) / _safe_name(symbol)
+
+    def _segment_paths(self, directory: Path) -> list[Path]:
+        if not directory.is_dir():
+            return []
+        # 段文件名是首个时间戳的定宽十进制，字典序即时间顺序
+        return sorted(directory.glob(f"*{SEGMENT_SUFFIX}"))
+
+    # ==================== 写入 ====================
+    def append(
+        self, symbol: str, period: Type[Period] | str, candles: Sequence[Any]
+    ) -> int:
+        """
+        追加K线（按时间升序），早于已归档最后一根的K线会被跳过，
+        与最后一根时间相同的K线会覆盖它（例如尚未走完的K线）
+
+        :param symbol: 标的代码
+        :param period: K线周期
+        :param candles: longport Candlestick 或 CandlestickRecord 列表
+        :return: 写入的行数
+        """
+        if not candles:
+            return 0
+        directory = self._dir(symbol, period)
+        rows = candle_columns(candles, self.scale)
+        timestamps = rows["timestamp_ns"]
+        if np.any(np.diff(timestamps) <= 0):
+            raise ValueError("K线时间戳必须严格递增")
+        with self._lock:
+            segment = self._writer(directory)
+            written = 0
+            if segment is not None and segment.count:
+                last_ns = segment.info.last_ns
+                skip = int(np.searchsorted(timestamps, last_ns))
+                replace = skip < len(timestamps) and timestamps[skip] == last_ns
+                rows = {name: col[skip:] for name, col in rows.items()}
+                if replace:
+                    head = {name: col[:1] for name, col in rows.items()}
+                    segment.write(head, replace_last=True)
+                    rows = {name: col[1:] for name, col in rows.items()}
+                    written += 1
+            while len(rows["timestamp_ns"]):
+                if segment is None or segment.count >= segment.capacity:
+                    segment = self._new_segment(directory, int(rows["timestamp_ns"][0]))
+                room = segment.capacity - segment.count
+                chunk = {name: col[:room] for name, col in rows.items()}
+                segment.write(chunk, replace_last=False)
+                written += len(chunk["timestamp_ns"])
+                rows = {name: col[room:] for name, col in rows.items()}
+            if segment is not None:
+                segment.flush()
+            return written
+
+    def _writer(self, directory: Path) -> Optional[Segment]:
+        segment = self._writers.get(directory)
+        if segment is None:
+            paths = self._segment_paths(directory)
+            if not paths:
+                return None
+            segment = self._writers[directory] = Segment(paths[-1], writable=True)
+        return segment
+
+    def _new_segment(self, directory: Path, first_ns: int) -> Segment:
+        directory.mkdir(parents=True, exist_ok=True)
+        previous = self._writers.pop(directory, None)
+        if previous is not None:
+            previous.close()
+        path = directory / f"{first_ns:020d}{SEGMENT_SUFFIX}"
+        segment = Segment.create(path, self.segment_rows, self.scale)
+        self._writers[directory] = segment
+        return segment
+
+    def backfill(
+        self,
+        adapter: "LongPortMarketAdapter",
+        symbol: str,
+        period: Type[Period],
+        start: date,
+        end: date,
+        adjust_type: Type[AdjustType] = AdjustType.NoAdjust,
+        trade_sessions: Type[TradeSessions] = TradeSessions.Intraday,
+    ) -> int:
+        """
+        从接口拉取历史K线并追加到归档
+
+        :param adapter: 行情适配器
+        :param symbol: 标的代码
+        :param period: K线周期
+        :param start: 开始日期
+        :param end: 结束日期
+        :param adjust_type: 复权类型
+        :param trade_sessions: 交易时段
+        :return: 写入的行数
+        """
+        candles = adapter.fetch_history_candlesticks_by_date(
+            symbol, period, adjust_type, start, end, trade_sessions
+        )
+        return self.append(symbol, period, candles)
+
+    def close(self) -> None:
+        """关闭写入中的段文件"""
+        with self._lock:
+            for segment in self._writers.values():
+                segment.close()
+            self._writers.clear()
+
+    # ==================== 读取 ====================
+    def open(self, symbol: str, period: Type[Period] | str) -> "ArchiveReader":
+        """
+        以只读方式打开某个 (标的, 周期) 的全部段文件
+
+        :param symbol: 标的代码
+        :param period: K线周期
+        :return: 读取器
+        """
+        return ArchiveReader(self._segment_paths(self._dir(symbol, period)))
+
+    def read(
+        self,
+        symbol: str,
+        period: Type[Period] | str,
+        start_ns: Optional[int] = None,
+        end_ns: Optional[int] = None,
+    ) -> CandleArrays:
+        """
+        读取时间区间内的K线（结果会复制出映射内存，适合小区间；大区间请用 open）
+
+        :param symbol: 标的代码
+        :param period: K线周期
+        :param start_ns: 开始时间（纳秒，含）
+        :param end_ns: 结束时间（纳秒，含）
+        :return: 列式K线
+        """
+        with self.open(symbol, period) as reader:
+            parts = list(reader.slices(start_ns, end_ns))
+            scale = parts[0].scale if parts else self.scale
+            return CandleArrays(
+                scale,
+                **{
+                    name: np.concatenate(
+                        [getattr(p, name) for p in parts] or [np.empty(0, "<i8")]
+                    )
+                    for name in CANDLE_COLUMNS
+                },
+            )
+
+
+class ArchiveReader:
+    """
+    某个 (标的, 周期) 的只读视图
+
+    打开时只读取各段文件头建立时间索引，数据页在访问时才由操作系统按需载入。
+    """
+
+    def __init__(self, paths: Sequence[Path]):
+        self._segments = [Segment(path) for path in paths]
+        self.index = [segment.info for segment in self._segments]
+        self._firsts = [info.first_ns for info in self.index]
+
+    def __len__(self) -> int:
+        return sum(info.count for info in self.index)
+
+    def slices(
+        self, start_ns: Optional[int] = None, end_ns: Optional[int] = None
+    ) -> Iterator[CandleArrays]:
+        """
+        按段依次返回时间区间内的列视图（不复制）
+
+        :param start_ns: 开始时间（纳秒，含）
+        :param end_ns: 结束时间（纳秒，含）
+        """
+        first = 0
+        if start_ns is not None:
+            first = max(bisect.bisect_right(self._firsts, start_ns) - 1, 0)
+        for segment, info in zip(self._segments[first:], self.index[first:]):
+            if end_ns is not None and info.first_ns > end_ns:
+                break
+            if not info.count:
+                continue
+            arrays = segment.slice_by_time(start_ns, end_ns)
+            if len(arrays):
+                yield arrays
+
+    def close(self) -> None:
+        for segment in self._segments:
+            segment.close()
+        self._segments = []
+
+    def __enter__(self) -> "ArchiveReader":
+        return self
+
+    def __exit__(self, *exc: object) -> None:
+        self.close()
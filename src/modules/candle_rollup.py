@@ -0,0 +1,351 @@
+import threading
+from collections import deque
+from dataclasses import dataclass
+from datetime import date, datetime, time
+from decimal import Decimal
+from typing import TYPE_CHECKING, Any, Iterable, Optional, Sequence, Type
+from longport.openapi import AdjustType, Period, TradeSession, TradeSessions
+from modules.candle_archive import period_key
+from modules.codec import CandlestickRecord, to_record
+from modules.markets import market_timezone, symbol_market_key
+from modules.timestamps import NS_PER_SECOND, from_epoch_ns, to_epoch_ns
+
+if TYPE_CHECKING:
+    from modules.long_port_market_adapter import LongPortMarketAdapter
+    from modules.trading_calendar import SessionWindow, TradingCalendar
+
+DEFAULT_ROLLUP_PERIODS: tuple[Type[Period], ...] = (
+    Period.Min_5,
+    Period.Min_15,
+    Period.Min_60,
+    Period.Day,
+)
+DEFAULT_MAX_BARS = 10_000
+# 按交易日分组的周期
+_DATE_PERIODS = frozenset({"Day", "Week", "Month", "Quarter", "Year"})
+
+
+def period_seconds(period: Type[Period] | str) -> Optional[int]:
+    """
+    日内周期的秒数
+
+    :param period: K线周期
+    :return: 秒数，日及以上周期返回None
+    """
+    key = period_key(period)
+    if key in _DATE_PERIODS:
+        return None
+    if not key.startswith("Min_"):
+        raise ValueError(f"不支持汇总的K线周期: {key}")
+    return int(key.removeprefix("Min_")) * 60
+
+
+def _date_bucket(key: str, day: date) -> tuple[int, ...]:
+    if key == "Day":
+        return (day.toordinal(),)
+    if key == "Week":
+        year, week, _ = day.isocalendar()
+        return (year, week)
+    if key == "Month":
+        return (day.year, day.month)
+    if key == "Quarter":
+        return (day.year, (day.month - 1) // 3)
+    return (day.year,)
+
+
+@dataclass(slots=True)
+class _Bucket:
+    """正在形成的一根汇总K线"""
+
+    key: tuple[int, ...]
+    # 汇总K线的时间戳：日内周期为区间开始，日及以上周期为首个交易日零点
+    timestamp_ns: int
+    # 组成这根K线的基础K线：时间戳 -> K线
+    parts: dict[int, CandlestickRecord]
+    open: Decimal
+    high: Decimal
+    low: Decimal
+    close: Decimal
+    volume: int
+    turnover: Decimal
+    last_ns: int
+
+    @classmethod
+    def start(
+        cls, key: tuple[int, ...], timestamp_ns: int, bar: CandlestickRecord
+    ) -> "_Bucket":
+        return cls(
+            key,
+            timestamp_ns,
+            {bar.timestamp_ns: bar},
+            bar.open,
+            bar.high,
+            bar.low,
+            bar.close,
+            bar.volume,
+            bar.turnover,
+            bar.timestamp_ns,
+        )
+
+    def add(self, bar: CandlestickRecord) -> bool:
+        """加入一根基础K线，返回汇总结果是否变化"""
+        if bar.timestamp_ns > self.last_ns:
+            # 常见情况：新的基础K线，增量更新
+            self.parts[bar.timestamp_ns] = bar
+            self.high = max(self.high, bar.high)
+            self.low = min(self.low, bar.low)
+            self.close = bar.close
+            self.volume += bar.volume
+            self.turnover += bar.turnover
+            self.last_ns = bar.timestamp_ns
+            return True
+        if self.parts.get(bar.timestamp_ns) == bar:
+            return False
+        # 已有基础K线被更新（例如尚未走完的最后一根），重新汇总
+        self.parts[bar.timestamp_ns] = bar
+        parts = [self.parts[ts] for ts in sorted(self.parts)]
+        self.open, self.close = parts[0].open, parts[-1].close
+        self.high = max(p.high for p in parts)
+        self.low = min(p.low for p in parts)
+        self.volume = sum(p.volume for p in parts)
+        self.turnover = sum((p.turnover for p in parts), Decimal(0))
+        return True
+
+    def record(self, trade_session: str) -> CandlestickRecord:
+        return CandlestickRecord(
+            close=self.close,
+            open=self.open,
+            low=self.low,
+            high=self.high,
+            volume=self.volume,
+            turnover=self.turnover,
+            timestamp_ns=self.timestamp_ns,
+            trade_session=trade_session,
+        )
+
+
+class _Series:
+    """单个 (标的, 周期) 的汇总结果"""
+
+    def __init__(self, max_bars: int):
+        self.history: deque[CandlestickRecord] = deque(maxlen=max_bars)
+        self.current: Optional[_Bucket] = None
+        self.trade_session = ""
+
+    def bars(self) -> list[CandlestickRecord]:
+        bars = list(self.history)
+        if self.current is not None:
+            bars.append(self.current.record(self.trade_session))
+        return bars
+
+
+class CandleRollup:
+    """
+    K线周期汇总引擎
+
+    每个标的只请求最细的基础周期（默认1分钟），更粗的周期在本地汇总得到。
+    有交易日历时，日内周期从交易时段开始时间对齐并在时段结束处截断，不会跨越午休，
+    日线按交易日（而非自然日）分组；时段外的基础K线会被丢弃。
+    基础K线按时间增量送入，最后一根未走完的基础K线可以重复送入以更新汇总结果。
+    基础K线的时间戳视为K线开始时间。
+    """
+
+    def __init__(
+        self,
+        calendar: Optional["TradingCalendar"] = None,
+        periods: Sequence[Type[Period]] = DEFAULT_ROLLUP_PERIODS,
+        base_period: Type[Period] = Period.Min_1,
+        trade_sessions: Sequence[Type[TradeSession]] = (TradeSession.Intraday,),
+        max_bars: int = DEFAULT_MAX_BARS,
+    ):
+        """
+        :param calendar: 交易日历，用于按交易时段对齐
+        :param periods: 需要汇总的周期
+        :param base_period: 基础周期，必须是日内周期且能整除各日内目标周期
+        :param trade_sessions: 参与汇总的交易时段
+        :param max_bars: 每个 (标的, 周期) 保留的已完成K线数量
+        """
+        base_seconds = period_seconds(base_period)
+        if base_seconds is None:
+            raise ValueError("基础周期必须是日内周期")
+        self._periods: dict[str, Optional[int]] = {}
+        for period in periods:
+            seconds = period_seconds(period)
+            if seconds is not None and seconds % base_seconds:
+                base = period_key(base_period)
+                raise ValueError(f"{period_key(period)} 不是基础周期 {base} 的整数倍")
+            self._periods[period_key(period)] = seconds
+        self.base_period = base_period
+        self._calendar = calendar
+        self._trade_sessions = tuple(trade_sessions)
+        self._max_bars = max_bars
+        self._series: dict[tuple[str, str], _Series] = {}
+        # 市场 -> 最近命中的交易时段 (开始, 结束, 时段)
+        self._windows: dict[str, tuple[int, int, "SessionWindow"]] = {}
+        self._lock = threading.Lock()
+        # 交易时段外被丢弃的基础K线数
+        self.dropped_bars = 0
+        # 早于当前汇总K线、被忽略的基础K线数（例如刷新时重复送入的旧K线）
+        self.late_bars = 0
+
+    @property
+    def periods(self) -> list[str]:
+        return list(self._periods)
+
+    def _window(
+        self, market: str, ts: int
+    ) -> Optional[tuple[int, int, Optional["SessionWindow"]]]:
+        """基础K线所在交易时段的 [开始, 结束)，没有交易日历时返回整个自然日"""
+        tz = market_timezone(market)
+        if self._calendar is None:
+            day = from_epoch_ns(ts, tz).date()
+            begin = to_epoch_ns(datetime.combine(day, time.min, tz))
+            return begin, begin + 86400 * NS_PER_SECOND, None
+        cached = self._windows.get(market)
+        if cached is None or not cached[0] <= ts < cached[1]:
+            window = self._calendar.session_at(
+                market, from_epoch_ns(ts, tz), self._trade_sessions
+            )
+            if window is None:
+                return None
+            cached = (to_epoch_ns(window.begin), to_epoch_ns(window.end), window)
+            self._windows[market] = cached
+        return cached
+
+    def update(
+        self, symbol: str, candles: Iterable[Any]
+    ) -> dict[str, list[CandlestickRecord]]:
+        """
+        送入一批基础K线（按时间升序）
+
+        :param symbol: 标的代码
+        :param candles: 基础周期的 longport Candlestick 或 CandlestickRecord
+        :return: 周期 -> 本次新完成或发生变化的汇总K线（最后一根可能尚未走完）
+        """
+        market = symbol_market_key(symbol)
+        tz = market_timezone(market)
+        changed: dict[str, dict[int, CandlestickRecord]] = {}
+        with self._lock:
+            for candle in candles:
+                bar = to_record(candle, CandlestickRecord)
+                window = self._window(market, bar.timestamp_ns)
+                if window is None:
+                    self.dropped_bars += 1
+                    continue
+                window_begin, _, session = window
+                trading_day = (
+                    session.trading_day
+                    if session is not None
+                    else from_epoch_ns(bar.timestamp_ns, tz).date()
+                )
+                for key, seconds in self._periods.items():
+                    if seconds is None:
+                        bucket_key = _date_bucket(key, trading_day)
+                        timestamp_ns = to_epoch_ns(
+                            datetime.combine(trading_day, time.min, tz)
+                        )
+                    else:
+                        period_ns = seconds * NS_PER_SECOND
+                        offset = (bar.timestamp_ns - window_begin) // period_ns
+                        timestamp_ns = window_begin + offset * period_ns
+                        bucket_key = (timestamp_ns,)
+                    for record in self._add(symbol, key, bucket_key, timestamp_ns, bar):
+                        changed.setdefault(key, {})[record.timestamp_ns] = record
+            return {
+                key: [records[ts] for ts in sorted(records)]
+                for key, records in changed.items()
+            }
+
+    def _add(
+        self,
+        symbol: str,
+        key: str,
+        bucket_key: tuple[int, ...],
+        timestamp_ns: int,
+        bar: CandlestickRecord,
+    ) -> list[CandlestickRecord]:
+        series = self._series.get((symbol, key))
+        if series is None:
+            series = self._series[(symbol, key)] = _Series(self._max_bars)
+        current = series.current
+        if current is not None and bucket_key < current.key:
+            self.late_bars += 1
+            return []
+        if current is not None and bucket_key == current.key:
+            if not current.add(bar):
+                return []
+            return [current.record(series.trade_session)]
+        completed: list[CandlestickRecord] = []
+        if current is not None:
+            completed.append(current.record(series.trade_session))
+            series.history.append(completed[-1])
+        series.current = _Bucket.start(bucket_key, timestamp_ns, bar)
+        series.trade_session = bar.trade_session
+        return completed + [series.current.record(series.trade_session)]
+
+    def bars(
+        self, symbol: str, period: Type[Period] | str, count: Optional[int] = None
+    ) -> list[CandlestickRecord]:
+        """
+        获取汇总K线（最后一根可能尚未走完）
+
+        :param symbol: 标的代码
+        :param period: K线周期
+        :param count: 最多返回最近的多少根，默认全部
+        :return: K线记录列表
+        """
+        key = period_key(period)
+        if key not in self._periods:
+            raise KeyError(f"未配置汇总周期: {key}")
+        with self._lock:
+            series = self._series.get((symbol, key))
+            bars = series.bars() if series is not None else []
+        return bars[-count:] if count is not None else bars
+
+    def backfill(
+        self,
+        adapter: "LongPortMarketAdapter",
+        symbol: str,
+        start: date,
+        end: date,
+        adjust_type: Type[AdjustType] = AdjustType.NoAdjust,
+        trade_sessions: Type[TradeSessions] = TradeSessions.Intraday,
+    ) -> dict[str, list[CandlestickRecord]]:
+        """
+        按日期请求一次基础K线并汇总
+
+        :param adapter: 行情适配器
+        :param symbol: 标的代码
+        :param start: 开始日期
+        :param end: 结束日期
+        :param adjust_type: 复权类型
+        :param trade_sessions: 交易时段
+        :return: 同 update
+        """
+        candles = adapter.fetch_history_candlesticks_by_date_normalized(
+            symbol, self.base_period, adjust_type, start, end, trade_sessions
+        )
+        return self.update(symbol, candles)
+
+    def refresh(
+        self,
+        adapter: "LongPortMarketAdapter",
+        symbol: str,
+        count: int = 10,
+        adjust_type: Type[AdjustType] = AdjustType.NoAdjust,
+        trade_sessions: Type[TradeSessions] = TradeSessions.Intraday,
+    ) -> dict[str, list[CandlestickRecord]]:
+        """
+        请求最近的若干根基础K线并增量更新汇总结果
+
+        :param adapter: 行情适配器
+        :param symbol: 标的代码
+        :param count: 请求的基础K线数量，应覆盖两次刷新之间新增的K线
+        :param adjust_type: 复权类型
+        :param trade_sessions: 交易时段
+        :return: 同 update
+        """
+        candles = adapter.fetch_candlesticks_normalized(
+            symbol, self.base_period, count, adjust_type, trade_sessions
+        )
+        return self.update(symbol, candles)
@@ -0,0 +1,180 @@
+import threading
+from typing import TYPE_CHECKING, Iterable, Optional, Sequence
+import numpy as np
+from modules.batch import BatchResult, fan_out
+from modules.rate_limiter import RateLimiter
+from modules.timestamps import to_epoch_ns
+
+if TYPE_CHECKING:
+    from longport.openapi import CapitalFlowLine
+    from modules.long_port_market_adapter import LongPortMarketAdapter
+
+
+class CapitalFlowSeries:
+    """
+    单个标的当日资金流向序列
+
+    时间戳与净流入分别保存在 int64 / float64 数组中，按需倍增扩容。
+    """
+
+    __slots__ = ("symbol", "_timestamps", "_inflows", "_size")
+
+    def __init__(self, symbol: str, capacity: int = 512):
+        self.symbol = symbol
+        self._timestamps = np.empty(capacity, dtype=np.int64)
+        self._inflows = np.empty(capacity, dtype=np.float64)
+        self._size = 0
+
+    def __len__(self) -> int:
+        return self._size
+
+    @property
+    def timestamps(self) -> np.ndarray:
+        """纳秒时间戳（只读视图）"""
+        view = self._timestamps[: self._size]
+        view.flags.writeable = False
+        return view
+
+    @property
+    def inflows(self) -> np.ndarray:
+        """净流入（只读视图）"""
+        view = self._inflows[: self._size]
+        view.flags.writeable = False
+        return view
+
+    def latest(self) -> Optional[tuple[int, float]]:
+        """最新一个点 (纳秒时间戳, 净流入)"""
+        if not self._size:
+            return None
+        i = self._size - 1
+        return int(self._timestamps[i]), float(self._inflows[i])
+
+    def clear(self) -> None:
+        self._size = 0
+
+    def _append(self, timestamp_ns: int, inflow: float) -> None:
+        if self._size == len(self._timestamps):
+            capacity = len(self._timestamps) * 2
+            self._timestamps = np.resize(self._timestamps, capacity)
+            self._inflows = np.resize(self._inflows, capacity)
+        self._timestamps[self._size] = timestamp_ns
+        self._inflows[self._size] = inflow
+        self._size += 1
+
+    def merge(self, lines: Sequence["CapitalFlowLine"]) -> int:
+        """
+        合并接口返回的当日完整序列，只处理新增部分
+
+        接口每次返回当日从开盘到现在的全部分钟点，已有的前 n-1 个点不会变化，
+        因此从第 n 个点（最后一个点可能仍在更新）开始合并即可；
+        第一个点不一致说明已经换日，清空后重新累积。
+
+        :param lines: 按时间升序的资金流向列表
+        :return: 新增的点数
+        """
+        if not lines:
+            return 0
+        size = self._size
+        if size and to_epoch_ns(lines[0].timestamp) != self._timestamps[0]:
+            self.clear()
+            size = 0
+        start = 0
+        if size:
+            start = size - 1
+            if (
+                start >= len(lines)
+                or to_epoch_ns(lines[start].timestamp) != self._timestamps[start]
+            ):
+                # 序列与已有数据对不上（例如接口修订了历史点），全部重建
+                self.clear()
+                size = start = 0
+            else:
+                self._size = start
+        for line in lines[start:]:
+            self._append(to_epoch_ns(line.timestamp), float(line.inflow))
+        return self._size - size
+
+
+class CapitalFlowAccumulator:
+    """
+    多标的资金流向累积器
+
+    每个标的在内存中保留当日资金流向序列，刷新时只追加新的分钟点；
+    批量刷新通过 fan_out 并发请求，所有请求共享同一个限流器。
+    """
+
+    def __init__(
+        self,
+        adapter: "LongPortMarketAdapter",
+        rate_limiter: Optional[RateLimiter] = None,
+        max_workers: int = 4,
+    ):
+        """
+        :param adapter: 行情适配器
+        :param rate_limiter: 限流器，默认使用适配器的限流器，与 *_batch 接口共享调用额度
+        :param max_workers: 批量刷新的并发线程数
+        """
+        self._adapter = adapter
+        self._limiter = rate_limiter or adapter.rate_limiter
+        self._max_workers = max_workers
+        self._series: dict[str, CapitalFlowSeries] = {}
+        self._locks: dict[str, threading.Lock] = {}
+        self._lock = threading.Lock()
+
+    def _entry(self, symbol: str) -> tuple[CapitalFlowSeries, threading.Lock]:
+        with self._lock:
+            series = self._series.get(symbol)
+            if series is None:
+                series = self._series[symbol] = CapitalFlowSeries(symbol)
+                self._locks[symbol] = threading.Lock()
+            return series, self._locks[symbol]
+
+    def refresh(self, symbol: str) -> int:
+        """
+        刷新单个标的
+
+        :param symbol: 标的代码
+        :return: 新增的点数
+        """
+        self._limiter.acquire()
+        return self._refresh(symbol)
+
+    def _refresh(self, symbol: str) -> int:
+        """拉取并合并单个标的（调用方负责限流）"""
+        series, lock = self._entry(symbol)
+        lines = self._adapter.fetch_capital_flow(symbol)
+        with lock:
+            return series.merge(lines)
+
+    def refresh_many(self, symbols: Iterable[str]) -> BatchResult[int]:
+        """
+        并发刷新多个标的，单个标的失败不影响其他标的
+
+        :param symbols: 标的代码列表
+        :return: 标的代码 -> 新增点数，失败的标的记录在 errors 中
+        """
+        return fan_out(self._refresh, symbols, self._max_workers, self._limiter)
+
+    def series(self, symbol: str) -> Optional[CapitalFlowSeries]:
+        """
+        获取某个标的的资金流向序列
+
+        :param symbol: 标的代码
+        :return: 序列，未刷新过的标的返回None
+        """
+        return self._series.get(symbol)
+
+    def latest_inflows(self, symbols: Sequence[str]) -> np.ndarray:
+        """
+        获取多个标的最新净流入，便于横向筛选
+
+        :param symbols: 标的代码列表
+        :return: 与 symbols 对齐的数组，没有数据的标的为 NaN
+        """
+        values = np.full(len(symbols), np.nan)
+        for i, symbol in enumerate(symbols):
+            series = self._series.get(symbol)
+            latest = series.latest() if series is not None else None
+            if latest is not None:
+                values[i] = latest[1]
+        return values
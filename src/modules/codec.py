@@ -0,0 +1,640 @@
+import dataclasses
+import struct
+import types
+import typing
+from dataclasses import dataclass
+from datetime import date, datetime, time
+from decimal import ROUND_HALF_UP, Decimal
+from functools import cache
+from typing import Any, Callable, Optional, Sequence, Union
+import numpy as np
+from modules.free_threading import parallel_map
+from modules.timestamps import EpochTimestamped, to_epoch_ns
+
+
+# ==================== 纯数据结构 ====================
+# 与 longport 返回类型一一对应；时间戳统一为纳秒整数，枚举保存为名称字符串。
+@dataclass(frozen=True, slots=True)
+class PrePostQuoteRecord(EpochTimestamped):
+    last_done: Decimal
+    timestamp_ns: int
+    volume: int
+    turnover: Decimal
+    high: Decimal
+    low: Decimal
+    prev_close: Decimal
+
+
+@dataclass(frozen=True, slots=True)
+class SecurityQuoteRecord(EpochTimestamped):
+    symbol: str
+    last_done: Decimal
+    prev_close: Decimal
+    open: Decimal
+    high: Decimal
+    low: Decimal
+    timestamp_ns: int
+    volume: int
+    turnover: Decimal
+    trade_status: str
+    pre_market_quote: Optional[PrePostQuoteRecord]
+    post_market_quote: Optional[PrePostQuoteRecord]
+    overnight_quote: Optional[PrePostQuoteRecord]
+
+
+@dataclass(frozen=True, slots=True)
+class SecurityStaticInfoRecord:
+    symbol: str
+    name_cn: str
+    name_en: str
+    name_hk: str
+    exchange: str
+    currency: str
+    lot_size: int
+    total_shares: int
+    circulating_shares: int
+    hk_shares: int
+    eps: Decimal
+    eps_ttm: Decimal
+    bps: Decimal
+    dividend_yield: Decimal
+    stock_derivatives: list[str]
+    board: str
+
+
+@dataclass(frozen=True, slots=True)
+class DepthRecord:
+    position: int
+    price: Optional[Decimal]
+    volume: int
+    order_num: int
+
+
+@dataclass(frozen=True, slots=True)
+class SecurityDepthRecord:
+    asks: list[DepthRecord]
+    bids: list[DepthRecord]
+
+
+@dataclass(frozen=True, slots=True)
+class BrokersRecord:
+    position: int
+    broker_ids: list[int]
+
+
+@dataclass(frozen=True, slots=True)
+class SecurityBrokersRecord:
+    ask_brokers: list[BrokersRecord]
+    bid_brokers: list[BrokersRecord]
+
+
+@dataclass(frozen=True, slots=True)
+class ParticipantInfoRecord:
+    broker_ids: list[int]
+    name_cn: str
+    name_en: str
+    name_hk: str
+
+
+@dataclass(frozen=True, slots=True)
+class TradeRecord(EpochTimestamped):
+    price: Decimal
+    volume: int
+    timestamp_ns: int
+    trade_type: str
+    direction: str
+    trade_session: str
+
+
+@dataclass(frozen=True, slots=True)
+class IntradayLineRecord(EpochTimestamped):
+    price: Decimal
+    timestamp_ns: int
+    volume: int
+    turnover: Decimal
+    avg_price: Decimal
+
+
+@dataclass(frozen=True, slots=True)
+class CandlestickRecord(EpochTimestamped):
+    close: Decimal
+    open: Decimal
+    low: Decimal
+    high: Decimal
+    volume: int
+    turnover: Decimal
+    timestamp_ns: int
+    trade_session: str
+
+
+@dataclass(frozen=True, slots=True)
+class TradingSessionInfoRecord:
+    begin_time: time
+    end_time: time
+    trade_session: str
+
+
+@dataclass(frozen=True, slots=True)
+class MarketTradingSessionRecord:
+    market: str
+    trade_sessions: list[TradingSessionInfoRecord]
+
+
+@dataclass(frozen=True, slots=True)
+class MarketTradingDaysRecord:
+    trading_days: list[date]
+    half_trading_days: list[date]
+
+
+@dataclass(frozen=True, slots=True)
+class CapitalFlowLineRecord(EpochTimestamped):
+    inflow: Decimal
+    timestamp_ns: int
+
+
+@dataclass(frozen=True, slots=True)
+class CapitalDistributionRecord:
+    large: Decimal
+    medium: Decimal
+    small: Decimal
+
+
+@dataclass(frozen=True, slots=True)
+class CapitalDistributionResponseRecord(EpochTimestamped):
+    timestamp_ns: int
+    capital_in: CapitalDistributionRecord
+    capital_out: CapitalDistributionRecord
+
+
+@dataclass(frozen=True, slots=True)
+class SecurityCalcIndexRecord:
+    symbol: str
+    last_done: Optional[Decimal]
+    change_value: Optional[Decimal]
+    change_rate: Optional[Decimal]
+    volume: Optional[int]
+    turnover: Optional[Decimal]
+    ytd_change_rate: Optional[Decimal]
+    turnover_rate: Optional[Decimal]
+    total_market_value: Optional[Decimal]
+    capital_flow: Optional[Decimal]
+    amplitude: Optional[Decimal]
+    volume_ratio: Optional[Decimal]
+    pe_ttm_ratio: Optional[Decimal]
+    pb_ratio: Optional[Decimal]
+    dividend_ratio_ttm: Optional[Decimal]
+    five_day_change_rate: Optional[Decimal]
+    ten_day_change_rate: Optional[Decimal]
+    half_year_change_rate: Optional[Decimal]
+    five_minutes_change_rate: Optional[Decimal]
+    expiry_date: Optional[date]
+    strike_price: Optional[Decimal]
+    upper_strike_price: Optional[Decimal]
+    lower_strike_price: Optional[Decimal]
+    outstanding_qty: Optional[int]
+    outstanding_ratio: Optional[Decimal]
+    premium: Optional[Decimal]
+    itm_otm: Optional[Decimal]
+    implied_volatility: Optional[Decimal]
+    warrant_delta: Optional[Decimal]
+    call_price: Optional[Decimal]
+    to_call_price: Optional[Decimal]
+    effective_leverage: Optional[Decimal]
+    leverage_ratio: Optional[Decimal]
+    conversion_ratio: Optional[Decimal]
+    balance_point: Optional[Decimal]
+    open_interest: Optional[int]
+    delta: Optional[Decimal]
+    gamma: Optional[Decimal]
+    theta: Optional[Decimal]
+    vega: Optional[Decimal]
+    rho: Optional[Decimal]
+
+
+@dataclass(frozen=True, slots=True)
+class MarketTemperatureRecord(EpochTimestamped):
+    temperature: int
+    description: str
+    valuation: int
+    sentiment: int
+    timestamp_ns: int
+
+
+@dataclass(frozen=True, slots=True)
+class HistoryMarketTemperatureResponseRecord:
+    granularity: str
+    records: list[MarketTemperatureRecord]
+
+
+# 编码时的类型标签，只能在末尾追加，不能调整顺序
+RECORD_TYPES: tuple[type, ...] = (
+    SecurityStaticInfoRecord,
+    SecurityQuoteRecord,
+    PrePostQuoteRecord,
+    SecurityDepthRecord,
+    DepthRecord,
+    SecurityBrokersRecord,
+    BrokersRecord,
+    ParticipantInfoRecord,
+    TradeRecord,
+    IntradayLineRecord,
+    CandlestickRecord,
+    MarketTradingSessionRecord,
+    TradingSessionInfoRecord,
+    MarketTradingDaysRecord,
+    CapitalFlowLineRecord,
+    CapitalDistributionResponseRecord,
+    CapitalDistributionRecord,
+    SecurityCalcIndexRecord,
+    MarketTemperatureRecord,
+    HistoryMarketTemperatureResponseRecord,
+)
+_TYPE_TAGS: dict[type, int] = {cls: tag for tag, cls in enumerate(RECORD_TYPES)}
+_RECORDS_BY_SOURCE: dict[str, type] = {
+    cls.__name__.removesuffix("Record"): cls for cls in RECORD_TYPES
+}
+
+
+# ==================== 字段类型解析 ====================
+def _unwrap_optional(tp: Any) -> tuple[bool, Any]:
+    origin = typing.get_origin(tp)
+    if origin in (Union, types.UnionType):
+        args = [a for a in typing.get_args(tp) if a is not type(None)]
+        return True, args[0]
+    return False, tp
+
+
+@cache
+def _fields(cls: type) -> tuple[tuple[str, Any], ...]:
+    hints = typing.get_type_hints(cls)
+    return tuple((f.name, hints[f.name]) for f in dataclasses.fields(cls))
+
+
+# ==================== longport 对象 -> 纯数据结构 ====================
+def _enum_name(value: Any) -> str:
+    return str(value).rsplit(".", 1)[-1]
+
+
+def _convert_value(tp: Any, value: Any) -> Any:
+    optional, tp = _unwrap_optional(tp)
+    if value is None:
+        if not optional:
+            raise ValueError(f"字段不能为空: {tp}")
+        return None
+    if typing.get_origin(tp) is list:
+        (item_tp,) = typing.get_args(tp)
+        return [_convert_value(item_tp, item) for item in value]
+    if dataclasses.is_dataclass(tp):
+        return to_record(value, tp)  # type: ignore[arg-type]
+    if tp is str and not isinstance(value, str):
+        return _enum_name(value)
+    if tp is Decimal and not isinstance(value, Decimal):
+        return Decimal(str(value))
+    return value
+
+
+def to_record(obj: Any, record_cls: Optional[type] = None) -> Any:
+    """
+    把 longport 返回的对象转换为对应的纯数据结构
+
+    :param obj: longport 对象，例如 SecurityQuote、Candlestick
+    :param record_cls: 目标类型，默认根据对象类型名推断
+    :return: 纯数据结构，已经是目标类型的对象原样返回
+    """
+    if record_cls is not None and isinstance(obj, record_cls):
+        return obj
+    if record_cls is None:
+        record_cls = _RECORDS_BY_SOURCE.get(type(obj).__name__)
+        if record_cls is None:
+            raise TypeError(f"不支持转换的类型: {type(obj).__name__}")
+    values: dict[str, Any] = {}
+    for name, tp in _fields(record_cls):
+        if name.endswith("_ns"):
+            raw = getattr(obj, name.removesuffix("_ns"))
+            values[name] = to_epoch_ns(raw) if isinstance(raw, datetime) else raw
+        else:
+            values[name] = _convert_value(tp, getattr(obj, name))
+    return record_cls(**values)
+
+
+def to_records(objs: Sequence[Any], record_cls: Optional[type] = None) -> list[Any]:
+    """批量转换，见 to_record；自由线程构建下大批量数据分块并行转换"""
+    return parallel_map(lambda obj: to_record(obj, record_cls), objs)
+
+
+# ==================== 二进制编解码 ====================
+def _write_uvarint(out: bytearray, value: int) -> None:
+    while value >= 0x80:
+        out.append((value & 0x7F) | 0x80)
+        value >>= 7
+    out.append(value)
+
+
+def _read_uvarint(buf: memoryview, pos: int) -> tuple[int, int]:
+    result = shift = 0
+    while True:
+        byte = buf[pos]
+        pos += 1
+        result |= (byte & 0x7F) << shift
+        if byte < 0x80:
+            return result, pos
+        shift += 7
+
+
+def _write_varint(out: bytearray, value: int) -> None:
+    _write_uvarint(out, value << 1 if value >= 0 else (-value << 1) - 1)
+
+
+def _read_varint(buf: memoryview, pos: int) -> tuple[int, int]:
+    raw, pos = _read_uvarint(buf, pos)
+    return (raw >> 1) ^ -(raw & 1), pos
+
+
+def _write_decimal(out: bytearray, value: Decimal) -> None:
+    # 十进制数编码为 (指数, 缩放后的整数)，精确且紧凑
+    sign, digits, exponent = value.as_tuple()
+    if not isinstance(exponent, int):
+        # NaN 与无穷大没有 (指数, 整数) 形式
+        raise ValueError(f"不支持编码的十进制数: {value}")
+    mantissa = int("".join(map(str, digits)) or "0")
+    _write_varint(out, exponent)
+    _write_varint(out, -mantissa if sign else mantissa)
+
+
+def _read_decimal(buf: memoryview, pos: int) -> tuple[Decimal, int]:
+    exponent, pos = _read_varint(buf, pos)
+    mantissa, pos = _read_varint(buf, pos)
+    return Decimal(mantissa).scaleb(exponent), pos
+
+
+Encoder = Callable[[bytearray, Any], None]
+Decoder = Callable[[memoryview, int], tuple[Any, int]]
+
+
+@cache
+def _codec(tp: Any) -> tuple[Encoder, Decoder]:
+    """根据字段类型生成编解码函数（按类型缓存）"""
+    optional, tp = _unwrap_optional(tp)
+    if optional:
+        enc_inner, dec_inner = _codec(tp)
+
+        def enc_opt(out: bytearray, value: Any) -> None:
+            if value is None:
+                out.append(0)
+            else:
+                out.append(1)
+                enc_inner(out, value)
+
+        def dec_opt(buf: memoryview, pos: int) -> tuple[Any, int]:
+            if buf[pos] == 0:
+                return None, pos + 1
+            return dec_inner(buf, pos + 1)
+
+        return enc_opt, dec_opt
+
+    if typing.get_origin(tp) is list:
+        (item_tp,) = typing.get_args(tp)
+        enc_item, dec_item = _codec(item_tp)
+
+        def enc_list(out: bytearray, value: Any) -> None:
+            _write_uvarint(out, len(value))
+            for item in value:
+                enc_item(out, item)
+
+        def dec_list(buf: memoryview, pos: int) -> tuple[Any, int]:
+            count, pos = _read_uvarint(buf, pos)
+            items = []
+            for _ in range(count):
+                item, pos = dec_item(buf, pos)
+                items.append(item)
+            return items, pos
+
+        return enc_list, dec_list
+
+    if dataclasses.is_dataclass(tp):
+        record_cls = typing.cast("type", tp)
+        fields = _fields(record_cls)
+        codecs = [(name, *_codec(field_tp)) for name, field_tp in fields]
+
+        def enc_record(out: bytearray, value: Any) -> None:
+            for name, enc, _ in codecs:
+                enc(out, getattr(value, name))
+
+        def dec_record(buf: memoryview, pos: int) -> tuple[Any, int]:
+            values = []
+            for _, _, dec in codecs:
+                item, pos = dec(buf, pos)
+                values.append(item)
+            return record_cls(*values), pos
+
+        return enc_record, dec_record
+
+    if tp is bool:
+        return (
+            lambda out, v: out.append(1 if v else 0),
+            lambda buf, pos: (buf[pos] == 1, pos + 1),
+        )
+    if tp is int:
+        return _write_varint, _read_varint
+    if tp is Decimal:
+        return _write_decimal, _read_decimal
+    if tp is float:
+        f64 = struct.Struct("<d")
+        return (
+            lambda out, v: out.extend(f64.pack(v)),
+            lambda buf, pos: (f64.unpack_from(buf, pos)[0], pos + 8),
+        )
+    if tp is str:
+
+        def enc_str(out: bytearray, value: str) -> None:
+            data = value.encode()
+            _write_uvarint(out, len(data))
+            out.extend(data)
+
+        def dec_str(buf: memoryview, pos: int) -> tuple[str, int]:
+            size, pos = _read_uvarint(buf, pos)
+            return str(buf[pos : pos + size], "utf-8"), pos + size
+
+        return enc_str, dec_str
+    if tp is date:
+        return (
+            lambda out, v: _write_uvarint(out, v.toordinal()),
+            lambda buf, pos: (lambda r: (date.fromordinal(r[0]), r[1]))(
+                _read_uvarint(buf, pos)
+            ),
+        )
+    if tp is time:
+
+        def enc_time(out: bytearray, value: time) -> None:
+            micros = (
+                (value.hour * 60 + value.minute) * 60 + value.second
+            ) * 1_000_000 + value.microsecond
+            _write_uvarint(out, micros)
+
+        def dec_time(buf: memoryview, pos: int) -> tuple[time, int]:
+            micros, pos = _read_uvarint(buf, pos)
+            seconds, micro = divmod(micros, 1_000_000)
+            return time(seconds // 3600, seconds // 60 % 60, seconds % 60, micro), pos
+
+        return enc_time, dec_time
+    raise TypeError(f"不支持编码的字段类型: {tp}")
+
+
+def dumps(record: Any) -> bytes:
+    """
+    把纯数据结构（或 longport 对象）编码为二进制
+
+    :param record: 纯数据结构或可转换的 longport 对象
+    :return: 二进制数据
+    """
+    if type(record) not in _TYPE_TAGS:
+        record = to_record(record)
+    # 缓存的 _codec 以类型为键，这里的类型一定是 RECORD_TYPES 中的数据类
+    record_type: Any = type(record)
+    out = bytearray()
+    out.append(_TYPE_TAGS[record_type])
+    _codec(record_type)[0](out, record)
+    return bytes(out)
+
+
+def loads(data: bytes | memoryview) -> Any:
+    """
+    解码 dumps 生成的二进制数据
+
+    :param data: 二进制数据
+    :return: 纯数据结构
+    """
+    buf = memoryview(data)
+    record, _ = _codec(RECORD_TYPES[buf[0]])[1](buf, 1)
+    return record
+
+
+def dumps_many(records: Sequence[Any]) -> bytes:
+    """
+    把同一类型的多条记录编码为一个二进制块
+
+    :param records: 记录列表
+    :return: 二进制数据
+    """
+    converted = [r if type(r) in _TYPE_TAGS else to_record(r) for r in records]
+    record_type = type(converted[0]) if converted else RECORD_TYPES[0]
+    out = bytearray()
+    out.append(_TYPE_TAGS[record_type])
+    _codec(list[record_type])[0](out, converted)  # type: ignore[valid-type]
+    return bytes(out)
+
+
+def loads_many(data: bytes | memoryview) -> list[Any]:
+    """
+    解码 dumps_many 生成的二进制数据
+
+    :param data: 二进制数据
+    :return: 记录列表
+    """
+    buf = memoryview(data)
+    record_type = RECORD_TYPES[buf[0]]
+    records, _ = _codec(list[record_type])[1](buf, 1)  # type: ignore[valid-type]
+    return records
+
+
+# ==================== K线列式定长编码 ====================
+CANDLE_MAGIC = b"MKTCNDL1"
+# 魔数、K线数量、价格缩放位数
+CANDLE_HEADER = struct.Struct("<8sQq")
+CANDLE_COLUMNS: tuple[str, ...] = (
+    "timestamp_ns",
+    "open",
+    "high",
+    "low",
+    "close",
+    "volume",
+    "turnover",
+)
+# 需要按 10^scale 缩放为整数的列
+SCALED_COLUMNS = frozenset({"open", "high", "low", "close", "turnover"})
+DEFAULT_PRICE_SCALE = 4
+
+
+@dataclass(frozen=True)
+class CandleArrays:
+    """
+    列式K线数据，每列都是 int64 数组
+
+    价格与成交额以 10^scale 缩放后的整数保存；从 decode_candles 得到的数组
+    直接引用原始缓冲区，不发生复制。
+    """
+
+    scale: int
+    timestamp_ns: np.ndarray
+    open: np.ndarray
+    high: np.ndarray
+    low: np.ndarray
+    close: np.ndarray
+    volume: np.ndarray
+    turnover: np.ndarray
+
+    def __len__(self) -> int:
+        return len(self.timestamp_ns)
+
+    def as_float(self, column: str) -> np.ndarray:
+        """把缩放后的整数列还原为浮点数"""
+        values = getattr(self, column)
+        return values / 10**self.scale if column in SCALED_COLUMNS else values
+
+
+def candle_columns(
+    candles: Sequence[Any], scale: int = DEFAULT_PRICE_SCALE
+) -> dict[str, np.ndarray]:
+    """
+    把K线列表转换为 CANDLE_COLUMNS 各列的 int64 数组
+
+    :param candles: longport Candlestick 或 CandlestickRecord 列表
+    :param scale: 价格缩放位数（保留的小数位数）
+    :return: 列名 -> 数组
+    """
+    factor = Decimal(10) ** scale
+    columns = {name: np.empty(len(candles), dtype="<i8") for name in CANDLE_COLUMNS}
+    for i, candle in enumerate(candles):
+        timestamp = getattr(candle, "timestamp_ns", None)
+        if timestamp is None:
+            timestamp = to_epoch_ns(candle.timestamp)
+        columns["timestamp_ns"][i] = timestamp
+        columns["volume"][i] = candle.volume
+        for name in SCALED_COLUMNS:
+            columns[name][i] = int(
+                (Decimal(getattr(candle, name)) * factor).to_integral_value(
+                    ROUND_HALF_UP
+                )
+            )
+    return columns
+
+
+def encode_candles(candles: Sequence[Any], scale: int = DEFAULT_PRICE_SCALE) -> bytes:
+    """
+    把K线列表编码为定长列式二进制
+
+    :param candles: longport Candlestick 或 CandlestickRecord 列表
+    :param scale: 价格缩放位数（保留的小数位数）
+    :return: 二进制数据：文件头 + 各列 int64 数组
+    """
+    columns = candle_columns(candles, scale)
+    header = CANDLE_HEADER.pack(CANDLE_MAGIC, len(candles), scale)
+    return header + b"".join(columns[name].tobytes() for name in CANDLE_COLUMNS)
+
+
+def decode_candles(data: bytes | memoryview) -> CandleArrays:
+    """
+    零拷贝解码 encode_candles 生成的二进制
+
+    :param data: 二进制数据（bytes、memoryview、mmap 均可）
+    :return: 列式K线数据，各列是原始缓冲区上的只读视图
+    """
+    magic, count, scale = CANDLE_HEADER.unpack_from(data, 0)
+    if magic != CANDLE_MAGIC:
+        raise ValueError("不是有效的K线列式数据")
+    offset = CANDLE_HEADER.size
+    columns: dict[str, np.ndarray] = {}
+    for name in CANDLE_COLUMNS:
+        columns[name] = np.frombuffer(data, dtype="<i8", count=count, offset=offset)
+        offset += count * 8
+    return CandleArrays(scale, **columns)
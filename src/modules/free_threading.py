@@ -0,0 +1,109 @@
+import os
+import sys
+import sysconfig
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Optional, Sequence, TypeVar
+
+T = TypeVar("T")
+R = TypeVar("R")
+
+# 每个线程任务处理的最少元素数，过小时线程调度的开销超过并行收益
+DEFAULT_CHUNK_SIZE = 2048
+
+
+def free_threaded_build() -> bool:
+    """是否为自由线程（3.13t）构建的解释器"""
+    return bool(sysconfig.get_config_var("Py_GIL_DISABLED"))
+
+
+def gil_enabled() -> bool:
+    """
+    当前进程是否启用了 GIL
+
+    自由线程构建在导入不兼容的扩展模块或设置 PYTHON_GIL=1 时仍会重新启用 GIL。
+    """
+    is_gil_enabled = getattr(sys, "_is_gil_enabled", None)
+    return True if is_gil_enabled is None else is_gil_enabled()
+
+
+def cpu_workers() -> int:
+    """
+    CPU 密集型任务适合的线程数：未启用 GIL 时为可用核数，否则为 1
+
+    :return: 线程数
+    """
+    if gil_enabled():
+        return 1
+    return os.process_cpu_count() or 1
+
+
+class Counter:
+    """
+    线程安全、写入不加锁的计数器
+
+    自由线程构建下 self.count += 1 不是原子操作，并发时会丢失计数。
+    这里每个线程累加自己的分片，读取时求和，写入路径不与其它线程竞争。
+    """
+
+    def __init__(self) -> None:
+        self._local = threading.local()
+        # 线程 -> 分片；已结束线程的分片并入 _base，分片数不随线程池的创建而增长
+        self._shards: dict[threading.Thread, list[int]] = {}
+        self._base = 0
+        self._lock = threading.Lock()
+
+    def add(self, value: int = 1) -> None:
+        shard = getattr(self._local, "shard", None)
+        if shard is None:
+            shard = self._local.shard = [0]
+            # 每个线程只在第一次计数时加锁登记分片
+            with self._lock:
+                self._fold_finished()
+                self._shards[threading.current_thread()] = shard
+        shard[0] += value
+
+    def _fold_finished(self) -> None:
+        """把已结束线程的分片并入基数（需持有锁），结束的线程不会再写分片"""
+        for thread in [t for t in self._shards if not t.is_alive()]:
+            self._base += self._shards.pop(thread)[0]
+
+    @property
+    def value(self) -> int:
+        with self._lock:
+            self._fold_finished()
+            return self._base + sum(shard[0] for shard in self._shards.values())
+
+    def __int__(self) -> int:
+        return self.value
+
+    def __repr__(self) -> str:
+        return f"Counter({self.value})"
+
+
+def parallel_map(
+    func: Callable[[T], R],
+    items: Sequence[T],
+    max_workers: Optional[int] = None,
+    chunk_size: int = DEFAULT_CHUNK_SIZE,
+) -> list[R]:
+    """
+    分块并行执行 CPU 密集型的转换，结果顺序与输入一致
+
+    启用 GIL 时线程无法并行执行 Python 代码，直接在当前线程中顺序执行。
+
+    :param func: 转换函数
+    :param items: 输入列表
+    :param max_workers: 最大线程数，默认 cpu_workers()
+    :param chunk_size: 每个任务处理的元素数
+    :return: 转换结果
+    """
+    workers = cpu_workers() if max_workers is None else max_workers
+    if workers <= 1 or len(items) <= chunk_size:
+        return [func(item) for item in items]
+    chunks = [items[i : i + chunk_size] for i in range(0, len(items), chunk_size)]
+    with ThreadPoolExecutor(
+        max_workers=min(workers, len(chunks)), thread_name_prefix="parallel-map"
+    ) as executor:
+        results = executor.map(lambda chunk: [func(item) for item in chunk], chunks)
+        return [result for chunk in results for result in chunk]
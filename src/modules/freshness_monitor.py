@@ -0,0 +1,356 @@
+import logging
+import threading
+import time
+from dataclasses import dataclass
+from datetime import datetime
+from typing import (
+    TYPE_CHECKING,
+    Any,
+    Callable,
+    Iterable,
+    Mapping,
+    Optional,
+    Sequence,
+    Type,
+)
+import numpy as np
+from longport.openapi import TradeSession
+from modules.markets import market_timezone, symbol_market_key
+from modules.timestamps import NS_PER_SECOND, to_epoch_ns
+from modules.trading_calendar import TradingCalendar
+
+if TYPE_CHECKING:
+    from modules.long_port_market_adapter import LongPortMarketAdapter
+
+logger = logging.getLogger(__name__)
+
+# 没有交易日历时的最大允许数据年龄（秒），考虑了休市与周末
+DEFAULT_MAX_AGE: dict[str, float] = {
+    "US": 24 * 3600,
+    "HK": 12 * 3600,
+    "CN": 7 * 24 * 3600,
+}
+# 交易时段内的最大允许数据年龄（秒）
+DEFAULT_STALE_AFTER: dict[str, float] = {
+    "US": 60,
+    "HK": 60,
+    "CN": 60,
+}
+FALLBACK_MAX_AGE = 24 * 3600
+FALLBACK_STALE_AFTER = 60
+
+# attach 时替换的适配器方法
+_MONITORED_METHODS = ("fetch_quote_batch", "fetch_depth")
+
+
+@dataclass(frozen=True, slots=True)
+class StaleEvent:
+    """一次数据过期告警"""
+
+    symbol: str
+    market: str
+    kind: str
+    age: float
+    threshold: float
+    observed_ns: int
+
+
+@dataclass(frozen=True, slots=True)
+class FreshnessStats:
+    """某个市场某类数据的年龄统计（秒）"""
+
+    market: str
+    kind: str
+    count: int
+    stale: int
+    p50: float
+    p90: float
+    p99: float
+    max: float
+
+
+class _AgeWindow:
+    """定长环形缓冲区，保存最近的数据年龄"""
+
+    __slots__ = ("ages", "size", "count", "stale")
+
+    def __init__(self, size: int):
+        self.ages = np.empty(size, dtype=np.float64)
+        self.size = 0
+        self.count = 0
+        self.stale = 0
+
+    def add(self, age: float) -> None:
+        self.ages[self.count % len(self.ages)] = age
+        self.count += 1
+        self.size = min(self.size + 1, len(self.ages))
+
+    def values(self) -> np.ndarray:
+        return self.ages[: self.size]
+
+
+class FreshnessMonitor:
+    """
+    数据新鲜度监控
+
+    记录适配器返回的每条行情、盘口的数据年龄，按市场与数据类型分别统计年龄分位数。
+    有交易日历时只在 trade_sessions 指定的交易时段内检查（默认仅盘中，
+    休市和盘前盘后期间行情时间戳不更新），超过 stale_after 触发回调；
+    没有交易日历时按 max_age 检查。同一标的同一类数据只在由新鲜变为过期时触发一次回调。
+
+    盘口数据没有交易所时间戳，其年龄按内容最近一次变化的时间计算。
+    """
+
+    def __init__(
+        self,
+        calendar: Optional[TradingCalendar] = None,
+        stale_after: Mapping[str, float] = DEFAULT_STALE_AFTER,
+        max_age: Mapping[str, float] = DEFAULT_MAX_AGE,
+        window: int = 1024,
+        clock: Callable[[], int] = time.time_ns,
+        trade_sessions: Sequence[Type[TradeSession]] = (TradeSession.Intraday,),
+    ):
+        """
+        :param calendar: 交易日历，用于判断是否处于交易时段
+        :param stale_after: 市场代码 -> 交易时段内允许的最大年龄（秒）
+        :param max_age: 市场代码 -> 没有交易日历时允许的最大年龄（秒）
+        :param window: 每个市场每类数据保留的最近年龄样本数
+        :param clock: 返回当前纳秒时间戳的函数
+        :param trade_sessions: 需要检查的交易时段类型，默认仅盘中
+        """
+        self._calendar = calendar
+        self._stale_after = dict(stale_after)
+        self._max_age = dict(max_age)
+        self._window = window
+        self._clock = clock
+        self._trade_sessions = tuple(trade_sessions)
+        # (市场, 数据类型) -> 最近的年龄样本
+        self._ages: dict[tuple[str, str], _AgeWindow] = {}
+        # 市场 -> 最近一次判断的 (开始, 结束, 是否在交易时段)
+        self._sessions: dict[str, tuple[int, int, bool]] = {}
+        # 标的 -> (盘口内容, 内容最近变化时间)
+        self._depths: dict[str, tuple[Any, int]] = {}
+        # 当前处于过期状态的 (标的, 数据类型)
+        self._stale: set[tuple[str, str]] = set()
+        self._callbacks: list[Callable[[StaleEvent], None]] = []
+        self._lock = threading.Lock()
+        # id(适配器) -> (适配器, 被替换前的实例属性，None 表示原来没有)
+        self._attached: dict[int, tuple[Any, dict[str, Any]]] = {}
+
+    def add_callback(self, callback: Callable[[StaleEvent], None]) -> None:
+        """
+        注册过期回调
+
+        :param callback: 数据过期时调用，参数为告警事件
+        """
+        self._callbacks.append(callback)
+
+    # ==================== 记录 ====================
+    def record(
+        self,
+        symbol: str,
+        timestamp_ns: int,
+        kind: str = "quote",
+        now_ns: Optional[int] = None,
+    ) -> float:
+        """
+        记录一条数据的年龄
+
+        :param symbol: 标的代码
+        :param timestamp_ns: 数据时间（纳秒时间戳）
+        :param kind: 数据类型，例如 "quote"、"depth"
+        :param now_ns: 当前时间，默认使用 clock
+        :return: 数据年龄（秒）
+        """
+        now_ns = self._clock() if now_ns is None else now_ns
+        market = symbol_market_key(symbol)
+        age = (now_ns - timestamp_ns) / NS_PER_SECOND
+        event: Optional[StaleEvent] = None
+        if self._calendar is None:
+            in_session = True
+            threshold = self._max_age.get(market, FALLBACK_MAX_AGE)
+        else:
+            # 交易日历可能需要联网加载，在锁外判断
+            in_session = self._in_session(market, now_ns)
+            threshold = self._stale_after.get(market, FALLBACK_STALE_AFTER)
+        key = (symbol, kind)
+        with self._lock:
+            if not in_session:
+                self._stale.discard(key)
+            else:
+                ages = self._ages.get((market, kind))
+                if ages is None:
+                    ages = self._ages[market, kind] = _AgeWindow(self._window)
+                ages.add(age)
+                if age <= threshold:
+                    self._stale.discard(key)
+                else:
+                    ages.stale += 1
+                    if key not in self._stale:
+                        self._stale.add(key)
+                        event = StaleEvent(symbol, market, kind, age, threshold, now_ns)
+        if event is not None:
+            self._fire(event)
+        return age
+
+    def _in_session(self, market: str, now_ns: int) -> bool:
+        # 缓存按市场整体替换，多个线程同时刷新时结果相同，不需要加锁
+        assert self._calendar is not None
+        cached = self._sessions.get(market)
+        if cached is not None and cached[0] <= now_ns < cached[1]:
+            return cached[2]
+        at = datetime.fromtimestamp(now_ns / NS_PER_SECOND, market_timezone(market))
+        try:
+            window = self._calendar.session_at(market, at, self._trade_sessions)
+            if window is not None:
+                cached = (to_epoch_ns(window.begin), to_epoch_ns(window.end), True)
+            else:
+                following = self._calendar.next_session(
+                    market, at, self._trade_sessions
+                )
+                end = to_epoch_ns(following.begin) if following else now_ns + 1
+                cached = (now_ns, end, False)
+        except KeyError:
+            # 交易日历没有加载该市场，视为一直在交易时段内
+            cached = (now_ns, now_ns + 1, True)
+        self._sessions[market] = cached
+        return cached[2]
+
+    def _fire(self, event: StaleEvent) -> None:
+        for callback in self._callbacks:
+            try:
+                callback(event)
+            except Exception:
+                logger.exception("数据过期回调执行失败")
+
+    def observe_quotes(self, quotes: Iterable[Any]) -> None:
+        """
+        记录一批行情的年龄
+
+        :param quotes: SecurityQuote 或 SecurityQuoteRecord 列表
+        """
+        now_ns = self._clock()
+        for quote in quotes:
+            timestamp_ns = getattr(quote, "timestamp_ns", None)
+            if timestamp_ns is None:
+                timestamp_ns = to_epoch_ns(quote.timestamp)
+            self.record(quote.symbol, timestamp_ns, "quote", now_ns)
+
+    def observe_depth(self, symbol: str, depth: Any) -> float:
+        """
+        记录一次盘口数据，年龄为盘口内容最近一次变化距今的时长
+
+        :param symbol: 标的代码
+        :param depth: SecurityDepth 或 SecurityDepthRecord
+        :return: 数据年龄（秒）
+        """
+        now_ns = self._clock()
+        content = tuple(
+            (level.price, level.volume) for level in (*depth.asks, *depth.bids)
+        )
+        with self._lock:
+            previous = self._depths.get(symbol)
+            changed_ns = now_ns
+            if previous is not None and previous[0] == content:
+                changed_ns = previous[1]
+            self._depths[symbol] = (content, changed_ns)
+        return self.record(symbol, changed_ns, "depth", now_ns)
+
+    # ==================== 接入适配器 ====================
+    def attach(self, adapter: "LongPortMarketAdapter") -> None:
+        """
+        接入适配器：此后适配器返回的行情与盘口都会被记录；重复接入不会重复记录
+
+        :param adapter: 行情适配器
+        """
+        with self._lock:
+            if id(adapter) in self._attached:
+                return
+            self._attached[id(adapter)] = (
+                adapter,
+                {name: vars(adapter).get(name) for name in _MONITORED_METHODS},
+            )
+        fetch_quote_batch = adapter.fetch_quote_batch
+        fetch_depth = adapter.fetch_depth
+
+        def monitored_fetch_quote_batch(symbols: list[str]) -> Any:
+            quotes = fetch_quote_batch(symbols)
+            self.observe_quotes(quotes)
+            return quotes
+
+        def monitored_fetch_depth(symbol: str) -> Any:
+            depth = fetch_depth(symbol)
+            if depth is not None:
+                self.observe_depth(symbol, depth)
+            return depth
+
+        # 单个标的与归一化接口都经由 fetch_quote_batch，替换实例属性即可覆盖
+        adapter.fetch_quote_batch = monitored_fetch_quote_batch  # type: ignore[method-assign]
+        adapter.fetch_depth = monitored_fetch_depth  # type: ignore[method-assign]
+
+    def detach(self, adapter: Optional["LongPortMarketAdapter"] = None) -> None:
+        """
+        恢复已接入适配器的原始方法，未接入时不做任何事
+
+        :param adapter: 行情适配器，默认恢复全部已接入的适配器
+        """
+        with self._lock:
+            if adapter is None:
+                attached = list(self._attached.values())
+                self._attached.clear()
+            else:
+                entry = self._attached.pop(id(adapter), None)
+                attached = [] if entry is None else [entry]
+        for target, originals in attached:
+            for name, original in originals.items():
+                if original is None:
+                    vars(target).pop(name, None)
+                else:
+                    setattr(target, name, original)
+
+    # ==================== 统计 ====================
+    def percentiles(
+        self, market: str, q: Sequence[float] = (50, 90, 99), kind: str = "quote"
+    ) -> dict[float, float]:
+        """
+        获取某个市场某类数据最近的年龄分位数
+
+        :param market: 市场代码
+        :param q: 分位点（0~100）
+        :param kind: 数据类型，例如 "quote"、"depth"
+        :return: 分位点 -> 年龄（秒），没有样本时为 NaN
+        """
+        with self._lock:
+            ages = self._ages.get((market, kind))
+            values = ages.values().copy() if ages is not None else np.empty(0)
+        if not len(values):
+            return {p: float("nan") for p in q}
+        return {p: float(v) for p, v in zip(q, np.percentile(values, q))}
+
+    def stats(self, kind: str = "quote") -> dict[str, FreshnessStats]:
+        """
+        获取所有市场某类数据的年龄统计
+
+        :param kind: 数据类型，例如 "quote"、"depth"
+        :return: 市场代码 -> 统计
+        """
+        with self._lock:
+            snapshot = {
+                market: (ages.count, ages.stale, ages.values().copy())
+                for (market, ages_kind), ages in self._ages.items()
+                if ages_kind == kind
+            }
+        result: dict[str, FreshnessStats] = {}
+        for market, (count, stale, values) in snapshot.items():
+            p50, p90, p99 = np.percentile(values, (50, 90, 99))
+            result[market] = FreshnessStats(
+                market,
+                kind,
+                count,
+                stale,
+                float(p50),
+                float(p90),
+                float(p99),
+                float(values.max()),
+            )
+        return result
@@ -0,0 +1,173 @@
+import asyncio
+from collections import deque
+from concurrent.futures import Future, ThreadPoolExecutor
+from datetime import date, timedelta
+from typing import (
+    TYPE_CHECKING,
+    AsyncIterator,
+    Callable,
+    Iterator,
+    List,
+    Optional,
+    Type,
+)
+from longport.openapi import AdjustType, Period, TradeSessions
+from modules.candle_archive import period_key
+from modules.candle_rollup import period_seconds
+from modules.codec import DEFAULT_PRICE_SCALE, CandleArrays, candle_columns
+
+if TYPE_CHECKING:
+    from longport.openapi import Candlestick
+    from modules.long_port_market_adapter import LongPortMarketAdapter
+
+DEFAULT_PREFETCH = 1
+# 单个窗口的目标K线数量（接口单次返回的数据量有限，窗口越小首根K线越快到达）
+TARGET_WINDOW_BARS = 1000
+# 按每天约 400 根1分钟K线估算
+_MINUTES_PER_DAY = 400
+
+
+def window_days(period: Type[Period] | str) -> int:
+    """
+    按K线周期估算单个窗口的自然日数
+
+    :param period: K线周期
+    :return: 天数
+    """
+    seconds = period_seconds(period)
+    if seconds is not None:
+        bars_per_day = max(_MINUTES_PER_DAY * 60 // seconds, 1)
+        return max(TARGET_WINDOW_BARS // bars_per_day, 1)
+    # 日线约 250 个交易日一年，更粗的周期一次取完
+    return 4 * 365 if period_key(period) == "Day" else 100 * 365
+
+
+def split_range(start: date, end: date, days: int) -> list[tuple[date, date]]:
+    """
+    把闭区间 [start, end] 切分为不重叠的窗口
+
+    :param start: 开始日期
+    :param end: 结束日期
+    :param days: 每个窗口的天数
+    :return: 按时间升序的 (开始, 结束) 列表
+    """
+    windows: list[tuple[date, date]] = []
+    step = timedelta(days=days)
+    current = start
+    while current <= end:
+        stop = min(current + step - timedelta(days=1), end)
+        windows.append((current, stop))
+        current = stop + timedelta(days=1)
+    return windows
+
+
+class HistoryStream:
+    """
+    分窗口流式获取历史K线
+
+    把日期区间切分为若干窗口，调用方处理当前窗口时后台预取后面的窗口，
+    内存中最多保留 prefetch + 1 个窗口的数据。
+    """
+
+    def __init__(
+        self,
+        adapter: "LongPortMarketAdapter",
+        symbol: str,
+        period: Type[Period],
+        adjust_type: Type[AdjustType],
+        start: date,
+        end: date,
+        trade_sessions: Type[TradeSessions] = TradeSessions.Intraday,
+        days: Optional[int] = None,
+        prefetch: int = DEFAULT_PREFETCH,
+    ):
+        """
+        :param adapter: 行情适配器
+        :param symbol: 标的代码
+        :param period: K线周期
+        :param adjust_type: 复权类型
+        :param start: 开始日期
+        :param end: 结束日期
+        :param trade_sessions: 交易时段
+        :param days: 每个窗口的天数，默认按周期估算
+        :param prefetch: 预取的窗口数
+        """
+        if start > end:
+            raise ValueError("开始日期不能晚于结束日期")
+        if prefetch < 0:
+            raise ValueError("预取窗口数不能为负数")
+        self.windows = split_range(start, end, days or window_days(period))
+        self._fetch: Callable[[tuple[date, date]], List["Candlestick"]] = (
+            lambda window: adapter.fetch_history_candlesticks_by_date(
+                symbol, period, adjust_type, window[0], window[1], trade_sessions
+            )
+        )
+        self._prefetch = prefetch
+
+    # ==================== 同步 ====================
+    def iter_windows(self) -> Iterator[List["Candlestick"]]:
+        """按时间顺序逐个窗口返回K线列表"""
+        executor = ThreadPoolExecutor(
+            max_workers=max(self._prefetch, 1), thread_name_prefix="history-stream"
+        )
+        pending: deque[Future[List["Candlestick"]]] = deque()
+        windows = iter(self.windows)
+        try:
+            pending.append(executor.submit(self._fetch, next(windows)))
+            while pending:
+                current = pending.popleft()
+                # 调用方处理当前窗口时，后台预取后面的窗口
+                while len(pending) < self._prefetch:
+                    window = next(windows, None)
+                    if window is None:
+                        break
+                    pending.append(executor.submit(self._fetch, window))
+                yield current.result()
+        finally:
+            for future in pending:
+                future.cancel()
+            executor.shutdown(wait=False)
+
+    def __iter__(self) -> Iterator["Candlestick"]:
+        for candles in self.iter_windows():
+            yield from candles
+
+    def iter_arrays(self) -> Iterator[CandleArrays]:
+        """按窗口返回列式K线，跳过空窗口"""
+        for candles in self.iter_windows():
+            if candles:
+                yield CandleArrays(DEFAULT_PRICE_SCALE, **candle_columns(candles))
+
+    # ==================== 异步 ====================
+    async def aiter_windows(self) -> AsyncIterator[List["Candlestick"]]:
+        """iter_windows 的异步版本，请求在线程池中执行，不阻塞事件循环"""
+        pending: deque[asyncio.Task[List["Candlestick"]]] = deque()
+        windows = iter(self.windows)
+
+        def submit(window: tuple[date, date]) -> None:
+            pending.append(asyncio.create_task(asyncio.to_thread(self._fetch, window)))
+
+        try:
+            submit(next(windows))
+            while pending:
+                current = pending.popleft()
+                while len(pending) < self._prefetch:
+                    window = next(windows, None)
+                    if window is None:
+                        break
+                    submit(window)
+                yield await current
+        finally:
+            for task in pending:
+                task.cancel()
+
+    async def __aiter__(self) -> AsyncIterator["Candlestick"]:
+        async for candles in self.aiter_windows():
+            for candle in candles:
+                yield candle
+
+    async def aiter_arrays(self) -> AsyncIterator[CandleArrays]:
+        """iter_arrays 的异步版本"""
+        async for candles in self.aiter_windows():
+            if candles:
+                yield CandleArrays(DEFAULT_PRICE_SCALE, **candle_columns(candles))
@@ -0,0 +1,519 @@
+from abc import ABC, abstractmethod
+from dataclasses import dataclass
+from typing import TYPE_CHECKING, Mapping, Optional, Sequence
+import numpy as np
+from modules.timestamps import to_epoch_ns
+
+if TYPE_CHECKING:
+    from longport.openapi import Candlestick
+
+CANDLE_FIELDS: tuple[str, ...] = ("open", "high", "low", "close", "volume", "turnover")
+
+State = dict[str, np.ndarray]
+
+
+# ==================== 列式K线数据 ====================
+@dataclass
+class CandlePanel:
+    """
+    多标的列式K线数据
+
+    每个字段都是 (标的数, K线数) 的二维数组，各标的按最新K线右对齐，
+    历史较短的标的左侧以 NaN 填充（时间戳填 0）。
+    """
+
+    symbols: list[str]
+    timestamp: np.ndarray
+    open: np.ndarray
+    high: np.ndarray
+    low: np.ndarray
+    close: np.ndarray
+    volume: np.ndarray
+    turnover: np.ndarray
+
+    @classmethod
+    def empty(cls, symbols: Sequence[str], length: int) -> "CandlePanel":
+        shape = (len(symbols), length)
+        return cls(
+            list(symbols),
+            np.zeros(shape, dtype=np.int64),
+            *(np.full(shape, np.nan) for _ in CANDLE_FIELDS),
+        )
+
+    @classmethod
+    def from_candles(
+        cls,
+        candles: Mapping[str, Sequence["Candlestick"]],
+        length: Optional[int] = None,
+    ) -> "CandlePanel":
+        """
+        从 fetch_candlesticks / fetch_history_candlesticks_by_date 的结果构建
+
+        :param candles: 标的代码 -> K线列表（按时间升序）
+        :param length: 保留的K线数量，默认取最长的序列长度
+        :return: 列式K线数据
+        """
+        if length is None:
+            length = max((len(c) for c in candles.values()), default=0)
+        panel = cls.empty(list(candles), length)
+        for row, series in enumerate(candles.values()):
+            series = series[-length:] if length else []
+            offset = length - len(series)
+            panel.timestamp[row, offset:] = [to_epoch_ns(c.timestamp) for c in series]
+            for name in CANDLE_FIELDS:
+                getattr(panel, name)[row, offset:] = [
+                    float(getattr(c, name)) for c in series
+                ]
+        return panel
+
+    @property
+    def length(self) -> int:
+        return self.timestamp.shape[1]
+
+    def rows(self, index: Sequence[int] | slice) -> "CandlePanel":
+        """取部分标的"""
+        symbols = (
+            self.symbols[index]
+            if isinstance(index, slice)
+            else [self.symbols[i] for i in index]
+        )
+        return CandlePanel(
+            symbols,
+            self.timestamp[index],
+            *(getattr(self, name)[index] for name in CANDLE_FIELDS),
+        )
+
+    def head(self, count: int) -> "CandlePanel":
+        """取最早的 count 根K线（视图，不复制数据）"""
+        return CandlePanel(
+            self.symbols,
+            self.timestamp[:, :count],
+            *(getattr(self, name)[:, :count] for name in CANDLE_FIELDS),
+        )
+
+    def tail(self, count: int) -> "CandlePanel":
+        """取最近 count 根K线（视图，不复制数据）"""
+        count = min(count, self.length)
+        return CandlePanel(
+            self.symbols,
+            self.timestamp[:, -count:],
+            *(getattr(self, name)[:, -count:] for name in CANDLE_FIELDS),
+        )
+
+    def push(self, row: int, candle: "Candlestick", replace: bool = False) -> None:
+        """
+        把一根新K线写入某个标的的末尾
+
+        :param row: 标的所在行
+        :param candle: K线
+        :param replace: 是否替换最后一根K线（同一根K线的盘中更新）
+        """
+        columns = [self.timestamp, *(getattr(self, name) for name in CANDLE_FIELDS)]
+        if not replace:
+            for column in columns:
+                column[row, :-1] = column[row, 1:]
+        self.timestamp[row, -1] = to_epoch_ns(candle.timestamp)
+        for name in CANDLE_FIELDS:
+            getattr(self, name)[row, -1] = float(getattr(candle, name))
+
+
+# ==================== 向量化计算核 ====================
+def rolling_sum(values: np.ndarray, window: int) -> np.ndarray:
+    """沿最后一维的滑动求和，窗口内含 NaN 时结果为 NaN"""
+    valid = ~np.isnan(values)
+    zero_pad = [(0, 0)] * (values.ndim - 1) + [(1, 0)]
+    sums = np.pad(np.cumsum(np.where(valid, values, 0.0), axis=-1), zero_pad)
+    counts = np.pad(np.cumsum(valid, axis=-1), zero_pad)
+    out = np.full(values.shape, np.nan)
+    if window <= values.shape[-1]:
+        window_sums = sums[..., window:] - sums[..., :-window]
+        window_counts = counts[..., window:] - counts[..., :-window]
+        out[..., window - 1 :] = np.where(window_counts == window, window_sums, np.nan)
+    return out
+
+
+def sma(values: np.ndarray, window: int) -> np.ndarray:
+    """简单移动平均"""
+    return rolling_sum(values, window) / window
+
+
+def rolling_std(values: np.ndarray, window: int) -> np.ndarray:
+    """
+    滑动总体标准差
+
+    先求窗口均值，再逐个窗口位置累加与均值之差的平方（两遍法），
+    避免 E[x²]-E[x]² 在价格较大、波动较小时的相消误差。
+    循环只在窗口长度上进行，每一步都在全部标的和K线上向量化。
+    """
+    mean = sma(values, window)
+    out = np.full(values.shape, np.nan)
+    length = values.shape[-1]
+    if window <= length:
+        window_mean = mean[..., window - 1 :]
+        squares = np.zeros(window_mean.shape)
+        for offset in range(window):
+            deviation = values[..., offset : length - window + 1 + offset] - window_mean
+            squares += deviation * deviation
+        out[..., window - 1 :] = np.sqrt(squares / window)
+    return out
+
+
+def _ewm_step(prev: np.ndarray, current: np.ndarray, alpha: float) -> np.ndarray:
+    return np.where(
+        np.isnan(prev),
+        current,
+        np.where(np.isnan(current), prev, prev + alpha * (current - prev)),
+    )
+
+
+def ewm(
+    values: np.ndarray, alpha: float, initial: Optional[np.ndarray] = None
+) -> np.ndarray:
+    """
+    指数加权平均，语义与逐项调用 _ewm_step 相同
+
+    递推 y[t] = a[t] * y[t-1] + b[t] 是仿射变换的复合，满足结合律，
+    因此用前缀扫描（倍增）在 O(log T) 次整块数组运算内求出全部结果，
+    没有沿时间的 Python 循环。系数只做乘法且不大于 1，不会溢出。
+
+    :param values: (..., T) 输入序列
+    :param alpha: 平滑系数
+    :param initial: 递推初始值，默认以首个有效值为初始值
+    :return: 与输入形状相同的结果
+    """
+    values = np.asarray(values, dtype=float)
+    prev = np.broadcast_to(
+        np.nan if initial is None else np.asarray(initial, dtype=float),
+        values.shape[:-1],
+    )
+    valid = ~np.isnan(values)
+    # 没有初始值的标的，首个有效值直接作为结果（a=0, b=x）
+    started = np.cumsum(valid, axis=-1) > 0
+    first = valid & ~np.concatenate(
+        [np.zeros(values.shape[:-1] + (1,), dtype=bool), started[..., :-1]], axis=-1
+    )
+    reset = first & np.isnan(prev)[..., None]
+    # 缺失值保持上一值不变（a=1, b=0）
+    a = np.where(valid, 1.0 - alpha, 1.0)
+    b = np.where(valid, alpha * np.where(valid, values, 0.0), 0.0)
+    a = np.where(reset, 0.0, a)
+    b = np.where(reset, values, b)
+
+    shift = 1
+    while shift < values.shape[-1]:
+        b[..., shift:] = a[..., shift:] * b[..., :-shift] + b[..., shift:]
+        a[..., shift:] = a[..., shift:] * a[..., :-shift]
+        shift *= 2
+    out = a * np.nan_to_num(prev)[..., None] + b
+    # 没有初始值且尚未出现有效值的位置保持 NaN
+    return np.where(np.isnan(prev)[..., None] & ~started, np.nan, out)
+
+
+def true_range(high: np.ndarray, low: np.ndarray, close: np.ndarray) -> np.ndarray:
+    """真实波幅"""
+    prev_close = np.concatenate(
+        [np.full(close.shape[:-1] + (1,), np.nan), close[..., :-1]], axis=-1
+    )
+    ranges = np.stack([high - low, np.abs(high - prev_close), np.abs(low - prev_close)])
+    tr = np.nanmax(np.where(np.isnan(ranges).all(axis=0), 0.0, ranges), axis=0)
+    return np.where(np.isnan(high - low), np.nan, tr)
+
+
+def _last_column(values: np.ndarray) -> np.ndarray:
+    """取最后一列作为递推状态，没有数据时为 NaN"""
+    if values.shape[-1] == 0:
+        return np.full(values.shape[:-1], np.nan)
+    return values[..., -1].copy()
+
+
+# ==================== 指标定义 ====================
+class Indicator(ABC):
+    """
+    指标基类
+
+    evaluate 一次性计算整段序列，并给出各递推状态量的整段序列（引擎从中取最后两列，
+    无需为上一根K线的状态再计算一遍）；step 在新K线写入面板末尾后只计算最新值。
+    默认的 step 在最近 lookback 根K线上重新计算，递推类指标会覆盖它并维护状态。
+    """
+
+    lookback: int = 1
+
+    @property
+    @abstractmethod
+    def names(self) -> tuple[str, ...]:
+        """指标输出的名称"""
+
+    def compute(self, panel: CandlePanel) -> dict[str, np.ndarray]:
+        return self.evaluate(panel)[0]
+
+    @abstractmethod
+    def evaluate(self, panel: CandlePanel) -> tuple[dict[str, np.ndarray], State]:
+        """计算整段序列，返回 (指标名 -> 序列, 递推状态量 -> 序列)"""
+
+    def step(
+        self, panel: CandlePanel, state: State
+    ) -> tuple[dict[str, np.ndarray], State]:
+        outputs, _ = self.evaluate(panel.tail(self.lookback))
+        return {name: values[:, -1] for name, values in outputs.items()}, state
+
+
+@dataclass(frozen=True)
+class SMA(Indicator):
+    """简单移动平均"""
+
+    window: int
+    source: str = "close"
+
+    @property
+    def names(self) -> tuple[str, ...]:
+        return (f"sma_{self.window}",)
+
+    @property
+    def lookback(self) -> int:  # type: ignore[override]
+        return self.window
+
+    def evaluate(self, panel: CandlePanel) -> tuple[dict[str, np.ndarray], State]:
+        return {self.names[0]: sma(getattr(panel, self.source), self.window)}, {}
+
+
+@dataclass(frozen=True)
+class Bollinger(Indicator):
+    """布林带"""
+
+    window: int = 20
+    width: float = 2.0
+
+    @property
+    def names(self) -> tuple[str, ...]:
+        return tuple(f"boll_{band}_{self.window}" for band in ("mid", "up", "low"))
+
+    @property
+    def lookback(self) -> int:  # type: ignore[override]
+        return self.window
+
+    def evaluate(self, panel: CandlePanel) -> tuple[dict[str, np.ndarray], State]:
+        mid = sma(panel.close, self.window)
+        band = self.width * rolling_std(panel.close, self.window)
+        return dict(zip(self.names, (mid, mid + band, mid - band))), {}
+
+
+@dataclass(frozen=True)
+class EMA(Indicator):
+    """指数移动平均"""
+
+    window: int
+    source: str = "close"
+
+    @property
+    def names(self) -> tuple[str, ...]:
+        return (f"ema_{self.window}",)
+
+    def evaluate(self, panel: CandlePanel) -> tuple[dict[str, np.ndarray], State]:
+        ema = ewm(getattr(panel, self.source), 2.0 / (self.window + 1))
+        return {self.names[0]: ema}, {"ema": ema}
+
+    def step(
+        self, panel: CandlePanel, state: State
+    ) -> tuple[dict[str, np.ndarray], State]:
+        current = getattr(panel, self.source)[:, -1]
+        ema = _ewm_step(state["ema"], current, 2.0 / (self.window + 1))
+        return {self.names[0]: ema}, {"ema": ema}
+
+
+def _gain_loss(change: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+    missing = np.isnan(change)
+    gain = np.where(missing, np.nan, np.maximum(change, 0.0))
+    loss = np.where(missing, np.nan, np.maximum(-change, 0.0))
+    return gain, loss
+
+
+def _rsi(gain: np.ndarray, loss: np.ndarray) -> np.ndarray:
+    with np.errstate(divide="ignore", invalid="ignore"):
+        rsi = np.where(loss == 0, 100.0, 100.0 - 100.0 / (1.0 + gain / loss))
+    return np.where(np.isnan(gain) | np.isnan(loss), np.nan, rsi)
+
+
+@dataclass(frozen=True)
+class RSI(Indicator):
+    """相对强弱指标（Wilder 平滑）"""
+
+    window: int = 14
+
+    @property
+    def names(self) -> tuple[str, ...]:
+        return (f"rsi_{self.window}",)
+
+    def evaluate(self, panel: CandlePanel) -> tuple[dict[str, np.ndarray], State]:
+        gain, loss = _gain_loss(np.diff(panel.close, axis=-1, prepend=np.nan))
+        avg_gain = ewm(gain, 1.0 / self.window)
+        avg_loss = ewm(loss, 1.0 / self.window)
+        state = {"gain": avg_gain, "loss": avg_loss}
+        return {self.names[0]: _rsi(avg_gain, avg_loss)}, state
+
+    def step(
+        self, panel: CandlePanel, state: State
+    ) -> tuple[dict[str, np.ndarray], State]:
+        gain, loss = _gain_loss(panel.close[:, -1] - panel.close[:, -2])
+        avg_gain = _ewm_step(state["gain"], gain, 1.0 / self.window)
+        avg_loss = _ewm_step(state["loss"], loss, 1.0 / self.window)
+        return {self.names[0]: _rsi(avg_gain, avg_loss)}, {
+            "gain": avg_gain,
+            "loss": avg_loss,
+        }
+
+
+@dataclass(frozen=True)
+class ATR(Indicator):
+    """平均真实波幅（Wilder 平滑）"""
+
+    window: int = 14
+
+    @property
+    def names(self) -> tuple[str, ...]:
+        return (f"atr_{self.window}",)
+
+    def evaluate(self, panel: CandlePanel) -> tuple[dict[str, np.ndarray], State]:
+        atr = ewm(true_range(panel.high, panel.low, panel.close), 1.0 / self.window)
+        return {self.names[0]: atr}, {"atr": atr}
+
+    def step(
+        self, panel: CandlePanel, state: State
+    ) -> tuple[dict[str, np.ndarray], State]:
+        tr = true_range(panel.high[:, -2:], panel.low[:, -2:], panel.close[:, -2:])
+        atr = _ewm_step(state["atr"], tr[:, -1], 1.0 / self.window)
+        return {self.names[0]: atr}, {"atr": atr}
+
+
+@dataclass(frozen=True)
+class MACD(Indicator):
+    """指数平滑异同移动平均"""
+
+    fast: int = 12
+    slow: int = 26
+    signal: int = 9
+
+    @property
+    def names(self) -> tuple[str, ...]:
+        return ("macd_dif", "macd_dea", "macd_hist")
+
+    def _outputs(self, fast: np.ndarray, slow: np.ndarray, dea: np.ndarray):  # type: ignore
+        dif = fast - slow
+        return dict(zip(self.names, (dif, dea, 2.0 * (dif - dea))))
+
+    def evaluate(self, panel: CandlePanel) -> tuple[dict[str, np.ndarray], State]:
+        fast = ewm(panel.close, 2.0 / (self.fast + 1))
+        slow = ewm(panel.close, 2.0 / (self.slow + 1))
+        dea = ewm(fast - slow, 2.0 / (self.signal + 1))
+        return self._outputs(fast, slow, dea), {"fast": fast, "slow": slow, "dea": dea}
+
+    def step(
+        self, panel: CandlePanel, state: State
+    ) -> tuple[dict[str, np.ndarray], State]:
+        close = panel.close[:, -1]
+        fast = _ewm_step(state["fast"], close, 2.0 / (self.fast + 1))
+        slow = _ewm_step(state["slow"], close, 2.0 / (self.slow + 1))
+        dea = _ewm_step(state["dea"], fast - slow, 2.0 / (self.signal + 1))
+        return self._outputs(fast, slow, dea), {"fast": fast, "slow": slow, "dea": dea}
+
+
+# ==================== 指标引擎 ====================
+class IndicatorEngine:
+    """
+    本地技术指标引擎
+
+    一次性对多个标的计算多个指标（在标的维度上向量化），之后每来一根新K线，
+    只需 O(标的K线窗口) 的增量计算即可得到最新指标值。
+    """
+
+    def __init__(self, indicators: Sequence[Indicator], window: int = 500):
+        """
+        :param indicators: 需要计算的指标列表
+        :param window: 每个标的保留的K线数量，至少为各指标 lookback 的最大值
+        """
+        self.indicators = list(indicators)
+        self.window = max([window, *(i.lookback for i in self.indicators)])
+        self.panel = CandlePanel.empty([], self.window)
+        self._rows: dict[str, int] = {}
+        # 每个指标的递推状态，以及最后一根K线写入前的状态（用于同一根K线的更新）
+        self._states: list[State] = []
+        self._prev_states: list[State] = []
+
+    def load(
+        self, candles: Mapping[str, Sequence["Candlestick"]]
+    ) -> dict[str, dict[str, np.ndarray]]:
+        """
+        载入历史K线并计算全部指标
+
+        :param candles: 标的代码 -> K线列表（按时间升序）
+        :return: 标的代码 -> 指标名 -> 指标序列
+        """
+        panel = CandlePanel.from_candles(candles)
+        results: dict[str, np.ndarray] = {}
+        self._states, self._prev_states = [], []
+        for indicator in self.indicators:
+            outputs, series = indicator.evaluate(panel)
+            results.update(outputs)
+            self._states.append({k: _last_column(v) for k, v in series.items()})
+            self._prev_states.append(
+                {k: _last_column(v[..., :-1]) for k, v in series.items()}
+            )
+
+        # 只保留最近 window 根K线用于增量计算
+        self.panel = CandlePanel.empty(panel.symbols, self.window)
+        kept = min(panel.length, self.window)
+        if kept:
+            for name in ("timestamp", *CANDLE_FIELDS):
+                getattr(self.panel, name)[:, -kept:] = getattr(panel, name)[:, -kept:]
+        self._rows = {symbol: row for row, symbol in enumerate(panel.symbols)}
+        return {
+            symbol: {name: values[row] for name, values in results.items()}
+            for row, symbol in enumerate(panel.symbols)
+        }
+
+    def update(self, symbol: str, candle: "Candlestick") -> dict[str, float]:
+        """
+        写入一根新K线并增量计算最新的指标值
+
+        与最后一根K线时间戳相同的K线视为该K线的更新（例如未确认的推送K线）。
+
+        :param symbol: 标的代码
+        :param candle: K线
+        :return: 指标名 -> 最新值
+        """
+        row = self._rows.get(symbol)
+        if row is None:
+            raise KeyError(f"标的 {symbol} 未载入历史K线")
+        replace = self.panel.timestamp[row, -1] == to_epoch_ns(candle.timestamp)
+        self.panel.push(row, candle, replace=replace)
+
+        sub_panel = self.panel.rows([row])
+        latest: dict[str, float] = {}
+        for i, indicator in enumerate(self.indicators):
+            if not replace:
+                for key, values in self._states[i].items():
+                    self._prev_states[i][key][row] = values[row]
+            before = {
+                key: values[row : row + 1]
+                for key, values in self._prev_states[i].items()
+            }
+            outputs, after = indicator.step(sub_panel, before)
+            for key, values in after.items():
+                self._states[i][key][row] = values[0]
+            latest.update({name: float(values[0]) for name, values in outputs.items()})
+        return latest
+
+    def latest(self, symbol: str) -> dict[str, float]:
+        """
+        在当前窗口上重新计算某个标的的最新指标值
+
+        :param symbol: 标的代码
+        :return: 指标名 -> 最新值
+        """
+        panel = self.panel.rows([self._rows[symbol]])
+        latest: dict[str, float] = {}
+        for indicator in self.indicators:
+            outputs, _ = indicator.evaluate(panel)
+            latest.update(
+                {name: float(values[0, -1]) for name, values in outputs.items()}
+            )
+        return latest
@@ -1,5 +1,6 @@
+from contextlib import nullcontext
 from datetime import date
-from typing import List, Optional, Type
+from typing import Callable, ContextManager, List, Optional, Type, TypeVar
 from longport.openapi import (
     QuoteContext,
     Config,
@@ -23,19 +24,126 @@ from longport.openapi import (
     Market,
     MarketTemperature,
     HistoryMarketTemperatureResponse,
+    PushTrades,
+    SubType,
 )
-from config import LONGPORT_APP_KEY, LONGPORT_APP_SECRET, LONGPORT_ACCESS_TOKEN
+from config import (
+    LONGPORT_APP_KEY,
+    LONGPORT_APP_SECRET,
+    LONGPORT_ACCESS_TOKEN,
+    PerformanceConfig,
+)
+from modules.backends import CachingBackend, MarketDataBackend, iter_backends
+from modules.batch import DEFAULT_MAX_WORKERS, BatchResult, fan_out
+from modules.codec import (
+    CandlestickRecord,
+    CapitalFlowLineRecord,
+    IntradayLineRecord,
+    SecurityQuoteRecord,
+    TradeRecord,
+    to_records,
+)
+from modules.history_stream import DEFAULT_PREFETCH, HistoryStream
+from modules.participants import ParticipantIndex, ResolvedSecurityBrokers
+from modules.rate_limiter import RateLimiter
+from modules.request_scheduler import Priority, ScheduledBackend
+
+T = TypeVar("T")
 
 
 class LongPortMarketAdapter:
-    def __init__(self):
-        self.ctx = QuoteContext(
-            Config(
-                app_key=LONGPORT_APP_KEY,
-                app_secret=LONGPORT_APP_SECRET,
-                access_token=LONGPORT_ACCESS_TOKEN,
+    """
+    长桥行情适配器
+
+    线程安全：同一个实例可以被多个线程同时调用。构造后只有 apply_performance_config
+    会整体替换 max_workers 等简单属性；
+    QuoteContext 可以并发调用，限流器、请求调度器在锁内更新状态；
+    券商席位索引、交易日历等缓存采用写时复制的只读快照，刷新时整体替换引用；
+    CachingBackend 在锁内原地写入；查询与缓存命中都不加锁，读线程不会与写线程竞争。
+    """
+
+    def __init__(
+        self,
+        max_workers: int = DEFAULT_MAX_WORKERS,
+        rate_limiter: Optional[RateLimiter] = None,
+        backend: Optional[MarketDataBackend] = None,
+        schedule_requests: bool = False,
+        performance: Optional[PerformanceConfig] = None,
+    ):
+        """
+        :param max_workers: *_batch 方法的最大并发数
+        :param rate_limiter: *_batch 方法使用的限流器，默认按行情接口限制新建一个
+        :param backend: 行情数据源，默认连接长桥 QuoteContext；
+            可传入 build_backend、RoutingBackend 包装后的数据源或本地模拟器
+        :param schedule_requests: 是否按优先级调度请求：实时行情等交互式请求优先，
+            历史回补、指标筛选等批量请求使用剩余的调用额度（共享 rate_limiter）
+        :param performance: 性能配置，例如 config.get_performance_config()，
+            会覆盖 max_workers 与限流、缓存设置
+        """
+        self.max_workers = max_workers
+        self.rate_limiter = rate_limiter or RateLimiter()
+        self.participant_index = ParticipantIndex(self)
+        ctx: MarketDataBackend = (
+            QuoteContext(
+                Config(
+                    app_key=LONGPORT_APP_KEY,
+                    app_secret=LONGPORT_APP_SECRET,
+                    access_token=LONGPORT_ACCESS_TOKEN,
+                )
             )
+            if backend is None
+            else backend
         )
+        if schedule_requests:
+            ctx = ScheduledBackend(ctx, self.rate_limiter)
+        self.ctx = ctx
+        if performance is not None:
+            self.apply_performance_config(performance)
+
+    def apply_performance_config(self, config: PerformanceConfig) -> None:
+        """
+        应用性能配置，不重建行情连接；可作为 ConfigWatcher 的回调实现热加载
+
+        :param config: 性能配置
+        """
+        self.max_workers = config.max_workers
+        self.rate_limiter.configure(config.rate_limit, config.rate_burst)
+        # 缓存可能位于 RoutingBackend 的某个路由目标之后，需要遍历全部下层数据源
+        for backend in iter_backends(self.ctx):
+            if isinstance(backend, CachingBackend):
+                backend.configure(config.cache_ttl, config.cache_max_entries)
+
+    def request_priority(self, priority: Priority) -> ContextManager[None]:
+        """
+        在当前线程中临时指定请求优先级（未启用请求调度时不起作用）
+
+        :param priority: 优先级
+        :return: 上下文管理器
+        """
+        if isinstance(self.ctx, ScheduledBackend):
+            return self.ctx.priority(priority)
+        return nullcontext()
+
+    def close(self) -> None:
+        """停止适配器创建的请求调度器的分发线程（未启用请求调度时不起作用）"""
+        if isinstance(self.ctx, ScheduledBackend):
+            self.ctx.close()
+
+    def _fan_out(self, func: Callable[[str], T], symbols: List[str]) -> BatchResult[T]:
+        """按适配器的并发与限流设置，对多个标的并发调用单标的接口"""
+        if not isinstance(self.ctx, ScheduledBackend):
+            return fan_out(func, symbols, self.max_workers, self.rate_limiter)
+        # 启用请求调度时由调度器统一限流，并把调用方指定的优先级带到工作线程
+        scheduler = self.ctx
+        priority = scheduler.current_priority()
+        if priority is None:
+            return fan_out(func, symbols, self.max_workers)
+
+        def call(symbol: str) -> T:
+            with scheduler.priority(priority):
+                return func(symbol)
+
+        return fan_out(call, symbols, self.max_workers)
 
     def fetch_static_info_batch(self, symbols: List[str]) -> List[SecurityStaticInfo]:
         """
@@ -87,6 +195,15 @@ class LongPortMarketAdapter:
         depth = self.ctx.depth(symbol)
         return depth
 
+    def fetch_depth_batch(self, symbols: List[str]) -> BatchResult[SecurityDepth]:
+        """
+        并发获取多个标的的盘口深度信息
+
+        :param symbols: 标的代码列表
+        :return: 标的代码 -> 盘口深度对象，失败的标的记录在 errors 中
+        """
+        return self._fan_out(self.fetch_depth, symbols)
+
     def fetch_brokers(self, symbol: str) -> SecurityBrokers:
         """
         获取标的的券商列表
@@ -97,6 +214,26 @@ class LongPortMarketAdapter:
         brokers = self.ctx.brokers(symbol)
         return brokers
 
+    def fetch_brokers_batch(self, symbols: List[str]) -> BatchResult[SecurityBrokers]:
+        """
+        并发获取多个标的的券商列表
+
+        :param symbols: 标的代码列表
+        :return: 标的代码 -> 券商队列对象，失败的标的记录在 errors 中
+        """
+        return self._fan_out(self.fetch_brokers, symbols)
+
+    def fetch_brokers_resolved(self, symbol: str) -> ResolvedSecurityBrokers:
+        """
+        获取标的的经纪队列，并把券商席位号解析为参与者信息
+
+        :param symbol: 标的代码
+        :return: 解析后的经纪队列
+        """
+        return self.participant_index.resolve_brokers(
+            symbol, self.fetch_brokers(symbol)
+        )
+
     def fetch_participants(self) -> List[ParticipantInfo]:
         """
         获取参与者代码列表
@@ -117,6 +254,18 @@ class LongPortMarketAdapter:
         trades = self.ctx.trades(symbol, count)
         return trades
 
+    def fetch_trades_batch(
+        self, symbols: List[str], count: int
+    ) -> BatchResult[List[Trade]]:
+        """
+        并发获取多个标的的成交明细
+
+        :param symbols: 标的代码列表
+        :param count: 每个标的的请求数量
+        :return: 标的代码 -> 成交列表，失败的标的记录在 errors 中
+        """
+        return self._fan_out(lambda symbol: self.fetch_trades(symbol, count), symbols)
+
     def fetch_intraday(self, symbol: str) -> List[IntradayLine]:
         """
         获取标的日内分时数据
@@ -127,6 +276,17 @@ class LongPortMarketAdapter:
         intraday = self.ctx.intraday(symbol)
         return intraday
 
+    def fetch_intraday_batch(
+        self, symbols: List[str]
+    ) -> BatchResult[List[IntradayLine]]:
+        """
+        并发获取多个标的的日内分时数据
+
+        :param symbols: 标的代码列表
+        :return: 标的代码 -> 分时数据列表，失败的标的记录在 errors 中
+        """
+        return self._fan_out(self.fetch_intraday, symbols)
+
     def fetch_trading_session(self) -> List[MarketTradingSession]:
         """
         获取交易时段信息
@@ -161,6 +321,17 @@ class LongPortMarketAdapter:
         capital_flow = self.ctx.capital_flow(symbol)
         return capital_flow
 
+    def fetch_capital_flow_batch(
+        self, symbols: List[str]
+    ) -> BatchResult[List[CapitalFlowLine]]:
+        """
+        并发获取多个标的的资金流向数据
+
+        :param symbols: 标的代码列表
+        :return: 标的代码 -> 资金流向数据列表，失败的标的记录在 errors 中
+        """
+        return self._fan_out(self.fetch_capital_flow, symbols)
+
     def fetch_capital_distribution(self, symbol: str) -> CapitalDistributionResponse:
         """
         获取标的的资金分布数据
@@ -171,6 +342,17 @@ class LongPortMarketAdapter:
         capital_distribution = self.ctx.capital_distribution(symbol)
         return capital_distribution
 
+    def fetch_capital_distribution_batch(
+        self, symbols: List[str]
+    ) -> BatchResult[CapitalDistributionResponse]:
+        """
+        并发获取多个标的的资金分布数据
+
+        :param symbols: 标的代码列表
+        :return: 标的代码 -> 资金分布数据，失败的标的记录在 errors 中
+        """
+        return self._fan_out(self.fetch_capital_distribution, symbols)
+
     def fetch_calc_indexes(
         self, symbols: List[str], indexes: List[type[CalcIndex]]
     ) -> List[SecurityCalcIndex]:
@@ -232,6 +414,43 @@ class LongPortMarketAdapter:
         )
         return candles
 
+    def stream_history_candlesticks_by_date(
+        self,
+        symbol: str,
+        period: Type[Period],
+        adjust_type: Type[AdjustType],
+        start: date,
+        end: date,
+        trade_sessions: Type[TradeSessions] = TradeSessions.Intraday,
+        window_days: Optional[int] = None,
+        prefetch: int = DEFAULT_PREFETCH,
+    ) -> HistoryStream:
+        """
+        分窗口流式获取长区间的历史K线，可用 for / async for 逐根遍历，
+        或通过 iter_arrays() / aiter_arrays() 按窗口获取列式数据
+
+        :param symbol: 标的代码
+        :param period: K线周期
+        :param adjust_type: 复权类型
+        :param start: 开始日期
+        :param end: 结束日期
+        :param trade_sessions: 可选的交易时段
+        :param window_days: 每个窗口的天数，默认按周期估算
+        :param prefetch: 预取的窗口数
+        :return: 流式K线
+        """
+        return HistoryStream(
+            self,
+            symbol,
+            period,
+            adjust_type,
+            start,
+            end,
+            trade_sessions,
+            window_days,
+            prefetch,
+        )
+
     def fetch_market_temperature(self, market: Type[Market]) -> MarketTemperature:
         """
         获取市场温度
@@ -256,3 +475,153 @@ class LongPortMarketAdapter:
         """
         history_temperature = self.ctx.history_market_temperature(market, start, end)
         return history_temperature
+
+    def set_on_trades(self, callback: Callable[[str, PushTrades], None]) -> None:
+        """
+        设置逐笔成交推送的回调
+
+        :param callback: 参数为标的代码与推送的成交
+        """
+        self.ctx.set_on_trades(callback)
+
+    def subscribe(self, symbols: List[str], sub_types: List[Type[SubType]]) -> None:
+        """
+        订阅行情推送
+
+        :param symbols: 标的代码列表
+        :param sub_types: 订阅类型列表
+        """
+        self.ctx.subscribe(symbols, sub_types)
+
+    def unsubscribe(self, symbols: List[str], sub_types: List[Type[SubType]]) -> None:
+        """
+        取消订阅行情推送
+
+        :param symbols: 标的代码列表
+        :param sub_types: 订阅类型列表
+        """
+        self.ctx.unsubscribe(symbols, sub_types)
+
+    def fetch_quote_batch_normalized(
+        self, symbols: List[str]
+    ) -> List[SecurityQuoteRecord]:
+        """
+        批量获取实时行情，时间戳统一为纳秒整数（timestamp_ns）
+
+        :param symbols: 标的代码列表
+        :return: 行情记录列表，可通过 local_time() 获取市场当地时间
+        """
+        return to_records(self.fetch_quote_batch(symbols), SecurityQuoteRecord)
+
+    def fetch_quote_normalized(self, symbol: str) -> Optional[SecurityQuoteRecord]:
+        """
+        获取单个标的的实时行情，时间戳统一为纳秒整数
+
+        :param symbol: 标的代码
+        :return: 行情记录或None
+        """
+        quotes = self.fetch_quote_batch_normalized([symbol])
+        return quotes[0] if quotes else None
+
+    def fetch_trades_normalized(self, symbol: str, count: int) -> List[TradeRecord]:
+        """
+        获取逐笔成交，时间戳统一为纳秒整数
+
+        :param symbol: 标的代码
+        :param count: 请求数量
+        :return: 成交记录列表
+        """
+        return to_records(self.fetch_trades(symbol, count), TradeRecord)
+
+    def fetch_intraday_normalized(self, symbol: str) -> List[IntradayLineRecord]:
+        """
+        获取日内分时数据，时间戳统一为纳秒整数
+
+        :param symbol: 标的代码
+        :return: 分时记录列表
+        """
+        return to_records(self.fetch_intraday(symbol), IntradayLineRecord)
+
+    def fetch_capital_flow_normalized(self, symbol: str) -> List[CapitalFlowLineRecord]:
+        """
+        获取资金流向数据，时间戳统一为纳秒整数
+
+        :param symbol: 标的代码
+        :return: 资金流向记录列表
+        """
+        return to_records(self.fetch_capital_flow(symbol), CapitalFlowLineRecord)
+
+    def fetch_candlesticks_normalized(
+        self,
+        symbol: str,
+        period: Type[Period],
+        count: int,
+        adjust_type: Type[AdjustType],
+        trade_session: Type[TradeSessions],
+    ) -> List[CandlestickRecord]:
+        """
+        获取K线数据，时间戳统一为纳秒整数
+
+        :param symbol: 标的代码
+        :param period: K线周期
+        :param count: 请求数量
+        :param adjust_type: 复权类型
+        :param trade_session: 可选的交易时段
+        :return: K线记录列表
+        """
+        candles = self.fetch_candlesticks(
+            symbol, period, count, adjust_type, trade_session
+        )
+        return to_records(candles, CandlestickRecord)
+
+    def fetch_candlesticks_normalized_batch(
+        self,
+        symbols: List[str],
+        period: Type[Period],
+        count: int,
+        adjust_type: Type[AdjustType],
+        trade_session: Type[TradeSessions],
+    ) -> BatchResult[List[CandlestickRecord]]:
+        """
+        并发获取多个标的的K线并转换为纯数据结构
+
+        转换在各工作线程中完成，自由线程构建下可以同时利用多个核心。
+
+        :param symbols: 标的代码列表
+        :param period: K线周期
+        :param count: 请求数量
+        :param adjust_type: 复权类型
+        :param trade_session: 可选的交易时段
+        :return: 批量结果
+        """
+        return self._fan_out(
+            lambda symbol: self.fetch_candlesticks_normalized(
+                symbol, period, count, adjust_type, trade_session
+            ),
+            symbols,
+        )
+
+    def fetch_history_candlesticks_by_date_normalized(
+        self,
+        symbol: str,
+        period: Type[Period],
+        adjust_type: Type[AdjustType],
+        start: Optional[date] = None,
+        end: Optional[date] = None,
+        trade_sessions: Type[TradeSessions] = TradeSessions.Intraday,
+    ) -> List[CandlestickRecord]:
+        """
+        按日期获取历史K线数据，时间戳统一为纳秒整数
+
+        :param symbol: 标的代码
+        :param period: K线周期
+        :param adjust_type: 复权类型
+        :param start: 开始日期
+        :param end: 结束日期
+        :param trade_sessions: 可选的交易时段
+        :return: K线记录列表
+        """
+        candles = self.fetch_history_candlesticks_by_date(
+            symbol, period, adjust_type, start, end, trade_sessions
+        )
+        return to_records(candles, CandlestickRecord)
@@ -0,0 +1,177 @@
+import bisect
+import threading
+import time
+from concurrent.futures import Future
+from datetime import date, datetime, timedelta
+from typing import TYPE_CHECKING, Callable, Optional, Type
+from longport.openapi import Market
+from modules.markets import market_from_key, market_key, market_timezone
+from modules.timestamps import from_epoch_ns, to_epoch_ns
+
+if TYPE_CHECKING:
+    from longport.openapi import MarketTemperature
+    from modules.long_port_market_adapter import LongPortMarketAdapter
+
+ONE_DAY = timedelta(days=1)
+
+
+class _MarketHistory:
+    """单个市场已获取的日度温度点，以及已覆盖的日期区间（闭区间，互不重叠）"""
+
+    def __init__(self) -> None:
+        self.points: dict[date, "MarketTemperature"] = {}
+        self.ranges: list[tuple[date, date]] = []
+        self.lock = threading.Lock()
+
+    def gaps(self, start: date, end: date) -> list[tuple[date, date]]:
+        """[start, end] 中尚未覆盖的区间"""
+        missing: list[tuple[date, date]] = []
+        cursor = start
+        index = bisect.bisect_left(self.ranges, (start, start))
+        # 前一个区间可能覆盖 start
+        if index > 0 and self.ranges[index - 1][1] >= start:
+            index -= 1
+        for begin, stop in self.ranges[index:]:
+            if begin > end:
+                break
+            if begin > cursor:
+                missing.append((cursor, begin - ONE_DAY))
+            cursor = max(cursor, stop + ONE_DAY)
+        if cursor <= end:
+            missing.append((cursor, end))
+        return missing
+
+    def cover(self, start: date, end: date) -> None:
+        """标记区间已覆盖，并与相邻或重叠的区间合并"""
+        merged: list[tuple[date, date]] = []
+        for begin, stop in self.ranges:
+            if stop + ONE_DAY < start or begin - ONE_DAY > end:
+                merged.append((begin, stop))
+            else:
+                start, end = min(start, begin), max(end, stop)
+        bisect.insort(merged, (start, end))
+        self.ranges = merged
+
+
+class MarketTemperatureStore:
+    """
+    市场温度本地缓存
+
+    历史温度按市场保存已获取的日度数据点，滑动窗口查询只请求缺失的日期区间；
+    当日数据仍可能变化，不计入已覆盖区间。当前温度使用短 TTL 缓存，
+    缓存过期时并发调用方共享同一次请求。
+    """
+
+    def __init__(
+        self,
+        adapter: "LongPortMarketAdapter",
+        ttl: float = 60.0,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        """
+        :param adapter: 行情适配器
+        :param ttl: 当前温度的缓存时间（秒）
+        :param clock: 单调时钟
+        """
+        self._adapter = adapter
+        self._ttl = ttl
+        self._clock = clock
+        self._histories: dict[str, _MarketHistory] = {}
+        # 市场 -> (当前温度, 过期时间)，写时复制的只读快照，读取无需加锁
+        self._current: dict[str, tuple["MarketTemperature", float]] = {}
+        self._inflight: dict[str, Future["MarketTemperature"]] = {}
+        self._lock = threading.Lock()
+
+    def _history(self, key: str) -> _MarketHistory:
+        with self._lock:
+            history = self._histories.get(key)
+            if history is None:
+                history = self._histories[key] = _MarketHistory()
+            return history
+
+    def history(
+        self,
+        market: Type[Market] | str,
+        start: date,
+        end: date,
+        today: Optional[date] = None,
+    ) -> list["MarketTemperature"]:
+        """
+        获取历史市场温度，只请求本地没有的日期区间
+
+        :param market: 市场
+        :param start: 开始日期
+        :param end: 结束日期
+        :param today: 市场当地的今天，默认按市场时区计算
+        :return: 按日期升序的温度列表
+        """
+        key = market if isinstance(market, str) else market_key(market)
+        tz = market_timezone(key)
+        today = today or datetime.now(tz).date()
+        history = self._history(key)
+        # 同一市场的缺口请求串行执行，避免并发的看板重复请求同一区间
+        with history.lock:
+            for gap_start, gap_end in history.gaps(start, end):
+                response = self._adapter.fetch_history_market_temperature(
+                    market_from_key(key), gap_start, gap_end
+                )
+                for record in response.records:
+                    day = from_epoch_ns(to_epoch_ns(record.timestamp), tz).date()
+                    history.points[day] = record
+                settled_end = min(gap_end, today - ONE_DAY)
+                if gap_start <= settled_end:
+                    history.cover(gap_start, settled_end)
+            points = history.points
+            return [points[day] for day in sorted(points) if start <= day <= end]
+
+    def current(self, market: Type[Market] | str) -> "MarketTemperature":
+        """
+        获取当前市场温度（TTL 缓存，并发调用共享同一次请求）
+
+        :param market: 市场
+        :return: 市场温度
+        """
+        key = market if isinstance(market, str) else market_key(market)
+        cached = self._current.get(key)
+        if cached is not None and cached[1] > self._clock():
+            return cached[0]
+        with self._lock:
+            cached = self._current.get(key)
+            if cached is not None and cached[1] > self._clock():
+                return cached[0]
+            future = self._inflight.get(key)
+            owner = future is None
+            if future is None:
+                future = self._inflight[key] = Future()
+        if not owner:
+            return future.result()
+        try:
+            temperature = self._adapter.fetch_market_temperature(market_from_key(key))
+        except Exception as e:
+            with self._lock:
+                del self._inflight[key]
+            future.set_exception(e)
+            raise
+        with self._lock:
+            self._current = {
+                **self._current,
+                key: (temperature, self._clock() + self._ttl),
+            }
+            del self._inflight[key]
+        future.set_result(temperature)
+        return temperature
+
+    def invalidate(self, market: Optional[Type[Market] | str] = None) -> None:
+        """
+        清空缓存
+
+        :param market: 市场，默认清空全部市场
+        """
+        with self._lock:
+            if market is None:
+                self._histories.clear()
+                self._current = {}
+                return
+            key = market if isinstance(market, str) else market_key(market)
+            self._histories.pop(key, None)
+            self._current = {k: v for k, v in self._current.items() if k != key}
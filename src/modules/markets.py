@@ -0,0 +1,68 @@
+from typing import Type
+from zoneinfo import ZoneInfo
+from longport.openapi import Market
+
+# 市场代码 -> 交易所所在时区
+MARKET_TIMEZONES: dict[str, ZoneInfo] = {
+    "US": ZoneInfo("America/New_York"),
+    "HK": ZoneInfo("Asia/Hong_Kong"),
+    "CN": ZoneInfo("Asia/Shanghai"),
+    "SG": ZoneInfo("Asia/Singapore"),
+}
+
+# 标的后缀 -> 市场代码
+SYMBOL_SUFFIX_MARKETS: dict[str, str] = {
+    "US": "US",
+    "HK": "HK",
+    "SH": "CN",
+    "SZ": "CN",
+    "SG": "SG",
+}
+
+_MARKETS: dict[str, Type[Market]] = {
+    "US": Market.US,
+    "HK": Market.HK,
+    "CN": Market.CN,
+    "SG": Market.SG,
+}
+
+
+def market_key(market: Type[Market]) -> str:
+    """
+    获取市场的字符串代码（longport 的 Market 不可哈希，不能直接作为字典键）
+
+    :param market: 市场
+    :return: 市场代码，例如 "HK"
+    """
+    return str(market).rsplit(".", 1)[-1]
+
+
+def market_from_key(key: str) -> Type[Market]:
+    """
+    根据市场代码获取市场
+
+    :param key: 市场代码，例如 "HK"
+    :return: 市场
+    """
+    return _MARKETS.get(key, Market.Unknown)
+
+
+def symbol_market_key(symbol: str) -> str:
+    """
+    根据标的代码后缀推断市场代码
+
+    :param symbol: 标的代码，例如 "0700.HK"
+    :return: 市场代码，无法识别时返回空字符串
+    """
+    _, _, suffix = symbol.rpartition(".")
+    return SYMBOL_SUFFIX_MARKETS.get(suffix.upper(), "")
+
+
+def market_timezone(key: str) -> ZoneInfo:
+    """
+    获取市场所在时区
+
+    :param key: 市场代码
+    :return: 时区，未知市场返回 UTC
+    """
+    return MARKET_TIMEZONES.get(key, ZoneInfo("UTC"))
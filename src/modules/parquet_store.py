@@ -0,0 +1,461 @@
+import dataclasses
+import typing
+from collections import OrderedDict
+from dataclasses import dataclass
+from datetime import date
+from decimal import ROUND_HALF_UP, Decimal
+from pathlib import Path
+from typing import Any, Callable, Iterable, Iterator, Optional, Type
+import pyarrow as pa
+import pyarrow.parquet as pq
+from longport.openapi import AdjustType, Period, TradeSessions
+from modules.codec import (
+    CandlestickRecord,
+    CapitalFlowLineRecord,
+    IntradayLineRecord,
+    TradeRecord,
+    to_record,
+)
+from modules.markets import market_timezone, symbol_market_key
+from modules.timestamps import from_epoch_ns
+
+DEFAULT_ROW_GROUP_SIZE = 64 * 1024
+DEFAULT_MAX_OPEN_FILES = 64
+# 价格与金额统一保存为 decimal128(38, 8)
+DECIMAL_PRECISION = 38
+DECIMAL_SCALE = 8
+_QUANTUM = Decimal(1).scaleb(-DECIMAL_SCALE)
+
+
+@dataclass(frozen=True, slots=True)
+class Dataset:
+    """一类导出数据"""
+
+    name: str
+    record_cls: type
+    # 分区键（标的、日期之外）
+    partition_keys: tuple[str, ...] = ()
+    # 时间戳是否唯一（读取时按时间戳去重，后写入的覆盖先写入的）
+    unique_timestamps: bool = True
+
+
+CANDLES = Dataset("candles", CandlestickRecord, ("period", "adjust_type"))
+TRADES = Dataset("trades", TradeRecord, unique_timestamps=False)
+INTRADAY = Dataset("intraday", IntradayLineRecord)
+CAPITAL_FLOW = Dataset("capital_flow", CapitalFlowLineRecord)
+DATASETS: dict[str, Dataset] = {
+    d.name: d for d in (CANDLES, TRADES, INTRADAY, CAPITAL_FLOW)
+}
+
+
+def _enum_name(value: Any) -> str:
+    return value if isinstance(value, str) else str(value).rsplit(".", 1)[-1]
+
+
+def _arrow_type(tp: Any) -> pa.DataType:
+    if tp is int:
+        return pa.int64()
+    if tp is Decimal:
+        return pa.decimal128(DECIMAL_PRECISION, DECIMAL_SCALE)
+    if tp is str:
+        return pa.string()
+    raise TypeError(f"不支持导出的字段类型: {tp}")
+
+
+def schema(dataset: Dataset) -> pa.Schema:
+    """
+    数据集的 Arrow 表结构，timestamp_ns 列保存为 UTC 纳秒时间戳
+
+    :param dataset: 数据集
+    :return: 表结构
+    """
+    hints = typing.get_type_hints(dataset.record_cls)
+    fields: list[pa.Field] = []
+    for f in dataclasses.fields(dataset.record_cls):
+        if f.name == "timestamp_ns":
+            fields.append(pa.field("timestamp", pa.timestamp("ns", tz="UTC")))
+        else:
+            fields.append(pa.field(f.name, _arrow_type(hints[f.name])))
+    return pa.schema(fields)
+
+
+def _quantize(value: Decimal) -> Decimal:
+    return value.quantize(_QUANTUM, ROUND_HALF_UP)
+
+
+def _partition_dir(
+    root: Path, dataset: Dataset, symbol: str, day: date, partition: dict[str, str]
+) -> Path:
+    path = root / dataset.name
+    for key in dataset.partition_keys:
+        path /= f"{key}={partition[key]}"
+    market = symbol_market_key(symbol) or "UNKNOWN"
+    return path / f"market={market}" / f"symbol={symbol}" / f"date={day.isoformat()}"
+
+
+def _partition(dataset: Dataset, values: dict[str, Any]) -> dict[str, str]:
+    missing = set(dataset.partition_keys) - values.keys()
+    if missing:
+        raise ValueError(f"{dataset.name} 缺少分区键: {sorted(missing)}")
+    return {key: _enum_name(values[key]) for key in dataset.partition_keys}
+
+
+class _PartitionWriter:
+    """单个分区目录的写入：缓冲一个行组的记录，满了就写出"""
+
+    def __init__(self, directory: Path, schema: pa.Schema, row_group_size: int):
+        directory.mkdir(parents=True, exist_ok=True)
+        index = len(list(directory.glob("part-*.parquet")))
+        self.path = directory / f"part-{index:05d}.parquet"
+        self._schema = schema
+        self._row_group_size = row_group_size
+        self._columns: dict[str, list[Any]] = {name: [] for name in schema.names}
+        self._writer: Optional[pq.ParquetWriter] = None
+
+    def add(self, record: Any) -> None:
+        for name, column in self._columns.items():
+            if name == "timestamp":
+                column.append(record.timestamp_ns)
+            else:
+                value = getattr(record, name)
+                column.append(_quantize(value) if isinstance(value, Decimal) else value)
+        if len(self._columns["timestamp"]) >= self._row_group_size:
+            self.flush()
+
+    def flush(self) -> None:
+        if not self._columns["timestamp"]:
+            return
+        arrays = []
+        for field in self._schema:
+            values = self._columns[field.name]
+            if field.name == "timestamp":
+                arrays.append(pa.array(values, pa.int64()).cast(field.type))
+            else:
+                arrays.append(pa.array(values, field.type))
+        table = pa.Table.from_arrays(arrays, schema=self._schema)
+        if self._writer is None:
+            self._writer = pq.ParquetWriter(self.path, self._schema)
+        self._writer.write_table(table, row_group_size=self._row_group_size)
+        for column in self._columns.values():
+            column.clear()
+
+    def close(self) -> None:
+        self.flush()
+        if self._writer is not None:
+            self._writer.close()
+
+
+class ParquetExporter:
+    """
+    把适配器结果流式写入按 市场/标的/日期 分区的 Parquet 文件
+
+    每个分区最多缓冲一个行组的记录，同时打开的分区数超过上限时关闭最久未写入的分区，
+    内存占用与导出数据总量无关。同一分区再次写入时会新建一个 part 文件。
+    """
+
+    def __init__(
+        self,
+        root: Path | str,
+        row_group_size: int = DEFAULT_ROW_GROUP_SIZE,
+        max_open_files: int = DEFAULT_MAX_OPEN_FILES,
+    ):
+        """
+        :param root: 导出根目录
+        :param row_group_size: 行组大小（行数）
+        :param max_open_files: 同时打开的分区文件数上限
+        """
+        self.root = Path(root)
+        self._row_group_size = row_group_size
+        self._max_open_files = max_open_files
+        self._writers: OrderedDict[Path, _PartitionWriter] = OrderedDict()
+        self._schemas = {name: schema(d) for name, d in DATASETS.items()}
+
+    def write(
+        self,
+        dataset: Dataset | str,
+        symbol: str,
+        items: Iterable[Any],
+        **partition: Any,
+    ) -> int:
+        """
+        写入一批数据（可以是生成器，逐条消费）
+
+        :param dataset: 数据集或其名称
+        :param symbol: 标的代码
+        :param items: longport 对象或对应的纯数据结构
+        :param partition: 数据集额外的分区键，例如K线的 period、adjust_type
+        :return: 写入的行数
+        """
+        dataset = DATASETS[dataset] if isinstance(dataset, str) else dataset
+        keys = _partition(dataset, partition)
+        tz = market_timezone(symbol_market_key(symbol))
+        written = 0
+        writer: Optional[_PartitionWriter] = None
+        current_day: Optional[date] = None
+        for item in items:
+            record: Any = (
+                item
+                if isinstance(item, dataset.record_cls)
+                else to_record(item, dataset.record_cls)
+            )
+            day = from_epoch_ns(record.timestamp_ns, tz).date()
+            if writer is None or day != current_day:
+                directory = _partition_dir(self.root, dataset, symbol, day, keys)
+                writer = self._writer(directory, dataset)
+                current_day = day
+            writer.add(record)
+            written += 1
+        return written
+
+    def _writer(self, directory: Path, dataset: Dataset) -> _PartitionWriter:
+        writer = self._writers.get(directory)
+        if writer is not None:
+            self._writers.move_to_end(directory)
+            return writer
+        while len(self._writers) >= self._max_open_files:
+            _, oldest = self._writers.popitem(last=False)
+            oldest.close()
+        writer = _PartitionWriter(
+            directory, self._schemas[dataset.name], self._row_group_size
+        )
+        self._writers[directory] = writer
+        return writer
+
+    def write_candles(
+        self,
+        symbol: str,
+        period: Type[Period],
+        adjust_type: Type[AdjustType],
+        candles: Iterable[Any],
+    ) -> int:
+        """写入K线，见 write"""
+        return self.write(
+            CANDLES, symbol, candles, period=period, adjust_type=adjust_type
+        )
+
+    def write_trades(self, symbol: str, trades: Iterable[Any]) -> int:
+        """写入逐笔成交，见 write"""
+        return self.write(TRADES, symbol, trades)
+
+    def write_intraday(self, symbol: str, lines: Iterable[Any]) -> int:
+        """写入分时数据，见 write"""
+        return self.write(INTRADAY, symbol, lines)
+
+    def write_capital_flow(self, symbol: str, lines: Iterable[Any]) -> int:
+        """写入资金流向，见 write"""
+        return self.write(CAPITAL_FLOW, symbol, lines)
+
+    def close(self) -> None:
+        """写出缓冲区并关闭所有分区文件"""
+        while self._writers:
+            _, writer = self._writers.popitem(last=False)
+            writer.close()
+
+    def __enter__(self) -> "ParquetExporter":
+        return self
+
+    def __exit__(self, *exc: object) -> None:
+        self.close()
+
+
+class ParquetMarketData:
+    """
+    从导出的 Parquet 文件读取数据
+
+    提供与适配器 fetch_*_normalized 相同签名的方法，回测和研究代码可以直接替换适配器。
+    """
+
+    def __init__(self, root: Path | str):
+        """
+        :param root: 导出根目录
+        """
+        self.root = Path(root)
+
+    def _days(
+        self,
+        dataset: Dataset,
+        symbol: str,
+        partition: dict[str, str],
+        start: Optional[date],
+        end: Optional[date],
+    ) -> list[Path]:
+        symbol_dir = _partition_dir(
+            self.root, dataset, symbol, date.min, partition
+        ).parent
+        if not symbol_dir.is_dir():
+            return []
+        days = []
+        for directory in sorted(symbol_dir.glob("date=*")):
+            day = date.fromisoformat(directory.name.removeprefix("date="))
+            if (start is None or day >= start) and (end is None or day <= end):
+                days.append(directory)
+        return days
+
+    def scan(
+        self,
+        dataset: Dataset | str,
+        symbol: str,
+        start: Optional[date] = None,
+        end: Optional[date] = None,
+        **partition: Any,
+    ) -> Iterator[Any]:
+        """
+        按日期顺序逐个行组读取记录，内存中最多保留一个行组
+
+        :param dataset: 数据集或其名称
+        :param symbol: 标的代码
+        :param start: 开始日期（市场当地日期，含）
+        :param end: 结束日期（含）
+        :param partition: 数据集额外的分区键
+        """
+        dataset = DATASETS[dataset] if isinstance(dataset, str) else dataset
+        keys = _partition(dataset, partition)
+        for directory in self._days(dataset, symbol, keys, start, end):
+            for path in sorted(directory.glob("part-*.parquet")):
+                parquet = pq.ParquetFile(path)
+                for i in range(parquet.num_row_groups):
+                    yield from self._records(dataset, parquet.read_row_group(i))
+
+    @staticmethod
+    def _records(dataset: Dataset, table: pa.Table) -> Iterator[Any]:
+        columns = {
+            name: (
+                table.column(name).cast(pa.int64())
+                if name == "timestamp"
+                else table.column(name)
+            ).to_pylist()
+            for name in table.column_names
+        }
+        columns["timestamp_ns"] = columns.pop("timestamp")
+        for values in zip(*columns.values()):
+            yield dataset.record_cls(**dict(zip(columns, values)))
+
+    def _load(
+        self,
+        dataset: Dataset,
+        symbol: str,
+        start: Optional[date] = None,
+        end: Optional[date] = None,
+        **partition: Any,
+    ) -> list[Any]:
+        records = list(self.scan(dataset, symbol, start, end, **partition))
+        if dataset.unique_timestamps:
+            records = list({r.timestamp_ns: r for r in records}.values())
+        records.sort(key=lambda r: r.timestamp_ns)
+        return records
+
+    def _tail(
+        self,
+        dataset: Dataset,
+        symbol: str,
+        count: int,
+        keep: Callable[[Any], bool],
+        **partition: Any,
+    ) -> list[Any]:
+        """从最近的日期分区往前读取，凑够 count 条满足 keep 的记录即停止"""
+        if count <= 0:
+            return []
+        days = self._days(dataset, symbol, _partition(dataset, partition), None, None)
+        chunks: list[list[Any]] = []
+        total = 0
+        for directory in reversed(days):
+            day = date.fromisoformat(directory.name.removeprefix("date="))
+            records = [
+                r for r in self._load(dataset, symbol, day, day, **partition) if keep(r)
+            ]
+            chunks.append(records)
+            total += len(records)
+            if total >= count:
+                break
+        return [r for chunk in reversed(chunks) for r in chunk][-count:]
+
+    def _latest_day(self, dataset: Dataset, symbol: str) -> list[Any]:
+        days = self._days(dataset, symbol, {}, None, None)
+        if not days:
+            return []
+        day = date.fromisoformat(days[-1].name.removeprefix("date="))
+        return self._load(dataset, symbol, day, day)
+
+    def fetch_history_candlesticks_by_date_normalized(
+        self,
+        symbol: str,
+        period: Type[Period],
+        adjust_type: Type[AdjustType],
+        start: Optional[date] = None,
+        end: Optional[date] = None,
+        trade_sessions: Type[TradeSessions] = TradeSessions.Intraday,
+    ) -> list[CandlestickRecord]:
+        """
+        按日期读取历史K线
+
+        :param symbol: 标的代码
+        :param period: K线周期
+        :param adjust_type: 复权类型
+        :param start: 开始日期
+        :param end: 结束日期
+        :param trade_sessions: 交易时段，Intraday 只返回盘中K线
+        :return: K线记录列表
+        """
+        candles = self._load(
+            CANDLES, symbol, start, end, period=period, adjust_type=adjust_type
+        )
+        if trade_sessions == TradeSessions.Intraday:
+            candles = [c for c in candles if c.trade_session == "Intraday"]
+        return candles
+
+    def fetch_candlesticks_normalized(
+        self,
+        symbol: str,
+        period: Type[Period],
+        count: int,
+        adjust_type: Type[AdjustType],
+        trade_session: Type[TradeSessions],
+    ) -> list[CandlestickRecord]:
+        """
+        读取最近的K线，从最近的日期分区往前读，不会读取全部历史
+
+        :param symbol: 标的代码
+        :param period: K线周期
+        :param count: 数量
+        :param adjust_type: 复权类型
+        :param trade_session: 交易时段
+        :return: K线记录列表
+        """
+        intraday_only = trade_session == TradeSessions.Intraday
+        return self._tail(
+            CANDLES,
+            symbol,
+            count,
+            lambda c: not intraday_only or c.trade_session == "Intraday",
+            period=period,
+            adjust_type=adjust_type,
+        )
+
+    def fetch_trades_normalized(self, symbol: str, count: int) -> list[TradeRecord]:
+        """
+        读取最近的逐笔成交
+
+        :param symbol: 标的代码
+        :param count: 数量
+        :return: 成交记录列表
+        """
+        trades = self._latest_day(TRADES, symbol)
+        return trades[-count:] if count > 0 else []
+
+    def fetch_intraday_normalized(self, symbol: str) -> list[IntradayLineRecord]:
+        """
+        读取最近一个交易日的分时数据
+
+        :param symbol: 标的代码
+        :return: 分时记录列表
+        """
+        return self._latest_day(INTRADAY, symbol)
+
+    def fetch_capital_flow_normalized(self, symbol: str) -> list[CapitalFlowLineRecord]:
+        """
+        读取最近一个交易日的资金流向
+
+        :param symbol: 标的代码
+        :return: 资金流向记录列表
+        """
+        return self._latest_day(CAPITAL_FLOW, symbol)
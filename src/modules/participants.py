@@ -0,0 +1,177 @@
+import logging
+import threading
+import time
+from dataclasses import dataclass
+from typing import TYPE_CHECKING, Callable, Iterable, Optional
+
+if TYPE_CHECKING:
+    from longport.openapi import Brokers, ParticipantInfo, SecurityBrokers
+    from modules.long_port_market_adapter import LongPortMarketAdapter
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_REFRESH_INTERVAL = 24 * 3600
+
+
+@dataclass(frozen=True, slots=True)
+class ResolvedBroker:
+    """解析后的券商席位"""
+
+    broker_id: int
+    participant: Optional["ParticipantInfo"]
+
+    @property
+    def name(self) -> str:
+        """券商名称，未知席位返回空字符串"""
+        return self.participant.name_cn if self.participant is not None else ""
+
+
+@dataclass(frozen=True, slots=True)
+class ResolvedBrokerLevel:
+    """经纪队列中的一档"""
+
+    position: int
+    brokers: tuple[ResolvedBroker, ...]
+
+
+@dataclass(frozen=True, slots=True)
+class ResolvedSecurityBrokers:
+    """解析后的买卖经纪队列"""
+
+    symbol: str
+    ask_brokers: tuple[ResolvedBrokerLevel, ...]
+    bid_brokers: tuple[ResolvedBrokerLevel, ...]
+
+
+class ParticipantIndex:
+    """
+    券商席位索引
+
+    由 fetch_participants 一次性建立 券商席位号 -> 参与者 的字典，O(1) 查询；
+    刷新时整体替换只读快照，查询无需加锁。超过刷新间隔后在下一次查询时自动重建，
+    也可以启动后台线程定期刷新。
+    """
+
+    def __init__(
+        self,
+        adapter: "LongPortMarketAdapter",
+        refresh_interval: float = DEFAULT_REFRESH_INTERVAL,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        """
+        :param adapter: 行情适配器
+        :param refresh_interval: 刷新间隔（秒），默认每天
+        :param clock: 单调时钟
+        """
+        self._adapter = adapter
+        self._refresh_interval = refresh_interval
+        self._clock = clock
+        self._index: dict[int, "ParticipantInfo"] = {}
+        self._expires_at = float("-inf")
+        self._load_lock = threading.Lock()
+        self._stop_event = threading.Event()
+        self._refresh_thread: Optional[threading.Thread] = None
+
+    # ==================== 加载与刷新 ====================
+    def load(self) -> None:
+        """从接口加载参与者列表并替换索引"""
+        with self._load_lock:
+            self._load()
+
+    def _load(self) -> None:
+        index: dict[int, "ParticipantInfo"] = {}
+        for participant in self._adapter.fetch_participants():
+            for broker_id in participant.broker_ids:
+                index[broker_id] = participant
+        self._index = index
+        self._expires_at = self._clock() + self._refresh_interval
+
+    def _ensure_fresh(self) -> dict[int, "ParticipantInfo"]:
+        if self._clock() >= self._expires_at:
+            try:
+                with self._load_lock:
+                    # 并发的查询只由第一个线程重建，其余线程等待后直接使用新索引
+                    if self._clock() >= self._expires_at:
+                        self._load()
+            except Exception:
+                if not self._index:
+                    raise
+                # 刷新失败时保留旧索引，稍后再试
+                logger.exception("券商席位索引刷新失败")
+                self._expires_at = self._clock() + min(self._refresh_interval, 60)
+        return self._index
+
+    def start(self) -> None:
+        """启动后台刷新线程（首次会同步加载）"""
+        if self._refresh_thread is not None:
+            return
+        self._ensure_fresh()
+        self._stop_event.clear()
+        self._refresh_thread = threading.Thread(
+            target=self._refresh_loop, name="participant-index-refresh", daemon=True
+        )
+        self._refresh_thread.start()
+
+    def stop(self) -> None:
+        """停止后台刷新线程"""
+        self._stop_event.set()
+        if self._refresh_thread is not None:
+            self._refresh_thread.join()
+            self._refresh_thread = None
+
+    def _refresh_loop(self) -> None:
+        while not self._stop_event.wait(self._refresh_interval):
+            try:
+                self.load()
+            except Exception:
+                logger.exception("券商席位索引刷新失败")
+
+    # ==================== 查询 ====================
+    def __len__(self) -> int:
+        return len(self._index)
+
+    def get(self, broker_id: int) -> Optional["ParticipantInfo"]:
+        """
+        查询券商席位对应的参与者
+
+        :param broker_id: 券商席位号
+        :return: 参与者信息，未知席位返回None
+        """
+        return self._ensure_fresh().get(broker_id)
+
+    def resolve(self, broker_ids: Iterable[int]) -> tuple[ResolvedBroker, ...]:
+        """
+        批量解析券商席位
+
+        :param broker_ids: 券商席位号列表
+        :return: 解析结果，顺序与输入一致
+        """
+        index = self._ensure_fresh()
+        return tuple(ResolvedBroker(b, index.get(b)) for b in broker_ids)
+
+    def resolve_brokers(
+        self, symbol: str, brokers: "SecurityBrokers"
+    ) -> ResolvedSecurityBrokers:
+        """
+        解析整个经纪队列
+
+        :param symbol: 标的代码
+        :param brokers: fetch_brokers 的返回值
+        :return: 解析后的经纪队列
+        """
+        index = self._ensure_fresh()
+
+        def levels(
+            raw: Iterable["Brokers"],
+        ) -> tuple[ResolvedBrokerLevel, ...]:
+            return tuple(
+                ResolvedBrokerLevel(
+                    level.position,
+                    tuple(ResolvedBroker(b, index.get(b)) for b in level.broker_ids),
+                )
+                for level in raw
+            )
+
+        return ResolvedSecurityBrokers(
+            symbol, levels(brokers.ask_brokers), levels(brokers.bid_brokers)
+        )
@@ -0,0 +1,226 @@
+import heapq
+import itertools
+import logging
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from datetime import datetime, timezone
+from typing import Any, Callable, Optional, Type
+from longport.openapi import Market
+from modules.markets import market_key
+from modules.trading_calendar import MarketPhase, TradingCalendar
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass(frozen=True, slots=True)
+class PollingPolicy:
+    """
+    各市场阶段的轮询间隔（秒），None 表示该阶段不轮询
+    """
+
+    intraday: Optional[float] = 3.0
+    pre_market: Optional[float] = 30.0
+    post_market: Optional[float] = 30.0
+    overnight: Optional[float] = 300.0
+    break_: Optional[float] = 300.0
+    closed: Optional[float] = None
+    # 不轮询时重新检查市场阶段的最长间隔
+    idle_recheck: float = 3600.0
+
+    def interval(self, phase: MarketPhase) -> Optional[float]:
+        return {
+            MarketPhase.INTRADAY: self.intraday,
+            MarketPhase.PRE_MARKET: self.pre_market,
+            MarketPhase.POST_MARKET: self.post_market,
+            MarketPhase.OVERNIGHT: self.overnight,
+            MarketPhase.BREAK: self.break_,
+            MarketPhase.CLOSED: self.closed,
+        }[phase]
+
+
+DEFAULT_POLICY = PollingPolicy()
+
+
+@dataclass(slots=True)
+class PollingJob:
+    """一个按市场阶段调整频率的轮询任务"""
+
+    name: str
+    market: str
+    func: Callable[[], Any]
+    policy: PollingPolicy = DEFAULT_POLICY
+    on_result: Optional[Callable[[Any], None]] = None
+    on_error: Optional[Callable[[Exception], None]] = None
+    # 统计信息
+    polls: int = 0
+    skips: int = 0
+    errors: int = 0
+    last_phase: Optional[MarketPhase] = None
+    cancelled: bool = field(default=False, repr=False)
+
+
+class AdaptivePollingScheduler:
+    """
+    感知交易时段的自适应轮询调度器
+
+    盘中高频、盘前盘后低频、非交易日不轮询；轮询间隔不会跨越时段边界，
+    开盘后第一时间即切换到高频。
+    """
+
+    def __init__(
+        self,
+        calendar: TradingCalendar,
+        max_workers: int = 4,
+        clock: Callable[[], float] = time.time,
+    ):
+        self._calendar = calendar
+        self._clock = clock
+        self._max_workers = max_workers
+        self._jobs: dict[str, PollingJob] = {}
+        self._queue: list[tuple[float, int, PollingJob]] = []
+        self._counter = itertools.count()
+        self._cond = threading.Condition()
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._thread: Optional[threading.Thread] = None
+        self._running = False
+
+    @property
+    def jobs(self) -> dict[str, PollingJob]:
+        return dict(self._jobs)
+
+    def add_job(
+        self,
+        name: str,
+        market: Type[Market] | str,
+        func: Callable[[], Any],
+        policy: PollingPolicy = DEFAULT_POLICY,
+        on_result: Optional[Callable[[Any], None]] = None,
+        on_error: Optional[Callable[[Exception], None]] = None,
+    ) -> PollingJob:
+        """
+        添加轮询任务，添加后立即执行一次阶段判断
+
+        :param name: 任务名称（唯一）
+        :param market: 任务所属市场
+        :param func: 轮询函数，例如 lambda: adapter.fetch_quote_batch(symbols)
+        :param policy: 轮询策略
+        :param on_result: 轮询成功的回调
+        :param on_error: 轮询失败的回调
+        :return: 轮询任务
+        """
+        key = market if isinstance(market, str) else market_key(market)
+        job = PollingJob(name, key, func, policy, on_result, on_error)
+        with self._cond:
+            if name in self._jobs:
+                raise ValueError(f"轮询任务 {name} 已存在")
+            self._jobs[name] = job
+            self._push(job, self._clock())
+        return job
+
+    def remove_job(self, name: str) -> None:
+        """
+        移除轮询任务
+
+        :param name: 任务名称
+        """
+        with self._cond:
+            job = self._jobs.pop(name, None)
+            if job is not None:
+                job.cancelled = True
+
+    def next_delay(self, job: PollingJob, at: datetime) -> float:
+        """
+        计算任务距下一次执行的等待时间（秒）
+
+        :param job: 轮询任务
+        :param at: 当前时刻（带时区）
+        :return: 等待时间
+        """
+        phase = self._calendar.phase(job.market, at)
+        interval = job.policy.interval(phase)
+        delay = job.policy.idle_recheck if interval is None else interval
+        boundary = self._calendar.next_phase_change(job.market, at)
+        if boundary is not None:
+            # 阶段切换时立即按新频率执行
+            delay = min(delay, max((boundary - at).total_seconds(), 0.0))
+        return delay
+
+    def start(self) -> None:
+        """启动调度线程"""
+        with self._cond:
+            if self._running:
+                return
+            self._running = True
+        self._executor = ThreadPoolExecutor(
+            max_workers=self._max_workers, thread_name_prefix="polling-job"
+        )
+        self._thread = threading.Thread(
+            target=self._loop, name="polling-scheduler", daemon=True
+        )
+        self._thread.start()
+
+    def stop(self) -> None:
+        """停止调度线程并等待正在执行的任务结束"""
+        with self._cond:
+            self._running = False
+            self._cond.notify_all()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+        if self._executor is not None:
+            self._executor.shutdown(wait=True)
+            self._executor = None
+
+    def _push(self, job: PollingJob, due: float) -> None:
+        heapq.heappush(self._queue, (due, next(self._counter), job))
+        self._cond.notify_all()
+
+    def _loop(self) -> None:
+        with self._cond:
+            while self._running:
+                if not self._queue:
+                    self._cond.wait()
+                    continue
+                due, _, job = self._queue[0]
+                wait = due - self._clock()
+                if wait > 0:
+                    self._cond.wait(wait)
+                    continue
+                heapq.heappop(self._queue)
+                if job.cancelled or self._executor is None:
+                    continue
+                self._executor.submit(self._run, job)
+
+    def _run(self, job: PollingJob) -> None:
+        at = datetime.fromtimestamp(self._clock(), timezone.utc)
+        try:
+            phase = self._calendar.phase(job.market, at)
+            job.last_phase = phase
+            if job.policy.interval(phase) is None:
+                job.skips += 1
+            else:
+                job.polls += 1
+                result = job.func()
+                if job.on_result is not None:
+                    job.on_result(result)
+        except Exception as e:
+            job.errors += 1
+            if job.on_error is not None:
+                job.on_error(e)
+            else:
+                logger.exception("轮询任务 %s 执行失败", job.name)
+        finally:
+            # 从本次执行结束时开始计时，避免慢请求叠加
+            finished = self._clock()
+            try:
+                delay = self.next_delay(
+                    job, datetime.fromtimestamp(finished, timezone.utc)
+                )
+            except Exception:
+                logger.exception("轮询任务 %s 计算下次执行时间失败", job.name)
+                delay = job.policy.idle_recheck
+            with self._cond:
+                if not job.cancelled:
+                    self._push(job, finished + delay)
@@ -0,0 +1,249 @@
+import logging
+import threading
+import time
+from dataclasses import dataclass
+from typing import TYPE_CHECKING, Any, Callable, Iterable, Optional, Sequence
+from modules.codec import PrePostQuoteRecord, to_record
+from modules.timestamps import to_epoch_ns
+
+if TYPE_CHECKING:
+    from longport.openapi import SecurityQuote
+    from config import PerformanceConfig
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_FIELDS: tuple[str, ...] = (
+    "last_done",
+    "prev_close",
+    "open",
+    "high",
+    "low",
+    "volume",
+    "turnover",
+    "timestamp",
+    "trade_status",
+    "pre_market_quote",
+    "post_market_quote",
+    "overnight_quote",
+)
+
+
+def _prepost(value: Any) -> Optional[PrePostQuoteRecord]:
+    return None if value is None else to_record(value, PrePostQuoteRecord)
+
+
+def _timestamp_ns(value: Any) -> int:
+    return value if isinstance(value, int) else to_epoch_ns(value)
+
+
+# 比较前的归一化：SDK 对象没有按值比较，转为可比较的值
+_NORMALIZERS: dict[str, Callable[[Any], Any]] = {
+    "timestamp": _timestamp_ns,
+    "trade_status": str,
+    "pre_market_quote": _prepost,
+    "post_market_quote": _prepost,
+    "overnight_quote": _prepost,
+}
+
+
+@dataclass(slots=True)
+class QuoteChange:
+    """一个标的的行情变化：变化的字段及其新值，以及最新的行情对象"""
+
+    symbol: str
+    changes: dict[str, Any]
+    quote: Any
+    # 首次出现的标的，changes 包含全部字段
+    is_new: bool = False
+
+
+class QuoteChangeDetector:
+    """
+    行情变化检测
+
+    保存每个标的上一次的行情快照，新结果逐字段比较，只输出发生变化的标的和字段。
+    可以直接接在轮询任务之后：
+    on_result=lambda quotes: conflator.push(detector.diff(quotes))
+    """
+
+    def __init__(self, fields: Sequence[str] = DEFAULT_FIELDS):
+        """
+        :param fields: 参与比较的字段
+        """
+        self.fields = tuple(fields)
+        self._normalizers = [_NORMALIZERS.get(name) for name in self.fields]
+        # 标的 -> 归一化后的字段值
+        self._last: dict[str, tuple[Any, ...]] = {}
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _get(quote: Any, name: str) -> Any:
+        # 纯数据结构只有纳秒时间戳
+        if name == "timestamp" and hasattr(quote, "timestamp_ns"):
+            return quote.timestamp_ns
+        return getattr(quote, name)
+
+    def _values(self, quote: Any) -> tuple[Any, ...]:
+        return tuple(
+            value if normalize is None else normalize(value)
+            for value, normalize in zip(
+                (self._get(quote, name) for name in self.fields), self._normalizers
+            )
+        )
+
+    def diff(self, quotes: Iterable["SecurityQuote"]) -> list[QuoteChange]:
+        """
+        与上一次的快照比较并更新快照
+
+        :param quotes: 行情对象列表（SecurityQuote 或 SecurityQuoteRecord）
+        :return: 发生变化的标的，按输入顺序
+        """
+        changed: list[QuoteChange] = []
+        with self._lock:
+            for quote in quotes:
+                values = self._values(quote)
+                previous = self._last.get(quote.symbol)
+                if previous == values:
+                    continue
+                self._last[quote.symbol] = values
+                if previous is None:
+                    changes = {name: self._get(quote, name) for name in self.fields}
+                else:
+                    changes = {
+                        name: self._get(quote, name)
+                        for name, old, new in zip(self.fields, previous, values)
+                        if old != new
+                    }
+                changed.append(
+                    QuoteChange(quote.symbol, changes, quote, previous is None)
+                )
+        return changed
+
+    def forget(self, symbols: Iterable[str]) -> None:
+        """
+        删除标的的快照，下一次出现时作为新标的输出全部字段
+
+        :param symbols: 标的代码列表
+        """
+        with self._lock:
+            for symbol in symbols:
+                self._last.pop(symbol, None)
+
+    def reset(self) -> None:
+        """清空全部快照"""
+        with self._lock:
+            self._last.clear()
+
+    def __len__(self) -> int:
+        return len(self._last)
+
+
+class QuoteConflator:
+    """
+    行情变化合并
+
+    在一个合并窗口内，同一标的的多次变化合并为一次（字段取最新值），
+    窗口结束时一次性交给下游，下游的处理量只与窗口内变化的标的数有关。
+    """
+
+    def __init__(
+        self,
+        window: float,
+        on_flush: Callable[[list[QuoteChange]], None],
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        """
+        :param window: 合并窗口（秒），0 表示不合并，每次 push 后立即下发
+        :param on_flush: 下发合并结果的回调
+        :param clock: 单调时钟
+        """
+        if window < 0:
+            raise ValueError("合并窗口不能为负数")
+        self.window = window
+        self._on_flush = on_flush
+        self._clock = clock
+        self._pending: dict[str, QuoteChange] = {}
+        self._last_flush = clock()
+        self._lock = threading.Lock()
+        self._stop_event = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        # 统计信息：收到的变化数、被合并掉的变化数、下发次数
+        self.received = 0
+        self.conflated = 0
+        self.flushes = 0
+
+    def apply_performance_config(self, config: "PerformanceConfig") -> None:
+        """
+        应用性能配置中的 conflation_window；可作为 ConfigWatcher 的回调实现热加载，
+        新窗口从下一次检查开始生效
+
+        :param config: 性能配置
+        """
+        self.window = config.conflation_window
+
+    def push(self, changes: Iterable[QuoteChange]) -> None:
+        """
+        加入变化，窗口到期时立即下发
+
+        :param changes: QuoteChangeDetector.diff 的结果
+        """
+        with self._lock:
+            for change in changes:
+                self.received += 1
+                pending = self._pending.get(change.symbol)
+                if pending is None:
+                    self._pending[change.symbol] = QuoteChange(
+                        change.symbol, dict(change.changes), change.quote, change.is_new
+                    )
+                else:
+                    self.conflated += 1
+                    pending.changes.update(change.changes)
+                    pending.quote = change.quote
+        if self._clock() - self._last_flush >= self.window:
+            self.flush()
+
+    def flush(self) -> int:
+        """
+        立即下发窗口内合并的变化
+
+        :return: 下发的标的数
+        """
+        with self._lock:
+            pending = list(self._pending.values())
+            self._pending = {}
+            self._last_flush = self._clock()
+            if pending:
+                self.flushes += 1
+        if pending:
+            self._on_flush(pending)
+        return len(pending)
+
+    def pending(self) -> int:
+        """窗口内等待下发的标的数"""
+        return len(self._pending)
+
+    def start(self) -> None:
+        """启动后台线程，没有新变化时也按窗口定时下发"""
+        if self._thread is not None:
+            return
+        self._stop_event.clear()
+        self._thread = threading.Thread(
+            target=self._run, name="quote-conflator", daemon=True
+        )
+        self._thread.start()
+
+    def stop(self) -> None:
+        """停止后台线程，并下发剩余的变化"""
+        self._stop_event.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+        self.flush()
+
+    def _run(self) -> None:
+        while not self._stop_event.wait(self.window or 0.1):
+            try:
+                if self._clock() - self._last_flush >= self.window:
+                    self.flush()
+            except Exception:
+                logger.exception("行情变化下发失败")
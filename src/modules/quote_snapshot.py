@@ -0,0 +1,340 @@
+import logging
+import mmap
+import os
+import struct
+import threading
+import time
+from pathlib import Path
+from typing import TYPE_CHECKING, Iterable, NamedTuple, Optional, Sequence
+from modules.timestamps import to_epoch_ns
+
+if TYPE_CHECKING:
+    from longport.openapi import SecurityQuote
+    from config import PerformanceConfig
+    from modules.long_port_market_adapter import LongPortMarketAdapter
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_SNAPSHOT_PATH = Path("/dev/shm/market-adapter-quotes")
+
+MAGIC = b"MKTQSNAP"
+VERSION = 2
+SYMBOL_SIZE = 24
+# 单次行情请求的标的数量上限
+QUOTE_BATCH_LIMIT = 500
+
+# 文件头：魔数、版本、容量、已用槽位数，以及发布端每次启动递增的代数
+HEADER = struct.Struct("<8sIII")
+GENERATION = struct.Struct("<Q")
+GENERATION_OFFSET = 24
+HEADER_SIZE = 64
+# 槽位：序号（seqlock）、标的代码，以及行情数据
+SEQ = struct.Struct("<Q")
+SYMBOL = struct.Struct(f"<{SYMBOL_SIZE}s")
+PAYLOAD = struct.Struct("<ddddddqqq")
+SLOT_SIZE = 128
+PAYLOAD_OFFSET = SEQ.size + SYMBOL.size
+
+assert SEQ.size + SYMBOL.size + PAYLOAD.size <= SLOT_SIZE
+
+
+class QuoteSnapshot(NamedTuple):
+    """共享内存中的一条行情快照"""
+
+    symbol: str
+    last_done: float
+    prev_close: float
+    open: float
+    high: float
+    low: float
+    turnover: float
+    volume: int
+    timestamp_ns: int
+    published_ns: int
+
+
+class QuoteSnapshotPublisher:
+    """
+    共享内存行情快照的发布端
+
+    同一台机器上只需要一个发布进程拉取行情，写入内存映射文件中的定长槽位表；
+    每个槽位用 seqlock 保护：写入前后各把序号加一，序号为奇数表示正在写入。
+    发布端重启时复用已有文件（只会扩大、不会截断，读取端不会因访问越界收到 SIGBUS），
+    并递增文件头中的代数，读取端发现代数变化后重新映射并重建槽位表。
+    """
+
+    def __init__(
+        self,
+        adapter: "LongPortMarketAdapter",
+        symbols: Sequence[str],
+        path: Path = DEFAULT_SNAPSHOT_PATH,
+        capacity: int = 10000,
+        batch_size: int = QUOTE_BATCH_LIMIT,
+    ):
+        """
+        :param adapter: 行情适配器
+        :param symbols: 发布的标的代码列表
+        :param path: 内存映射文件路径，建议放在 /dev/shm 下
+        :param capacity: 槽位数量上限
+        :param batch_size: refresh 时单次行情请求的标的数量
+        """
+        self._adapter = adapter
+        self.path = Path(path)
+        self.capacity = capacity
+        self.batch_size = batch_size
+        self._slots: dict[str, int] = {}
+        self._symbols: list[str] = []
+        self._write_lock = threading.Lock()
+        self._stop_event = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+        size = HEADER_SIZE + capacity * SLOT_SIZE
+        fd = os.open(self.path, os.O_RDWR | os.O_CREAT, 0o644)
+        try:
+            if os.fstat(fd).st_size < size:
+                os.ftruncate(fd, size)
+            self._mm = mmap.mmap(fd, size, access=mmap.ACCESS_WRITE)
+        finally:
+            os.close(fd)
+        magic, version, _, _ = HEADER.unpack_from(self._mm, 0)
+        generation = 0
+        if magic == MAGIC and version == VERSION:
+            (generation,) = GENERATION.unpack_from(self._mm, GENERATION_OFFSET)
+        # 先清空槽位数并发布新的代数，再清空旧槽位，读取端据此丢弃旧的槽位表
+        HEADER.pack_into(self._mm, 0, MAGIC, VERSION, capacity, 0)
+        self.generation = generation + 1
+        GENERATION.pack_into(self._mm, GENERATION_OFFSET, self.generation)
+        self._mm[HEADER_SIZE:size] = bytes(size - HEADER_SIZE)
+        self.add_symbols(symbols)
+
+    def add_symbols(self, symbols: Iterable[str]) -> None:
+        """
+        追加发布的标的（读取端会自动发现新槽位）
+
+        :param symbols: 标的代码列表
+        """
+        with self._write_lock:
+            for symbol in symbols:
+                if symbol in self._slots:
+                    continue
+                slot = len(self._symbols)
+                if slot >= self.capacity:
+                    raise ValueError(f"快照槽位已满（容量 {self.capacity}）")
+                encoded = symbol.encode()
+                if len(encoded) > SYMBOL_SIZE:
+                    raise ValueError(f"标的代码过长: {symbol}")
+                offset = HEADER_SIZE + slot * SLOT_SIZE
+                SYMBOL.pack_into(self._mm, offset + SEQ.size, encoded)
+                self._slots[symbol] = slot
+                self._symbols.append(symbol)
+                # 槽位内容写好之后再发布槽位数
+                HEADER.pack_into(
+                    self._mm, 0, MAGIC, VERSION, self.capacity, len(self._symbols)
+                )
+
+    def publish(self, quotes: Iterable["SecurityQuote"]) -> int:
+        """
+        把行情写入共享内存
+
+        :param quotes: 行情对象列表
+        :return: 写入的条数
+        """
+        published_ns = time.time_ns()
+        written = 0
+        mm = self._mm
+        with self._write_lock:
+            for quote in quotes:
+                slot = self._slots.get(quote.symbol)
+                if slot is None:
+                    continue
+                offset = HEADER_SIZE + slot * SLOT_SIZE
+                (seq,) = SEQ.unpack_from(mm, offset)
+                SEQ.pack_into(mm, offset, seq + 1)
+                PAYLOAD.pack_into(
+                    mm,
+                    offset + PAYLOAD_OFFSET,
+                    float(quote.last_done),
+                    float(quote.prev_close),
+                    float(quote.open),
+                    float(quote.high),
+                    float(quote.low),
+                    float(quote.turnover),
+                    quote.volume,
+                    to_epoch_ns(quote.timestamp),
+                    published_ns,
+                )
+                SEQ.pack_into(mm, offset, seq + 2)
+                written += 1
+        return written
+
+    def refresh(self) -> int:
+        """
+        拉取全部标的的最新行情并发布
+
+        :return: 写入的条数
+        """
+        symbols = list(self._symbols)
+        batch_size = self.batch_size
+        written = 0
+        for i in range(0, len(symbols), batch_size):
+            quotes = self._adapter.fetch_quote_batch(symbols[i : i + batch_size])
+            written += self.publish(quotes)
+        return written
+
+    def apply_performance_config(self, config: "PerformanceConfig") -> None:
+        """
+        应用性能配置中的 batch_size；可作为 ConfigWatcher 的回调实现热加载
+
+        :param config: 性能配置
+        """
+        self.batch_size = config.batch_size
+
+    def start(self, interval: float = 1.0) -> None:
+        """
+        启动后台发布线程
+
+        :param interval: 刷新间隔（秒）
+        """
+        if self._thread is not None:
+            return
+        self._stop_event.clear()
+        self._thread = threading.Thread(
+            target=self._run, args=(interval,), name="quote-snapshot", daemon=True
+        )
+        self._thread.start()
+
+    def stop(self) -> None:
+        """停止后台发布线程"""
+        self._stop_event.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    def _run(self, interval: float) -> None:
+        while not self._stop_event.is_set():
+            try:
+                self.refresh()
+            except Exception:
+                logger.exception("行情快照发布失败")
+            self._stop_event.wait(interval)
+
+    def close(self, unlink: bool = False) -> None:
+        """
+        关闭内存映射
+
+        :param unlink: 是否删除映射文件
+        """
+        self.stop()
+        self._mm.close()
+        if unlink:
+            self.path.unlink(missing_ok=True)
+
+
+class QuoteSnapshotReader:
+    """
+    共享内存行情快照的读取端
+
+    以只读方式映射发布端的文件，直接从映射内存中读取，不经过任何 IPC；
+    读到奇数序号或前后序号不一致时重试，保证读到的是一致的快照。
+    发布端重启后（代数变化）自动重新映射文件并重建槽位表。
+    """
+
+    def __init__(self, path: Path = DEFAULT_SNAPSHOT_PATH):
+        """
+        :param path: 发布端的内存映射文件路径
+        """
+        self.path = Path(path)
+        self._mm: Optional[mmap.mmap] = None
+        self._map()
+
+    def _map(self) -> None:
+        """（重新）映射发布端的文件并重建槽位表"""
+        with open(self.path, "rb") as f:
+            mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, version, capacity, _ = HEADER.unpack_from(mm, 0)
+        if magic != MAGIC or version != VERSION:
+            mm.close()
+            raise ValueError(f"{self.path} 不是有效的行情快照文件")
+        if self._mm is not None:
+            self._mm.close()
+        self._mm = mm
+        self.capacity = capacity
+        (self.generation,) = GENERATION.unpack_from(mm, GENERATION_OFFSET)
+        self._slots: dict[str, int] = {}
+        self._count = 0
+        self._sync_slots()
+
+    def _check_generation(self) -> bool:
+        """发布端重启后重新映射，返回是否发生了重新映射"""
+        assert self._mm is not None
+        (generation,) = GENERATION.unpack_from(self._mm, GENERATION_OFFSET)
+        if generation == self.generation:
+            return False
+        self._map()
+        return True
+
+    def _sync_slots(self) -> None:
+        """发现发布端新增的槽位"""
+        assert self._mm is not None
+        count = HEADER.unpack_from(self._mm, 0)[3]
+        for slot in range(self._count, count):
+            offset = HEADER_SIZE + slot * SLOT_SIZE + SEQ.size
+            raw = SYMBOL.unpack_from(self._mm, offset)[0]
+            self._slots[raw.rstrip(b"\0").decode()] = slot
+        self._count = count
+
+    def symbols(self) -> list[str]:
+        """获取已发布的标的列表"""
+        if not self._check_generation():
+            self._sync_slots()
+        return list(self._slots)
+
+    def read(self, symbol: str, max_retries: int = 1000) -> Optional[QuoteSnapshot]:
+        """
+        读取某个标的的最新快照
+
+        :param symbol: 标的代码
+        :param max_retries: 遇到写入中时的最大重试次数
+        :return: 行情快照，标的未发布或尚未写入过数据时返回None
+        """
+        for _ in range(max_retries):
+            self._check_generation()
+            slot = self._slots.get(symbol)
+            if slot is None:
+                self._sync_slots()
+                slot = self._slots.get(symbol)
+                if slot is None:
+                    return None
+            mm = self._mm
+            assert mm is not None
+            offset = HEADER_SIZE + slot * SLOT_SIZE
+            (before,) = SEQ.unpack_from(mm, offset)
+            if not before & 1:
+                payload = PAYLOAD.unpack_from(mm, offset + PAYLOAD_OFFSET)
+                (after,) = SEQ.unpack_from(mm, offset)
+                (generation,) = GENERATION.unpack_from(mm, GENERATION_OFFSET)
+                if before == after and generation == self.generation:
+                    return None if before == 0 else QuoteSnapshot(symbol, *payload)
+            # 写入方可能是同进程的线程，让出执行权
+            time.sleep(0)
+        raise TimeoutError(f"读取 {symbol} 的行情快照超过重试次数")
+
+    def read_many(self, symbols: Iterable[str]) -> dict[str, QuoteSnapshot]:
+        """
+        批量读取快照
+
+        :param symbols: 标的代码列表
+        :return: 标的代码 -> 行情快照（跳过没有数据的标的）
+        """
+        snapshots: dict[str, QuoteSnapshot] = {}
+        for symbol in symbols:
+            snapshot = self.read(symbol)
+            if snapshot is not None:
+                snapshots[symbol] = snapshot
+        return snapshots
+
+    def close(self) -> None:
+        """关闭内存映射"""
+        if self._mm is not None:
+            self._mm.close()
+            self._mm = None
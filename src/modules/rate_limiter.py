@@ -0,0 +1,118 @@
+import threading
+import time
+from typing import Callable, Optional
+
+# 长桥行情接口限制：每秒不超过 10 次调用
+DEFAULT_QUOTE_RATE = 10.0
+
+
+class RateLimiter:
+    """
+    令牌桶限流器（线程安全）
+
+    令牌以 rate 个/秒的速度生成，最多积累 burst 个；每次调用消耗一个令牌，
+    令牌不足时阻塞等待。多个组件共享同一个实例即可共同遵守接口频率限制。
+    """
+
+    def __init__(
+        self,
+        rate: float = DEFAULT_QUOTE_RATE,
+        burst: Optional[float] = None,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        """
+        :param rate: 每秒生成的令牌数
+        :param burst: 令牌桶容量，默认等于 rate
+        :param clock: 单调时钟
+        """
+        if rate <= 0:
+            raise ValueError("限流速率必须为正数")
+        self.rate = rate
+        self.burst = rate if burst is None else burst
+        if self.burst < 1:
+            raise ValueError("令牌桶容量不能小于 1")
+        self._clock = clock
+        self._tokens = self.burst
+        self._updated = clock()
+        self._lock = threading.Lock()
+
+    def configure(self, rate: float, burst: Optional[float] = None) -> None:
+        """
+        运行时调整速率与容量，已积累的令牌不超过新容量
+
+        :param rate: 每秒生成的令牌数
+        :param burst: 令牌桶容量，默认等于 rate
+        """
+        if rate <= 0:
+            raise ValueError("限流速率必须为正数")
+        burst = rate if burst is None else burst
+        if burst < 1:
+            raise ValueError("令牌桶容量不能小于 1")
+        with self._lock:
+            self._refill()
+            self.rate = rate
+            self.burst = burst
+            self._tokens = min(self._tokens, burst)
+
+    def _refill(self) -> None:
+        now = self._clock()
+        elapsed = now - self._updated
+        if elapsed > 0:
+            self._tokens = min(self.burst, self._tokens + elapsed * self.rate)
+        self._updated = now
+
+    def try_acquire(self, tokens: float = 1) -> bool:
+        """
+        尝试获取令牌，不等待
+
+        :param tokens: 令牌数
+        :return: 是否获取成功
+        """
+        with self._lock:
+            self._refill()
+            if self._tokens >= tokens:
+                self._tokens -= tokens
+                return True
+            return False
+
+    def acquire(self, tokens: float = 1, timeout: Optional[float] = None) -> bool:
+        """
+        获取令牌，令牌不足时等待
+
+        :param tokens: 令牌数
+        :param timeout: 最长等待时间（秒），None 表示一直等待
+        :return: 是否获取成功（超时返回 False）
+        """
+        if tokens > self.burst:
+            raise ValueError(f"一次获取的令牌数不能超过容量 {self.burst}")
+        deadline = None if timeout is None else self._clock() + timeout
+        while True:
+            with self._lock:
+                self._refill()
+                if self._tokens >= tokens:
+                    self._tokens -= tokens
+                    return True
+                wait = (tokens - self._tokens) / self.rate
+            if deadline is not None:
+                remaining = deadline - self._clock()
+                if remaining <= 0:
+                    return False
+                wait = min(wait, remaining)
+            time.sleep(wait)
+
+    def release(self, tokens: float = 1) -> None:
+        """
+        归还已获取但未使用的令牌，不超过容量
+
+        :param tokens: 令牌数
+        """
+        with self._lock:
+            self._refill()
+            self._tokens = min(self.burst, self._tokens + tokens)
+
+    def __enter__(self) -> "RateLimiter":
+        self.acquire()
+        return self
+
+    def __exit__(self, *exc: object) -> None:
+        pass
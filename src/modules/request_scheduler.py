@@ -0,0 +1,237 @@
+import threading
+import time
+from collections import deque
+from concurrent.futures import Future
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from enum import IntEnum
+from typing import Any, Iterator, Mapping, Optional
+from modules.backends import BackendMiddleware
+from modules.rate_limiter import RateLimiter
+
+
+class Priority(IntEnum):
+    """请求优先级"""
+
+    # 交互式请求（实时行情、盘口），总是最先发出
+    INTERACTIVE = 0
+    # 普通请求
+    NORMAL = 1
+    # 批量请求（历史回补、全市场筛选），使用剩余的调用额度
+    BULK = 2
+
+
+# 非交互式优先级之间按权重分配调用额度
+DEFAULT_WEIGHTS: dict[Priority, float] = {
+    Priority.NORMAL: 4.0,
+    Priority.BULK: 1.0,
+}
+
+# QuoteContext 方法 -> 默认优先级，未列出的方法为 NORMAL
+DEFAULT_METHOD_PRIORITIES: dict[str, Priority] = {
+    "quote": Priority.INTERACTIVE,
+    "depth": Priority.INTERACTIVE,
+    "brokers": Priority.INTERACTIVE,
+    "trades": Priority.INTERACTIVE,
+    "intraday": Priority.INTERACTIVE,
+    "history_candlesticks_by_date": Priority.BULK,
+    "history_candlesticks_by_offset": Priority.BULK,
+    "calc_indexes": Priority.BULK,
+    "history_market_temperature": Priority.BULK,
+}
+
+
+@dataclass(slots=True)
+class _Request:
+    priority: Priority
+    finish: float
+    method: str
+    args: tuple[Any, ...]
+    kwargs: dict[str, Any]
+    future: Future[Any] = field(default_factory=Future)
+    enqueued: float = field(default_factory=time.monotonic)
+
+
+@dataclass(slots=True)
+class PriorityStats:
+    """某个优先级的调度统计"""
+
+    dispatched: int = 0
+    queued: int = 0
+    wait_seconds: float = 0.0
+
+    @property
+    def mean_wait(self) -> float:
+        return self.wait_seconds / self.dispatched if self.dispatched else 0.0
+
+
+class ScheduledBackend(BackendMiddleware):
+    """
+    按优先级调度的数据源
+
+    所有调用先进入各优先级的队列，分发线程拿到限流令牌后再取出优先级最高的请求发出：
+    交互式请求严格优先；其余优先级按加权公平排队（WFQ）分配剩余额度，
+    批量任务不会饿死，也不会挤占实时行情。
+    数据源在分发线程中再次调用调度器（嵌套调用）时直接在当前线程执行，
+    避免分发线程全部等待自己提交的请求而死锁。使用完毕后需调用 close。
+    """
+
+    def __init__(
+        self,
+        backend: Any,
+        rate_limiter: Optional[RateLimiter] = None,
+        weights: Mapping[Priority, float] = DEFAULT_WEIGHTS,
+        method_priorities: Mapping[str, Priority] = DEFAULT_METHOD_PRIORITIES,
+        max_concurrency: int = 4,
+    ):
+        """
+        :param backend: 被包装的数据源
+        :param rate_limiter: 限流器，None 表示不限流（只限制并发数）
+        :param weights: 非交互式优先级的权重
+        :param method_priorities: 方法名 -> 默认优先级
+        :param max_concurrency: 同时进行的请求数（分发线程数）
+        """
+        super().__init__(backend)
+        self.rate_limiter = rate_limiter
+        self._weights = {p: weights.get(p, 1.0) for p in Priority}
+        self._method_priorities = dict(method_priorities)
+        self._queues: dict[Priority, deque[_Request]] = {p: deque() for p in Priority}
+        self._last_finish: dict[Priority, float] = {p: 0.0 for p in Priority}
+        self._virtual_time = 0.0
+        self._stats: dict[Priority, PriorityStats] = {
+            p: PriorityStats() for p in Priority
+        }
+        self._cond = threading.Condition()
+        self._local = threading.local()
+        self._stopping = False
+        self._workers = [
+            threading.Thread(
+                target=self._worker, name=f"request-scheduler-{i}", daemon=True
+            )
+            for i in range(max_concurrency)
+        ]
+        for worker in self._workers:
+            worker.start()
+
+    @contextmanager
+    def priority(self, priority: Priority) -> Iterator[None]:
+        """
+        在当前线程中临时指定请求优先级
+
+        :param priority: 优先级，覆盖方法的默认优先级
+        """
+        previous = getattr(self._local, "priority", None)
+        self._local.priority = priority
+        try:
+            yield
+        finally:
+            self._local.priority = previous
+
+    def current_priority(self) -> Optional[Priority]:
+        """当前线程通过 priority() 指定的优先级，未指定时返回None"""
+        return getattr(self._local, "priority", None)
+
+    def _call(self, method: str, args: tuple[Any, ...], kwargs: dict[str, Any]) -> Any:
+        if getattr(self._local, "dispatcher", False):
+            if self.rate_limiter is not None:
+                self.rate_limiter.acquire()
+            return BackendMiddleware._call(self, method, args, kwargs)
+        priority = self.current_priority()
+        if priority is None:
+            priority = self._method_priorities.get(method, Priority.NORMAL)
+        return self.submit(priority, method, args, kwargs).result()
+
+    def submit(
+        self,
+        priority: Priority,
+        method: str,
+        args: tuple[Any, ...] = (),
+        kwargs: Optional[dict[str, Any]] = None,
+    ) -> Future[Any]:
+        """
+        提交一个请求，不等待结果
+
+        :param priority: 优先级
+        :param method: 数据源方法名
+        :param args: 位置参数
+        :param kwargs: 关键字参数
+        :return: 请求结果的 Future
+        """
+        with self._cond:
+            if self._stopping:
+                raise RuntimeError("请求调度器已关闭")
+            # 虚拟完成时间：同一优先级内先到先得，不同优先级按权重交错
+            start = max(self._virtual_time, self._last_finish[priority])
+            finish = start + 1.0 / self._weights[priority]
+            self._last_finish[priority] = finish
+            request = _Request(priority, finish, method, args, kwargs or {})
+            self._queues[priority].append(request)
+            self._stats[priority].queued += 1
+            self._cond.notify()
+        return request.future
+
+    def _pop(self) -> Optional[_Request]:
+        """取出下一个请求（需持有锁）"""
+        interactive = self._queues[Priority.INTERACTIVE]
+        if interactive:
+            return interactive.popleft()
+        heads = [q for p, q in self._queues.items() if q and p != Priority.INTERACTIVE]
+        if not heads:
+            return None
+        queue = min(heads, key=lambda q: q[0].finish)
+        request = queue.popleft()
+        self._virtual_time = max(self._virtual_time, request.finish)
+        return request
+
+    def _has_pending(self) -> bool:
+        return any(self._queues.values())
+
+    def _worker(self) -> None:
+        self._local.dispatcher = True
+        while True:
+            with self._cond:
+                while not self._has_pending() and not self._stopping:
+                    self._cond.wait()
+                if not self._has_pending():
+                    return
+            # 先获取令牌再取出请求：等待令牌期间到达的交互式请求仍然排在最前，
+            # 队列已被其他分发线程取空时归还令牌
+            if self.rate_limiter is not None:
+                self.rate_limiter.acquire()
+            with self._cond:
+                request = self._pop()
+                if request is not None:
+                    stats = self._stats[request.priority]
+                    stats.queued -= 1
+                    stats.dispatched += 1
+                    stats.wait_seconds += time.monotonic() - request.enqueued
+            if request is None:
+                if self.rate_limiter is not None:
+                    self.rate_limiter.release()
+                continue
+            if not request.future.set_running_or_notify_cancel():
+                continue
+            try:
+                result = BackendMiddleware._call(
+                    self, request.method, request.args, request.kwargs
+                )
+            except BaseException as e:
+                request.future.set_exception(e)
+            else:
+                request.future.set_result(result)
+
+    def stats(self) -> dict[Priority, PriorityStats]:
+        """获取各优先级调度统计的快照"""
+        with self._cond:
+            return {
+                p: PriorityStats(s.dispatched, s.queued, s.wait_seconds)
+                for p, s in self._stats.items()
+            }
+
+    def close(self) -> None:
+        """处理完已排队的请求后停止分发线程"""
+        with self._cond:
+            self._stopping = True
+            self._cond.notify_all()
+        for worker in self._workers:
+            worker.join()
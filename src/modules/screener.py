@@ -0,0 +1,359 @@
+import dataclasses
+import operator
+import threading
+import time
+from dataclasses import dataclass, field
+from decimal import Decimal
+from typing import TYPE_CHECKING, Any, Callable, Iterable, Optional, Sequence, Type
+import numpy as np
+from longport.openapi import CalcIndex
+from modules.codec import SecurityCalcIndexRecord, SecurityStaticInfoRecord
+from modules.markets import symbol_market_key
+from modules.rate_limiter import RateLimiter
+
+if TYPE_CHECKING:
+    from config import PerformanceConfig
+    from modules.long_port_market_adapter import LongPortMarketAdapter
+
+# 单次批量请求的标的数量上限
+BATCH_LIMIT = 500
+DEFAULT_STATIC_TTL = 24 * 3600
+
+# 数据源按成本从低到高排列：标的代码本身、静态信息（有缓存）、实时行情、计算指标
+COST_ORDER: tuple[str, ...] = ("symbol", "static", "quote", "calc")
+SOURCE_FIELDS: dict[str, frozenset[str]] = {
+    "symbol": frozenset({"market"}),
+    "static": frozenset(
+        f.name
+        for f in dataclasses.fields(SecurityStaticInfoRecord)
+        if f.name not in ("symbol", "stock_derivatives")
+    ),
+    "quote": frozenset(
+        {
+            "last_done",
+            "prev_close",
+            "open",
+            "high",
+            "low",
+            "volume",
+            "turnover",
+            "trade_status",
+        }
+    ),
+    "calc": frozenset(
+        f.name
+        for f in dataclasses.fields(SecurityCalcIndexRecord)
+        if f.name != "symbol"
+    ),
+}
+
+
+@dataclass(frozen=True, slots=True)
+class FieldRef:
+    """数据源中的一个字段"""
+
+    source: str
+    name: str
+
+    @property
+    def key(self) -> str:
+        """结果中的列名：默认数据源的字段直接用字段名，否则加上数据源前缀"""
+        return self.name if resolve_field(self.name) == self else str(self)
+
+    def __str__(self) -> str:
+        return f"{self.source}.{self.name}"
+
+
+def resolve_field(name: str) -> FieldRef:
+    """
+    解析字段名，未指定数据源时使用成本最低的数据源
+
+    :param name: 字段名，例如 "turnover"，或带数据源的 "calc.turnover"
+    :return: 字段
+    """
+    source, _, field_name = name.rpartition(".")
+    if source:
+        if field_name not in SOURCE_FIELDS.get(source, ()):
+            raise KeyError(f"数据源 {source} 没有字段 {field_name}")
+        return FieldRef(source, field_name)
+    for source in COST_ORDER:
+        if field_name in SOURCE_FIELDS[source]:
+            return FieldRef(source, field_name)
+    raise KeyError(f"未知的筛选字段: {name}")
+
+
+def _calc_index(name: str) -> Type[CalcIndex]:
+    return getattr(CalcIndex, "".join(part.capitalize() for part in name.split("_")))
+
+
+_OPS: dict[str, Callable[[Any, Any], Any]] = {
+    ">": operator.gt,
+    ">=": operator.ge,
+    "<": operator.lt,
+    "<=": operator.le,
+    "==": operator.eq,
+    "!=": operator.ne,
+}
+
+
+@dataclass(frozen=True)
+class Condition:
+    """单个筛选条件，缺失值总是不满足条件"""
+
+    field: FieldRef
+    op: str
+    value: Any
+
+    def mask(self, column: np.ndarray) -> np.ndarray:
+        if self.op == "in":
+            return np.isin(column, list(self.value))
+        value = float(self.value) if isinstance(self.value, Decimal) else self.value
+        with np.errstate(invalid="ignore"):
+            return np.asarray(_OPS[self.op](column, value), dtype=bool)
+
+    def __str__(self) -> str:
+        return f"{self.field} {self.op} {self.value!r}"
+
+
+class Field:
+    """
+    筛选字段，与值比较得到筛选条件
+
+    例如 Field("turnover") > 1e8、Field("pe_ttm_ratio") < 20、
+    Field("board") == "HKEquity"、Field("market").isin(["HK", "US"])
+    """
+
+    __hash__ = None  # type: ignore[assignment]
+
+    def __init__(self, name: str):
+        self.ref = resolve_field(name)
+
+    def __gt__(self, value: Any) -> Condition:
+        return Condition(self.ref, ">", value)
+
+    def __ge__(self, value: Any) -> Condition:
+        return Condition(self.ref, ">=", value)
+
+    def __lt__(self, value: Any) -> Condition:
+        return Condition(self.ref, "<", value)
+
+    def __le__(self, value: Any) -> Condition:
+        return Condition(self.ref, "<=", value)
+
+    def __eq__(self, value: Any) -> Condition:  # type: ignore[override]
+        return Condition(self.ref, "==", value)
+
+    def __ne__(self, value: Any) -> Condition:  # type: ignore[override]
+        return Condition(self.ref, "!=", value)
+
+    def isin(self, values: Iterable[Any]) -> Condition:
+        return Condition(self.ref, "in", tuple(values))
+
+
+@dataclass(frozen=True)
+class Stage:
+    """执行计划中的一步：请求一个数据源的若干字段，并应用该数据源上的条件"""
+
+    source: str
+    fields: tuple[str, ...]
+    conditions: tuple[Condition, ...]
+
+
+@dataclass(slots=True)
+class StageStats:
+    """一步的执行统计"""
+
+    source: str
+    symbols_in: int
+    symbols_out: int
+    requests: int
+
+
+@dataclass
+class ScreenResult:
+    """筛选结果：通过筛选的标的与各列数据（与 symbols 对齐）"""
+
+    symbols: list[str]
+    columns: dict[str, np.ndarray]
+    stages: list[StageStats] = field(default_factory=list)
+
+    def __len__(self) -> int:
+        return len(self.symbols)
+
+    def rows(self) -> list[dict[str, Any]]:
+        """按标的展开为字典列表"""
+        return [
+            {"symbol": symbol, **{k: v[i] for k, v in self.columns.items()}}
+            for i, symbol in enumerate(self.symbols)
+        ]
+
+
+def _to_column(values: Sequence[Any]) -> np.ndarray:
+    """数值转为 float64（缺失值为 NaN），其它值转为字符串"""
+    if all(v is None or isinstance(v, (int, float, Decimal)) for v in values):
+        return np.array([np.nan if v is None else float(v) for v in values])
+    return np.array(
+        [
+            v if v is None or isinstance(v, str) else str(v).rsplit(".", 1)[-1]
+            for v in values
+        ],
+        dtype=object,
+    )
+
+
+class ScreeningEngine:
+    """
+    全市场筛选引擎
+
+    根据声明式的筛选条件生成执行计划：按成本从低到高依次请求数据源，
+    每一步只请求计划需要的字段（计算指标只请求用到的指标），并立即应用该数据源上的条件，
+    后面更昂贵的请求只针对剩余的标的。各步的结果以列式数组按标的对齐，条件以向量化方式计算。
+    静态信息变化很少，按标的缓存。
+    """
+
+    def __init__(
+        self,
+        adapter: "LongPortMarketAdapter",
+        rate_limiter: Optional[RateLimiter] = None,
+        static_ttl: float = DEFAULT_STATIC_TTL,
+        batch_size: int = BATCH_LIMIT,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        """
+        :param adapter: 行情适配器
+        :param rate_limiter: 限流器，每次批量请求前获取一个令牌
+        :param static_ttl: 静态信息的缓存时间（秒）
+        :param batch_size: 单次批量请求的标的数量
+        :param clock: 单调时钟
+        """
+        self._adapter = adapter
+        self._rate_limiter = rate_limiter
+        self._static_ttl = static_ttl
+        self._batch_size = batch_size
+        self._clock = clock
+        # 标的 -> (静态信息, 过期时间)，写时复制的只读快照，读取无需加锁
+        self._static: dict[str, tuple[Any, float]] = {}
+        self._lock = threading.Lock()
+
+    def apply_performance_config(self, config: "PerformanceConfig") -> None:
+        """
+        应用性能配置中的 batch_size；可作为 ConfigWatcher 的回调实现热加载
+
+        :param config: 性能配置
+        """
+        self._batch_size = config.batch_size
+
+    def plan(
+        self, conditions: Sequence[Condition], columns: Sequence[str] = ()
+    ) -> list[Stage]:
+        """
+        生成执行计划
+
+        :param conditions: 筛选条件（同时满足）
+        :param columns: 结果中额外需要的字段
+        :return: 按执行顺序排列的步骤，没有字段的数据源不会被请求
+        """
+        refs = [c.field for c in conditions] + [resolve_field(c) for c in columns]
+        stages = []
+        for source in COST_ORDER:
+            fields = tuple(dict.fromkeys(r.name for r in refs if r.source == source))
+            if fields:
+                stage_conditions = tuple(
+                    c for c in conditions if c.field.source == source
+                )
+                stages.append(Stage(source, fields, stage_conditions))
+        return stages
+
+    def screen(
+        self,
+        symbols: Iterable[str],
+        conditions: Sequence[Condition],
+        columns: Sequence[str] = (),
+    ) -> ScreenResult:
+        """
+        执行筛选
+
+        :param symbols: 候选标的
+        :param conditions: 筛选条件（同时满足）
+        :param columns: 结果中额外需要的字段
+        :return: 筛选结果
+        """
+        universe = np.array(list(dict.fromkeys(symbols)), dtype=object)
+        result: dict[str, np.ndarray] = {}
+        stats: list[StageStats] = []
+        for stage in self.plan(conditions, columns):
+            symbols_in = len(universe)
+            stage_columns, present, requests = self._fetch(stage, universe.tolist())
+            # 没有静态信息的是无效标的，直接剔除；其它数据源缺失的字段为缺失值
+            mask = present if stage.source == "static" else np.ones_like(present)
+            for condition in stage.conditions:
+                mask &= condition.mask(stage_columns[condition.field.name])
+            universe = universe[mask]
+            result = {key: column[mask] for key, column in result.items()}
+            for name, column in stage_columns.items():
+                result[FieldRef(stage.source, name).key] = column[mask]
+            stats.append(StageStats(stage.source, symbols_in, len(universe), requests))
+        return ScreenResult(universe.tolist(), result, stats)
+
+    def _fetch(
+        self, stage: Stage, symbols: list[str]
+    ) -> tuple[dict[str, np.ndarray], np.ndarray, int]:
+        """请求一个数据源，返回与 symbols 对齐的各列、是否有数据，以及请求次数"""
+        if stage.source == "symbol":
+            markets = np.array([symbol_market_key(s) for s in symbols], dtype=object)
+            return {"market": markets}, np.ones(len(symbols), dtype=bool), 0
+        if stage.source == "static":
+            by_symbol, requests = self._fetch_static(symbols)
+        elif stage.source == "quote":
+            by_symbol, requests = self._fetch_batches(
+                symbols, self._adapter.fetch_quote_batch
+            )
+        else:
+            indexes = [_calc_index(name) for name in stage.fields]
+            by_symbol, requests = self._fetch_batches(
+                symbols, lambda batch: self._adapter.fetch_calc_indexes(batch, indexes)
+            )
+        rows = [by_symbol.get(s) for s in symbols]
+        columns = {
+            name: _to_column(
+                [getattr(r, name) if r is not None else None for r in rows]
+            )
+            for name in stage.fields
+        }
+        return columns, np.array([r is not None for r in rows], dtype=bool), requests
+
+    def _fetch_batches(
+        self, symbols: list[str], fetch: Callable[[list[str]], list[Any]]
+    ) -> tuple[dict[str, Any], int]:
+        by_symbol: dict[str, Any] = {}
+        requests = 0
+        batch_size = self._batch_size
+        for i in range(0, len(symbols), batch_size):
+            if self._rate_limiter is not None:
+                self._rate_limiter.acquire()
+            for item in fetch(symbols[i : i + batch_size]):
+                by_symbol[item.symbol] = item
+            requests += 1
+        return by_symbol, requests
+
+    def _fetch_static(self, symbols: list[str]) -> tuple[dict[str, Any], int]:
+        now = self._clock()
+        static = self._static
+        cached = {
+            s: entry[0]
+            for s in symbols
+            if (entry := static.get(s)) is not None and entry[1] > now
+        }
+        missing = [s for s in symbols if s not in cached]
+        fetched, requests = self._fetch_batches(
+            missing, self._adapter.fetch_static_info_batch
+        )
+        expires_at = self._clock() + self._static_ttl
+        if fetched:
+            with self._lock:
+                static = dict(self._static)
+                for symbol, info in fetched.items():
+                    static[symbol] = (info, expires_at)
+                self._static = static
+        cached.update(fetched)
+        return cached, requests
@@ -0,0 +1,413 @@
+import multiprocessing
+import queue
+import threading
+import time
+import traceback
+import zlib
+from dataclasses import dataclass, field
+from multiprocessing.shared_memory import SharedMemory
+from typing import TYPE_CHECKING, Any, Callable, Literal, Mapping, Optional, Sequence
+import numpy as np
+from modules.markets import symbol_market_key
+from modules.timestamps import to_epoch_ns
+
+if TYPE_CHECKING:
+    from multiprocessing.context import BaseContext
+    from modules.long_port_market_adapter import LongPortMarketAdapter
+
+# 在工作进程中执行的函数：(适配器, 本分片标的) -> 标的 -> 各列数值
+ShardFunc = Callable[[Any, list[str]], Mapping[str, Sequence[float | int]]]
+
+# 整数列中缺失值（标的没有结果或分片失败）的取值
+INT_MISSING = np.iinfo(np.int64).min
+
+# 等待结果时检查工作进程存活状态的间隔（秒）
+_POLL_INTERVAL = 0.5
+
+# 单次行情请求的标的数量上限
+QUOTE_BATCH_LIMIT = 500
+
+QUOTE_COLUMNS: tuple[str, ...] = (
+    "last_done",
+    "prev_close",
+    "open",
+    "high",
+    "low",
+    "volume",
+    "turnover",
+    "timestamp_ns",
+)
+# 按 int64 存储的列，避免纳秒时间戳等超过 2^53 的整数在 float64 中丢失精度
+QUOTE_INT_COLUMNS: tuple[str, ...] = ("volume", "timestamp_ns")
+
+
+def quote_columns(
+    adapter: "LongPortMarketAdapter", symbols: list[str]
+) -> dict[str, tuple[float | int, ...]]:
+    """在工作进程中拉取行情并转换为 QUOTE_COLUMNS 数值列"""
+    quotes = [
+        quote
+        for i in range(0, len(symbols), QUOTE_BATCH_LIMIT)
+        for quote in adapter.fetch_quote_batch(symbols[i : i + QUOTE_BATCH_LIMIT])
+    ]
+    return {
+        q.symbol: (
+            float(q.last_done),
+            float(q.prev_close),
+            float(q.open),
+            float(q.high),
+            float(q.low),
+            int(q.volume),
+            float(q.turnover),
+            to_epoch_ns(q.timestamp),
+        )
+        for q in quotes
+    }
+
+
+def _default_adapter_factory() -> "LongPortMarketAdapter":
+    from modules.long_port_market_adapter import LongPortMarketAdapter
+
+    return LongPortMarketAdapter()
+
+
+def partition_by_hash(symbols: Sequence[str], shards: int) -> list[list[str]]:
+    """
+    按标的代码的稳定哈希分片（同一标的总是落在同一个进程）
+
+    :param symbols: 标的代码列表
+    :param shards: 分片数
+    :return: 各分片的标的列表
+    """
+    parts: list[list[str]] = [[] for _ in range(shards)]
+    for symbol in symbols:
+        parts[zlib.crc32(symbol.encode()) % shards].append(symbol)
+    return parts
+
+
+def partition_by_market(symbols: Sequence[str], shards: int) -> list[list[str]]:
+    """
+    按市场分片（同一市场的标的由同一个进程处理）
+
+    :param symbols: 标的代码列表
+    :param shards: 分片数
+    :return: 各分片的标的列表
+    """
+    parts: list[list[str]] = [[] for _ in range(shards)]
+    for symbol in symbols:
+        market = symbol_market_key(symbol)
+        parts[zlib.crc32(market.encode()) % shards].append(symbol)
+    return parts
+
+
+def _split_layout(
+    columns: Sequence[str], int_columns: Sequence[str]
+) -> tuple[list[int], list[int]]:
+    """列序号拆分为 float64 列与 int64 列"""
+    ints = set(int_columns)
+    float_index = [i for i, name in enumerate(columns) if name not in ints]
+    int_index = [i for i, name in enumerate(columns) if name in ints]
+    return float_index, int_index
+
+
+def _matrices(
+    shm: SharedMemory, rows: int, float_index: list[int], int_index: list[int]
+) -> tuple[np.ndarray, np.ndarray]:
+    """在共享内存上映射 float64 矩阵以及紧随其后的 int64 矩阵"""
+    buf = shm.buf
+    assert buf is not None
+    floats = np.ndarray((rows, len(float_index)), dtype=np.float64, buffer=buf)
+    ints = np.ndarray(
+        (rows, len(int_index)), dtype=np.int64, buffer=buf, offset=floats.nbytes
+    )
+    return floats, ints
+
+
+def _worker_main(
+    factory: Callable[[], Any],
+    tasks: "multiprocessing.Queue[Any]",
+    results: "multiprocessing.Queue[Any]",
+) -> None:
+    """工作进程入口：持有自己的适配器（以及 QuoteContext），循环执行任务"""
+    adapter = factory()
+    while True:
+        task = tasks.get()
+        if task is None:
+            break
+        task_id, shard, func, symbols, shm_name, layout, offset = task
+        rows, float_index, int_index = layout
+        error: Optional[str] = None
+        try:
+            values = func(adapter, symbols)
+            shm = SharedMemory(name=shm_name, track=False)
+            try:
+                floats, ints = _matrices(shm, rows, float_index, int_index)
+                for i, symbol in enumerate(symbols):
+                    row = values.get(symbol)
+                    if row is not None:
+                        floats[offset + i] = [row[j] for j in float_index]
+                        ints[offset + i] = [row[j] for j in int_index]
+                del floats, ints
+            finally:
+                shm.close()
+        except Exception:
+            error = traceback.format_exc()
+        results.put((task_id, shard, error))
+
+
+@dataclass
+class ShardedResult:
+    """
+    分片计算结果
+
+    values 是直接映射到共享内存的 (标的数, 浮点列数) float64 数组，
+    int_values 是整数列（int_columns）对应的 int64 数组，缺失值为 INT_MISSING，
+    父进程读取时不需要反序列化。使用完毕后需调用 close 释放共享内存，之后数组不再可用。
+    """
+
+    symbols: list[str]
+    columns: tuple[str, ...]
+    values: np.ndarray
+    errors: dict[int, str]
+    _shm: Optional[SharedMemory] = field(default=None, repr=False)
+    int_columns: tuple[str, ...] = ()
+    int_values: np.ndarray = field(
+        default_factory=lambda: np.empty((0, 0), dtype=np.int64)
+    )
+    _rows: dict[str, int] = field(default_factory=dict, repr=False)
+    _index: dict[str, tuple[bool, int]] = field(default_factory=dict, repr=False)
+
+    def __post_init__(self) -> None:
+        self._rows = {symbol: i for i, symbol in enumerate(self.symbols)}
+        float_index, int_index = _split_layout(self.columns, self.int_columns)
+        self._index = {self.columns[j]: (False, i) for i, j in enumerate(float_index)}
+        self._index.update(
+            {self.columns[j]: (True, i) for i, j in enumerate(int_index)}
+        )
+
+    def row(self, symbol: str) -> dict[str, float | int]:
+        """获取某个标的的全部列"""
+        row = self._rows[symbol]
+        result: dict[str, float | int] = {}
+        for name in self.columns:
+            is_int, i = self._index[name]
+            if is_int:
+                result[name] = int(self.int_values[row, i])
+            else:
+                result[name] = float(self.values[row, i])
+        return result
+
+    def column(self, name: str) -> np.ndarray:
+        """获取某一列（共享内存上的视图）"""
+        is_int, i = self._index[name]
+        return self.int_values[:, i] if is_int else self.values[:, i]
+
+    def close(self) -> None:
+        """释放共享内存"""
+        self.values = np.empty((0, self.values.shape[1]))
+        self.int_values = np.empty((0, self.int_values.shape[1]), dtype=np.int64)
+        if self._shm is not None:
+            self._shm.close()
+            self._shm.unlink()
+            self._shm = None
+
+    def __enter__(self) -> "ShardedResult":
+        return self
+
+    def __exit__(self, *exc: object) -> None:
+        self.close()
+
+
+class ShardedMarketAdapter:
+    """
+    多进程分片适配器
+
+    按哈希或市场把标的分配到多个工作进程，每个进程持有自己的 QuoteContext，
+    结果转换与后处理都在工作进程中完成，数值结果通过共享内存回传给父进程，
+    父进程不需要 pickle 结果对象，从而绕开 GIL 瓶颈。
+    """
+
+    def __init__(
+        self,
+        num_workers: int = 4,
+        partition: Literal["hash", "market"] = "hash",
+        adapter_factory: Callable[[], Any] = _default_adapter_factory,
+        mp_context: Optional["BaseContext"] = None,
+    ):
+        """
+        :param num_workers: 工作进程数
+        :param partition: 分片方式，"hash" 按标的哈希，"market" 按市场
+        :param adapter_factory: 在工作进程中创建适配器的函数（需可 pickle）
+        :param mp_context: multiprocessing 上下文，默认 spawn（避免 fork 父进程的连接）
+        """
+        if num_workers <= 0:
+            raise ValueError("工作进程数必须为正数")
+        self.num_workers = num_workers
+        self._partition = (
+            partition_by_market if partition == "market" else partition_by_hash
+        )
+        self._factory = adapter_factory
+        self._ctx: Any = mp_context or multiprocessing.get_context("spawn")
+        self._tasks: list["multiprocessing.Queue[Any]"] = []
+        self._results: Optional["multiprocessing.Queue[Any]"] = None
+        self._workers: list[multiprocessing.process.BaseProcess] = []
+        self._lock = threading.Lock()
+        self._task_id = 0
+
+    def start(self) -> None:
+        """启动工作进程"""
+        if self._workers:
+            return
+        self._results = self._ctx.Queue()
+        for i in range(self.num_workers):
+            tasks, worker = self._spawn(i)
+            self._tasks.append(tasks)
+            self._workers.append(worker)
+
+    def _spawn(
+        self, index: int
+    ) -> tuple["multiprocessing.Queue[Any]", multiprocessing.process.BaseProcess]:
+        tasks = self._ctx.Queue()
+        worker = self._ctx.Process(
+            target=_worker_main,
+            args=(self._factory, tasks, self._results),
+            name=f"market-adapter-shard-{index}",
+            daemon=True,
+        )
+        worker.start()
+        return tasks, worker
+
+    def _restart_dead_workers(self) -> None:
+        """重新启动异常退出的工作进程（其任务队列一并丢弃）"""
+        for index, worker in enumerate(self._workers):
+            if not worker.is_alive():
+                worker.join()
+                self._tasks[index], self._workers[index] = self._spawn(index)
+
+    def close(self) -> None:
+        """停止全部工作进程"""
+        for tasks in self._tasks:
+            tasks.put(None)
+        for worker in self._workers:
+            worker.join()
+        if self._results is not None:
+            self._results.close()
+        self._tasks, self._workers, self._results = [], [], None
+
+    def __enter__(self) -> "ShardedMarketAdapter":
+        self.start()
+        return self
+
+    def __exit__(self, *exc: object) -> None:
+        self.close()
+
+    def map(
+        self,
+        func: ShardFunc,
+        symbols: Sequence[str],
+        columns: Sequence[str],
+        timeout: Optional[float] = None,
+        int_columns: Sequence[str] = (),
+    ) -> ShardedResult:
+        """
+        把标的分片后在各工作进程中执行 func，结果写入共享内存
+
+        :param func: 顶层函数 (适配器, 标的列表) -> 标的 -> 数值列，需可 pickle
+        :param symbols: 标的代码列表
+        :param columns: 结果列名
+        :param timeout: 等待全部分片完成的超时时间（秒），超时抛出 TimeoutError
+        :param int_columns: 按 int64 精确存储的列名，例如纳秒时间戳
+        :return: 分片计算结果，失败分片的行为 NaN（整数列为 INT_MISSING），
+            错误记录在 errors 中；执行中退出的工作进程会被重新启动
+        """
+        self.start()
+        shards = self._partition(symbols, self.num_workers)
+        ordered = [symbol for shard in shards for symbol in shard]
+        float_index, int_index = _split_layout(columns, int_columns)
+        size = len(ordered) * (len(float_index) + len(int_index)) * 8
+        shm = SharedMemory(create=True, size=max(size, 1))
+        try:
+            values, int_values = _matrices(shm, len(ordered), float_index, int_index)
+            values.fill(np.nan)
+            int_values.fill(INT_MISSING)
+            layout = (len(ordered), float_index, int_index)
+            errors = self._dispatch(func, shards, shm.name, layout, timeout)
+        except BaseException:
+            shm.close()
+            shm.unlink()
+            raise
+
+        return ShardedResult(
+            ordered,
+            tuple(columns),
+            values,
+            errors,
+            shm,
+            tuple(columns[j] for j in int_index),
+            int_values,
+        )
+
+    def _dispatch(
+        self,
+        func: ShardFunc,
+        shards: list[list[str]],
+        shm_name: str,
+        layout: tuple[int, list[int], list[int]],
+        timeout: Optional[float],
+    ) -> dict[int, str]:
+        """分发任务并等待全部分片完成，返回失败分片的错误信息"""
+        errors: dict[int, str] = {}
+        deadline = None if timeout is None else time.monotonic() + timeout
+        with self._lock:
+            self._restart_dead_workers()
+            self._task_id += 1
+            task_id = self._task_id
+            pending: set[int] = set()
+            offset = 0
+            for index, shard in enumerate(shards):
+                if shard:
+                    self._tasks[index].put(
+                        (task_id, index, func, shard, shm_name, layout, offset)
+                    )
+                    pending.add(index)
+                offset += len(shard)
+            assert self._results is not None
+            while pending:
+                wait = _POLL_INTERVAL
+                if deadline is not None:
+                    wait = min(wait, deadline - time.monotonic())
+                    if wait <= 0:
+                        raise TimeoutError(f"分片 {sorted(pending)} 未在超时时间内完成")
+                try:
+                    result_id, index, error = self._results.get(timeout=wait)
+                except queue.Empty:
+                    # 工作进程崩溃时不会再返回结果，按失败分片处理
+                    for index in list(pending):
+                        worker = self._workers[index]
+                        if not worker.is_alive():
+                            pending.discard(index)
+                            errors[index] = (
+                                f"工作进程 {worker.name} 异常退出"
+                                f"（exitcode={worker.exitcode}）"
+                            )
+                    continue
+                if result_id != task_id:
+                    continue
+                pending.discard(index)
+                if error is not None:
+                    errors[index] = error
+        return errors
+
+    def fetch_quote_columns(
+        self, symbols: Sequence[str], timeout: Optional[float] = None
+    ) -> ShardedResult:
+        """
+        分片批量获取实时行情，结果为 QUOTE_COLUMNS 数值列
+
+        :param symbols: 标的代码列表
+        :param timeout: 超时时间（秒）
+        :return: 分片计算结果，volume 与 timestamp_ns 为 int64 列
+        """
+        return self.map(
+            quote_columns, symbols, QUOTE_COLUMNS, timeout, QUOTE_INT_COLUMNS
+        )
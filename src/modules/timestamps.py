@@ -0,0 +1,71 @@
+from datetime import datetime, timezone, tzinfo
+from typing import Optional
+from modules.markets import market_timezone, symbol_market_key
+
+NS_PER_SECOND = 1_000_000_000
+
+
+def to_epoch_ns(value: datetime) -> int:
+    """
+    把 datetime 转换为纳秒时间戳
+
+    longport SDK 返回的 naive datetime 是本地时间，因此 naive datetime 按本地时间处理。
+
+    :param value: 时间
+    :return: 纳秒时间戳
+    """
+    return round(value.timestamp() * 1_000_000) * 1_000
+
+
+def from_epoch_ns(value: int, tz: tzinfo = timezone.utc) -> datetime:
+    """
+    把纳秒时间戳转换为带时区的 datetime（精度为微秒）
+
+    :param value: 纳秒时间戳
+    :param tz: 目标时区，默认 UTC
+    :return: 带时区的时间
+    """
+    seconds, ns = divmod(value, NS_PER_SECOND)
+    return datetime.fromtimestamp(seconds, tz).replace(microsecond=ns // 1_000)
+
+
+class EpochTimestamped:
+    """
+    以纳秒时间戳保存时间的记录
+
+    热路径上只比较、相减 timestamp_ns 这个整数；需要展示时再按市场时区生成 datetime。
+    """
+
+    __slots__ = ()
+
+    timestamp_ns: int
+
+    @property
+    def utc_time(self) -> datetime:
+        """UTC 时间"""
+        return from_epoch_ns(self.timestamp_ns)
+
+    def local_time(self, market: Optional[str] = None) -> datetime:
+        """
+        获取市场当地时间
+
+        :param market: 市场代码（如 "HK"）或标的代码（如 "700.HK"），
+            省略时使用记录自身的 symbol
+        :return: 带交易所时区的时间
+        """
+        if market is None:
+            market = getattr(self, "symbol", None)
+            if market is None:
+                raise ValueError("记录没有标的代码，需要指定市场")
+        if "." in market:
+            market = symbol_market_key(market)
+        return from_epoch_ns(self.timestamp_ns, market_timezone(market))
+
+    def age_ns(self, now_ns: int) -> int:
+        """
+        数据距今的时长
+
+        :param now_ns: 当前纳秒时间戳，例如 time.time_ns()
+        :return: 纳秒数
+        """
+        return now_ns - self.timestamp_ns
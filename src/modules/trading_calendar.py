@@ -0,0 +1,456 @@
+import bisect
+import logging
+import threading
+from dataclasses import dataclass
+from enum import Enum
+from datetime import date, datetime, time, timedelta
+from typing import TYPE_CHECKING, Iterator, List, Optional, Sequence, Type
+from zoneinfo import ZoneInfo
+from longport.openapi import Market, TradeSession
+from modules.markets import market_key, market_timezone
+
+if TYPE_CHECKING:
+    from modules.long_port_market_adapter import LongPortMarketAdapter
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_MARKETS: tuple[Type[Market], ...] = (Market.US, Market.HK, Market.CN)
+
+# 默认加载的日期范围：交易日接口只提供最近约一年的数据，不再向前回溯更久
+DEFAULT_LOOKBACK_DAYS = 365
+DEFAULT_LOOKAHEAD_DAYS = 90
+
+ALL_TRADE_SESSIONS: tuple[Type[TradeSession], ...] = (
+    TradeSession.Intraday,
+    TradeSession.Pre,
+    TradeSession.Post,
+    TradeSession.Overnight,
+)
+
+# 半日市的收市时间（市场本地时间）
+HALF_DAY_CLOSE: dict[str, time] = {
+    "HK": time(12, 0),
+    "US": time(13, 0),
+}
+
+
+class MarketPhase(Enum):
+    """市场在某一时刻所处的阶段"""
+
+    INTRADAY = "intraday"  # 盘中
+    PRE_MARKET = "pre_market"  # 盘前
+    POST_MARKET = "post_market"  # 盘后
+    OVERNIGHT = "overnight"  # 夜盘
+    BREAK = "break"  # 交易日内的非交易时间（开盘前、午休、收盘后）
+    CLOSED = "closed"  # 非交易日
+
+
+_SESSION_PHASES: tuple[tuple[Type[TradeSession], MarketPhase], ...] = (
+    (TradeSession.Intraday, MarketPhase.INTRADAY),
+    (TradeSession.Pre, MarketPhase.PRE_MARKET),
+    (TradeSession.Post, MarketPhase.POST_MARKET),
+    (TradeSession.Overnight, MarketPhase.OVERNIGHT),
+)
+
+
+@dataclass(frozen=True, slots=True)
+class SessionWindow:
+    """某个交易日内的一个具体交易时段"""
+
+    market: str
+    trading_day: date
+    begin: datetime
+    end: datetime
+    trade_session: Type[TradeSession]
+
+    def contains(self, at: datetime) -> bool:
+        return self.begin <= at < self.end
+
+
+@dataclass(frozen=True, slots=True)
+class _SessionSpec:
+    begin: time
+    end: time
+    trade_session: Type[TradeSession]
+
+
+@dataclass(frozen=True, slots=True)
+class _MarketCalendar:
+    key: str
+    tz: ZoneInfo
+    days: tuple[int, ...]
+    half_days: frozenset[int]
+    sessions: tuple[_SessionSpec, ...]
+
+    def windows(self, ordinal: int) -> Iterator[SessionWindow]:
+        """生成某个交易日的全部交易时段（按开始时间排序）"""
+        day = date.fromordinal(ordinal)
+        half_close = HALF_DAY_CLOSE.get(self.key) if ordinal in self.half_days else None
+        for spec in self.sessions:
+            if half_close is not None and spec.begin >= half_close:
+                continue
+            begin = datetime.combine(day, spec.begin, self.tz)
+            end_time = spec.end
+            if half_close is not None and spec.begin < half_close < spec.end:
+                end_time = half_close
+            end = datetime.combine(day, end_time, self.tz)
+            if end <= begin:
+                # 跨越午夜的时段（例如美股夜盘）
+                end += timedelta(days=1)
+            yield SessionWindow(self.key, day, begin, end, spec.trade_session)
+
+
+def _month_ranges(begin: date, end: date) -> Iterator[tuple[date, date]]:
+    """把日期区间切分为自然月区间（交易日接口单次查询不能超过一个月）"""
+    current = begin
+    while current <= end:
+        next_month = (current.replace(day=1) + timedelta(days=32)).replace(day=1)
+        yield current, min(next_month - timedelta(days=1), end)
+        current = next_month
+
+
+class TradingCalendar:
+    """
+    本地交易日历
+
+    一次性加载各市场的交易日与交易时段，之后所有查询都在本地以 O(log n) 完成，
+    并可在后台线程中定期刷新。
+    只加载 [今天 - lookback_days, 今天 + lookahead_days] 范围内的交易日，
+    范围之外的日期一律视为非交易日。交易日接口只提供最近约一年的数据，
+    调大 lookback_days 时接口拒绝的月份会被跳过（记录日志），其余月份照常加载。
+    """
+
+    def __init__(
+        self,
+        adapter: "LongPortMarketAdapter",
+        markets: Sequence[Type[Market]] = DEFAULT_MARKETS,
+        lookback_days: int = DEFAULT_LOOKBACK_DAYS,
+        lookahead_days: int = DEFAULT_LOOKAHEAD_DAYS,
+    ):
+        """
+        :param adapter: 行情适配器
+        :param markets: 需要加载的市场
+        :param lookback_days: 向前加载的自然日数（交易日接口按月请求，每年 12 次）
+        :param lookahead_days: 向后加载的自然日数
+        """
+        self._adapter = adapter
+        self._markets = list(markets)
+        self._lookback = timedelta(days=lookback_days)
+        self._lookahead = timedelta(days=lookahead_days)
+        # 整体替换的只读快照，查询无需加锁
+        self._calendars: dict[str, _MarketCalendar] = {}
+        self._load_lock = threading.Lock()
+        self._stop_event = threading.Event()
+        self._refresh_thread: Optional[threading.Thread] = None
+        self.loaded_at: Optional[datetime] = None
+
+    # ==================== 加载与刷新 ====================
+    def load(self, today: Optional[date] = None) -> None:
+        """
+        从接口加载交易日与交易时段并替换本地快照
+
+        :param today: 基准日期，默认今天
+        """
+        today = today or date.today()
+        begin, end = today - self._lookback, today + self._lookahead
+        with self._load_lock:
+            specs: dict[str, tuple[_SessionSpec, ...]] = {}
+            for market_sessions in self._adapter.fetch_trading_session():
+                specs[market_key(market_sessions.market)] = tuple(
+                    sorted(
+                        (
+                            _SessionSpec(s.begin_time, s.end_time, s.trade_session)
+                            for s in market_sessions.trade_sessions
+                        ),
+                        key=lambda s: s.begin,
+                    )
+                )
+
+            calendars: dict[str, _MarketCalendar] = {}
+            for market in self._markets:
+                key = market_key(market)
+                days: set[int] = set()
+                half_days: set[int] = set()
+                for range_begin, range_end in _month_ranges(begin, end):
+                    try:
+                        resp = self._adapter.fetch_trading_days(
+                            market, range_begin, range_end
+                        )
+                    except Exception:
+                        # 单个月份失败（例如超出接口提供的范围）不影响其余月份
+                        logger.warning(
+                            "市场 %s %s ~ %s 的交易日加载失败，已跳过",
+                            key,
+                            range_begin,
+                            range_end,
+                            exc_info=True,
+                        )
+                        continue
+                    days.update(d.toordinal() for d in resp.trading_days)
+                    half_days.update(d.toordinal() for d in resp.half_trading_days)
+                calendars[key] = _MarketCalendar(
+                    key=key,
+                    tz=market_timezone(key),
+                    days=tuple(sorted(days | half_days)),
+                    half_days=frozenset(half_days),
+                    sessions=specs.get(key, ()),
+                )
+
+            self._calendars = calendars
+            self.loaded_at = datetime.now().astimezone()
+
+    def start(self, refresh_interval: float = 6 * 3600) -> None:
+        """
+        启动后台刷新线程（首次会同步加载）
+
+        :param refresh_interval: 刷新间隔（秒）
+        """
+        if self._refresh_thread is not None:
+            return
+        if not self._calendars:
+            self.load()
+        self._stop_event.clear()
+        self._refresh_thread = threading.Thread(
+            target=self._refresh_loop,
+            args=(refresh_interval,),
+            name="trading-calendar-refresh",
+            daemon=True,
+        )
+        self._refresh_thread.start()
+
+    def stop(self) -> None:
+        """停止后台刷新线程"""
+        self._stop_event.set()
+        if self._refresh_thread is not None:
+            self._refresh_thread.join()
+            self._refresh_thread = None
+
+    def _refresh_loop(self, refresh_interval: float) -> None:
+        while not self._stop_event.wait(refresh_interval):
+            try:
+                self.load()
+            except Exception:
+                # 刷新失败时保留旧快照
+                logger.exception("交易日历刷新失败")
+
+    def _calendar(self, market: Type[Market] | str) -> _MarketCalendar:
+        if not self._calendars:
+            self.load()
+        key = market if isinstance(market, str) else market_key(market)
+        calendar = self._calendars.get(key)
+        if calendar is None:
+            raise KeyError(f"市场 {key} 的交易日历未加载")
+        return calendar
+
+    # ==================== 交易日查询 ====================
+    def is_trading_day(self, market: Type[Market] | str, day: date) -> bool:
+        """
+        判断某天是否为交易日
+
+        :param market: 市场
+        :param day: 日期
+        :return: 是否为交易日
+        """
+        days = self._calendar(market).days
+        ordinal = day.toordinal()
+        index = bisect.bisect_left(days, ordinal)
+        return index < len(days) and days[index] == ordinal
+
+    def is_half_trading_day(self, market: Type[Market] | str, day: date) -> bool:
+        """
+        判断某天是否为半日市
+
+        :param market: 市场
+        :param day: 日期
+        :return: 是否为半日市
+        """
+        return day.toordinal() in self._calendar(market).half_days
+
+    def next_trading_day(self, market: Type[Market] | str, day: date) -> Optional[date]:
+        """
+        获取某天之后的下一个交易日
+
+        :param market: 市场
+        :param day: 日期
+        :return: 下一个交易日，超出已加载范围时返回None
+        """
+        days = self._calendar(market).days
+        index = bisect.bisect_right(days, day.toordinal())
+        return date.fromordinal(days[index]) if index < len(days) else None
+
+    def previous_trading_day(
+        self, market: Type[Market] | str, day: date
+    ) -> Optional[date]:
+        """
+        获取某天之前的上一个交易日
+
+        :param market: 市场
+        :param day: 日期
+        :return: 上一个交易日，超出已加载范围时返回None
+        """
+        days = self._calendar(market).days
+        index = bisect.bisect_left(days, day.toordinal())
+        return date.fromordinal(days[index - 1]) if index > 0 else None
+
+    def trading_days_between(
+        self, market: Type[Market] | str, begin: date, end: date
+    ) -> int:
+        """
+        统计闭区间 [begin, end] 内的交易日数量
+
+        :param market: 市场
+        :param begin: 开始日期
+        :param end: 结束日期
+        :return: 交易日数量
+        """
+        if end < begin:
+            return 0
+        days = self._calendar(market).days
+        return bisect.bisect_right(days, end.toordinal()) - bisect.bisect_left(
+            days, begin.toordinal()
+        )
+
+    def trading_days(
+        self, market: Type[Market] | str, begin: date, end: date
+    ) -> List[date]:
+        """
+        获取闭区间 [begin, end] 内的交易日列表
+
+        :param market: 市场
+        :param begin: 开始日期
+        :param end: 结束日期
+        :return: 交易日列表
+        """
+        days = self._calendar(market).days
+        lo = bisect.bisect_left(days, begin.toordinal())
+        hi = bisect.bisect_right(days, end.toordinal())
+        return [date.fromordinal(d) for d in days[lo:hi]]
+
+    # ==================== 交易时段查询 ====================
+    def session_at(
+        self,
+        market: Type[Market] | str,
+        at: Optional[datetime] = None,
+        trade_sessions: Optional[Sequence[Type[TradeSession]]] = None,
+    ) -> Optional[SessionWindow]:
+        """
+        获取某一时刻所处的交易时段
+
+        :param market: 市场
+        :param at: 时刻（带时区），默认当前时间
+        :param trade_sessions: 关注的交易时段类型，默认全部
+        :return: 所处的交易时段，不在任何时段内时返回None
+        """
+        calendar = self._calendar(market)
+        local = (at or datetime.now(calendar.tz)).astimezone(calendar.tz)
+        ordinal = local.date().toordinal()
+        # 前一交易日的跨午夜时段也可能覆盖当前时刻
+        index = bisect.bisect_right(calendar.days, ordinal)
+        for day in calendar.days[max(index - 2, 0) : index]:
+            for window in calendar.windows(day):
+                if window.contains(local) and (
+                    trade_sessions is None or window.trade_session in trade_sessions
+                ):
+                    return window
+        return None
+
+    def is_open(
+        self,
+        market: Type[Market] | str,
+        at: Optional[datetime] = None,
+        trade_sessions: Sequence[Type[TradeSession]] = (TradeSession.Intraday,),
+    ) -> bool:
+        """
+        判断市场在某一时刻是否处于交易中
+
+        :param market: 市场
+        :param at: 时刻（带时区），默认当前时间
+        :param trade_sessions: 视为开市的交易时段类型，默认仅盘中
+        :return: 是否开市
+        """
+        return self.session_at(market, at, trade_sessions) is not None
+
+    def next_session(
+        self,
+        market: Type[Market] | str,
+        at: Optional[datetime] = None,
+        trade_sessions: Sequence[Type[TradeSession]] = (TradeSession.Intraday,),
+    ) -> Optional[SessionWindow]:
+        """
+        获取某一时刻之后开始的下一个交易时段
+
+        :param market: 市场
+        :param at: 时刻（带时区），默认当前时间
+        :param trade_sessions: 关注的交易时段类型，默认仅盘中
+        :return: 下一个交易时段，超出已加载范围时返回None
+        """
+        calendar = self._calendar(market)
+        local = (at or datetime.now(calendar.tz)).astimezone(calendar.tz)
+        index = bisect.bisect_left(calendar.days, local.date().toordinal())
+        for i in range(index, len(calendar.days)):
+            for window in calendar.windows(calendar.days[i]):
+                if window.begin > local and window.trade_session in trade_sessions:
+                    return window
+        return None
+
+    def previous_session(
+        self,
+        market: Type[Market] | str,
+        at: Optional[datetime] = None,
+        trade_sessions: Sequence[Type[TradeSession]] = (TradeSession.Intraday,),
+    ) -> Optional[SessionWindow]:
+        """
+        获取某一时刻之前已经结束的上一个交易时段
+
+        :param market: 市场
+        :param at: 时刻（带时区），默认当前时间
+        :param trade_sessions: 关注的交易时段类型，默认仅盘中
+        :return: 上一个交易时段，超出已加载范围时返回None
+        """
+        calendar = self._calendar(market)
+        local = (at or datetime.now(calendar.tz)).astimezone(calendar.tz)
+        index = bisect.bisect_right(calendar.days, local.date().toordinal())
+        for i in range(index - 1, -1, -1):
+            for window in reversed(list(calendar.windows(calendar.days[i]))):
+                if window.end <= local and window.trade_session in trade_sessions:
+                    return window
+        return None
+
+    def phase(
+        self, market: Type[Market] | str, at: Optional[datetime] = None
+    ) -> MarketPhase:
+        """
+        获取市场在某一时刻所处的阶段
+
+        :param market: 市场
+        :param at: 时刻（带时区），默认当前时间
+        :return: 市场阶段
+        """
+        calendar = self._calendar(market)
+        local = (at or datetime.now(calendar.tz)).astimezone(calendar.tz)
+        window = self.session_at(market, local)
+        if window is not None:
+            for trade_session, phase in _SESSION_PHASES:
+                if window.trade_session == trade_session:
+                    return phase
+        if self.is_trading_day(market, local.date()):
+            return MarketPhase.BREAK
+        return MarketPhase.CLOSED
+
+    def next_phase_change(
+        self, market: Type[Market] | str, at: Optional[datetime] = None
+    ) -> Optional[datetime]:
+        """
+        获取下一次市场阶段可能发生变化的时刻（当前时段结束或下一个时段开始）
+
+        :param market: 市场
+        :param at: 时刻（带时区），默认当前时间
+        :return: 变化时刻，超出已加载范围时返回None
+        """
+        calendar = self._calendar(market)
+        local = (at or datetime.now(calendar.tz)).astimezone(calendar.tz)
+        window = self.session_at(market, local)
+        if window is not None:
+            return window.end
+        upcoming = self.next_session(market, local, ALL_TRADE_SESSIONS)
+        return upcoming.begin if upcoming is not None else None
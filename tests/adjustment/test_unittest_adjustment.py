@@ -0,0 +1,134 @@
+from datetime import date, datetime, timedelta
+from decimal import Decimal
+from types import SimpleNamespace
+from unittest.mock import MagicMock
+from zoneinfo import ZoneInfo
+import numpy as np
+from longport.openapi import AdjustType, Period
+from modules.adjustment import AdjustmentEngine, adjust_arrays, compute_factors
+from modules.codec import CandleArrays, CandlestickRecord, candle_columns, to_records
+from modules.history_stream import HistoryStream
+
+HK = ZoneInfo("Asia/Hong_Kong")
+# 2 月 5 日除权，1 拆 2
+RAW_CLOSES = {1: "100", 2: "102", 5: "51", 6: "52"}
+ADJUSTED_CLOSES = {1: "50", 2: "51", 5: "51", 6: "52"}
+
+
+def make_candle(ts: datetime, close: str) -> SimpleNamespace:
+    price = Decimal(close)
+    return SimpleNamespace(
+        close=price,
+        open=price - 1,
+        low=price - 2,
+        high=price + 2,
+        volume=1000,
+        turnover=price * 1000,
+        timestamp=ts,
+        trade_session="Intraday",
+    )
+
+
+def daily(closes: dict[int, str]) -> list[SimpleNamespace]:
+    return [make_candle(datetime(2024, 2, d, tzinfo=HK), c) for d, c in closes.items()]
+
+
+def minute(day: int, close: str) -> SimpleNamespace:
+    return make_candle(datetime(2024, 2, day, 10, 30, tzinfo=HK), close)
+
+
+class TestAdjustmentFactors:
+    def test_compute_factors(self) -> None:
+        """测试由日K线计算每日因子，并按交易日查找"""
+        factors = compute_factors("700.HK", daily(RAW_CLOSES), daily(ADJUSTED_CLOSES))
+        np.testing.assert_allclose(factors.factors, [0.5, 0.5, 1, 1])
+        timestamps = candle_columns([minute(d, "1") for d in (1, 2, 3, 5, 7)])
+        np.testing.assert_allclose(
+            factors.factor_at(timestamps["timestamp_ns"]), [0.5, 0.5, 0.5, 1, 1]
+        )
+
+    def test_adjust_arrays_vectorized(self) -> None:
+        """测试对列式K线整体复权，成交量与成交额不变"""
+        factors = compute_factors("700.HK", daily(RAW_CLOSES), daily(ADJUSTED_CLOSES))
+        candles = [minute(2, "101.5"), minute(5, "51.2")]
+        arrays = CandleArrays(4, **candle_columns(candles))
+        adjusted = adjust_arrays(arrays, factors)
+        assert adjusted.as_float("close").tolist() == [50.75, 51.2]
+        assert adjusted.as_float("high").tolist() == [51.75, 53.2]
+        assert adjusted.volume is arrays.volume
+        assert adjusted.turnover is arrays.turnover
+
+
+class TestAdjustmentEngine:
+    def setup_method(self) -> None:
+        self.adapter = MagicMock()
+
+        def by_date(symbol, period, adjust_type, start, end, *args):
+            if adjust_type == AdjustType.ForwardAdjust:
+                return daily(ADJUSTED_CLOSES)
+            return daily(RAW_CLOSES)
+
+        self.adapter.fetch_history_candlesticks_by_date.side_effect = by_date
+        self.adapter.stream_history_candlesticks_by_date.side_effect = lambda *args: (
+            HistoryStream(self.adapter, *args)
+        )
+        minutes = [minute(2, "101"), minute(6, "52.5")]
+        self.adapter.fetch_history_candlesticks_by_date_normalized.return_value = (
+            to_records(minutes, CandlestickRecord)
+        )
+        self.clock = MagicMock(return_value=0.0)
+        self.engine = AdjustmentEngine(self.adapter, ttl=60, clock=self.clock)
+
+    def test_fetch_both_single_request(self) -> None:
+        """测试分钟K线只请求一次不复权数据，前复权在本地推导"""
+        raw, adjusted = self.engine.fetch_both(
+            "700.HK", Period.Min_1, date(2024, 2, 1), date(2024, 2, 6)
+        )
+        assert [c.close for c in raw] == [Decimal("101"), Decimal("52.5")]
+        assert [c.close for c in adjusted] == [Decimal("50.5"), Decimal("52.5")]
+        assert adjusted[0].timestamp_ns == raw[0].timestamp_ns
+        calls = (
+            self.adapter.fetch_history_candlesticks_by_date_normalized.call_args_list
+        )
+        assert len(calls) == 1
+        assert calls[0].args[2] == AdjustType.NoAdjust
+
+    def test_factors_cached_with_ttl(self) -> None:
+        """测试复权因子按标的缓存，过期或失效后重新计算"""
+        today = date(2024, 2, 6)
+        first = self.engine.factors("700.HK", today)
+        assert self.engine.factors("700.HK", today) is first
+        assert self.adapter.fetch_history_candlesticks_by_date.call_count == 2
+        start = self.adapter.fetch_history_candlesticks_by_date.call_args.args[3]
+        assert start == today - timedelta(days=730)
+
+        self.clock.return_value = 61.0
+        assert self.engine.factors("700.HK", today) is not first
+        self.engine.invalidate("700.HK")
+        self.engine.factors("700.HK", today)
+        assert self.adapter.fetch_history_candlesticks_by_date.call_count == 6
+
+    def test_factors_extended_for_older_bars(self) -> None:
+        """测试需要更早的因子时只补请求缺少的区间"""
+        today = date(2024, 2, 6)
+        fetch = self.adapter.fetch_history_candlesticks_by_date
+        first = self.engine.factors("700.HK", today)
+        covered_from = today - timedelta(days=730)
+        assert self.engine.factors("700.HK", today, since=covered_from) is first
+
+        since = date(2021, 1, 1)
+        extended = self.engine.factors("700.HK", today, since=since)
+        assert len(extended) == 2 * len(first)
+        older = fetch.call_args_list[2:]
+        assert {call.args[3] for call in older} == {since}
+        assert max(call.args[4] for call in older) == covered_from - timedelta(days=1)
+        assert self.engine.factors("700.HK", today, since=since) is extended
+        assert fetch.call_count == 4
+
+    def test_no_adjust_skips_factors(self) -> None:
+        """测试不复权请求不需要复权因子"""
+        candles = self.engine.fetch_history_candlesticks_by_date_normalized(
+            "700.HK", Period.Min_1, AdjustType.NoAdjust
+        )
+        assert len(candles) == 2
+        self.adapter.fetch_history_candlesticks_by_date.assert_not_called()
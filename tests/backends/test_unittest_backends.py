@@ -0,0 +1,334 @@
+import threading
+import time
+from datetime import date
+from types import SimpleNamespace
+from typing import Any
+from unittest.mock import MagicMock, patch
+import pytest
+from longport.openapi import Market
+from modules.backends import (
+    CachingBackend,
+    MarketDataBackend,
+    MetricsBackend,
+    RateLimitedBackend,
+    RoutingBackend,
+    build_backend,
+)
+from modules.long_port_market_adapter import LongPortMarketAdapter
+
+
+class FakeBackend:
+    """记录调用的模拟数据源"""
+
+    def __init__(self, name: str, delay: float = 0.0, fail: bool = False):
+        self.name = name
+        self.delay = delay
+        self.fail = fail
+        self.calls: list[tuple[str, Any]] = []
+        self.lock = threading.Lock()
+
+    def _record(self, method: str, arg: Any) -> None:
+        with self.lock:
+            self.calls.append((method, arg))
+        time.sleep(self.delay)
+        if self.fail:
+            raise RuntimeError(f"{self.name} down")
+
+    def quote(self, symbols: list[str]) -> list[SimpleNamespace]:
+        self._record("quote", list(symbols))
+        return [SimpleNamespace(symbol=s, source=self.name) for s in symbols]
+
+    def depth(self, symbol: str) -> str:
+        self._record("depth", symbol)
+        return f"{self.name}: {symbol}"
+
+    def candlesticks(self, symbol: str, *args: Any) -> list[str]:
+        self._record("candlesticks", symbol)
+        return [self.name]
+
+    def history_candlesticks_by_date(self, symbol: str, *args: Any) -> list[str]:
+        self._record("history_candlesticks_by_date", symbol)
+        return [self.name]
+
+    def trading_session(self) -> list[str]:
+        self._record("trading_session", None)
+        return [self.name]
+
+    def trading_days(self, market: Any, begin: date, end: date) -> str:
+        self._record("trading_days", str(market))
+        return self.name
+
+    def brokers(self, symbol: str) -> str:
+        self._record("brokers", symbol)
+        return f"{self.name} brokers: {symbol}"
+
+    def static_info(self, symbols: list[str]) -> list[SimpleNamespace]:
+        self._record("static_info", list(symbols))
+        return [SimpleNamespace(symbol=s, source=self.name) for s in symbols]
+
+    def participants(self) -> list[str]:
+        self._record("participants", None)
+        return [self.name]
+
+    def trades(self, symbol: str, count: int) -> list[str]:
+        self._record("trades", symbol)
+        return [self.name]
+
+    def intraday(self, symbol: str, *args: Any) -> list[str]:
+        self._record("intraday", symbol)
+        return [self.name]
+
+    def capital_flow(self, symbol: str) -> list[str]:
+        self._record("capital_flow", symbol)
+        return [self.name]
+
+    def capital_distribution(self, symbol: str) -> str:
+        self._record("capital_distribution", symbol)
+        return self.name
+
+    def calc_indexes(self, symbols: list[str], indexes: list[Any]) -> list[str]:
+        self._record("calc_indexes", list(symbols))
+        return [self.name]
+
+    def market_temperature(self, market: Any) -> str:
+        self._record("market_temperature", str(market))
+        return self.name
+
+    def history_market_temperature(self, market: Any, *args: Any) -> str:
+        self._record("history_market_temperature", str(market))
+        return self.name
+
+    def set_on_trades(self, callback: Any) -> None:
+        self._record("set_on_trades", None)
+
+    def subscribe(self, symbols: list[str], sub_types: list[Any]) -> None:
+        self._record("subscribe", list(symbols))
+
+    def unsubscribe(self, symbols: list[str], sub_types: list[Any]) -> None:
+        self._record("unsubscribe", list(symbols))
+
+
+class TestProtocol:
+    def test_fake_backend_satisfies_protocol(self):
+        """测试结构化协议检查"""
+        assert isinstance(FakeBackend("a"), MarketDataBackend)
+        assert isinstance(CachingBackend(FakeBackend("a")), MarketDataBackend)
+
+    def test_forward_extra_methods(self):
+        """测试协议之外的方法同样经过中间件"""
+        backend = MetricsBackend(FakeBackend("a"))
+        assert backend.brokers("700.HK") == "a brokers: 700.HK"
+        assert backend.stats()["brokers"].calls == 1
+        assert backend.name == "a"
+        with pytest.raises(AttributeError):
+            backend.missing_attribute  # type: ignore
+
+
+class TestCaching:
+    def test_ttl(self):
+        """测试 TTL 内复用结果，参数不同分别缓存"""
+        now = [0.0]
+        fake = FakeBackend("a")
+        backend = CachingBackend(fake, {"depth": 1.0}, clock=lambda: now[0])
+        assert backend.depth("700.HK") == backend.depth("700.HK")
+        backend.depth("AAPL.US")
+        now[0] = 1.5
+        backend.depth("700.HK")
+        assert [c[1] for c in fake.calls] == ["700.HK", "AAPL.US", "700.HK"]
+        assert (backend.hits, backend.misses) == (1, 3)
+
+    def test_coalescing(self):
+        """测试并发的相同调用共享一次请求"""
+        fake = FakeBackend("a", delay=0.05)
+        backend = CachingBackend(fake, {})
+        results: list[Any] = []
+        threads = [
+            threading.Thread(target=lambda: results.append(backend.depth("700.HK")))
+            for _ in range(6)
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        assert len(fake.calls) == 1
+        assert results == ["a: 700.HK"] * 6
+        assert backend.coalesced == 5
+        # 没有配置 TTL 的方法不缓存
+        backend.depth("700.HK")
+        assert len(fake.calls) == 2
+
+    def test_lru_eviction(self):
+        """测试超出容量时淘汰最久未使用的结果"""
+        fake = FakeBackend("a")
+        backend = CachingBackend(fake, {"depth": 60}, max_entries=2)
+        for symbol in ("A", "B", "A", "C", "A", "B"):
+            backend.depth(symbol)
+        assert [c[1] for c in fake.calls] == ["A", "B", "C", "B"]
+
+    def test_list_results_are_copies(self):
+        """测试每个调用方拿到各自的列表，修改返回值不影响缓存"""
+        fake = FakeBackend("a")
+        backend = CachingBackend(fake, {"quote": 60})
+        first = backend.quote(["700.HK"])
+        first.clear()
+        second = backend.quote(["700.HK"])
+        third = backend.quote(["700.HK"])
+        assert isinstance(second, list) and len(second) == 1
+        assert second is not third
+        assert len(fake.calls) == 1
+
+    def test_hits_do_not_take_lock(self):
+        """测试缓存命中不加锁，写线程持有锁时读线程照常返回"""
+        fake = FakeBackend("a")
+        backend = CachingBackend(fake, {"depth": 60})
+        backend.depth("700.HK")
+        with backend._lock:
+            result: list[Any] = []
+            reader = threading.Thread(
+                target=lambda: result.append(backend.depth("700.HK"))
+            )
+            reader.start()
+            reader.join(1)
+            assert result == ["a: 700.HK"]
+
+    def test_concurrent_readers_and_writer(self):
+        """测试读线程与不断写入新结果的写线程并发"""
+        fake = FakeBackend("a")
+        backend = CachingBackend(fake, {"depth": 60}, max_entries=50)
+        backend.depth("HOT")
+        stop = threading.Event()
+        errors: list[Any] = []
+
+        def read() -> None:
+            while not stop.is_set():
+                if backend.depth("HOT") != "a: HOT":
+                    errors.append("mismatch")
+                time.sleep(0)
+
+        def write() -> None:
+            for i in range(200):
+                backend.depth(f"{i}.HK")
+            stop.set()
+
+        threads = [threading.Thread(target=read) for _ in range(4)]
+        threads.append(threading.Thread(target=write))
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        assert errors == []
+        # 热点结果一直被命中，不会被淘汰
+        assert [c[1] for c in fake.calls].count("HOT") == 1
+
+
+class TestRateLimitAndMetrics:
+    def test_rate_limited(self):
+        """测试每次调用都获取令牌"""
+        limiter = MagicMock()
+        backend = RateLimitedBackend(FakeBackend("a"), limiter)
+        backend.quote(["700.HK"])
+        backend.trading_session()
+        assert limiter.acquire.call_count == 2
+
+    def test_metrics_errors(self):
+        """测试统计错误次数与耗时"""
+        backend = MetricsBackend(FakeBackend("a", fail=True))
+        with pytest.raises(RuntimeError):
+            backend.depth("700.HK")
+        stats = backend.stats()["depth"]
+        assert (stats.calls, stats.errors) == (1, 1)
+        assert backend.latency("depth") is not None
+        assert backend.latency("quote") is None
+
+    def test_build_backend_stack(self):
+        """测试组合后的数据源依次经过统计、缓存、限流"""
+        limiter = MagicMock()
+        backend = build_backend(FakeBackend("a"), rate_limiter=limiter)
+        backend.depth("700.HK")
+        backend.depth("700.HK")
+        assert limiter.acquire.call_count == 1
+        assert backend.stats()["depth"].calls == 2
+
+
+class TestRouting:
+    def test_failover(self):
+        """测试主数据源失败后切换到备用数据源"""
+        primary, backup = FakeBackend("primary", fail=True), FakeBackend("backup")
+        router = RoutingBackend({"primary": primary, "backup": backup})
+        assert router.depth("700.HK") == "backup: 700.HK"
+        assert router.failovers == 1
+        assert len(primary.calls) == 1
+
+    def test_all_failed(self):
+        """测试全部数据源失败时抛出最后一个异常"""
+        router = RoutingBackend(
+            {"a": FakeBackend("a", fail=True), "b": FakeBackend("b", fail=True)}
+        )
+        with pytest.raises(RuntimeError, match="b down"):
+            router.trading_session()
+
+    def test_timeout_failover(self):
+        """测试主数据源超时后切换"""
+        router = RoutingBackend(
+            {"slow": FakeBackend("slow", delay=0.5), "fast": FakeBackend("fast")},
+            timeout=0.05,
+        )
+        try:
+            assert router.depth("700.HK") == "fast: 700.HK"
+        finally:
+            router.close()
+
+    def test_market_routes_and_quote_split(self):
+        """测试按市场路由，行情按数据源分组后恢复原顺序"""
+        hk, us = FakeBackend("hk"), FakeBackend("us")
+        router = RoutingBackend(
+            {"hk": hk, "us": us},
+            market_routes={"US": ["us", "hk"], "HK": ["hk"]},
+        )
+        quotes = router.quote(["AAPL.US", "700.HK", "TSLA.US"])
+        assert [(q.symbol, q.source) for q in quotes] == [
+            ("AAPL.US", "us"),
+            ("700.HK", "hk"),
+            ("TSLA.US", "us"),
+        ]
+        assert (
+            router.trading_days(Market.US, date(2024, 1, 1), date(2024, 1, 2)) == "us"
+        )
+        assert router.depth("700.HK") == "hk: 700.HK"
+
+    def test_push_routes(self):
+        """测试推送回调设置到全部数据源，订阅按市场路由"""
+        hk, us = FakeBackend("hk"), FakeBackend("us")
+        router = RoutingBackend(
+            {"hk": hk, "us": us},
+            market_routes={"US": ["us", "hk"], "HK": ["hk"]},
+        )
+        router.set_on_trades(lambda symbol, event: None)
+        router.subscribe(["AAPL.US", "700.HK"], [])
+        router.unsubscribe(["700.HK"], [])
+        assert hk.calls == [
+            ("set_on_trades", None),
+            ("subscribe", ["700.HK"]),
+            ("unsubscribe", ["700.HK"]),
+        ]
+        assert us.calls == [("set_on_trades", None), ("subscribe", ["AAPL.US"])]
+
+    def test_prefer_fastest(self):
+        """测试按平均耗时选择最快的数据源"""
+        slow, fast = FakeBackend("slow", delay=0.02), FakeBackend("fast")
+        router = RoutingBackend({"slow": slow, "fast": fast}, prefer="fastest")
+        router.metrics["slow"].observe("depth", 0.02)
+        router.metrics["fast"].observe("depth", 0.001)
+        assert router.candidates("HK") == ["fast", "slow"]
+        assert router.depth("700.HK") == "fast: 700.HK"
+
+
+class TestAdapterBackend:
+    def test_adapter_uses_backend(self):
+        """测试适配器使用注入的数据源，不再创建 QuoteContext"""
+        with patch("modules.long_port_market_adapter.QuoteContext") as quote_context:
+            adapter = LongPortMarketAdapter(backend=build_backend(FakeBackend("sim")))
+        quote_context.assert_not_called()
+        assert adapter.fetch_depth("700.HK") == "sim: 700.HK"
+        assert adapter.fetch_quote("700.HK").source == "sim"  # type: ignore
+        assert adapter.fetch_brokers("700.HK") == "sim brokers: 700.HK"
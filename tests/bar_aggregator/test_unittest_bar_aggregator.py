@@ -0,0 +1,194 @@
+from datetime import datetime, timedelta
+from decimal import Decimal
+from types import SimpleNamespace
+from unittest.mock import MagicMock
+import pytest
+from longport.openapi import SubType
+from modules.bar_aggregator import Bar, BarAggregator, parse_period
+from modules.markets import market_timezone
+from modules.trading_calendar import TradingCalendar
+
+HK_TZ = market_timezone("HK")
+
+
+def hk_trade(hour: int, minute: int, second: int, price: str, volume: int = 100):  # type: ignore
+    return SimpleNamespace(
+        timestamp=datetime(2024, 2, 8, hour, minute, second, tzinfo=HK_TZ),
+        price=Decimal(price),
+        volume=volume,
+        trade_type="",
+    )
+
+
+@pytest.fixture
+def bars() -> list[Bar]:
+    return []
+
+
+class TestParsePeriod:
+    @pytest.mark.parametrize(
+        "period,expected", [("15s", 15), ("3m", 180), ("1h", 3600), (60, 60)]
+    )
+    def test_valid(self, period: str | int, expected: int):
+        """测试合法的周期"""
+        assert parse_period(period) == expected
+
+    @pytest.mark.parametrize("period", ["3d", "abc", 0, "0s"])
+    def test_invalid(self, period: str | int):
+        """测试非法的周期"""
+        with pytest.raises(ValueError):
+            parse_period(period)
+
+
+class TestBarAggregation:
+    def test_ohlcv(self, mock_calendar: TradingCalendar, bars: list[Bar]):
+        """测试按交易时段对齐聚合 OHLCV"""
+        aggregator = BarAggregator("3m", bars.append, mock_calendar)
+        aggregator.add_trades(
+            "0700.HK",
+            [
+                hk_trade(9, 30, 10, "300.0"),
+                hk_trade(9, 31, 0, "302.0", 200),
+                hk_trade(9, 32, 59, "299.5"),
+                hk_trade(9, 33, 5, "301.0"),
+            ],
+        )
+        assert len(bars) == 1
+        bar = bars[0]
+        assert bar.begin == datetime(2024, 2, 8, 9, 30, tzinfo=HK_TZ)
+        assert bar.end == datetime(2024, 2, 8, 9, 33, tzinfo=HK_TZ)
+        assert (bar.open, bar.high, bar.low, bar.close) == (
+            Decimal("300.0"),
+            Decimal("302.0"),
+            Decimal("299.5"),
+            Decimal("299.5"),
+        )
+        assert bar.volume == 400
+        assert bar.turnover == Decimal("120350.0")
+        assert bar.count == 3
+
+        current = aggregator.current("0700.HK")
+        assert current is not None
+        assert current.open == Decimal("301.0")
+
+    def test_bar_truncated_at_session_end(
+        self, mock_calendar: TradingCalendar, bars: list[Bar]
+    ):
+        """测试K线在时段结束处截断，午休成交被丢弃"""
+        aggregator = BarAggregator("7m", bars.append, mock_calendar)
+        aggregator.add_trades(
+            "0700.HK", [hk_trade(11, 58, 0, "300.0"), hk_trade(12, 30, 0, "301.0")]
+        )
+        current = aggregator.current("0700.HK")
+        assert current is not None
+        assert current.begin == datetime(2024, 2, 8, 11, 57, tzinfo=HK_TZ)
+        assert current.end == datetime(2024, 2, 8, 12, 0, tzinfo=HK_TZ)
+        assert aggregator.dropped_trades == 1
+
+        aggregator.add_trades("0700.HK", [hk_trade(13, 0, 1, "302.0")])
+        assert len(bars) == 1
+        new_bar = aggregator.current("0700.HK")
+        assert new_bar is not None
+        assert new_bar.begin == datetime(2024, 2, 8, 13, 0, tzinfo=HK_TZ)
+
+    def test_late_trade_ignored(self, mock_calendar: TradingCalendar, bars: list[Bar]):
+        """测试迟到的成交被忽略"""
+        aggregator = BarAggregator("1m", bars.append, mock_calendar)
+        aggregator.add_trades(
+            "0700.HK", [hk_trade(10, 5, 0, "300.0"), hk_trade(10, 3, 0, "1.0")]
+        )
+        current = aggregator.current("0700.HK")
+        assert current is not None
+        assert current.low == Decimal("300.0")
+        assert aggregator.late_trades == 1
+
+    def test_flush(self, mock_calendar: TradingCalendar, bars: list[Bar]):
+        """测试没有新成交时按时间关闭K线"""
+        aggregator = BarAggregator("15s", bars.append, mock_calendar)
+        aggregator.add_trades("0700.HK", [hk_trade(10, 0, 3, "300.0")])
+        aggregator.add_trades("9988.HK", [hk_trade(10, 0, 20, "80.0")])
+
+        closed = aggregator.flush(datetime(2024, 2, 8, 10, 0, 15, tzinfo=HK_TZ))
+        assert [bar.symbol for bar in closed] == ["0700.HK"]
+        assert bars == closed
+        assert aggregator.current("0700.HK") is None
+        assert aggregator.flush(datetime(2024, 2, 8, 10, 0, 16, tzinfo=HK_TZ)) == []
+
+    def test_late_trade_after_flush(
+        self, mock_calendar: TradingCalendar, bars: list[Bar]
+    ):
+        """测试落在已关闭K线内的成交不会产生重复K线"""
+        aggregator = BarAggregator("15s", bars.append, mock_calendar)
+        aggregator.add_trades("0700.HK", [hk_trade(10, 0, 3, "300.0")])
+        aggregator.flush(datetime(2024, 2, 8, 10, 0, 15, tzinfo=HK_TZ))
+        aggregator.add_trades("0700.HK", [hk_trade(10, 0, 10, "301.0")])
+        assert aggregator.current("0700.HK") is None
+        assert aggregator.late_trades == 1
+        aggregator.add_trades("0700.HK", [hk_trade(10, 0, 16, "302.0")])
+        assert aggregator.current("0700.HK") is not None
+        assert len(bars) == 1
+
+    def test_without_calendar(self, bars: list[Bar]):
+        """测试没有交易日历时按自然时间对齐"""
+        aggregator = BarAggregator("15s", bars.append)
+        aggregator.add_trades("0700.HK", [hk_trade(12, 30, 7, "300.0")])
+        current = aggregator.current("0700.HK")
+        assert current is not None
+        assert current.begin == datetime(2024, 2, 8, 12, 30, 0, tzinfo=HK_TZ)
+        assert current.end - current.begin == timedelta(seconds=15)
+
+
+class TestTradeSources:
+    def test_poll_skips_seen_trades(
+        self, mock_calendar: TradingCalendar, bars: list[Bar]
+    ):
+        """测试轮询时跳过已处理的成交"""
+        adapter = MagicMock()
+        adapter.fetch_trades.side_effect = [
+            [hk_trade(10, 0, 1, "300.0"), hk_trade(10, 0, 2, "301.0")],
+            [
+                hk_trade(10, 0, 2, "301.0"),
+                hk_trade(10, 0, 2, "302.0"),
+                hk_trade(10, 0, 3, "303.0"),
+            ],
+        ]
+        aggregator = BarAggregator("1m", bars.append, mock_calendar)
+        aggregator.poll(adapter, ["0700.HK"])
+        aggregator.poll(adapter, ["0700.HK"])
+
+        current = aggregator.current("0700.HK")
+        assert current is not None
+        assert current.count == 4
+        assert current.close == Decimal("303.0")
+
+    def test_poll_keeps_identical_trades(
+        self, mock_calendar: TradingCalendar, bars: list[Bar]
+    ):
+        """测试同一时间同价同量的不同成交都会计入，重复拉取的不会"""
+        adapter = MagicMock()
+        adapter.fetch_trades.side_effect = [
+            [hk_trade(10, 0, 1, "300.0")],
+            [hk_trade(10, 0, 1, "300.0"), hk_trade(10, 0, 1, "300.0")],
+            [hk_trade(10, 0, 1, "300.0"), hk_trade(10, 0, 1, "300.0")],
+        ]
+        aggregator = BarAggregator("1m", bars.append, mock_calendar)
+        for _ in range(3):
+            aggregator.poll(adapter, ["0700.HK"])
+
+        current = aggregator.current("0700.HK")
+        assert current is not None
+        assert current.count == 2
+        assert current.volume == 200
+
+    def test_attach_subscribes_trades(self, bars: list[Bar]):
+        """测试订阅逐笔成交推送"""
+        adapter = MagicMock()
+        aggregator = BarAggregator("1m", bars.append)
+        aggregator.attach(adapter, ["0700.HK"])
+        adapter.set_on_trades.assert_called_once_with(aggregator.on_push_trades)
+        adapter.subscribe.assert_called_once_with(["0700.HK"], [SubType.Trade])
+
+        aggregator.on_push_trades(
+            "0700.HK", SimpleNamespace(trades=[hk_trade(10, 0, 1, "300.0")])
+        )
+        assert aggregator.current("0700.HK") is not None
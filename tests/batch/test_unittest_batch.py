@@ -0,0 +1,38 @@
+import threading
+import time
+from unittest.mock import MagicMock
+from modules.batch import BatchResult, fan_out
+
+
+class TestFanOut:
+    def test_bounded_parallelism(self):
+        """测试并发数不超过上限"""
+        running = 0
+        peak = 0
+        lock = threading.Lock()
+
+        def call(symbol: str) -> str:
+            nonlocal running, peak
+            with lock:
+                running += 1
+                peak = max(peak, running)
+            time.sleep(0.01)
+            with lock:
+                running -= 1
+            return symbol.lower()
+
+        result = fan_out(call, [f"{i}.HK" for i in range(12)], max_workers=3)
+        assert peak == 3
+        assert result["11.HK"] == "11.hk"
+        assert len(result) == 12
+
+    def test_rate_limiter(self):
+        """测试每次调用都获取一个令牌"""
+        limiter = MagicMock()
+        fan_out(str.lower, ["A", "B", "A"], rate_limiter=limiter)
+        assert limiter.acquire.call_count == 2
+
+    def test_empty(self):
+        """测试空列表"""
+        result: BatchResult[str] = fan_out(str.lower, [])
+        assert result.ok and len(result) == 0
@@ -0,0 +1,125 @@
+from datetime import date, datetime, timedelta
+from decimal import Decimal
+from types import SimpleNamespace
+from unittest.mock import MagicMock
+import numpy as np
+import pytest
+from longport.openapi import AdjustType, Period
+from modules.candle_archive import CandleArchive, period_key
+from modules.timestamps import to_epoch_ns
+
+START = datetime(2024, 2, 1, 9, 30)
+
+
+def make_candle(i: int, close: str = "100.125") -> SimpleNamespace:
+    price = Decimal(close) + i
+    return SimpleNamespace(
+        close=price,
+        open=price - Decimal("0.5"),
+        low=price - 1,
+        high=price + 1,
+        volume=1000 + i,
+        turnover=price * (1000 + i),
+        timestamp=START + timedelta(minutes=i),
+    )
+
+
+def ns(i: int) -> int:
+    return to_epoch_ns(START + timedelta(minutes=i))
+
+
+@pytest.fixture
+def archive(tmp_path):
+    archive = CandleArchive(tmp_path, segment_rows=4)
+    yield archive
+    archive.close()
+
+
+class TestCandleArchive:
+    def test_period_key(self) -> None:
+        """测试周期目录名"""
+        assert period_key(Period.Min_1) == "Min_1"
+        assert period_key("Day") == "Day"
+
+    def test_append_and_read_across_segments(self, archive, tmp_path) -> None:
+        """测试追加写入跨段文件，并按时间区间读取"""
+        assert archive.append(
+            "700.HK", Period.Min_1, [make_candle(i) for i in range(10)]
+        )
+        segments = sorted((tmp_path / "Min_1" / "700.HK").glob("*.seg"))
+        assert len(segments) == 3
+        arrays = archive.read("700.HK", Period.Min_1)
+        assert len(arrays) == 10
+        assert arrays.timestamp_ns.tolist() == [ns(i) for i in range(10)]
+        np.testing.assert_allclose(arrays.as_float("close")[:2], [100.125, 101.125])
+
+        window = archive.read("700.HK", Period.Min_1, ns(3), ns(6))
+        assert window.timestamp_ns.tolist() == [ns(i) for i in range(3, 7)]
+        assert len(archive.read("700.HK", Period.Min_1, ns(20))) == 0
+        assert len(archive.read("AAPL.US", Period.Min_1)) == 0
+
+    def test_append_is_incremental(self, archive) -> None:
+        """测试增量追加：跳过已归档的K线，覆盖最后一根未走完的K线"""
+        archive.append("700.HK", Period.Min_1, [make_candle(i) for i in range(3)])
+        updated = [make_candle(i, close="200") for i in range(1, 6)]
+        assert archive.append("700.HK", Period.Min_1, updated) == 4
+        arrays = archive.read("700.HK", Period.Min_1)
+        assert arrays.timestamp_ns.tolist() == [ns(i) for i in range(6)]
+        # 第 0、1 根保持不变，第 2 根被覆盖
+        assert arrays.close.tolist()[:3] == [1001250, 1011250, 2020000]
+        assert archive.append("700.HK", Period.Min_1, [make_candle(0)]) == 0
+
+    def test_reopen_and_reader_index(self, archive, tmp_path) -> None:
+        """测试重新打开归档继续追加，读取器使用段索引定位并返回零拷贝视图"""
+        archive.append("700.HK", Period.Min_1, [make_candle(i) for i in range(6)])
+        archive.close()
+        reopened = CandleArchive(tmp_path, segment_rows=4)
+        reopened.append("700.HK", Period.Min_1, [make_candle(i) for i in range(6, 9)])
+        with reopened.open("700.HK", Period.Min_1) as reader:
+            assert len(reader) == 9
+            assert [(i.first_ns, i.count) for i in reader.index] == [
+                (ns(0), 4),
+                (ns(4), 4),
+                (ns(8), 1),
+            ]
+            parts = list(reader.slices(ns(5), ns(8)))
+            assert [p.timestamp_ns.tolist() for p in parts] == [
+                [ns(5), ns(6), ns(7)],
+                [ns(8)],
+            ]
+            assert not parts[0].close.flags.writeable
+            del parts
+        reopened.close()
+
+    def test_reader_sees_later_appends(self, archive) -> None:
+        """测试已打开的读取器能看到同一段文件中后续追加的行"""
+        archive.append("700.HK", Period.Min_1, [make_candle(0)])
+        with archive.open("700.HK", Period.Min_1) as reader:
+            archive.append("700.HK", Period.Min_1, [make_candle(1)])
+            (part,) = reader.slices()
+            assert part.timestamp_ns.tolist() == [ns(0), ns(1)]
+            del part
+
+    def test_invalid_input(self, archive, tmp_path) -> None:
+        """测试非法输入"""
+        with pytest.raises(ValueError):
+            archive.append("../x", Period.Min_1, [make_candle(0)])
+        with pytest.raises(ValueError):
+            archive.append("700.HK", Period.Min_1, [make_candle(1), make_candle(0)])
+        bad = tmp_path / "Day" / "700.HK"
+        bad.mkdir(parents=True)
+        (bad / f"{0:020d}.seg").write_bytes(b"\0" * 128)
+        with pytest.raises(ValueError):
+            archive.open("700.HK", "Day")
+
+    def test_backfill(self, archive) -> None:
+        """测试从接口回补历史K线"""
+        adapter = MagicMock()
+        adapter.fetch_history_candlesticks_by_date.return_value = [
+            make_candle(i) for i in range(3)
+        ]
+        start, end = date(2024, 2, 1), date(2024, 2, 2)
+        assert archive.backfill(adapter, "700.HK", Period.Min_1, start, end) == 3
+        args = adapter.fetch_history_candlesticks_by_date.call_args.args
+        assert args[:5] == ("700.HK", Period.Min_1, AdjustType.NoAdjust, start, end)
+        assert len(archive.read("700.HK", Period.Min_1)) == 3
@@ -0,0 +1,135 @@
+from dataclasses import replace
+from datetime import date, datetime, timedelta
+from decimal import Decimal
+from unittest.mock import MagicMock
+import pytest
+from longport.openapi import AdjustType, Period
+from modules.candle_rollup import CandleRollup, period_seconds
+from modules.codec import CandlestickRecord
+from modules.markets import market_timezone
+from modules.timestamps import to_epoch_ns
+from modules.trading_calendar import TradingCalendar
+
+HK_TZ = market_timezone("HK")
+
+
+def hk_bar(day: int, hour: int, minute: int, price: str = "300") -> CandlestickRecord:
+    price_ = Decimal(price)
+    return CandlestickRecord(
+        close=price_,
+        open=price_,
+        low=price_ - 1,
+        high=price_ + 1,
+        volume=100,
+        turnover=price_ * 100,
+        timestamp_ns=to_epoch_ns(datetime(2024, 2, day, hour, minute, tzinfo=HK_TZ)),
+        trade_session="Intraday",
+    )
+
+
+def minutes(day: int, begin: datetime, count: int) -> list[CandlestickRecord]:
+    bars = []
+    for i in range(count):
+        at = begin + timedelta(minutes=i)
+        bars.append(hk_bar(day, at.hour, at.minute, str(300 + i)))
+    return bars
+
+
+def starts(bars: list[CandlestickRecord]) -> list[str]:
+    return [bar.local_time("HK").strftime("%H:%M") for bar in bars]
+
+
+class TestPeriodSeconds:
+    def test_period_seconds(self) -> None:
+        """测试周期秒数"""
+        assert period_seconds(Period.Min_15) == 900
+        assert period_seconds(Period.Week) is None
+        with pytest.raises(ValueError):
+            period_seconds(Period.Unknown)
+
+    def test_invalid_configuration(self) -> None:
+        """测试基础周期不能整除目标周期或不是日内周期"""
+        with pytest.raises(ValueError):
+            CandleRollup(periods=[Period.Min_5], base_period=Period.Min_2)
+        with pytest.raises(ValueError):
+            CandleRollup(base_period=Period.Day)
+
+
+class TestCandleRollup:
+    def test_session_aligned_rollup(self, mock_calendar: TradingCalendar) -> None:
+        """测试按交易时段对齐汇总，不跨越午休，时段外的K线被丢弃"""
+        rollup = CandleRollup(mock_calendar)
+        base = minutes(8, datetime(2024, 2, 8, 11, 25), 35)  # 11:25 - 11:59
+        base.append(hk_bar(8, 12, 30))
+        base += minutes(8, datetime(2024, 2, 8, 13, 0), 5)
+        rollup.update("700.HK", base)
+        assert rollup.dropped_bars == 1
+
+        hourly = rollup.bars("700.HK", Period.Min_60)
+        assert starts(hourly) == ["10:30", "11:30", "13:00"]
+        assert [bar.volume for bar in hourly] == [500, 3000, 500]
+        first = hourly[0]
+        assert (first.open, first.close) == (Decimal("300"), Decimal("304"))
+        assert (first.low, first.high) == (Decimal("299"), Decimal("305"))
+        assert starts(rollup.bars("700.HK", Period.Min_15))[:2] == ["11:15", "11:30"]
+
+        (day,) = rollup.bars("700.HK", Period.Day)
+        assert day.local_time("HK") == datetime(2024, 2, 8, tzinfo=HK_TZ)
+        assert day.volume == 4000
+        lunch = hk_bar(8, 12, 30)
+        assert day.turnover == sum(b.turnover for b in base if b != lunch)
+
+    def test_incremental_updates(self, mock_calendar: TradingCalendar) -> None:
+        """测试增量更新：新完成的K线、未走完K线的修正、重复送入不产生变化"""
+        rollup = CandleRollup(mock_calendar, periods=[Period.Min_5])
+        rollup.update("700.HK", minutes(8, datetime(2024, 2, 8, 9, 30), 4))
+        last = hk_bar(8, 9, 33, "303")
+        revised = replace(last, close=Decimal("310"), high=Decimal("311"), volume=150)
+        changed = rollup.update("700.HK", [revised])
+        (current,) = changed["Min_5"]
+        assert (current.close, current.high, current.volume) == (
+            Decimal("310"),
+            Decimal("311"),
+            450,
+        )
+        assert rollup.update("700.HK", [revised]) == {}
+
+        changed = rollup.update("700.HK", [hk_bar(8, 9, 35)])
+        assert starts(changed["Min_5"]) == ["09:30", "09:35"]
+        assert len(rollup.bars("700.HK", Period.Min_5)) == 2
+        assert len(rollup.bars("700.HK", Period.Min_5, count=1)) == 1
+
+        rollup.update("700.HK", [hk_bar(8, 9, 31)])
+        assert rollup.late_bars == 1
+        with pytest.raises(KeyError):
+            rollup.bars("700.HK", Period.Day)
+
+    def test_without_calendar(self) -> None:
+        """测试没有交易日历时按自然日和整点对齐"""
+        rollup = CandleRollup(periods=[Period.Min_60, Period.Day, Period.Week])
+        rollup.update("700.HK", [hk_bar(8, 9, 30), hk_bar(8, 10, 5), hk_bar(9, 9, 30)])
+        assert starts(rollup.bars("700.HK", Period.Min_60)) == [
+            "09:00",
+            "10:00",
+            "09:00",
+        ]
+        assert len(rollup.bars("700.HK", Period.Day)) == 2
+        (week,) = rollup.bars("700.HK", Period.Week)
+        assert week.volume == 300
+
+    def test_backfill_and_refresh_fetch_base_period(self) -> None:
+        """测试回补与刷新只请求基础周期"""
+        adapter = MagicMock()
+        adapter.fetch_history_candlesticks_by_date_normalized.return_value = [
+            hk_bar(8, 9, 30)
+        ]
+        adapter.fetch_candlesticks_normalized.return_value = [hk_bar(8, 9, 31)]
+        rollup = CandleRollup(periods=[Period.Min_5])
+        rollup.backfill(adapter, "700.HK", date(2024, 2, 8), date(2024, 2, 8))
+        rollup.refresh(adapter, "700.HK", count=5)
+        args = adapter.fetch_history_candlesticks_by_date_normalized.call_args.args
+        assert args[1:3] == (Period.Min_1, AdjustType.NoAdjust)
+        args = adapter.fetch_candlesticks_normalized.call_args.args
+        assert args[1:3] == (Period.Min_1, 5)
+        (bar,) = rollup.bars("700.HK", Period.Min_5)
+        assert bar.volume == 200
@@ -0,0 +1,91 @@
+from datetime import datetime, timedelta
+from decimal import Decimal
+from types import SimpleNamespace
+from unittest.mock import MagicMock
+import numpy as np
+import pytest
+from modules.capital_flow import CapitalFlowAccumulator, CapitalFlowSeries
+from modules.rate_limiter import RateLimiter
+from modules.timestamps import to_epoch_ns
+
+OPEN = datetime(2024, 2, 8, 9, 30)
+
+
+def flow_lines(count: int, start: datetime = OPEN, last: str | None = None):  # type: ignore
+    lines = [
+        SimpleNamespace(timestamp=start + timedelta(minutes=i), inflow=Decimal(i))
+        for i in range(count)
+    ]
+    if last is not None:
+        lines[-1].inflow = Decimal(last)
+    return lines
+
+
+@pytest.fixture
+def adapter() -> MagicMock:
+    adapter = MagicMock()
+    adapter.fetch_capital_flow.side_effect = lambda symbol: flow_lines(3)
+    return adapter
+
+
+class TestCapitalFlowSeries:
+    def test_incremental_merge(self):
+        """测试只追加新的分钟点，并更新仍在变化的最后一个点"""
+        series = CapitalFlowSeries("700.HK", capacity=2)
+        assert series.merge(flow_lines(3, last="1.5")) == 3
+        assert series.inflows.tolist() == [0, 1, 1.5]
+        assert series.merge(flow_lines(5)) == 2
+        assert series.inflows.tolist() == [0, 1, 2, 3, 4]
+        assert series.timestamps[-1] == to_epoch_ns(OPEN + timedelta(minutes=4))
+        assert series.merge(flow_lines(5)) == 0
+        assert series.latest() == (int(series.timestamps[-1]), 4.0)
+
+    def test_new_day_resets(self):
+        """测试换日后清空重新累积"""
+        series = CapitalFlowSeries("700.HK")
+        series.merge(flow_lines(10))
+        assert series.merge(flow_lines(2, OPEN + timedelta(days=1))) == 2
+        assert len(series) == 2
+
+    def test_views_are_read_only(self):
+        """测试对外暴露的数组不可修改"""
+        series = CapitalFlowSeries("700.HK")
+        series.merge(flow_lines(2))
+        with pytest.raises(ValueError):
+            series.inflows[0] = 1
+
+
+class TestCapitalFlowAccumulator:
+    def test_refresh_many(self, adapter: MagicMock):
+        """测试批量刷新，单个标的失败不影响其他标的"""
+
+        def fetch(symbol: str):  # type: ignore
+            if symbol == "BAD.US":
+                raise RuntimeError("boom")
+            return flow_lines(3)
+
+        adapter.fetch_capital_flow.side_effect = fetch
+        accumulator = CapitalFlowAccumulator(adapter, RateLimiter(rate=1000))
+        results = accumulator.refresh_many(["700.HK", "AAPL.US", "BAD.US", "700.HK"])
+        assert results["700.HK"] == 3
+        assert isinstance(results.errors["BAD.US"], RuntimeError)
+        assert list(results.results) == ["700.HK", "AAPL.US"]
+        assert adapter.fetch_capital_flow.call_count == 3
+        inflows = accumulator.latest_inflows(["700.HK", "BAD.US", "NEW.US"])
+        assert inflows[0] == 2
+        assert np.isnan(inflows[1:]).all()
+
+    def test_shares_rate_limiter(self, adapter: MagicMock):
+        """测试每次请求都经过限流器"""
+        limiter = MagicMock()
+        accumulator = CapitalFlowAccumulator(adapter, limiter)
+        accumulator.refresh_many([f"{i}.HK" for i in range(7)])
+        assert limiter.acquire.call_count == 7
+        assert accumulator.series("0.HK") is not None
+        assert accumulator.series("X.HK") is None
+
+    def test_defaults_to_adapter_limiter(self, adapter: MagicMock):
+        """测试未指定限流器时与适配器共享同一个限流器"""
+        accumulator = CapitalFlowAccumulator(adapter)
+        accumulator.refresh("700.HK")
+        adapter.rate_limiter.acquire.assert_called_once()
@@ -0,0 +1,199 @@
+import pickle
+from datetime import date, datetime, time
+from decimal import Decimal
+from types import SimpleNamespace
+import numpy as np
+import pytest
+from longport.openapi import Market, TradeSession, TradeStatus
+from modules.codec import (
+    CandlestickRecord,
+    HistoryMarketTemperatureResponseRecord,
+    MarketTemperatureRecord,
+    MarketTradingDaysRecord,
+    MarketTradingSessionRecord,
+    PrePostQuoteRecord,
+    SecurityDepthRecord,
+    SecurityQuoteRecord,
+    decode_candles,
+    dumps,
+    dumps_many,
+    encode_candles,
+    loads,
+    loads_many,
+    to_record,
+)
+from modules.timestamps import to_epoch_ns
+
+
+def make_candle(i: int) -> SimpleNamespace:
+    price = Decimal("100.125") + i
+    return SimpleNamespace(
+        close=price,
+        open=price - Decimal("0.5"),
+        low=price - 1,
+        high=price + 1,
+        volume=1000 + i,
+        turnover=price * (1000 + i),
+        timestamp=datetime(2024, 2, 1, 9, 30 + i),
+        trade_session=TradeSession.Intraday,
+    )
+
+
+class TestConvert:
+    def test_quote_with_nested_optional(self) -> None:
+        """测试行情转换：时间戳转纳秒、枚举转名称、嵌套可选结构"""
+        timestamp = datetime(2024, 2, 1, 10, 0)
+        pre = SimpleNamespace(
+            last_done=Decimal("1.5"),
+            timestamp=timestamp,
+            volume=10,
+            turnover=Decimal("15"),
+            high=Decimal("1.6"),
+            low=Decimal("1.4"),
+            prev_close=Decimal("1.45"),
+        )
+        quote = SimpleNamespace(
+            symbol="700.HK",
+            last_done=Decimal("320.2"),
+            prev_close=Decimal("318"),
+            open=Decimal("319"),
+            high=Decimal("321"),
+            low=Decimal("317.8"),
+            timestamp=timestamp,
+            volume=123456,
+            turnover=Decimal("39500000.5"),
+            trade_status=TradeStatus.Normal,
+            pre_market_quote=pre,
+            post_market_quote=None,
+            overnight_quote=None,
+        )
+        record = to_record(quote, SecurityQuoteRecord)
+        assert record.timestamp_ns == to_epoch_ns(timestamp)
+        assert record.trade_status == "Normal"
+        assert isinstance(record.pre_market_quote, PrePostQuoteRecord)
+        assert record.post_market_quote is None
+        assert loads(dumps(record)) == record
+
+    def test_enum_and_list_fields(self) -> None:
+        """测试交易时段：市场枚举与 time 列表"""
+        session = SimpleNamespace(
+            market=Market.HK,
+            trade_sessions=[
+                SimpleNamespace(
+                    begin_time=time(9, 30),
+                    end_time=time(12, 0),
+                    trade_session=TradeSession.Intraday,
+                )
+            ],
+        )
+        record = to_record(session, MarketTradingSessionRecord)
+        assert record.market == "HK"
+        assert record.trade_sessions[0].end_time == time(12, 0)
+        assert loads(dumps(record)) == record
+
+    def test_unknown_type(self) -> None:
+        """测试无法推断类型时报错"""
+        with pytest.raises(TypeError):
+            to_record(object())
+
+
+class TestBinaryCodec:
+    def test_decimal_exact_and_compact(self) -> None:
+        """测试十进制数按缩放整数精确编码，且比 pickle 更紧凑"""
+        depth = to_record(
+            SimpleNamespace(
+                asks=[
+                    SimpleNamespace(
+                        position=i,
+                        price=Decimal("320.2") + Decimal("0.2") * i,
+                        volume=100 * i,
+                        order_num=i,
+                    )
+                    for i in range(1, 11)
+                ],
+                bids=[SimpleNamespace(position=1, price=None, volume=0, order_num=0)],
+            ),
+            SecurityDepthRecord,
+        )
+        data = dumps(depth)
+        decoded = loads(data)
+        assert decoded == depth
+        assert decoded.asks[-1].price == Decimal("322.2")
+        assert decoded.bids[0].price is None
+        assert len(data) < len(pickle.dumps(depth)) / 2
+
+    @pytest.mark.parametrize("value", ["NaN", "Infinity", "-Infinity"])
+    def test_non_finite_decimal_rejected(self, value: str) -> None:
+        """测试 NaN 与无穷大的十进制数拒绝编码"""
+        depth = to_record(
+            SimpleNamespace(
+                asks=[
+                    SimpleNamespace(
+                        position=1, price=Decimal(value), volume=100, order_num=1
+                    )
+                ],
+                bids=[],
+            ),
+            SecurityDepthRecord,
+        )
+        with pytest.raises(ValueError):
+            dumps(depth)
+
+    def test_negative_and_large_values(self) -> None:
+        """测试负数、大整数与日期字段"""
+        records = [
+            MarketTemperatureRecord(-5, "冷", 2**40, -(2**40), -1),
+            MarketTemperatureRecord(80, "热", 0, 0, 1_700_000_000_000_000_000),
+        ]
+        response = HistoryMarketTemperatureResponseRecord("Daily", records)
+        assert loads(dumps(response)) == response
+
+    def test_many(self) -> None:
+        """测试批量编解码"""
+        candles = [to_record(make_candle(i), CandlestickRecord) for i in range(20)]
+        assert loads_many(dumps_many(candles)) == candles
+        assert loads_many(dumps_many([])) == []
+
+
+class TestCandleArrays:
+    def test_roundtrip(self) -> None:
+        """测试K线列式编码与还原"""
+        candles = [make_candle(i) for i in range(5)]
+        arrays = decode_candles(encode_candles(candles))
+        assert len(arrays) == 5
+        assert arrays.close[0] == 1001250
+        np.testing.assert_allclose(
+            arrays.as_float("close"), [float(c.close) for c in candles]
+        )
+        assert arrays.timestamp_ns.tolist() == [
+            to_epoch_ns(c.timestamp) for c in candles
+        ]
+        assert arrays.volume.tolist() == [c.volume for c in candles]
+
+    def test_zero_copy(self) -> None:
+        """测试解码结果直接引用原始缓冲区"""
+        buffer = bytearray(encode_candles([make_candle(i) for i in range(3)]))
+        arrays = decode_candles(buffer)
+        assert np.shares_memory(arrays.close, np.frombuffer(buffer, dtype=np.uint8))
+        arrays.volume[0] = 42
+        assert decode_candles(buffer).volume[0] == 42
+
+    def test_records_and_bad_data(self) -> None:
+        """测试纯数据结构输入与非法数据"""
+        record = to_record(make_candle(0), CandlestickRecord)
+        arrays = decode_candles(encode_candles([record], scale=2))
+        assert arrays.scale == 2
+        assert arrays.open[0] == 9963  # 99.625 四舍五入到两位小数
+        with pytest.raises(ValueError):
+            decode_candles(b"\0" * 64)
+
+    def test_trading_days(self) -> None:
+        """测试日期列表编码"""
+        record = to_record(
+            SimpleNamespace(
+                trading_days=[date(2024, 2, 1), date(2024, 2, 2)],
+                half_trading_days=[],
+            ),
+            MarketTradingDaysRecord,
+        )
+        assert loads(dumps(record)) == record
@@ -1,8 +1,15 @@
 import pytest
+from datetime import date, time, timedelta
+from types import SimpleNamespace
 from typing import Callable
 from unittest.mock import MagicMock, patch
-from longport.openapi import Market
+from longport.openapi import Market, TradeSession
 from modules.long_port_market_adapter import LongPortMarketAdapter
+from modules.trading_calendar import TradingCalendar
+
+# 模拟交易日历：周一至周五交易，2024-02-12 ~ 2024-02-13 休市，2024-02-09 为半日市
+MOCK_HOLIDAYS = {date(2024, 2, 12), date(2024, 2, 13)}
+MOCK_HALF_DAYS = {date(2024, 2, 9)}
 
 
 @pytest.fixture(scope="module")
@@ -100,3 +107,55 @@ def mock_adapter() -> LongPortMarketAdapter:
         )
 
         return adapter
+
+
+def mock_trading_days(market, begin: date, end: date) -> SimpleNamespace:  # type: ignore
+    days = [
+        begin + timedelta(days=i)
+        for i in range((end - begin).days + 1)
+        if (begin + timedelta(days=i)).weekday() < 5
+    ]
+    return SimpleNamespace(
+        trading_days=[d for d in days if d not in MOCK_HOLIDAYS | MOCK_HALF_DAYS],
+        half_trading_days=[d for d in days if d in MOCK_HALF_DAYS],
+    )
+
+
+def mock_session(begin: time, end: time, trade_session) -> SimpleNamespace:  # type: ignore
+    return SimpleNamespace(begin_time=begin, end_time=end, trade_session=trade_session)
+
+
+@pytest.fixture
+def mock_calendar_adapter() -> MagicMock:
+    adapter = MagicMock()
+    adapter.fetch_trading_session.return_value = [
+        SimpleNamespace(
+            market=Market.HK,
+            trade_sessions=[
+                mock_session(time(13, 0), time(16, 0), TradeSession.Intraday),
+                mock_session(time(9, 30), time(12, 0), TradeSession.Intraday),
+            ],
+        ),
+        SimpleNamespace(
+            market=Market.US,
+            trade_sessions=[
+                mock_session(time(4, 0), time(9, 30), TradeSession.Pre),
+                mock_session(time(9, 30), time(16, 0), TradeSession.Intraday),
+                mock_session(time(16, 0), time(20, 0), TradeSession.Post),
+            ],
+        ),
+    ]
+    adapter.fetch_trading_days.side_effect = mock_trading_days
+    return adapter
+
+
+@pytest.fixture
+def mock_calendar(mock_calendar_adapter: MagicMock) -> TradingCalendar:
+    calendar = TradingCalendar(
+        mock_calendar_adapter,
+        markets=[Market.HK, Market.US],
+        lookback_days=60,
+        lookahead_days=60,
+    )
+    calendar.load(today=date(2024, 2, 1))
+    return calendar
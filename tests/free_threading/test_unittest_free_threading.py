@@ -0,0 +1,143 @@
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from decimal import Decimal
+from types import SimpleNamespace
+from unittest.mock import MagicMock, patch
+from longport.openapi import AdjustType, Period, TradeSessions
+from modules.codec import CandlestickRecord, to_record, to_records
+from modules.free_threading import (
+    Counter,
+    cpu_workers,
+    free_threaded_build,
+    gil_enabled,
+    parallel_map,
+)
+from modules.long_port_market_adapter import LongPortMarketAdapter
+
+
+def make_candles(n: int) -> list[SimpleNamespace]:
+    return [
+        SimpleNamespace(
+            close=Decimal(i),
+            open=Decimal(i),
+            low=Decimal(i),
+            high=Decimal(i),
+            volume=i,
+            turnover=Decimal(i),
+            timestamp=datetime.fromtimestamp(1_700_000_000 + i * 60),
+            trade_session="Intraday",
+        )
+        for i in range(n)
+    ]
+
+
+def run_threads(target, count: int = 8) -> None:
+    threads = [threading.Thread(target=target) for _ in range(count)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+
+class TestRuntime:
+    def test_gil_detection(self) -> None:
+        """测试 GIL 检测，启用 GIL 时 CPU 密集型任务只用一个线程"""
+        assert isinstance(free_threaded_build(), bool)
+        if not free_threaded_build():
+            assert gil_enabled()
+        with patch("modules.free_threading.gil_enabled", return_value=True):
+            assert cpu_workers() == 1
+        with patch("modules.free_threading.gil_enabled", return_value=False):
+            assert cpu_workers() >= 1
+
+    def test_counter_is_exact(self) -> None:
+        """测试多线程并发计数不丢失"""
+        counter = Counter()
+
+        def count() -> None:
+            for _ in range(10000):
+                counter.add()
+
+        run_threads(count)
+        assert counter.value == 80000
+        assert int(counter) == 80000
+
+    def test_counter_shards_bounded(self) -> None:
+        """测试反复创建短生命周期线程池时分片数量不增长，计数不丢失"""
+        counter = Counter()
+        for _ in range(200):
+            with ThreadPoolExecutor(max_workers=2) as executor:
+                list(executor.map(lambda _: counter.add(), range(4)))
+            assert len(counter._shards) <= 4
+        assert counter.value == 800
+        assert not counter._shards
+
+    def test_parallel_map_keeps_order(self) -> None:
+        """测试分块并行转换保持输入顺序"""
+        items = list(range(1000))
+        assert parallel_map(lambda x: x * 2, items, max_workers=4, chunk_size=7) == [
+            x * 2 for x in items
+        ]
+        assert parallel_map(str, [], max_workers=4) == []
+
+
+class TestConcurrentConversion:
+    def test_to_records_from_threads(self) -> None:
+        """测试多个线程同时转换得到一致的结果"""
+        candles = make_candles(500)
+        expected = to_records(candles, CandlestickRecord)
+        mismatches: list[int] = []
+
+        def convert() -> None:
+            for _ in range(5):
+                if to_records(candles, CandlestickRecord) != expected:
+                    mismatches.append(1)
+
+        run_threads(convert)
+        assert mismatches == []
+
+    def test_parallel_to_records(self) -> None:
+        """测试大批量数据分块并行转换"""
+        candles = make_candles(5000)
+        serial = to_records(candles, CandlestickRecord)
+        with patch("modules.free_threading.cpu_workers", return_value=4):
+            assert to_records(candles, CandlestickRecord) == serial
+
+    def test_conversion_scaling(self) -> None:
+        """测试离线K线转换的多线程扩展性（自由线程构建且至少 4 核时应随线程数提速）"""
+        candles = make_candles(5000)
+        timings: dict[int, float] = {}
+        for workers in (1, 4):
+            start_time = time.perf_counter()
+            records = parallel_map(
+                lambda c: to_record(c, CandlestickRecord),
+                candles,
+                max_workers=workers,
+            )
+            timings[workers] = time.perf_counter() - start_time
+            assert len(records) == len(candles)
+        print(
+            f"GIL: {'启用' if gil_enabled() else '未启用'}，CPU: {os.cpu_count()}，"
+            f"1 线程 {timings[1]:.3f}秒，4 线程 {timings[4]:.3f}秒"
+        )
+        if not gil_enabled() and (os.cpu_count() or 1) >= 4:
+            assert timings[1] / timings[4] > 1.5, "自由线程构建下转换没有随线程数提速"
+
+    def test_adapter_normalized_batch(self) -> None:
+        """测试并发获取多个标的的K线并转换"""
+        backend = MagicMock()
+        backend.candlesticks.side_effect = lambda symbol, *args: make_candles(10)
+        adapter = LongPortMarketAdapter(backend=backend)
+        result = adapter.fetch_candlesticks_normalized_batch(
+            ["700.HK", "AAPL.US"],
+            Period.Min_1,
+            10,
+            AdjustType.NoAdjust,
+            TradeSessions.Intraday,
+        )
+        assert result.ok
+        assert [len(result[s]) for s in ("700.HK", "AAPL.US")] == [10, 10]
+        assert isinstance(result["700.HK"][0], CandlestickRecord)
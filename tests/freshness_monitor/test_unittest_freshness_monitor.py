@@ -0,0 +1,198 @@
+from datetime import datetime
+from decimal import Decimal
+from types import SimpleNamespace
+from unittest.mock import patch
+import pytest
+from modules.freshness_monitor import FreshnessMonitor, StaleEvent
+from modules.long_port_market_adapter import LongPortMarketAdapter
+from modules.markets import market_timezone
+from modules.timestamps import NS_PER_SECOND, to_epoch_ns
+from modules.trading_calendar import TradingCalendar
+
+HK_TZ = market_timezone("HK")
+US_TZ = market_timezone("US")
+
+
+def hk_ns(hour: int, minute: int, second: int = 0) -> int:
+    return to_epoch_ns(datetime(2024, 2, 8, hour, minute, second, tzinfo=HK_TZ))
+
+
+@pytest.fixture
+def events() -> list[StaleEvent]:
+    return []
+
+
+class TestWithoutCalendar:
+    def test_market_tolerances(self, events: list[StaleEvent]):
+        """测试没有交易日历时按市场最大年龄检查"""
+        now = hk_ns(12, 0)
+        monitor = FreshnessMonitor(clock=lambda: now)
+        monitor.add_callback(events.append)
+
+        assert monitor.record("0700.HK", now - 11 * 3600 * NS_PER_SECOND) == 11 * 3600
+        assert not events
+        monitor.record("0700.HK", now - 13 * 3600 * NS_PER_SECOND)
+        monitor.record("600519.SH", now - 6 * 24 * 3600 * NS_PER_SECOND)
+        monitor.record("AAPL.US", now - 25 * 3600 * NS_PER_SECOND)
+        assert [(e.symbol, e.market) for e in events] == [
+            ("0700.HK", "HK"),
+            ("AAPL.US", "US"),
+        ]
+        assert events[0].threshold == 12 * 3600
+
+    def test_percentiles_and_stats(self):
+        """测试分位数统计只保留最近的样本"""
+        now = hk_ns(10, 0)
+        monitor = FreshnessMonitor(window=100, clock=lambda: now)
+        for age in range(200):
+            monitor.record("0700.HK", now - age * NS_PER_SECOND)
+        percentiles = monitor.percentiles("HK", (0, 50, 100))
+        assert percentiles == {0: 100.0, 50: 149.5, 100: 199.0}
+        stats = monitor.stats()["HK"]
+        assert (stats.count, stats.stale, stats.max) == (200, 0, 199.0)
+        assert monitor.percentiles("US")[50] != monitor.percentiles("US")[50]
+
+    def test_callback_error_is_isolated(self, events: list[StaleEvent]):
+        """测试回调异常不影响其他回调"""
+        monitor = FreshnessMonitor(clock=lambda: hk_ns(10, 0))
+        monitor.add_callback(lambda event: 1 / 0)  # type: ignore
+        monitor.add_callback(events.append)
+        monitor.record("0700.HK", 0)
+        assert len(events) == 1
+
+
+class TestWithCalendar:
+    def test_only_alerts_in_session(
+        self, mock_calendar: TradingCalendar, events: list[StaleEvent]
+    ):
+        """测试只在交易时段内检查，午休期间的旧数据不告警也不计入统计"""
+        clock = [hk_ns(10, 0)]
+        monitor = FreshnessMonitor(mock_calendar, clock=lambda: clock[0])
+        monitor.add_callback(events.append)
+
+        monitor.record("0700.HK", hk_ns(9, 59, 30))
+        monitor.record("0700.HK", hk_ns(9, 58))
+        clock[0] = hk_ns(12, 30)
+        monitor.record("0700.HK", hk_ns(12, 0))
+        clock[0] = hk_ns(13, 5)
+        monitor.record("0700.HK", hk_ns(12, 0))
+
+        assert [round(e.age) for e in events] == [120, 3900]
+        assert monitor.stats()["HK"].count == 3
+
+    def test_pre_market_not_checked(
+        self, mock_calendar: TradingCalendar, events: list[StaleEvent]
+    ):
+        """测试盘前时段不检查（行情时间戳停在上一个收盘）"""
+        close = to_epoch_ns(datetime(2024, 2, 7, 16, 0, tzinfo=US_TZ))
+        clock = [to_epoch_ns(datetime(2024, 2, 8, 7, 0, tzinfo=US_TZ))]
+        monitor = FreshnessMonitor(mock_calendar, clock=lambda: clock[0])
+        monitor.add_callback(events.append)
+
+        monitor.record("AAPL.US", close)
+        assert not events
+        assert "US" not in monitor.stats()
+        clock[0] = to_epoch_ns(datetime(2024, 2, 8, 9, 31, tzinfo=US_TZ))
+        monitor.record("AAPL.US", close)
+        assert [e.market for e in events] == ["US"]
+
+    def test_alerts_once_per_transition(
+        self, mock_calendar: TradingCalendar, events: list[StaleEvent]
+    ):
+        """测试持续过期只告警一次，恢复新鲜后再次过期重新告警"""
+        clock = [hk_ns(10, 0)]
+        monitor = FreshnessMonitor(mock_calendar, clock=lambda: clock[0])
+        monitor.add_callback(events.append)
+
+        for second in range(3):
+            clock[0] = hk_ns(10, 0, second)
+            monitor.record("0700.HK", hk_ns(9, 50))
+        monitor.record("9988.HK", hk_ns(9, 50))
+        monitor.record("0700.HK", hk_ns(10, 0))
+        clock[0] = hk_ns(10, 5)
+        monitor.record("0700.HK", hk_ns(10, 0))
+        assert [e.symbol for e in events] == ["0700.HK", "9988.HK", "0700.HK"]
+        assert monitor.stats()["HK"].stale == 5
+
+    def test_depth_age_from_content_change(
+        self, mock_calendar: TradingCalendar, events: list[StaleEvent]
+    ):
+        """测试盘口年龄按内容最近一次变化计算"""
+        clock = [hk_ns(10, 0)]
+        monitor = FreshnessMonitor(mock_calendar, clock=lambda: clock[0])
+        monitor.add_callback(events.append)
+
+        def depth(price: str):  # type: ignore
+            level = SimpleNamespace(price=Decimal(price), volume=100)
+            return SimpleNamespace(asks=[level], bids=[])
+
+        assert monitor.observe_depth("0700.HK", depth("300")) == 0
+        clock[0] = hk_ns(10, 1, 30)
+        assert monitor.observe_depth("0700.HK", depth("300")) == 90
+        assert events[0].kind == "depth"
+        assert monitor.observe_depth("0700.HK", depth("300.2")) == 0
+        assert monitor.stats("depth")["HK"].count == 3
+        assert "HK" not in monitor.stats()
+
+    def test_ages_kept_per_kind(self):
+        """测试行情与盘口的年龄分别统计"""
+        now = hk_ns(10, 0)
+        monitor = FreshnessMonitor(clock=lambda: now)
+        monitor.record("0700.HK", now - 10 * NS_PER_SECOND, "quote")
+        monitor.record("0700.HK", now - 100 * NS_PER_SECOND, "depth")
+        assert monitor.percentiles("HK", (50,)) == {50: 10.0}
+        assert monitor.percentiles("HK", (50,), kind="depth") == {50: 100.0}
+        assert monitor.stats("depth")["HK"].kind == "depth"
+
+    def test_session_resolved_outside_lock(self, mock_calendar: TradingCalendar):
+        """测试查询交易日历时不持有监控器的锁"""
+        monitor = FreshnessMonitor(mock_calendar, clock=lambda: hk_ns(10, 0))
+        session_at = mock_calendar.session_at
+
+        def checked_session_at(*args, **kwargs):  # type: ignore
+            assert not monitor._lock.locked()
+            return session_at(*args, **kwargs)
+
+        with patch.object(mock_calendar, "session_at", checked_session_at):
+            monitor.record("0700.HK", hk_ns(9, 59))
+        assert monitor.stats()["HK"].count == 1
+
+
+class TestAttach:
+    def test_records_adapter_results(
+        self, mock_adapter: LongPortMarketAdapter, events: list[StaleEvent]
+    ):
+        """测试接入适配器后记录返回的行情，并可恢复原始方法"""
+        now = hk_ns(10, 0)
+        monitor = FreshnessMonitor(clock=lambda: now)
+        monitor.add_callback(events.append)
+        quote = SimpleNamespace(
+            symbol="0700.HK",
+            timestamp=datetime(2024, 2, 7, 16, 0, tzinfo=HK_TZ),
+        )
+        with patch.object(mock_adapter.ctx, "quote", return_value=[quote]):
+            monitor.attach(mock_adapter)
+            try:
+                assert mock_adapter.fetch_quote("0700.HK") is quote
+            finally:
+                monitor.detach()
+        assert events[0].age == 18 * 3600
+        assert mock_adapter.fetch_quote("AAPL.US") == "mock_quote: AAPL.US"
+        assert monitor.stats()["HK"].count == 1
+
+    def test_attach_detach_idempotent(self, mock_adapter: LongPortMarketAdapter):
+        """测试重复接入与恢复不会出错，也不会重复记录"""
+        now = hk_ns(10, 0)
+        monitor = FreshnessMonitor(clock=lambda: now)
+        quote = SimpleNamespace(symbol="0700.HK", timestamp_ns=now)
+        with patch.object(mock_adapter.ctx, "quote", return_value=[quote]):
+            monitor.attach(mock_adapter)
+            monitor.attach(mock_adapter)
+            mock_adapter.fetch_quote_batch(["0700.HK"])
+            monitor.detach(mock_adapter)
+            monitor.detach()
+            monitor.detach(mock_adapter)
+            mock_adapter.fetch_quote_batch(["0700.HK"])
+        assert monitor.stats()["HK"].count == 1
+        assert "fetch_quote_batch" not in vars(mock_adapter)
+        assert "fetch_depth" not in vars(mock_adapter)
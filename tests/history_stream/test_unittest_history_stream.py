@@ -0,0 +1,138 @@
+import threading
+from datetime import date, datetime
+from decimal import Decimal
+from types import SimpleNamespace
+from unittest.mock import MagicMock
+import pytest
+from longport.openapi import AdjustType, Period
+from modules.history_stream import HistoryStream, split_range, window_days
+
+
+def make_candle(day: date) -> SimpleNamespace:
+    return SimpleNamespace(
+        close=Decimal("10"),
+        open=Decimal("9"),
+        low=Decimal("8"),
+        high=Decimal("11"),
+        volume=100,
+        turnover=Decimal("1000"),
+        timestamp=datetime(day.year, day.month, day.day, 10),
+    )
+
+
+def make_adapter() -> MagicMock:
+    adapter = MagicMock()
+
+    def by_date(symbol, period, adjust_type, start, end, trade_sessions):
+        return [make_candle(start), make_candle(end)]
+
+    adapter.fetch_history_candlesticks_by_date.side_effect = by_date
+    return adapter
+
+
+def stream(adapter: MagicMock, **kwargs) -> HistoryStream:
+    return HistoryStream(
+        adapter,
+        "700.HK",
+        Period.Min_1,
+        AdjustType.NoAdjust,
+        date(2024, 1, 1),
+        date(2024, 1, 10),
+        days=3,
+        **kwargs,
+    )
+
+
+class TestWindows:
+    def test_split_range(self) -> None:
+        """测试日期区间切分"""
+        assert split_range(date(2024, 1, 1), date(2024, 1, 5), 2) == [
+            (date(2024, 1, 1), date(2024, 1, 2)),
+            (date(2024, 1, 3), date(2024, 1, 4)),
+            (date(2024, 1, 5), date(2024, 1, 5)),
+        ]
+        assert split_range(date(2024, 1, 2), date(2024, 1, 1), 2) == []
+
+    def test_window_days(self) -> None:
+        """测试按周期估算窗口天数"""
+        assert window_days(Period.Min_1) == 2
+        assert window_days(Period.Min_60) == 166
+        assert window_days(Period.Day) == 4 * 365
+
+    def test_invalid_arguments(self) -> None:
+        """测试非法参数"""
+        with pytest.raises(ValueError):
+            HistoryStream(
+                MagicMock(),
+                "700.HK",
+                Period.Day,
+                AdjustType.NoAdjust,
+                date(2024, 1, 2),
+                date(2024, 1, 1),
+            )
+        with pytest.raises(ValueError):
+            stream(MagicMock(), prefetch=-1)
+
+
+class TestHistoryStream:
+    def test_iterates_windows_in_order(self) -> None:
+        """测试按窗口顺序逐根返回K线"""
+        adapter = make_adapter()
+        candles = list(stream(adapter))
+        assert len(candles) == 8
+        assert [c.timestamp.day for c in candles] == [1, 3, 4, 6, 7, 9, 10, 10]
+        windows = [
+            call.args[3:5]
+            for call in adapter.fetch_history_candlesticks_by_date.call_args_list
+        ]
+        assert windows == split_range(date(2024, 1, 1), date(2024, 1, 10), 3)
+
+    def test_prefetch_overlaps_processing(self) -> None:
+        """测试调用方处理当前窗口时，下一个窗口已经在请求"""
+        adapter = make_adapter()
+        second_requested = threading.Event()
+
+        def by_date(symbol, period, adjust_type, start, end, trade_sessions):
+            if start == date(2024, 1, 4):
+                second_requested.set()
+            return [make_candle(start)]
+
+        adapter.fetch_history_candlesticks_by_date.side_effect = by_date
+        windows = stream(adapter).iter_windows()
+        next(windows)
+        assert second_requested.wait(1)
+        windows.close()
+
+    def test_no_prefetch_and_early_close(self) -> None:
+        """测试不预取时按需请求，提前结束不会继续请求"""
+        adapter = make_adapter()
+        windows = stream(adapter, prefetch=0).iter_windows()
+        next(windows)
+        windows.close()
+        assert adapter.fetch_history_candlesticks_by_date.call_count == 1
+
+    def test_iter_arrays(self) -> None:
+        """测试按窗口返回列式数据"""
+        chunks = list(stream(make_adapter()).iter_arrays())
+        assert [len(chunk) for chunk in chunks] == [2, 2, 2, 2]
+        assert chunks[0].close.tolist() == [100000, 100000]
+
+    @pytest.mark.asyncio
+    async def test_async_iteration(self) -> None:
+        """测试异步逐根遍历与异步列式数据"""
+        candles = [c async for c in stream(make_adapter())]
+        assert len(candles) == 8
+        chunks = [chunk async for chunk in stream(make_adapter()).aiter_arrays()]
+        assert sum(len(chunk) for chunk in chunks) == 8
+
+    def test_adapter_entry_point(self, mock_adapter) -> None:
+        """测试适配器的流式获取入口"""
+        history = mock_adapter.stream_history_candlesticks_by_date(
+            "700.HK",
+            Period.Day,
+            AdjustType.NoAdjust,
+            date(2020, 1, 1),
+            date(2024, 12, 31),
+        )
+        assert isinstance(history, HistoryStream)
+        assert len(history.windows) == 2
@@ -0,0 +1,187 @@
+from datetime import datetime, timedelta
+from decimal import Decimal
+from types import SimpleNamespace
+import numpy as np
+import pytest
+from modules.indicators import (
+    ATR,
+    EMA,
+    MACD,
+    RSI,
+    SMA,
+    Bollinger,
+    CandlePanel,
+    Indicator,
+    IndicatorEngine,
+    _ewm_step,
+    ewm,
+    rolling_std,
+    sma,
+)
+
+START = datetime(2024, 1, 2, 9, 30)
+
+
+def make_candle(i: int, close: float) -> SimpleNamespace:
+    return SimpleNamespace(
+        timestamp=START + timedelta(minutes=i),
+        open=Decimal(str(close - 0.5)),
+        high=Decimal(str(close + 1)),
+        low=Decimal(str(close - 1)),
+        close=Decimal(str(close)),
+        volume=100 + i,
+        turnover=Decimal(str(close * (100 + i))),
+    )
+
+
+def make_series(closes: list[float]) -> list[SimpleNamespace]:
+    return [make_candle(i, close) for i, close in enumerate(closes)]
+
+
+ALL_INDICATORS = [SMA(3), EMA(5), RSI(4), ATR(4), MACD(3, 6, 2), Bollinger(4)]
+
+
+class TestKernels:
+    def test_sma_with_padding(self):
+        """测试简单移动平均及 NaN 填充"""
+        values = np.array([[1.0, 2.0, 3.0, 4.0], [np.nan, 2.0, 4.0, 6.0]])
+        result = sma(values, 2)
+        np.testing.assert_allclose(
+            result, [[np.nan, 1.5, 2.5, 3.5], [np.nan, np.nan, 3.0, 5.0]]
+        )
+
+    def test_ewm_matches_recursion(self):
+        """测试指数加权平均与逐项递推一致"""
+        values = np.array([3.0, 5.0, 4.0, 8.0])
+        expected, prev = [], values[0]
+        for value in values:
+            prev = prev + 0.5 * (value - prev)
+            expected.append(prev)
+        np.testing.assert_allclose(ewm(values, 0.5), expected)
+
+    def test_ewm_nan_semantics(self):
+        """测试向量化的指数加权平均与逐项调用 _ewm_step 一致（含缺失值和初始值）"""
+        rng = np.random.default_rng(3)
+        values = rng.normal(0, 1, (4, 300))
+        values[0, :50] = np.nan
+        values[1, rng.random(300) < 0.2] = np.nan
+        values[2, :] = np.nan
+        for initial in (None, np.array([np.nan, 1.0, 2.0, np.nan])):
+            prev = np.full(4, np.nan) if initial is None else initial
+            expected = []
+            for t in range(values.shape[1]):
+                prev = _ewm_step(prev, values[:, t], 0.1)
+                expected.append(prev)
+            np.testing.assert_allclose(
+                ewm(values, 0.1, initial), np.stack(expected, axis=1)
+            )
+
+    def test_rolling_std_large_offset(self):
+        """测试价格很大、波动很小时滑动标准差没有相消误差"""
+        values = 1e8 + np.tile([0.0, 0.01, 0.02, 0.01], 5)
+        result = rolling_std(values[None, :], 4)
+        expected = [np.std(values[i - 3 : i + 1]) for i in range(3, len(values))]
+        np.testing.assert_allclose(result[0, 3:], expected, rtol=1e-6)
+        assert np.isnan(result[0, :3]).all()
+
+    def test_rsi_monotonic_rise(self):
+        """测试单边上涨时 RSI 为 100"""
+        panel = CandlePanel.from_candles({"A.US": make_series([1, 2, 3, 4, 5])})
+        rsi = RSI(3).compute(panel)["rsi_3"]
+        assert np.isnan(rsi[0, 0])
+        np.testing.assert_allclose(rsi[0, 1:], 100.0)
+
+    def test_atr_constant_range(self):
+        """测试振幅恒定时 ATR 等于振幅"""
+        panel = CandlePanel.from_candles({"A.US": make_series([10.0] * 6)})
+        np.testing.assert_allclose(ATR(3).compute(panel)["atr_3"], 2.0)
+
+
+class TestIndicator:
+    def test_missing_methods_fail_on_creation(self):
+        """测试未实现 names 或 evaluate 的指标在创建时就报错"""
+
+        class NoEvaluate(Indicator):
+            @property
+            def names(self) -> tuple[str, ...]:
+                return ("x",)
+
+        with pytest.raises(TypeError):
+            NoEvaluate()  # type: ignore[abstract]
+
+
+class TestCandlePanel:
+    def test_right_aligned(self):
+        """测试不同长度的序列右对齐"""
+        panel = CandlePanel.from_candles(
+            {"A.US": make_series([1, 2, 3]), "B.US": make_series([7])}
+        )
+        assert panel.symbols == ["A.US", "B.US"]
+        np.testing.assert_allclose(panel.close[1], [np.nan, np.nan, 7.0])
+        assert panel.timestamp[1, 0] == 0
+        assert panel.timestamp[1, -1] == panel.timestamp[0, 0]
+
+
+class TestIndicatorEngine:
+    @pytest.fixture
+    def closes(self) -> dict[str, list[float]]:
+        rng = np.random.default_rng(7)
+        return {
+            "A.US": list(np.round(100 + rng.normal(0, 1, 40).cumsum(), 2)),
+            "B.US": list(np.round(50 + rng.normal(0, 1, 25).cumsum(), 2)),
+        }
+
+    def test_load_many_symbols(self, closes: dict[str, list[float]]):
+        """测试一次性计算多个标的的多个指标"""
+        engine = IndicatorEngine(ALL_INDICATORS, window=50)
+        results = engine.load({s: make_series(c) for s, c in closes.items()})
+        assert set(results) == {"A.US", "B.US"}
+        expected_names = {name for i in ALL_INDICATORS for name in i.names}
+        assert set(results["A.US"]) == expected_names
+        assert results["B.US"]["sma_3"].shape == (40,)
+
+    def test_incremental_update_matches_full(self, closes: dict[str, list[float]]):
+        """测试增量更新与全量重算结果一致"""
+        engine = IndicatorEngine(ALL_INDICATORS, window=50)
+        engine.load({s: make_series(c[:-3]) for s, c in closes.items()})
+        for i in range(3, 0, -1):
+            latest = engine.update("A.US", make_candle(40 - i, closes["A.US"][-i]))
+
+        full = CandlePanel.from_candles({"A.US": make_series(closes["A.US"])})
+        for indicator in ALL_INDICATORS:
+            for name, values in indicator.compute(full).items():
+                assert latest[name] == pytest.approx(values[0, -1]), name
+
+    def test_update_same_bar_replaces(self, closes: dict[str, list[float]]):
+        """测试同一根K线的更新会替换而不是追加"""
+        series = make_series(closes["A.US"])
+        engine = IndicatorEngine(ALL_INDICATORS, window=50)
+        engine.load({"A.US": series})
+        engine.update("A.US", make_candle(len(series) - 1, 123.0))
+        latest = engine.update("A.US", make_candle(len(series) - 1, 99.0))
+
+        revised = series[:-1] + [make_candle(len(series) - 1, 99.0)]
+        full = CandlePanel.from_candles({"A.US": revised})
+        for indicator in ALL_INDICATORS:
+            for name, values in indicator.compute(full).items():
+                assert latest[name] == pytest.approx(values[0, -1]), name
+
+    def test_load_evaluates_once(self, closes: dict[str, list[float]]):
+        """测试载入时每个指标只计算一次"""
+        calls = []
+
+        class CountingEMA(EMA):
+            def evaluate(self, panel: CandlePanel):  # type: ignore[override]
+                calls.append(panel.length)
+                return super().evaluate(panel)
+
+        engine = IndicatorEngine([CountingEMA(5)], window=50)
+        engine.load({s: make_series(c) for s, c in closes.items()})
+        assert calls == [40]
+
+    def test_unknown_symbol(self):
+        """测试未载入的标的"""
+        engine = IndicatorEngine([SMA(3)])
+        engine.load({"A.US": make_series([1, 2, 3])})
+        with pytest.raises(KeyError):
+            engine.update("B.US", make_candle(0, 1.0))
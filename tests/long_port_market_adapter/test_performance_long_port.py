@@ -1,6 +1,9 @@
+import os
 import time
 from typing import List, TYPE_CHECKING, Type
+from modules.freshness_monitor import DEFAULT_MAX_AGE, FALLBACK_MAX_AGE
 from modules.long_port_market_adapter import LongPortMarketAdapter
+from modules.markets import symbol_market_key
 
 if TYPE_CHECKING:
     from longport.openapi import SecurityQuote, SecurityStaticInfo
@@ -298,6 +301,37 @@ class TestPerformance:
             elif period_name == "日线":
                 assert data_count < 50, f"日线数据量({data_count})似乎过多"
 
+    def test_period_rollup_performance(self, live_adapter: LongPortMarketAdapter):
+        """测试只请求分钟线、本地汇总其它周期的性能"""
+        from longport.openapi import Period, AdjustType
+        from datetime import date, timedelta
+        from modules.candle_rollup import CandleRollup
+        from modules.trading_calendar import TradingCalendar
+
+        symbol = "AAPL.US"
+        end_date = date.today()
+        start_date = end_date - timedelta(days=30)
+        calendar = TradingCalendar(live_adapter, lookback_days=40, lookahead_days=1)
+        calendar.load()
+        periods = [Period.Min_5, Period.Min_15, Period.Min_30, Period.Min_60]
+        rollup = CandleRollup(calendar, periods=[*periods, Period.Day])
+
+        start_time = time.time()
+        rollup.backfill(live_adapter, symbol, start_date, end_date)
+        rollup_time = time.time() - start_time
+
+        start_time = time.time()
+        for period in periods:
+            live_adapter.fetch_history_candlesticks_by_date(
+                symbol, period, AdjustType.NoAdjust, start_date, end_date
+            )
+        fetch_time = time.time() - start_time
+
+        print(f"  本地汇总: {rollup_time:.4f}秒（1次请求）")
+        print(f"  分别请求: {fetch_time:.4f}秒（{len(periods)}次请求）")
+        daily = rollup.bars(symbol, Period.Day)
+        assert 0 < len(daily) < 50, f"汇总日线数量({len(daily)})异常"
+
     def test_realtime_data_latency(self, live_adapter: LongPortMarketAdapter):
         """测试实时数据查询延迟"""
         # 选择几个活跃的股票进行测试
@@ -446,6 +480,49 @@ class TestPerformance:
             # 验证总时间在合理范围内
             assert total_time < 10000, f"总查询时间({total_time:.2f}ms)超过10秒"
 
+    def test_free_threaded_conversion_scaling(
+        self, live_adapter: LongPortMarketAdapter
+    ):
+        """测试K线转换在多线程下的扩展性（自由线程构建下应随线程数提速）"""
+        from longport.openapi import Period, AdjustType, TradeSessions
+        from modules.codec import CandlestickRecord, to_record
+        from modules.free_threading import gil_enabled, parallel_map
+
+        symbols = ["AAPL.US", "MSFT.US", "0700.HK", "9988.HK"]
+        candles = []
+        for symbol in symbols:
+            candles.extend(
+                live_adapter.fetch_candlesticks(
+                    symbol,
+                    Period.Min_1,
+                    1000,
+                    AdjustType.NoAdjust,
+                    TradeSessions.Intraday,
+                )
+            )
+        # 重复数据以放大转换耗时，网络请求不计入
+        candles = candles * 25
+        print(f"GIL: {'启用' if gil_enabled() else '未启用'}，K线数: {len(candles)}")
+
+        timings: dict[int, float] = {}
+        for workers in (1, 2, 4, 8):
+            start_time = time.perf_counter()
+            records = parallel_map(
+                lambda c: to_record(c, CandlestickRecord),
+                candles,
+                max_workers=workers,
+            )
+            timings[workers] = time.perf_counter() - start_time
+            assert len(records) == len(candles)
+            print(
+                f"  {workers} 线程: {timings[workers]:.3f}秒，"
+                f"加速比 {timings[1] / timings[workers]:.2f}x"
+            )
+
+        if not gil_enabled() and (os.cpu_count() or 1) >= 4:
+            # 自由线程构建且至少 4 核时，4 个线程应有明显的加速
+            assert timings[1] / timings[4] > 1.5, "自由线程构建下转换没有随线程数提速"
+
     def test_api_rate_limit_behavior(self, live_adapter: LongPortMarketAdapter):
         """测试API速率限制行为"""
         print("开始测试API速率限制行为...")
@@ -515,9 +592,6 @@ class TestPerformance:
 
     def test_data_freshness_check(self, live_adapter: LongPortMarketAdapter):
         """测试数据新鲜度检查"""
-        from datetime import datetime, timezone
-        import time as time_module
-
         print("开始测试数据新鲜度...")
 
         # 选择几个活跃市场的股票
@@ -527,117 +601,46 @@ class TestPerformance:
             "600519.SH",  # A股
         ]
 
-        # 使用本地时间和 UTC 时间进行对比
-        current_time_utc = datetime.now(timezone.utc)
-        current_time_local = datetime.now()
-        current_timestamp = time_module.time()
-
-        print(f"当前 UTC 时间: {current_time_utc}")
-        print(f"当前本地时间: {current_time_local}")
-        print(f"当前时间戳: {current_timestamp}")
-
         for symbol in symbols:
             print(f"\n检查 {symbol} 的数据新鲜度:")
 
             # 测试实时报价数据
             start_time = time.time()
-            quote = live_adapter.fetch_quote(symbol)
+            quote = live_adapter.fetch_quote_normalized(symbol)
             query_time = (time.time() - start_time) * 1000
+            assert quote is not None, f"无法获取 {symbol} 的报价数据"
 
-            if quote and hasattr(quote, "timestamp"):
-                data_time = quote.timestamp
-
-                print(f"  原始数据时间: {data_time} (类型: {type(data_time)})")
-                print(f"  数据时间是否有时区: {data_time.tzinfo is not None}")
-
-                # 更谨慎的时间处理
-                if isinstance(data_time, datetime): # type: ignore
-                    if data_time.tzinfo is None:
-                        # 如果是 naive datetime，尝试多种假设
-                        print("  数据时间为 naive datetime，尝试不同时区假设:")
-
-                        # 假设1: 数据时间是 UTC
-                        data_time_utc = data_time.replace(tzinfo=timezone.utc)
-                        time_diff_utc = (
-                            current_time_utc - data_time_utc
-                        ).total_seconds()
-                        print(f"    假设为UTC: 时间差 {time_diff_utc:.2f}秒")
-
-                        # 假设2: 数据时间是本地时间
-                        time_diff_local = float("inf")  # 初始化为无穷大
-                        if current_time_local.tzinfo is None:
-                            time_diff_local = (
-                                current_time_local - data_time
-                            ).total_seconds()
-                            print(f"    假设为本地时间: 时间差 {time_diff_local:.2f}秒")
-                        else:
-                            print("    本地时间有时区信息，跳过本地时间假设")
-
-                        # 选择更合理的时间差（绝对值较小的）
-                        if abs(time_diff_utc) < abs(time_diff_local):
-                            time_diff = time_diff_utc
-                            used_assumption = "UTC"
-                            final_data_time = data_time_utc
-                        else:
-                            time_diff = time_diff_local
-                            used_assumption = "本地时间"
-                            final_data_time = data_time
-                    else:
-                        # 如果有时区信息，直接计算
-                        time_diff = (current_time_utc - data_time).total_seconds()
-                        used_assumption = "原有时区"
-                        final_data_time = data_time
-                else:
-                    # 如果不是 datetime 对象，可能是时间戳
-                    print(f"  数据时间不是 datetime 对象: {type(data_time)}")
-                    continue
-
-                print(f"  查询耗时: {query_time:.2f}ms")
-                print(f"  使用假设: {used_assumption}")
-                print(f"  最终数据时间: {final_data_time}")
-                print(f"  当前时间: {current_time_utc}")
-                print(f"  时间差: {time_diff:.2f}秒")
-
-                # 更宽松的数据新鲜度验证
-                abs_time_diff = abs(time_diff)
-
-                # 根据不同市场调整时间容忍度
-                if symbol.endswith(".US"):
-                    # 美股：考虑交易时间
-                    max_allowed_diff = 24 * 3600  # 24小时
-                elif symbol.endswith(".HK"):
-                    # 港股：考虑交易时间
-                    max_allowed_diff = 12 * 3600  # 12小时
-                elif symbol.endswith((".SH", ".SZ")):
-                    # A股：考虑交易时间，周末数据可能较旧
-                    max_allowed_diff = 7 * 24 * 3600  # 7天（包含周末）
-                else:
-                    max_allowed_diff = 24 * 3600  # 默认24小时
+            # 时间戳已在适配器边界统一为纳秒整数，不需要再猜测时区
+            time_diff = quote.age_ns(time.time_ns()) / 1e9
 
-                # 验证数据时间在合理范围内
-                assert abs_time_diff < max_allowed_diff, (
-                    f"{symbol} 数据时间异常，时间差: {time_diff:.2f}秒，"
-                    f"超过允许范围({max_allowed_diff}秒)"
-                )
+            print(f"  查询耗时: {query_time:.2f}ms")
+            print(f"  数据时间: {quote.local_time()}")
+            print(f"  时间差: {time_diff:.2f}秒")
 
-                # 验证查询响应时间合理
-                assert query_time < 2000, f"{symbol} 查询耗时过长: {query_time:.2f}ms"
-
-                # 打印数据新鲜度评估
-                if abs_time_diff < 300:  # 5分钟内
-                    freshness = "非常新鲜"
-                elif abs_time_diff < 1800:  # 30分钟内
-                    freshness = "新鲜"
-                elif abs_time_diff < 3600:  # 1小时内
-                    freshness = "较新鲜"
-                elif abs_time_diff < 7200:  # 2小时内
-                    freshness = "一般"
-                else:
-                    freshness = "较旧"
+            # 根据不同市场调整时间容忍度（A股包含周末，容忍度最宽）
+            market = symbol_market_key(symbol)
+            max_allowed_diff = DEFAULT_MAX_AGE.get(market, FALLBACK_MAX_AGE)
 
-                print(f"  数据新鲜度: {freshness}")
+            # 验证数据时间在合理范围内
+            assert abs(time_diff) < max_allowed_diff, (
+                f"{symbol} 数据时间异常，时间差: {time_diff:.2f}秒，"
+                f"超过允许范围({max_allowed_diff}秒)"
+            )
 
+            # 验证查询响应时间合理
+            assert query_time < 2000, f"{symbol} 查询耗时过长: {query_time:.2f}ms"
+
+            # 打印数据新鲜度评估
+            abs_time_diff = abs(time_diff)
+            if abs_time_diff < 300:  # 5分钟内
+                freshness = "非常新鲜"
+            elif abs_time_diff < 1800:  # 30分钟内
+                freshness = "新鲜"
+            elif abs_time_diff < 3600:  # 1小时内
+                freshness = "较新鲜"
+            elif abs_time_diff < 7200:  # 2小时内
+                freshness = "一般"
             else:
-                print(f"  {symbol} 无法获取有效的时间戳数据")
-                # 至少验证能获取到数据
-                assert quote is not None, f"无法获取 {symbol} 的报价数据"
+                freshness = "较旧"
+
+            print(f"  数据新鲜度: {freshness}")
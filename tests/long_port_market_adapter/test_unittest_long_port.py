@@ -1,12 +1,20 @@
-from datetime import date
+from datetime import date, datetime, timedelta
+from decimal import Decimal
+from types import SimpleNamespace
 from typing import Type
+from unittest.mock import patch
 import pytest
 from modules.long_port_market_adapter import LongPortMarketAdapter
+from modules.markets import MARKET_TIMEZONES
+from modules.rate_limiter import RateLimiter
+from modules.timestamps import to_epoch_ns
 from longport.openapi import (
     Period,
     AdjustType,
     CalcIndex,
     TradeSessions,
+    TradeSession,
+    TradeStatus,
     Market,
 )
 
@@ -198,3 +206,118 @@ class TestMarketStructure:
         # 验证返回的是资金分布数据对象
         assert result is not None
         assert result == "mock_capital_distribution: AAPL.US"
+
+
+# 4. 时间戳归一化测试类
+class TestNormalizedTimestamps:
+    def test_fetch_quote_normalized(self, mock_adapter: LongPortMarketAdapter):
+        """测试行情时间戳统一为纳秒整数，并按市场时区还原当地时间"""
+        # SDK 返回的 naive datetime 是本地时间
+        timestamp = datetime(2024, 2, 1, 16, 0, tzinfo=MARKET_TIMEZONES["HK"])
+        naive = timestamp.astimezone().replace(tzinfo=None)
+        quote = SimpleNamespace(
+            symbol="700.HK",
+            last_done=Decimal("300"),
+            prev_close=Decimal("298"),
+            open=Decimal("299"),
+            high=Decimal("301"),
+            low=Decimal("297"),
+            timestamp=naive,
+            volume=100,
+            turnover=Decimal("30000"),
+            trade_status=TradeStatus.Normal,
+            pre_market_quote=None,
+            post_market_quote=None,
+            overnight_quote=None,
+        )
+        with patch.object(mock_adapter.ctx, "quote", return_value=[quote]):
+            result = mock_adapter.fetch_quote_normalized("700.HK")
+
+        assert result is not None
+        assert result.timestamp_ns == int(timestamp.timestamp()) * 1_000_000_000
+        assert result.local_time() == timestamp
+        assert result.local_time().utcoffset() == timedelta(hours=8)
+        assert result.local_time("US").hour == 3
+        assert result.utc_time.hour == 8
+        assert result.age_ns(result.timestamp_ns + 5) == 5
+
+    def test_fetch_candlesticks_normalized(self, mock_adapter: LongPortMarketAdapter):
+        """测试K线时间戳归一化，无标的代码的记录需指定市场"""
+        candle = SimpleNamespace(
+            close=Decimal("1"),
+            open=Decimal("1"),
+            low=Decimal("1"),
+            high=Decimal("1"),
+            volume=1,
+            turnover=Decimal("1"),
+            timestamp=datetime(2024, 2, 1, 9, 30),
+            trade_session=TradeSession.Intraday,
+        )
+        with patch.object(mock_adapter.ctx, "candlesticks", return_value=[candle]):
+            result = mock_adapter.fetch_candlesticks_normalized(
+                "AAPL.US",
+                Period.Day,
+                1,
+                AdjustType.NoAdjust,
+                TradeSessions.Intraday,
+            )
+
+        assert result[0].timestamp_ns == to_epoch_ns(candle.timestamp)
+        assert result[0].trade_session == "Intraday"
+        assert result[0].local_time("AAPL.US").tzinfo == MARKET_TIMEZONES["US"]
+        with pytest.raises(ValueError):
+            result[0].local_time()
+
+
+# 5. 多标的批量接口测试类
+class TestBatchFanOut:
+    @pytest.fixture(autouse=True)
+    def fast_rate_limiter(self, mock_adapter: LongPortMarketAdapter):  # type: ignore
+        """放宽限流，避免测试等待令牌"""
+        with patch.object(mock_adapter, "rate_limiter", RateLimiter(rate=10000)):
+            yield
+
+    @pytest.mark.parametrize(
+        "method_name,expected",
+        [
+            ("fetch_depth_batch", "mock_depth: {}"),
+            ("fetch_brokers_batch", "mock_broker: {}"),
+            ("fetch_capital_distribution_batch", "mock_capital_distribution: {}"),
+        ],
+    )
+    def test_single_result_batches(
+        self, mock_adapter: LongPortMarketAdapter, method_name: str, expected: str
+    ):
+        """测试批量接口按标的返回结果，顺序与请求一致"""
+        symbols = [f"{i}.HK" for i in range(20)]
+        result = getattr(mock_adapter, method_name)(symbols)
+        assert result.ok
+        assert list(result.results) == symbols
+        assert result["7.HK"] == expected.format("7.HK")
+
+    def test_list_result_batches(self, mock_adapter: LongPortMarketAdapter):
+        """测试返回列表的批量接口"""
+        trades = mock_adapter.fetch_trades_batch(["AAPL.US", "700.HK"], 3)
+        assert trades["700.HK"][-1] == "mock_trades: 700.HK_2"
+        intraday = mock_adapter.fetch_intraday_batch(["AAPL.US"])
+        assert len(intraday["AAPL.US"]) == 2
+        flows = mock_adapter.fetch_capital_flow_batch(["AAPL.US"])
+        assert flows["AAPL.US"][0] == "mock_capital_flow: AAPL.US_1"
+
+    def test_per_symbol_errors(self, mock_adapter: LongPortMarketAdapter):
+        """测试单个标的失败不影响其他标的"""
+
+        def depth(symbol: str) -> str:
+            if symbol == "BAD.US":
+                raise RuntimeError("invalid symbol")
+            return f"depth: {symbol}"
+
+        with patch.object(mock_adapter.ctx, "depth", side_effect=depth):
+            result = mock_adapter.fetch_depth_batch(["AAPL.US", "BAD.US", "AAPL.US"])
+
+        assert not result.ok
+        assert len(result) == 1
+        assert result.get("BAD.US") is None
+        assert "BAD.US" not in result
+        with pytest.raises(RuntimeError):
+            result["BAD.US"]
@@ -0,0 +1,129 @@
+import threading
+import time
+from datetime import date, datetime, timedelta
+from types import SimpleNamespace
+from unittest.mock import MagicMock
+import pytest
+from longport.openapi import Market
+from modules.market_temperature import MarketTemperatureStore, _MarketHistory
+from modules.markets import market_timezone
+
+TODAY = date(2024, 3, 1)
+
+
+def history_response(market: object, start: date, end: date) -> SimpleNamespace:
+    tz = market_timezone("HK")
+    days = (end - start).days + 1
+    records = [
+        SimpleNamespace(
+            temperature=day.day,
+            timestamp=datetime(day.year, day.month, day.day, tzinfo=tz),
+        )
+        for day in (start + timedelta(days=i) for i in range(days))
+    ]
+    return SimpleNamespace(granularity="Daily", records=records)
+
+
+@pytest.fixture
+def adapter() -> MagicMock:
+    adapter = MagicMock()
+    adapter.fetch_history_market_temperature.side_effect = history_response
+    return adapter
+
+
+class TestRanges:
+    def test_gaps_and_merge(self):
+        """测试缺口计算与区间合并"""
+        history = _MarketHistory()
+        history.cover(date(2024, 1, 10), date(2024, 1, 20))
+        history.cover(date(2024, 2, 1), date(2024, 2, 5))
+        assert history.gaps(date(2024, 1, 1), date(2024, 2, 10)) == [
+            (date(2024, 1, 1), date(2024, 1, 9)),
+            (date(2024, 1, 21), date(2024, 1, 31)),
+            (date(2024, 2, 6), date(2024, 2, 10)),
+        ]
+        assert history.gaps(date(2024, 1, 12), date(2024, 1, 15)) == []
+        history.cover(date(2024, 1, 21), date(2024, 1, 31))
+        assert history.ranges == [(date(2024, 1, 10), date(2024, 2, 5))]
+
+
+class TestHistory:
+    def test_fetches_only_missing_gaps(self, adapter: MagicMock):
+        """测试滑动窗口只请求缺失的日期"""
+        store = MarketTemperatureStore(adapter)
+        first = store.history(Market.HK, date(2024, 2, 1), date(2024, 2, 10), TODAY)
+        assert [r.temperature for r in first] == list(range(1, 11))
+
+        second = store.history("HK", date(2024, 2, 5), date(2024, 2, 15), TODAY)
+        assert [r.temperature for r in second] == list(range(5, 16))
+        calls = adapter.fetch_history_market_temperature.call_args_list
+        assert [c.args[1:] for c in calls] == [
+            (date(2024, 2, 1), date(2024, 2, 10)),
+            (date(2024, 2, 11), date(2024, 2, 15)),
+        ]
+
+        store.history(Market.HK, date(2024, 2, 3), date(2024, 2, 12), TODAY)
+        assert adapter.fetch_history_market_temperature.call_count == 2
+
+    def test_today_is_refetched(self, adapter: MagicMock):
+        """测试当日数据不计入已覆盖区间"""
+        store = MarketTemperatureStore(adapter)
+        store.history(Market.HK, date(2024, 2, 25), TODAY, TODAY)
+        store.history(Market.HK, date(2024, 2, 25), TODAY, TODAY)
+        last = adapter.fetch_history_market_temperature.call_args.args
+        assert last[1:] == (TODAY, TODAY)
+
+    def test_markets_are_separate(self, adapter: MagicMock):
+        """测试不同市场分别缓存"""
+        store = MarketTemperatureStore(adapter)
+        store.history(Market.HK, date(2024, 2, 1), date(2024, 2, 2), TODAY)
+        store.history(Market.US, date(2024, 2, 1), date(2024, 2, 2), TODAY)
+        assert adapter.fetch_history_market_temperature.call_count == 2
+
+
+class TestCurrent:
+    def test_ttl(self, adapter: MagicMock):
+        """测试当前温度在 TTL 内复用"""
+        now = [0.0]
+        adapter.fetch_market_temperature.side_effect = lambda market: now[0]
+        store = MarketTemperatureStore(adapter, ttl=60, clock=lambda: now[0])
+        assert store.current(Market.HK) == 0.0
+        now[0] = 59.0
+        assert store.current("HK") == 0.0
+        now[0] = 61.0
+        assert store.current(Market.HK) == 61.0
+        store.invalidate(Market.HK)
+        now[0] = 62.0
+        assert store.current(Market.HK) == 62.0
+
+    def test_concurrent_callers_share_request(self, adapter: MagicMock):
+        """测试缓存过期时并发调用只发出一次请求"""
+        release = threading.Event()
+
+        def fetch(market: object) -> str:
+            release.wait(1)
+            return "warm"
+
+        adapter.fetch_market_temperature.side_effect = fetch
+        store = MarketTemperatureStore(adapter)
+        results: list[str] = []
+        threads = [
+            threading.Thread(target=lambda: results.append(store.current("US")))
+            for _ in range(8)
+        ]
+        for thread in threads:
+            thread.start()
+        time.sleep(0.05)
+        release.set()
+        for thread in threads:
+            thread.join()
+        assert results == ["warm"] * 8
+        assert adapter.fetch_market_temperature.call_count == 1
+
+    def test_error_not_cached(self, adapter: MagicMock):
+        """测试请求失败不会被缓存"""
+        adapter.fetch_market_temperature.side_effect = [RuntimeError("boom"), "ok"]
+        store = MarketTemperatureStore(adapter)
+        with pytest.raises(RuntimeError):
+            store.current(Market.HK)
+        assert store.current(Market.HK) == "ok"
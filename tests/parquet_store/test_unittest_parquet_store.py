@@ -0,0 +1,145 @@
+from datetime import date, datetime, timedelta
+from decimal import Decimal
+from types import SimpleNamespace
+import pyarrow.parquet as pq
+import pytest
+from longport.openapi import AdjustType, Period, TradeSession, TradeSessions
+from modules.codec import CandlestickRecord, IntradayLineRecord, to_record
+from modules.parquet_store import ParquetExporter, ParquetMarketData
+from modules.timestamps import to_epoch_ns
+
+# 2024-02-01 09:30 香港时间
+START = datetime(2024, 2, 1, 1, 30)
+
+
+def make_candle(i: int, session=TradeSession.Intraday) -> SimpleNamespace:
+    price = Decimal("100.125") + i
+    return SimpleNamespace(
+        close=price,
+        open=price - Decimal("0.5"),
+        low=price - 1,
+        high=price + 1,
+        volume=1000 + i,
+        turnover=price * (1000 + i),
+        timestamp=START + timedelta(hours=i),
+        trade_session=session,
+    )
+
+
+def make_line(minutes: int, price: str = "10.5") -> SimpleNamespace:
+    return SimpleNamespace(
+        price=Decimal(price),
+        timestamp=START + timedelta(minutes=minutes),
+        volume=100,
+        turnover=Decimal("1050"),
+        avg_price=Decimal("10.123456789"),
+    )
+
+
+@pytest.fixture
+def root(tmp_path):
+    return tmp_path / "export"
+
+
+class TestParquetStore:
+    def test_candles_roundtrip_partitioned_by_date(self, root) -> None:
+        """测试K线按 周期/复权/市场/标的/日期 分区写入，并按日期读取"""
+        # 第 15 根以后是香港时间 2 月 2 日
+        candles = [make_candle(i) for i in range(20)]
+        with ParquetExporter(root, row_group_size=4) as exporter:
+            written = exporter.write_candles(
+                "700.HK", Period.Min_1, AdjustType.NoAdjust, iter(candles)
+            )
+        assert written == 20
+        base = root / "candles/period=Min_1/adjust_type=NoAdjust/market=HK"
+        days = sorted(p.name for p in (base / "symbol=700.HK").iterdir())
+        assert days == ["date=2024-02-01", "date=2024-02-02"]
+        parquet = pq.ParquetFile(
+            base / "symbol=700.HK/date=2024-02-01/part-00000.parquet"
+        )
+        assert parquet.metadata.num_rows == 15
+        assert parquet.num_row_groups == 4
+
+        store = ParquetMarketData(root)
+        loaded = store.fetch_history_candlesticks_by_date_normalized(
+            "700.HK", Period.Min_1, AdjustType.NoAdjust, date(2024, 2, 2)
+        )
+        assert loaded == [to_record(c, CandlestickRecord) for c in candles[15:]]
+        assert not store.fetch_history_candlesticks_by_date_normalized(
+            "700.HK", Period.Day, AdjustType.NoAdjust
+        )
+
+    def test_trade_session_filter_and_count(self, root) -> None:
+        """测试盘中时段过滤与最近 N 根K线"""
+        candles = [make_candle(0, TradeSession.Pre), make_candle(1), make_candle(2)]
+        with ParquetExporter(root) as exporter:
+            exporter.write_candles(
+                "AAPL.US", Period.Day, AdjustType.ForwardAdjust, candles
+            )
+        store = ParquetMarketData(root)
+        args = ("AAPL.US", Period.Day, AdjustType.ForwardAdjust)
+        assert len(store.fetch_history_candlesticks_by_date_normalized(*args)) == 2
+        all_sessions = store.fetch_history_candlesticks_by_date_normalized(
+            *args, trade_sessions=TradeSessions.All
+        )
+        assert len(all_sessions) == 3
+        latest = store.fetch_candlesticks_normalized(
+            "AAPL.US", Period.Day, 1, AdjustType.ForwardAdjust, TradeSessions.All
+        )
+        assert [c.volume for c in latest] == [1002]
+
+    def test_latest_candles_read_from_tail(self, root, monkeypatch) -> None:
+        """测试读取最近的K线时从最近的日期分区往前读，不读取全部历史"""
+        # 每天 24 根小时K线，共 5 天
+        candles = [make_candle(i) for i in range(24 * 5)]
+        with ParquetExporter(root) as exporter:
+            exporter.write_candles(
+                "700.HK", Period.Min_60, AdjustType.NoAdjust, candles
+            )
+        store = ParquetMarketData(root)
+        opened: list[str] = []
+        parquet_file = pq.ParquetFile
+
+        def tracked(path, *args, **kwargs):  # type: ignore
+            opened.append(path.parent.name)
+            return parquet_file(path, *args, **kwargs)
+
+        monkeypatch.setattr(pq, "ParquetFile", tracked)
+        latest = store.fetch_candlesticks_normalized(
+            "700.HK", Period.Min_60, 30, AdjustType.NoAdjust, TradeSessions.All
+        )
+        assert latest == [to_record(c, CandlestickRecord) for c in candles[-30:]]
+        assert opened == ["date=2024-02-06", "date=2024-02-05"]
+
+    def test_intraday_latest_day_and_dedup(self, root) -> None:
+        """测试分时读取最近一天，重复导出时后写入的覆盖先写入的"""
+        with ParquetExporter(root) as exporter:
+            exporter.write_intraday("700.HK", [make_line(0), make_line(1)])
+        with ParquetExporter(root) as exporter:
+            exporter.write_intraday("700.HK", [make_line(1, "11"), make_line(2)])
+        lines = ParquetMarketData(root).fetch_intraday_normalized("700.HK")
+        assert [line.timestamp_ns for line in lines] == [
+            to_epoch_ns(START + timedelta(minutes=m)) for m in range(3)
+        ]
+        assert lines[1].price == Decimal("11")
+        # 超出保存精度的小数位四舍五入
+        assert isinstance(lines[0], IntradayLineRecord)
+        assert lines[0].avg_price == Decimal("10.12345679")
+
+    def test_bounded_open_files(self, root) -> None:
+        """测试打开的分区文件数超过上限时关闭最久未写入的分区"""
+        exporter = ParquetExporter(root, max_open_files=1)
+        exporter.write_intraday("700.HK", [make_line(0)])
+        exporter.write_intraday("9988.HK", [make_line(0)])
+        assert len(exporter._writers) == 1
+        exporter.close()
+        store = ParquetMarketData(root)
+        assert len(store.fetch_intraday_normalized("700.HK")) == 1
+        assert len(store.fetch_intraday_normalized("9988.HK")) == 1
+        assert store.fetch_capital_flow_normalized("700.HK") == []
+
+    def test_missing_partition_key(self, root) -> None:
+        """测试缺少分区键"""
+        with ParquetExporter(root) as exporter:
+            with pytest.raises(ValueError):
+                exporter.write("candles", "700.HK", [make_candle(0)])
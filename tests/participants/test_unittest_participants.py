@@ -0,0 +1,100 @@
+import threading
+import time
+from types import SimpleNamespace
+from unittest.mock import MagicMock, patch
+import pytest
+from modules.long_port_market_adapter import LongPortMarketAdapter
+from modules.participants import ParticipantIndex
+
+GOLDMAN = SimpleNamespace(broker_ids=[1, 2], name_cn="高盛", name_en="Goldman")
+UBS = SimpleNamespace(broker_ids=[3], name_cn="瑞银", name_en="UBS")
+BROKERS = SimpleNamespace(
+    ask_brokers=[SimpleNamespace(position=1, broker_ids=[1, 3])],
+    bid_brokers=[
+        SimpleNamespace(position=1, broker_ids=[2]),
+        SimpleNamespace(position=2, broker_ids=[99]),
+    ],
+)
+
+
+@pytest.fixture
+def adapter() -> MagicMock:
+    adapter = MagicMock()
+    adapter.fetch_participants.return_value = [GOLDMAN, UBS]
+    return adapter
+
+
+class TestParticipantIndex:
+    def test_lookup(self, adapter: MagicMock):
+        """测试按券商席位号查询，只加载一次"""
+        index = ParticipantIndex(adapter)
+        assert index.get(2) is GOLDMAN
+        assert index.get(3) is UBS
+        assert index.get(99) is None
+        assert len(index) == 3
+        assert adapter.fetch_participants.call_count == 1
+
+    def test_resolve_brokers(self, adapter: MagicMock):
+        """测试解析整个经纪队列"""
+        resolved = ParticipantIndex(adapter).resolve_brokers("700.HK", BROKERS)
+        assert [b.name for b in resolved.ask_brokers[0].brokers] == ["高盛", "瑞银"]
+        unknown = resolved.bid_brokers[1].brokers[0]
+        assert (unknown.broker_id, unknown.participant, unknown.name) == (99, None, "")
+
+    def test_refresh_after_interval(self, adapter: MagicMock):
+        """测试超过刷新间隔后重建索引，刷新失败保留旧索引"""
+        now = [0.0]
+        index = ParticipantIndex(adapter, refresh_interval=100, clock=lambda: now[0])
+        assert index.get(1) is GOLDMAN
+        now[0] = 50.0
+        index.get(1)
+        assert adapter.fetch_participants.call_count == 1
+
+        now[0] = 100.0
+        adapter.fetch_participants.return_value = [UBS]
+        assert index.get(1) is None
+        assert adapter.fetch_participants.call_count == 2
+
+        now[0] = 200.0
+        adapter.fetch_participants.side_effect = RuntimeError("boom")
+        assert index.resolve([3])[0].participant is UBS
+
+    def test_concurrent_first_lookup(self, adapter: MagicMock):
+        """测试并发的首次查询只加载一次"""
+
+        def slow_participants():
+            time.sleep(0.05)
+            return [GOLDMAN, UBS]
+
+        adapter.fetch_participants.side_effect = slow_participants
+        index = ParticipantIndex(adapter)
+        results: list = []
+        threads = [
+            threading.Thread(target=lambda: results.append(index.get(3)))
+            for _ in range(8)
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        assert results == [UBS] * 8
+        assert adapter.fetch_participants.call_count == 1
+
+    def test_first_load_error(self, adapter: MagicMock):
+        """测试首次加载失败时抛出异常"""
+        adapter.fetch_participants.side_effect = RuntimeError("boom")
+        with pytest.raises(RuntimeError):
+            ParticipantIndex(adapter).get(1)
+
+
+class TestFetchBrokersResolved:
+    def test_adapter_method(self, mock_adapter: LongPortMarketAdapter):
+        """测试适配器直接返回解析后的经纪队列"""
+        with (
+            patch.object(mock_adapter.ctx, "brokers", return_value=BROKERS),
+            patch.object(mock_adapter.ctx, "participants", return_value=[GOLDMAN]),
+        ):
+            resolved = mock_adapter.fetch_brokers_resolved("700.HK")
+        assert resolved.symbol == "700.HK"
+        assert resolved.bid_brokers[0].brokers[0].participant is GOLDMAN
+        assert resolved.ask_brokers[0].brokers[1].participant is None
@@ -0,0 +1,106 @@
+import threading
+import time
+from datetime import datetime
+import pytest
+from longport.openapi import Market
+from modules.markets import market_timezone
+from modules.polling_scheduler import AdaptivePollingScheduler, PollingPolicy
+from modules.trading_calendar import MarketPhase, TradingCalendar
+
+HK_TZ = market_timezone("HK")
+US_TZ = market_timezone("US")
+
+
+class TestPollingPolicy:
+    def test_interval_per_phase(self):
+        """测试各阶段的轮询间隔"""
+        policy = PollingPolicy(intraday=1.0, pre_market=10.0, closed=None)
+        assert policy.interval(MarketPhase.INTRADAY) == 1.0
+        assert policy.interval(MarketPhase.PRE_MARKET) == 10.0
+        assert policy.interval(MarketPhase.CLOSED) is None
+
+
+class TestNextDelay:
+    @pytest.fixture
+    def scheduler(self, mock_calendar: TradingCalendar) -> AdaptivePollingScheduler:
+        return AdaptivePollingScheduler(mock_calendar)
+
+    def test_intraday_uses_fast_interval(self, scheduler: AdaptivePollingScheduler):
+        """测试盘中使用高频间隔"""
+        job = scheduler.add_job("quotes", Market.HK, lambda: None)
+        at = datetime(2024, 2, 8, 10, 0, tzinfo=HK_TZ)
+        assert scheduler.next_delay(job, at) == job.policy.intraday
+
+    def test_delay_clamped_to_session_boundary(
+        self, scheduler: AdaptivePollingScheduler
+    ):
+        """测试等待时间不跨越时段边界"""
+        job = scheduler.add_job("flow", Market.US, lambda: None)
+        # 盘前 09:29:50，10 秒后开盘
+        at = datetime(2024, 2, 8, 9, 29, 50, tzinfo=US_TZ)
+        assert scheduler.next_delay(job, at) == 10.0
+
+    def test_holiday_waits_until_next_session(
+        self, scheduler: AdaptivePollingScheduler
+    ):
+        """测试休市日等待到下一个时段"""
+        policy = PollingPolicy(idle_recheck=7 * 24 * 3600)
+        job = scheduler.add_job("temperature", Market.HK, lambda: None, policy)
+        at = datetime(2024, 2, 12, 10, 0, tzinfo=HK_TZ)
+        expected = datetime(2024, 2, 14, 9, 30, tzinfo=HK_TZ) - at
+        assert scheduler.next_delay(job, at) == expected.total_seconds()
+
+    def test_duplicate_job_name(self, scheduler: AdaptivePollingScheduler):
+        """测试重复的任务名称"""
+        scheduler.add_job("quotes", Market.HK, lambda: None)
+        with pytest.raises(ValueError):
+            scheduler.add_job("quotes", Market.US, lambda: None)
+
+
+class TestSchedulerLoop:
+    def test_polls_during_session(self, mock_calendar: TradingCalendar):
+        """测试盘中按间隔执行轮询"""
+        # 以真实时间流逝驱动、起点固定在港股盘中的时钟
+        base = datetime(2024, 2, 8, 10, 0, tzinfo=HK_TZ).timestamp()
+        started = time.time()
+        results: list[int] = []
+        done = threading.Event()
+
+        def on_result(result: int) -> None:
+            results.append(result)
+            if len(results) >= 3:
+                done.set()
+
+        scheduler = AdaptivePollingScheduler(
+            mock_calendar, clock=lambda: base + time.time() - started
+        )
+        scheduler.add_job(
+            "quotes",
+            Market.HK,
+            lambda: len(results),
+            PollingPolicy(intraday=0.01),
+            on_result=on_result,
+        )
+        scheduler.start()
+        try:
+            assert done.wait(timeout=5)
+        finally:
+            scheduler.stop()
+        assert results[:3] == [0, 1, 2]
+
+    def test_skips_on_holiday(self, mock_calendar: TradingCalendar):
+        """测试休市日不轮询"""
+        now = datetime(2024, 2, 12, 10, 0, tzinfo=HK_TZ).timestamp()
+        calls: list[int] = []
+        scheduler = AdaptivePollingScheduler(mock_calendar, clock=lambda: now)
+        job = scheduler.add_job("quotes", Market.HK, lambda: calls.append(1))
+        scheduler.start()
+        try:
+            deadline = datetime.now().timestamp() + 5
+            while job.skips == 0 and datetime.now().timestamp() < deadline:
+                pass
+        finally:
+            scheduler.stop()
+        assert job.skips == 1
+        assert job.last_phase == MarketPhase.CLOSED
+        assert calls == []
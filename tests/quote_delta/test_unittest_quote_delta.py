@@ -0,0 +1,127 @@
+from datetime import datetime
+from decimal import Decimal
+from types import SimpleNamespace
+from unittest.mock import MagicMock
+import pytest
+from modules.codec import SecurityQuoteRecord, to_record
+from modules.quote_delta import QuoteChange, QuoteChangeDetector, QuoteConflator
+
+
+def make_quote(symbol: str, price: str, volume: int = 100, second: int = 0):
+    return SimpleNamespace(
+        symbol=symbol,
+        last_done=Decimal(price),
+        prev_close=Decimal("10"),
+        open=Decimal("10"),
+        high=Decimal(price),
+        low=Decimal("10"),
+        volume=volume,
+        turnover=Decimal(volume) * Decimal(price),
+        timestamp=datetime(2024, 2, 1, 10, 0, second),
+        trade_status="Normal",
+        pre_market_quote=None,
+        post_market_quote=None,
+        overnight_quote=None,
+    )
+
+
+def change(symbol: str, **changes) -> QuoteChange:
+    return QuoteChange(symbol, changes, None)
+
+
+class TestQuoteChangeDetector:
+    def test_only_changed_symbols_and_fields(self) -> None:
+        """测试只输出变化的标的和字段"""
+        detector = QuoteChangeDetector()
+        first = detector.diff([make_quote("700.HK", "10"), make_quote("1.HK", "10")])
+        assert [(c.symbol, c.is_new) for c in first] == [
+            ("700.HK", True),
+            ("1.HK", True),
+        ]
+        assert first[0].changes.keys() == set(detector.fields)
+
+        quote = make_quote("700.HK", "10.5", second=3)
+        changed = detector.diff([quote, make_quote("1.HK", "10")])
+        assert len(changed) == 1
+        assert changed[0].quote is quote
+        assert not changed[0].is_new
+        assert changed[0].changes == {
+            "last_done": Decimal("10.5"),
+            "high": Decimal("10.5"),
+            "turnover": Decimal("1050.0"),
+            "timestamp": datetime(2024, 2, 1, 10, 0, 3),
+        }
+        assert detector.diff([quote]) == []
+
+    def test_records_and_nested_quotes(self) -> None:
+        """测试纯数据结构与盘前行情按值比较"""
+        detector = QuoteChangeDetector()
+        quote = make_quote("AAPL.US", "10")
+        quote.pre_market_quote = SimpleNamespace(
+            last_done=Decimal("9"),
+            timestamp=datetime(2024, 2, 1, 8),
+            volume=1,
+            turnover=Decimal("9"),
+            high=Decimal("9"),
+            low=Decimal("9"),
+            prev_close=Decimal("10"),
+        )
+        detector.diff([quote])
+        # 同样内容的新对象、以及转换后的纯数据结构都不算变化
+        assert detector.diff([to_record(quote, SecurityQuoteRecord)]) == []
+
+    def test_custom_fields_and_forget(self) -> None:
+        """测试只比较指定字段，删除快照后重新输出全部字段"""
+        detector = QuoteChangeDetector(fields=["last_done"])
+        detector.diff([make_quote("700.HK", "10")])
+        assert detector.diff([make_quote("700.HK", "10", volume=200)]) == []
+        detector.forget(["700.HK"])
+        assert len(detector) == 0
+        (again,) = detector.diff([make_quote("700.HK", "10")])
+        assert again.is_new and again.changes == {"last_done": Decimal("10")}
+
+
+class TestQuoteConflator:
+    def test_conflates_within_window(self) -> None:
+        """测试窗口内同一标的的变化合并为一次，字段取最新值"""
+        clock = MagicMock(return_value=0.0)
+        on_flush = MagicMock()
+        conflator = QuoteConflator(1.0, on_flush, clock=clock)
+        conflator.push([change("700.HK", last_done=1, volume=1)])
+        clock.return_value = 0.5
+        conflator.push([change("700.HK", last_done=2), change("1.HK", last_done=3)])
+        on_flush.assert_not_called()
+        assert conflator.pending() == 2
+
+        clock.return_value = 1.0
+        conflator.push([change("700.HK", last_done=4)])
+        (flushed,) = on_flush.call_args.args
+        assert [(c.symbol, c.changes) for c in flushed] == [
+            ("700.HK", {"last_done": 4, "volume": 1}),
+            ("1.HK", {"last_done": 3}),
+        ]
+        assert (conflator.received, conflator.conflated, conflator.flushes) == (
+            4,
+            2,
+            1,
+        )
+
+    def test_zero_window_and_empty_flush(self) -> None:
+        """测试不合并时立即下发，没有变化时不调用回调"""
+        on_flush = MagicMock()
+        conflator = QuoteConflator(0, on_flush)
+        conflator.push([change("700.HK", last_done=1)])
+        assert on_flush.call_count == 1
+        assert conflator.flush() == 0
+        assert on_flush.call_count == 1
+        with pytest.raises(ValueError):
+            QuoteConflator(-1, on_flush)
+
+    def test_background_flush(self) -> None:
+        """测试后台线程按窗口下发，停止时下发剩余变化"""
+        flushed: list[list[QuoteChange]] = []
+        conflator = QuoteConflator(0.01, flushed.append)
+        conflator.start()
+        conflator.push([change("700.HK", last_done=1)])
+        conflator.stop()
+        assert sum(len(batch) for batch in flushed) == 1
@@ -0,0 +1,140 @@
+import multiprocessing
+import threading
+from datetime import datetime
+from decimal import Decimal
+from pathlib import Path
+from types import SimpleNamespace
+from unittest.mock import MagicMock
+import pytest
+from modules.quote_snapshot import QuoteSnapshotPublisher, QuoteSnapshotReader
+
+
+def make_quote(symbol: str, value: int) -> SimpleNamespace:
+    price = Decimal(value)
+    return SimpleNamespace(
+        symbol=symbol,
+        last_done=price,
+        prev_close=price,
+        open=price,
+        high=price,
+        low=price,
+        turnover=price,
+        volume=value,
+        timestamp=datetime.fromtimestamp(value),
+    )
+
+
+def read_in_child(path: str, symbol: str) -> float:
+    reader = QuoteSnapshotReader(Path(path))
+    try:
+        snapshot = reader.read(symbol)
+        return -1.0 if snapshot is None else snapshot.last_done
+    finally:
+        reader.close()
+
+
+@pytest.fixture
+def publisher(tmp_path: Path):  # type: ignore
+    adapter = MagicMock()
+    adapter.fetch_quote_batch.side_effect = lambda symbols: [  # type: ignore
+        make_quote(s, 42) for s in symbols
+    ]
+    publisher = QuoteSnapshotPublisher(
+        adapter, ["AAPL.US", "0700.HK"], path=tmp_path / "quotes", capacity=8
+    )
+    yield publisher
+    publisher.close(unlink=True)
+
+
+class TestQuoteSnapshot:
+    def test_publish_and_read(self, publisher: QuoteSnapshotPublisher):
+        """测试发布后读取快照"""
+        reader = QuoteSnapshotReader(publisher.path)
+        assert reader.read("AAPL.US") is None
+        assert publisher.refresh() == 2
+
+        snapshot = reader.read("0700.HK")
+        assert snapshot is not None
+        assert snapshot.last_done == 42.0
+        assert snapshot.volume == 42
+        assert snapshot.timestamp_ns == 42 * 1_000_000_000
+        assert reader.read("TSLA.US") is None
+        reader.close()
+
+    def test_reader_discovers_new_symbols(self, publisher: QuoteSnapshotPublisher):
+        """测试读取端发现发布端新增的标的"""
+        reader = QuoteSnapshotReader(publisher.path)
+        publisher.add_symbols(["TSLA.US"])
+        publisher.publish([make_quote("TSLA.US", 7)])
+        assert reader.symbols() == ["AAPL.US", "0700.HK", "TSLA.US"]
+        assert reader.read_many(["TSLA.US", "AAPL.US"]).keys() == {"TSLA.US"}
+        reader.close()
+
+    def test_publisher_restart(self, publisher: QuoteSnapshotPublisher):
+        """测试发布端重启后读取端重新映射，文件不会被截断"""
+        publisher.publish([make_quote("AAPL.US", 1), make_quote("0700.HK", 2)])
+        reader = QuoteSnapshotReader(publisher.path)
+        assert reader.read("0700.HK") is not None
+        size = publisher.path.stat().st_size
+        publisher.close()
+
+        restarted = QuoteSnapshotPublisher(
+            MagicMock(), ["0700.HK", "9988.HK"], path=publisher.path, capacity=4
+        )
+        try:
+            assert restarted.generation == publisher.generation + 1
+            assert publisher.path.stat().st_size == size
+            # 旧槽位表已失效：0700.HK 换了槽位且尚未写入数据
+            assert reader.read("0700.HK") is None
+            assert reader.read("AAPL.US") is None
+            restarted.publish([make_quote("9988.HK", 3)])
+            snapshot = reader.read("9988.HK")
+            assert snapshot is not None and snapshot.last_done == 3.0
+            assert reader.symbols() == ["0700.HK", "9988.HK"]
+            assert reader.capacity == 4
+        finally:
+            reader.close()
+            restarted.close()
+
+    def test_capacity(self, publisher: QuoteSnapshotPublisher):
+        """测试槽位容量上限"""
+        with pytest.raises(ValueError):
+            publisher.add_symbols([f"{i}.HK" for i in range(10)])
+
+    def test_invalid_file(self, tmp_path: Path):
+        """测试打开无效的快照文件"""
+        path = tmp_path / "invalid"
+        path.write_bytes(b"\0" * 128)
+        with pytest.raises(ValueError):
+            QuoteSnapshotReader(path)
+
+    def test_consistent_reads_during_writes(self, publisher: QuoteSnapshotPublisher):
+        """测试并发写入时读取到的快照始终一致"""
+        reader = QuoteSnapshotReader(publisher.path)
+        stop = threading.Event()
+
+        def write() -> None:
+            value = 1
+            while not stop.is_set():
+                publisher.publish([make_quote("AAPL.US", value)])
+                value += 1
+
+        writer = threading.Thread(target=write)
+        writer.start()
+        try:
+            for _ in range(2000):
+                snapshot = reader.read("AAPL.US")
+                if snapshot is not None:
+                    assert snapshot.last_done == snapshot.high == snapshot.volume
+        finally:
+            stop.set()
+            writer.join()
+            reader.close()
+
+    def test_read_from_other_process(self, publisher: QuoteSnapshotPublisher):
+        """测试其他进程只读映射后读取"""
+        publisher.publish([make_quote("AAPL.US", 123)])
+        ctx = multiprocessing.get_context("spawn")
+        with ctx.Pool(1) as pool:
+            value = pool.apply(read_in_child, (str(publisher.path), "AAPL.US"))
+        assert value == 123.0
@@ -0,0 +1,82 @@
+import threading
+import time
+import pytest
+from modules.rate_limiter import RateLimiter
+
+
+class TestRateLimiter:
+    def test_burst_then_refill(self):
+        """测试令牌耗尽后按速率补充"""
+        now = [0.0]
+        limiter = RateLimiter(rate=10, burst=3, clock=lambda: now[0])
+        assert all(limiter.try_acquire() for _ in range(3))
+        assert not limiter.try_acquire()
+        now[0] = 0.1
+        assert limiter.try_acquire()
+        assert not limiter.try_acquire()
+        now[0] = 10.0
+        assert all(limiter.try_acquire() for _ in range(3))
+        assert not limiter.try_acquire()
+
+    def test_configure(self):
+        """测试运行时调整速率与容量"""
+        now = [0.0]
+        limiter = RateLimiter(rate=10, burst=5, clock=lambda: now[0])
+        limiter.configure(rate=1, burst=2)
+        assert (limiter.rate, limiter.burst) == (1, 2)
+        assert all(limiter.try_acquire() for _ in range(2))
+        assert not limiter.try_acquire()
+        now[0] = 1.0
+        assert limiter.try_acquire()
+        with pytest.raises(ValueError):
+            limiter.configure(rate=0)
+
+    def test_release(self):
+        """测试归还令牌，不超过容量"""
+        now = [0.0]
+        limiter = RateLimiter(rate=10, burst=2, clock=lambda: now[0])
+        assert all(limiter.try_acquire() for _ in range(2))
+        limiter.release()
+        assert limiter.try_acquire()
+        assert not limiter.try_acquire()
+        limiter.release(5)
+        assert all(limiter.try_acquire() for _ in range(2))
+        assert not limiter.try_acquire()
+
+    def test_acquire_waits(self):
+        """测试令牌不足时阻塞等待"""
+        limiter = RateLimiter(rate=50, burst=1)
+        started = time.monotonic()
+        for _ in range(4):
+            limiter.acquire()
+        assert time.monotonic() - started >= 0.05
+
+    def test_acquire_timeout(self):
+        """测试等待超时"""
+        limiter = RateLimiter(rate=1, burst=1)
+        assert limiter.acquire()
+        assert not limiter.acquire(timeout=0.01)
+
+    def test_concurrent_callers(self):
+        """测试多线程共享限流器时总速率不超过限制"""
+        limiter = RateLimiter(rate=100, burst=5)
+        acquired: list[float] = []
+
+        def worker() -> None:
+            for _ in range(5):
+                with limiter:
+                    acquired.append(time.monotonic())
+
+        threads = [threading.Thread(target=worker) for _ in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        # 20 次调用，前 5 次消耗容量，其余 15 次至少需要 0.15 秒
+        assert max(acquired) - min(acquired) >= 0.14
+
+    @pytest.mark.parametrize("rate,burst", [(0, None), (10, 0.5)])
+    def test_invalid(self, rate: float, burst: float | None):
+        """测试非法参数"""
+        with pytest.raises(ValueError):
+            RateLimiter(rate, burst)
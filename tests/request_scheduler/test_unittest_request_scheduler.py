@@ -0,0 +1,216 @@
+import threading
+import time
+from typing import Any
+from unittest.mock import patch
+import pytest
+from modules.long_port_market_adapter import LongPortMarketAdapter
+from modules.rate_limiter import RateLimiter
+from modules.request_scheduler import Priority, ScheduledBackend
+
+
+class GatedBackend:
+    """第一次调用阻塞到 release，之后按顺序记录调用"""
+
+    def __init__(self) -> None:
+        self.order: list[str] = []
+        self.started = threading.Event()
+        self.release = threading.Event()
+
+    def _run(self, label: str) -> str:
+        if not self.started.is_set():
+            self.started.set()
+            self.release.wait(2)
+        self.order.append(label)
+        return label
+
+    def quote(self, symbols: list[str]) -> str:
+        return self._run(f"quote:{symbols[0]}")
+
+    def depth(self, symbol: str) -> str:
+        return self._run(f"depth:{symbol}")
+
+    def history_candlesticks_by_date(self, symbol: str, *args: Any) -> str:
+        return self._run(f"history:{symbol}")
+
+    def calc_indexes(self, symbols: list[str], indexes: list[Any]) -> str:
+        return self._run(f"calc:{symbols[0]}")
+
+    def fail(self) -> None:
+        raise RuntimeError("boom")
+
+
+@pytest.fixture
+def gated() -> GatedBackend:
+    return GatedBackend()
+
+
+@pytest.fixture
+def scheduler(gated: GatedBackend):  # type: ignore
+    scheduler = ScheduledBackend(gated, max_concurrency=1)
+    yield scheduler
+    gated.release.set()
+    scheduler.close()
+
+
+def block(scheduler: ScheduledBackend, gated: GatedBackend) -> None:
+    """占住唯一的分发线程，使后续请求排队"""
+    scheduler.submit(Priority.NORMAL, "depth", ("BLOCK",))
+    assert gated.started.wait(1)
+
+
+class TestScheduling:
+    def test_interactive_goes_first(
+        self, scheduler: ScheduledBackend, gated: GatedBackend
+    ):
+        """测试交互式请求插队到批量请求之前"""
+        block(scheduler, gated)
+        futures = [
+            scheduler.submit(Priority.BULK, "history_candlesticks_by_date", (s,))
+            for s in ("A", "B")
+        ]
+        futures.append(scheduler.submit(Priority.INTERACTIVE, "quote", (["700.HK"],)))
+        gated.release.set()
+        for future in futures:
+            future.result(1)
+        assert gated.order == ["depth:BLOCK", "quote:700.HK", "history:A", "history:B"]
+
+    def test_weighted_fair_queuing(
+        self, scheduler: ScheduledBackend, gated: GatedBackend
+    ):
+        """测试普通与批量请求按 4:1 权重交错，批量请求不会饿死"""
+        block(scheduler, gated)
+        futures = [
+            scheduler.submit(Priority.BULK, "history_candlesticks_by_date", (f"b{i}",))
+            for i in range(3)
+        ] + [scheduler.submit(Priority.NORMAL, "depth", (f"n{i}",)) for i in range(8)]
+        gated.release.set()
+        for future in futures:
+            future.result(1)
+        labels = [label.split(":")[1] for label in gated.order[1:]]
+        expected = "n0 n1 n2 n3 b0 n4 n5 n6 n7 b1 b2".split()
+        assert labels == expected
+        stats = scheduler.stats()
+        assert stats[Priority.BULK].dispatched == 3
+        assert stats[Priority.NORMAL].queued == 0
+
+    def test_method_priorities_and_override(
+        self, scheduler: ScheduledBackend, gated: GatedBackend
+    ):
+        """测试方法默认优先级，以及在线程内临时指定优先级"""
+        block(scheduler, gated)
+        results: list[str] = []
+
+        def bulk_quote() -> None:
+            with scheduler.priority(Priority.BULK):
+                results.append(scheduler.quote(["BULK.US"]))
+
+        threads = [
+            threading.Thread(target=bulk_quote),
+            threading.Thread(
+                target=lambda: results.append(scheduler.calc_indexes(["C"], []))
+            ),
+            threading.Thread(target=lambda: results.append(scheduler.depth("700.HK"))),
+        ]
+        for thread in threads:
+            thread.start()
+        while sum(s.queued for s in scheduler.stats().values()) < 3:
+            pass
+        gated.release.set()
+        for thread in threads:
+            thread.join()
+        assert gated.order[1] == "depth:700.HK"
+        assert scheduler.current_priority() is None
+
+    def test_errors_propagate(self, scheduler: ScheduledBackend, gated: GatedBackend):
+        """测试请求异常返回给调用方"""
+        gated.release.set()
+        with pytest.raises(RuntimeError):
+            scheduler.fail()
+
+    def test_rate_limiter_shared(self, gated: GatedBackend):
+        """测试分发前获取限流令牌"""
+        gated.release.set()
+        limiter = RateLimiter(rate=1000)
+        scheduler = ScheduledBackend(gated, limiter, max_concurrency=2)
+        try:
+            with (
+                patch.object(limiter, "acquire", wraps=limiter.acquire) as acquire,
+                patch.object(limiter, "release", wraps=limiter.release) as release,
+            ):
+                for i in range(5):
+                    scheduler.depth(str(i))
+            # 每个请求只消耗一个令牌（队列已空时拿到的令牌会归还）
+            assert acquire.call_count - release.call_count == 5
+        finally:
+            scheduler.close()
+        with pytest.raises(RuntimeError):
+            scheduler.depth("closed")
+
+    def test_interactive_first_under_rate_limit(self, gated: GatedBackend):
+        """测试限流时分发线程不会提前占住批量请求，之后到达的交互式请求下一个发出"""
+        gated.release.set()
+        scheduler = ScheduledBackend(
+            gated, RateLimiter(rate=20, burst=1), max_concurrency=4
+        )
+        try:
+            futures = [
+                scheduler.submit(Priority.BULK, "history_candlesticks_by_date", (s,))
+                for s in "ABCDEFGH"
+            ]
+            # 第一个批量请求用掉唯一的令牌后，其余分发线程都在等待令牌
+            while not gated.order:
+                pass
+            time.sleep(0.01)
+            futures.append(
+                scheduler.submit(Priority.INTERACTIVE, "quote", (["700.HK"],))
+            )
+            for future in futures:
+                future.result(2)
+        finally:
+            scheduler.close()
+        assert gated.order[:2] == ["history:A", "quote:700.HK"]
+
+    def test_nested_call_runs_inline(self, gated: GatedBackend):
+        """测试数据源在分发线程中嵌套调用调度器时不会死锁"""
+        gated.release.set()
+        limiter = RateLimiter(rate=1000)
+        scheduler = ScheduledBackend(gated, limiter, max_concurrency=1)
+
+        def nested_quote(symbols: list[str]) -> str:
+            return scheduler.depth(symbols[0])
+
+        try:
+            with patch.object(gated, "quote", nested_quote):
+                assert (
+                    scheduler.submit(Priority.INTERACTIVE, "quote", (["A"],)).result(
+                        timeout=2
+                    )
+                    == "depth:A"
+                )
+            assert scheduler.stats()[Priority.INTERACTIVE].dispatched == 1
+        finally:
+            scheduler.close()
+
+
+class TestAdapterScheduling:
+    def test_adapter_schedule_requests(self, gated: GatedBackend):
+        """测试适配器启用请求调度，批量接口继承调用方指定的优先级"""
+        gated.release.set()
+        adapter = LongPortMarketAdapter(backend=gated, schedule_requests=True)
+        assert isinstance(adapter.ctx, ScheduledBackend)
+        try:
+            with adapter.request_priority(Priority.BULK):
+                result = adapter.fetch_depth_batch(["A", "B"])
+            assert result.ok
+            assert adapter.ctx.stats()[Priority.BULK].dispatched == 2
+        finally:
+            adapter.close()
+        with pytest.raises(RuntimeError):
+            adapter.fetch_depth("closed")
+
+    def test_priority_noop_without_scheduler(self, gated: GatedBackend):
+        """测试未启用请求调度时指定优先级不起作用"""
+        gated.release.set()
+        adapter = LongPortMarketAdapter(backend=gated)
+        with adapter.request_priority(Priority.BULK):
+            assert adapter.fetch_depth("A") == "depth:A"
@@ -0,0 +1,154 @@
+from decimal import Decimal
+from types import SimpleNamespace
+from unittest.mock import MagicMock
+import numpy as np
+import pytest
+from longport.openapi import CalcIndex, TradeStatus
+from modules.screener import Field, FieldRef, ScreeningEngine, resolve_field
+
+STATIC = {
+    "700.HK": ("HKEquity", 100),
+    "9988.HK": ("HKEquity", 100),
+    "1.HK": ("HKEquity", 500),
+    "AAPL.US": ("USMain", 1),
+    "TSLA.US": ("USMain", 1),
+}
+TURNOVER = {
+    "700.HK": "5e9",
+    "9988.HK": "3e9",
+    "1.HK": "1e7",
+    "AAPL.US": "8e9",
+    "TSLA.US": "9e9",
+}
+PE = {"700.HK": "18.5", "9988.HK": "25", "AAPL.US": "30", "TSLA.US": "60"}
+
+
+def static_info(symbols):
+    return [
+        SimpleNamespace(symbol=s, board=STATIC[s][0], lot_size=STATIC[s][1])
+        for s in symbols
+        if s in STATIC
+    ]
+
+
+def quotes(symbols):
+    return [
+        SimpleNamespace(
+            symbol=s,
+            turnover=Decimal(TURNOVER[s]),
+            last_done=Decimal("100"),
+            trade_status=TradeStatus.Normal,
+        )
+        for s in symbols
+        if s in TURNOVER
+    ]
+
+
+def calc_indexes(symbols, indexes):
+    return [
+        SimpleNamespace(symbol=s, pe_ttm_ratio=Decimal(PE[s]) if s in PE else None)
+        for s in symbols
+    ]
+
+
+@pytest.fixture
+def adapter() -> MagicMock:
+    adapter = MagicMock()
+    adapter.fetch_static_info_batch.side_effect = static_info
+    adapter.fetch_quote_batch.side_effect = quotes
+    adapter.fetch_calc_indexes.side_effect = calc_indexes
+    return adapter
+
+
+class TestFields:
+    def test_resolve_field(self) -> None:
+        """测试字段解析：未指定数据源时使用成本最低的数据源"""
+        assert resolve_field("turnover") == FieldRef("quote", "turnover")
+        assert resolve_field("calc.turnover") == FieldRef("calc", "turnover")
+        assert resolve_field("board") == FieldRef("static", "board")
+        assert FieldRef("calc", "turnover").key == "calc.turnover"
+        with pytest.raises(KeyError):
+            resolve_field("unknown")
+        with pytest.raises(KeyError):
+            resolve_field("static.pe_ttm_ratio")
+
+    def test_condition_mask(self) -> None:
+        """测试条件的向量化计算，缺失值不满足条件"""
+        column = np.array([1.0, np.nan, 3.0])
+        assert (Field("turnover") > Decimal(2)).mask(column).tolist() == [
+            False,
+            False,
+            True,
+        ]
+        boards = np.array(["HKEquity", None], dtype=object)
+        assert (Field("board") == "HKEquity").mask(boards).tolist() == [True, False]
+        assert Field("market").isin(["US"]).mask(np.array(["HK", "US"])).tolist() == [
+            False,
+            True,
+        ]
+
+
+class TestScreeningEngine:
+    def test_plan_orders_by_cost(self, adapter) -> None:
+        """测试执行计划按成本排序，只包含用到的数据源和字段"""
+        engine = ScreeningEngine(adapter)
+        plan = engine.plan(
+            [Field("pe_ttm_ratio") < 20, Field("turnover") > 1e9],
+            columns=["board"],
+        )
+        assert [(s.source, s.fields) for s in plan] == [
+            ("static", ("board",)),
+            ("quote", ("turnover",)),
+            ("calc", ("pe_ttm_ratio",)),
+        ]
+        assert plan[0].conditions == ()
+
+    def test_screen_pushes_cheap_filters_first(self, adapter) -> None:
+        """测试廉价条件先执行，昂贵请求只针对剩余标的"""
+        engine = ScreeningEngine(adapter, batch_size=2)
+        result = engine.screen(
+            [*STATIC, "BAD.HK"],
+            [
+                Field("market") == "HK",
+                Field("board") == "HKEquity",
+                Field("turnover") > 1e9,
+                Field("pe_ttm_ratio") < 20,
+            ],
+            columns=["last_done"],
+        )
+        assert result.symbols == ["700.HK"]
+        assert result.columns["pe_ttm_ratio"].tolist() == [18.5]
+        assert result.columns["last_done"].tolist() == [100.0]
+        assert [(s.source, s.symbols_in, s.symbols_out) for s in result.stages] == [
+            ("symbol", 6, 4),
+            ("static", 4, 3),
+            ("quote", 3, 2),
+            ("calc", 2, 1),
+        ]
+        calc_calls = adapter.fetch_calc_indexes.call_args_list
+        assert len(calc_calls) == 1
+        assert sorted(calc_calls[0].args[0]) == ["700.HK", "9988.HK"]
+        assert calc_calls[0].args[1] == [CalcIndex.PeTtmRatio]
+        assert result.rows()[0]["symbol"] == "700.HK"
+
+    def test_missing_values_kept_without_conditions(self, adapter) -> None:
+        """测试只请求输出字段时保留缺失值，枚举转为名称"""
+        engine = ScreeningEngine(adapter)
+        result = engine.screen(
+            ["1.HK", "700.HK"], [], columns=["pe_ttm_ratio", "trade_status"]
+        )
+        assert result.symbols == ["1.HK", "700.HK"]
+        assert np.isnan(result.columns["pe_ttm_ratio"][0])
+        assert result.columns["trade_status"].tolist() == ["Normal", "Normal"]
+
+    def test_static_info_cached(self, adapter) -> None:
+        """测试静态信息按标的缓存，过期后重新请求"""
+        clock = MagicMock(return_value=0.0)
+        engine = ScreeningEngine(adapter, static_ttl=60, clock=clock)
+        condition = [Field("lot_size") >= 100]
+        assert engine.screen(["700.HK", "AAPL.US"], condition).symbols == ["700.HK"]
+        engine.screen(["700.HK", "AAPL.US", "1.HK"], condition)
+        assert adapter.fetch_static_info_batch.call_args.args[0] == ["1.HK"]
+        clock.return_value = 61.0
+        engine.screen(["700.HK"], condition)
+        assert adapter.fetch_static_info_batch.call_count == 3
@@ -0,0 +1,163 @@
+import os
+import time
+from datetime import datetime
+from decimal import Decimal
+from types import SimpleNamespace
+from typing import Iterator
+import numpy as np
+import pytest
+from modules.markets import symbol_market_key
+from modules.sharded_adapter import (
+    INT_MISSING,
+    QUOTE_COLUMNS,
+    ShardedMarketAdapter,
+    partition_by_hash,
+    partition_by_market,
+)
+
+SYMBOLS = ["AAPL.US", "TSLA.US", "0700.HK", "9988.HK", "600519.SH", "000001.SZ"]
+
+
+class FakeQuoteAdapter:
+    """在工作进程中代替真实适配器"""
+
+    def fetch_quote_batch(self, symbols: list[str]) -> list[SimpleNamespace]:
+        return [
+            SimpleNamespace(
+                symbol=symbol,
+                last_done=Decimal(len(symbol)),
+                prev_close=Decimal("1.5"),
+                open=Decimal("1"),
+                high=Decimal("2"),
+                low=Decimal("0.5"),
+                volume=100,
+                turnover=Decimal("150"),
+                timestamp=datetime(2024, 1, 2, 10, 0),
+            )
+            for symbol in symbols
+            if not symbol.startswith("BAD")
+        ]
+
+
+def fake_factory() -> FakeQuoteAdapter:
+    return FakeQuoteAdapter()
+
+
+def pid_columns(
+    adapter: FakeQuoteAdapter, symbols: list[str]
+) -> dict[str, list[float]]:
+    return {symbol: [float(os.getpid()), float(len(symbols))] for symbol in symbols}
+
+
+def failing_columns(
+    adapter: FakeQuoteAdapter, symbols: list[str]
+) -> dict[str, list[float]]:
+    if "0700.HK" in symbols:
+        raise RuntimeError("shard failed")
+    return {symbol: [1.0] for symbol in symbols}
+
+
+def crashing_columns(
+    adapter: FakeQuoteAdapter, symbols: list[str]
+) -> dict[str, list[float]]:
+    if "0700.HK" in symbols:
+        os._exit(3)
+    return {symbol: [1.0] for symbol in symbols}
+
+
+def slow_columns(
+    adapter: FakeQuoteAdapter, symbols: list[str]
+) -> dict[str, list[float]]:
+    time.sleep(1)
+    return {symbol: [1.0] for symbol in symbols}
+
+
+def shared_memory_blocks() -> set[str]:
+    return {name for name in os.listdir("/dev/shm") if name.startswith("psm_")}
+
+
+class TestPartition:
+    def test_hash_is_stable(self):
+        """测试哈希分片稳定且不丢标的"""
+        parts = partition_by_hash(SYMBOLS, 3)
+        assert sorted(s for part in parts for s in part) == sorted(SYMBOLS)
+        assert parts == partition_by_hash(SYMBOLS, 3)
+
+    def test_market_keeps_market_together(self):
+        """测试按市场分片时同一市场只落在一个分片"""
+        parts = partition_by_market(SYMBOLS, 4)
+        markets = [{symbol_market_key(s) for s in part} for part in parts]
+        for market in ("US", "HK", "CN"):
+            assert sum(market in part for part in markets) == 1
+
+
+@pytest.fixture(scope="module")
+def sharded() -> Iterator[ShardedMarketAdapter]:
+    with ShardedMarketAdapter(num_workers=2, adapter_factory=fake_factory) as adapter:
+        yield adapter
+
+
+class TestShardedMarketAdapter:
+    def test_fetch_quote_columns(self, sharded: ShardedMarketAdapter):
+        """测试分片获取行情并通过共享内存回传"""
+        with sharded.fetch_quote_columns(SYMBOLS + ["BAD.US"]) as result:
+            assert sorted(result.symbols) == sorted(SYMBOLS + ["BAD.US"])
+            assert result.columns == QUOTE_COLUMNS
+            assert result.row("0700.HK")["last_done"] == len("0700.HK")
+            assert result.row("AAPL.US")["turnover"] == 150.0
+            assert np.isnan(result.row("BAD.US")["last_done"])
+            assert result.row("BAD.US")["timestamp_ns"] == INT_MISSING
+            assert result.errors == {}
+
+    def test_runs_in_separate_processes(self, sharded: ShardedMarketAdapter):
+        """测试各分片在不同的工作进程中执行"""
+        with sharded.map(pid_columns, SYMBOLS, ("pid", "shard_size")) as result:
+            pids = set(result.column("pid"))
+            assert len(pids) == 2
+            assert os.getpid() not in pids
+            assert result.column("shard_size").sum() > len(SYMBOLS)
+
+    def test_shard_error(self, sharded: ShardedMarketAdapter):
+        """测试单个分片失败不影响其他分片"""
+        with sharded.map(failing_columns, SYMBOLS, ("value",)) as result:
+            assert len(result.errors) == 1
+            assert "shard failed" in next(iter(result.errors.values()))
+            assert np.isnan(result.row("0700.HK")["value"])
+            assert np.nansum(result.column("value")) > 0
+
+    def test_int_columns_keep_precision(self, sharded: ShardedMarketAdapter):
+        """测试整数列按 int64 存储，纳秒时间戳不丢失精度"""
+        with sharded.fetch_quote_columns(SYMBOLS) as result:
+            timestamps = result.column("timestamp_ns")
+            assert timestamps.dtype == np.int64
+            expected = int(datetime(2024, 1, 2, 10, 0).timestamp()) * 10**9
+            assert result.row("0700.HK")["timestamp_ns"] == expected
+            assert isinstance(result.row("0700.HK")["volume"], int)
+            assert result.column("last_done").dtype == np.float64
+
+
+class TestWorkerFailures:
+    def test_crashed_worker(self):
+        """测试工作进程崩溃时不会一直阻塞，并在下次调用前重新启动"""
+        with ShardedMarketAdapter(
+            num_workers=2, adapter_factory=fake_factory
+        ) as adapter:
+            with adapter.map(crashing_columns, SYMBOLS, ("value",), 30) as result:
+                assert len(result.errors) == 1
+                assert "exitcode=3" in next(iter(result.errors.values()))
+                assert np.isnan(result.row("0700.HK")["value"])
+            with adapter.map(pid_columns, SYMBOLS, ("pid", "n")) as result:
+                assert result.errors == {}
+                assert not np.isnan(result.column("pid")).any()
+
+    @pytest.mark.skipif(not os.path.isdir("/dev/shm"), reason="需要 /dev/shm")
+    def test_timeout_releases_shared_memory(self):
+        """测试超时后抛出 TimeoutError 并释放共享内存"""
+        with ShardedMarketAdapter(
+            num_workers=2, adapter_factory=fake_factory
+        ) as adapter:
+            adapter.start()
+            before = shared_memory_blocks()
+            with pytest.raises(TimeoutError):
+                adapter.map(slow_columns, SYMBOLS, ("value",), timeout=0.1)
+            assert shared_memory_blocks() == before
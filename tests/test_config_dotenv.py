@@ -83,3 +83,142 @@ def test_default_values(temp_project_env: str):
     assert key == ""
     assert secret == ""
     assert token == ""
+
+
+def test_performance_defaults(temp_project_env: str):
+    reload_config()
+    from config import PerformanceConfig, get_performance_config
+
+    assert get_performance_config() == PerformanceConfig()
+
+
+def test_performance_yaml(temp_project_env: str):
+    yaml_path = Path(temp_project_env) / "config.yml"
+    yaml_path.write_text(
+        """
+performance:
+  max_workers: 16
+  rate_limit: 5
+  cache_ttl:
+    quote: 0.25
+  conflation_window: 0.2
+"""
+    )
+    reload_config()
+    from config import get_performance_config
+
+    config = get_performance_config()
+    assert config.max_workers == 16
+    assert config.rate_limit == 5.0
+    assert config.cache_ttl["quote"] == 0.25
+    # 未配置的方法保留默认缓存时间
+    assert config.cache_ttl["depth"] == 0.5
+    assert config.conflation_window == 0.2
+
+
+@pytest.mark.parametrize(
+    "section",
+    [
+        {"max_workers": 0},
+        {"max_workers": "8"},
+        {"batch_size": True},
+        {"rate_limit": -1},
+        {"rate_burst": 0.5},
+        {"cache_ttl": {"quote": -1}},
+        {"cache_ttl": [1]},
+        {"pool": 4},
+    ],
+)
+def test_performance_validation(temp_project_env: str, section: dict):
+    from config import parse_performance_config
+
+    with pytest.raises(ValueError):
+        parse_performance_config(section)
+
+
+def test_invalid_performance_fails_at_startup(temp_project_env: str):
+    (Path(temp_project_env) / "config.yml").write_text(
+        "performance:\n  max_workers: -1\n"
+    )
+    with pytest.raises(ValueError):
+        reload_config()
+
+
+def test_hot_reload(temp_project_env: str):
+    from unittest.mock import MagicMock
+    from config import ConfigWatcher, get_performance_config
+    from modules.backends import CachingBackend
+    from modules.long_port_market_adapter import LongPortMarketAdapter
+
+    yaml_path = Path(temp_project_env) / "config.yml"
+    yaml_path.write_text("performance:\n  max_workers: 4\n")
+    ctx = MagicMock()
+    cache = CachingBackend(ctx)
+    adapter = LongPortMarketAdapter(backend=cache)
+    watcher = ConfigWatcher(yaml_path, [adapter.apply_performance_config])
+    assert not watcher.check()
+
+    yaml_path.write_text(
+        "performance:\n  max_workers: 12\n  rate_limit: 20\n  cache_ttl:\n"
+        "    quote: 0\n  cache_max_entries: 5\n"
+    )
+    assert watcher.check()
+    assert get_performance_config().max_workers == 12
+    assert adapter.max_workers == 12
+    assert adapter.rate_limiter.rate == 20.0
+    # 不重建连接
+    assert adapter.ctx is cache and cache.backend is ctx
+    cache.quote(["700.HK"])
+    cache.quote(["700.HK"])
+    assert ctx.quote.call_count == 2
+
+    # 不合法的新配置不生效
+    yaml_path.write_text("performance:\n  max_workers: many\n")
+    assert not watcher.check()
+    assert watcher.errors == 1
+    assert adapter.max_workers == 12
+
+
+def test_hot_reload_consumers(temp_project_env: str):
+    from unittest.mock import MagicMock
+    from config import ConfigWatcher
+    from modules.backends import CachingBackend, RoutingBackend
+    from modules.long_port_market_adapter import LongPortMarketAdapter
+    from modules.quote_delta import QuoteConflator
+    from modules.quote_snapshot import QuoteSnapshotPublisher
+    from modules.screener import ScreeningEngine
+
+    yaml_path = Path(temp_project_env) / "config.yml"
+    yaml_path.write_text("performance:\n  max_workers: 4\n")
+    # 缓存位于路由的备用数据源之后
+    vendor = MagicMock()
+    cache = CachingBackend(vendor)
+    adapter = LongPortMarketAdapter(
+        backend=RoutingBackend({"primary": MagicMock(), "vendor": cache})
+    )
+    publisher = QuoteSnapshotPublisher(
+        adapter, ["AAPL.US"], path=Path(temp_project_env) / "quotes"
+    )
+    engine = ScreeningEngine(adapter)
+    conflator = QuoteConflator(0, lambda changes: None)
+    watcher = ConfigWatcher(
+        yaml_path,
+        [
+            adapter.apply_performance_config,
+            publisher.apply_performance_config,
+            engine.apply_performance_config,
+            conflator.apply_performance_config,
+        ],
+    )
+    try:
+        yaml_path.write_text(
+            "performance:\n  batch_size: 50\n  conflation_window: 0.25\n"
+            "  cache_max_entries: 5\n"
+        )
+        assert watcher.check()
+        assert cache._max_entries == 5
+        assert publisher.batch_size == 50
+        assert engine._batch_size == 50
+        assert conflator.window == 0.25
+    finally:
+        publisher.close(unlink=True)
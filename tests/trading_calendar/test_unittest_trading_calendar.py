@@ -0,0 +1,191 @@
+from datetime import date, datetime, timedelta
+from unittest.mock import MagicMock
+import pytest
+from longport.openapi import Market
+from modules.markets import market_timezone
+from modules.trading_calendar import MarketPhase, TradingCalendar
+
+HK_TZ = market_timezone("HK")
+US_TZ = market_timezone("US")
+
+
+class TestTradingCalendarLoading:
+    def test_load_splits_into_month_ranges(self, mock_calendar_adapter: MagicMock):
+        """测试按自然月切分交易日查询"""
+        calendar = TradingCalendar(
+            mock_calendar_adapter,
+            markets=[Market.HK],
+            lookback_days=10,
+            lookahead_days=40,
+        )
+        calendar.load(today=date(2024, 2, 1))
+
+        ranges = [
+            (c.args[1], c.args[2])
+            for c in mock_calendar_adapter.fetch_trading_days.call_args_list
+        ]
+        assert ranges == [
+            (date(2024, 1, 22), date(2024, 1, 31)),
+            (date(2024, 2, 1), date(2024, 2, 29)),
+            (date(2024, 3, 1), date(2024, 3, 12)),
+        ]
+        assert mock_calendar_adapter.fetch_trading_session.call_count == 1
+
+    def test_failed_month_skipped(self, mock_calendar_adapter: MagicMock):
+        """测试接口拒绝较早的月份时跳过该月，其余月份照常加载"""
+        trading_days = mock_calendar_adapter.fetch_trading_days.side_effect
+
+        def reject_old_months(market, begin: date, end: date):  # type: ignore
+            if begin < date(2024, 1, 1):
+                raise RuntimeError("out of range")
+            return trading_days(market, begin, end)
+
+        mock_calendar_adapter.fetch_trading_days.side_effect = reject_old_months
+        calendar = TradingCalendar(
+            mock_calendar_adapter,
+            markets=[Market.HK],
+            lookback_days=60,
+            lookahead_days=10,
+        )
+        calendar.load(today=date(2024, 2, 1))
+        assert calendar.is_trading_day(Market.HK, date(2024, 1, 2))
+        assert not calendar.is_trading_day(Market.HK, date(2023, 12, 15))
+        assert mock_calendar_adapter.fetch_trading_days.call_count == 3
+
+    def test_unknown_market(self, mock_calendar: TradingCalendar):
+        """测试查询未加载的市场"""
+        with pytest.raises(KeyError):
+            mock_calendar.is_trading_day(Market.SG, date(2024, 2, 1))
+
+    def test_background_refresh(self, mock_calendar_adapter: MagicMock):
+        """测试后台刷新线程"""
+        calendar = TradingCalendar(
+            mock_calendar_adapter,
+            markets=[Market.HK],
+            lookback_days=1,
+            lookahead_days=1,
+        )
+        calendar.start(refresh_interval=0.01)
+        try:
+            deadline = datetime.now() + timedelta(seconds=2)
+            while (
+                mock_calendar_adapter.fetch_trading_session.call_count < 3
+                and datetime.now() < deadline
+            ):
+                pass
+        finally:
+            calendar.stop()
+        assert mock_calendar_adapter.fetch_trading_session.call_count >= 3
+
+
+class TestTradingDays:
+    def test_is_trading_day(self, mock_calendar: TradingCalendar):
+        """测试交易日判断"""
+        assert mock_calendar.is_trading_day(Market.HK, date(2024, 2, 8))
+        assert mock_calendar.is_trading_day("HK", date(2024, 2, 9))
+        assert not mock_calendar.is_trading_day(Market.HK, date(2024, 2, 10))
+        assert not mock_calendar.is_trading_day(Market.HK, date(2024, 2, 12))
+        assert mock_calendar.is_half_trading_day(Market.HK, date(2024, 2, 9))
+
+    def test_next_and_previous_trading_day(self, mock_calendar: TradingCalendar):
+        """测试前后交易日"""
+        assert mock_calendar.next_trading_day(Market.HK, date(2024, 2, 9)) == date(
+            2024, 2, 14
+        )
+        assert mock_calendar.previous_trading_day(Market.HK, date(2024, 2, 14)) == date(
+            2024, 2, 9
+        )
+        assert mock_calendar.next_trading_day(Market.HK, date(2030, 1, 1)) is None
+
+    def test_trading_days_between(self, mock_calendar: TradingCalendar):
+        """测试区间交易日计数"""
+        assert (
+            mock_calendar.trading_days_between(
+                Market.HK, date(2024, 2, 5), date(2024, 2, 16)
+            )
+            == 8
+        )
+        assert mock_calendar.trading_days(
+            Market.HK, date(2024, 2, 9), date(2024, 2, 14)
+        ) == [date(2024, 2, 9), date(2024, 2, 14)]
+        assert (
+            mock_calendar.trading_days_between(
+                Market.HK, date(2024, 2, 16), date(2024, 2, 5)
+            )
+            == 0
+        )
+
+
+class TestTradingSessions:
+    def test_is_open(self, mock_calendar: TradingCalendar):
+        """测试开市判断"""
+        assert mock_calendar.is_open(
+            Market.HK, datetime(2024, 2, 8, 10, 0, tzinfo=HK_TZ)
+        )
+        assert not mock_calendar.is_open(
+            Market.HK, datetime(2024, 2, 8, 12, 30, tzinfo=HK_TZ)
+        )
+        assert not mock_calendar.is_open(
+            Market.HK, datetime(2024, 2, 12, 10, 0, tzinfo=HK_TZ)
+        )
+
+    def test_half_day_has_no_afternoon(self, mock_calendar: TradingCalendar):
+        """测试半日市没有午市"""
+        assert mock_calendar.is_open(
+            Market.HK, datetime(2024, 2, 9, 11, 0, tzinfo=HK_TZ)
+        )
+        assert not mock_calendar.is_open(
+            Market.HK, datetime(2024, 2, 9, 14, 0, tzinfo=HK_TZ)
+        )
+
+    def test_next_session(self, mock_calendar: TradingCalendar):
+        """测试下一个交易时段"""
+        window = mock_calendar.next_session(
+            Market.HK, datetime(2024, 2, 9, 11, 0, tzinfo=HK_TZ)
+        )
+        assert window is not None
+        assert window.begin == datetime(2024, 2, 14, 9, 30, tzinfo=HK_TZ)
+        assert window.end == datetime(2024, 2, 14, 12, 0, tzinfo=HK_TZ)
+
+    def test_previous_session(self, mock_calendar: TradingCalendar):
+        """测试上一个交易时段"""
+        window = mock_calendar.previous_session(
+            Market.HK, datetime(2024, 2, 14, 9, 0, tzinfo=HK_TZ)
+        )
+        assert window is not None
+        assert window.trading_day == date(2024, 2, 9)
+        assert window.end == datetime(2024, 2, 9, 12, 0, tzinfo=HK_TZ)
+
+
+class TestMarketPhase:
+    def test_phase(self, mock_calendar: TradingCalendar):
+        """测试市场阶段判断"""
+        assert (
+            mock_calendar.phase(Market.US, datetime(2024, 2, 8, 8, 0, tzinfo=US_TZ))
+            == MarketPhase.PRE_MARKET
+        )
+        assert (
+            mock_calendar.phase(Market.US, datetime(2024, 2, 8, 10, 0, tzinfo=US_TZ))
+            == MarketPhase.INTRADAY
+        )
+        assert (
+            mock_calendar.phase(Market.US, datetime(2024, 2, 8, 21, 0, tzinfo=US_TZ))
+            == MarketPhase.BREAK
+        )
+        assert (
+            mock_calendar.phase(Market.HK, datetime(2024, 2, 8, 12, 30, tzinfo=HK_TZ))
+            == MarketPhase.BREAK
+        )
+        assert (
+            mock_calendar.phase(Market.HK, datetime(2024, 2, 12, 10, 0, tzinfo=HK_TZ))
+            == MarketPhase.CLOSED
+        )
+
+    def test_next_phase_change(self, mock_calendar: TradingCalendar):
+        """测试下一次阶段变化时刻"""
+        assert mock_calendar.next_phase_change(
+            Market.HK, datetime(2024, 2, 8, 10, 0, tzinfo=HK_TZ)
+        ) == datetime(2024, 2, 8, 12, 0, tzinfo=HK_TZ)
+        assert mock_calendar.next_phase_change(
+            Market.US, datetime(2024, 2, 8, 21, 0, tzinfo=US_TZ)
+        ) == datetime(2024, 2, 9, 4, 0, tzinfo=US_TZ)